@@ -100,6 +100,13 @@ class User(AbstractUser):
         # We preserve the original case as entered by the user
         super().save(*args, **kwargs)
 
+        # Avatar proxy URLs (/api/chats/media/avatars/user/<id>) resolve
+        # through a cached storage path; drop it when the avatar may change
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'avatar_url' in update_fields:
+            from chatpop.utils.media.storage import MediaStorage
+            MediaStorage.invalidate_avatar_path(self.pk)
+
 
 class UserSubscription(models.Model):
     """
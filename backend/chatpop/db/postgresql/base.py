@@ -0,0 +1,67 @@
+"""
+PostgreSQL backend with connection pooling and connect timing.
+
+Django's postgresql backend, plus:
+- OPTIONS['pool'] = {'max_size', 'timeout', 'max_idle'} checks connections
+  out of a process-wide pool (see pool.py) and hands them back on close,
+  like Django 5.1's option of the same name. Requires CONN_MAX_AGE = 0.
+- Every new physical connection records its connect time as 'db_connect'
+  in the cluster-wide latency histograms.
+
+Settings (chatpop/settings.py):
+    DATABASES = {"default": {"ENGINE": "chatpop.db.postgresql", ...}}
+"""
+
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from .pool import get_pool, record_latency
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self):
+        """This database's pool, or None when OPTIONS['pool'] is not set."""
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured('Pooling requires CONN_MAX_AGE = 0 (connections are returned on close).')
+        return get_pool(self.alias, self.settings_dict['NAME'], options)
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return self._connect(conn_params)
+
+        # Set by the parent's get_new_connection() on a fresh connection
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        return pool.getconn(
+            lambda: self._connect(conn_params),
+            health_check=self.settings_dict['CONN_HEALTH_CHECKS'],
+        )
+
+    def _connect(self, conn_params):
+        start = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        record_latency('db_connect', (time.perf_counter() - start) * 1000)
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+            # The pool may hand it to another thread now
+            self.connection = None
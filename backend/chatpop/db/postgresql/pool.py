@@ -0,0 +1,209 @@
+"""
+Process-wide psycopg2 connection pool used by chatpop.db.postgresql.
+
+Django 5.0 has no OPTIONS['pool'] and psycopg_pool needs psycopg 3, so the
+backend keeps its own pool: one per database per process, shared by every
+thread. A bounded semaphore caps checked-out connections at max_size;
+threads beyond that wait up to `timeout` seconds. Idle connections are
+reused newest first so the oldest ones age out after max_idle.
+
+Every checkout records its wait in the cluster-wide latency histograms
+('db_pool_wait'), and every new physical connection its connect time
+('db_connect'), so both show on the cache dashboard and /metrics.
+
+Usage:
+    pool = get_pool('default', 'chatpop', {'max_size': 20, 'timeout': 10})
+    conn = pool.getconn(connect)     # connect() opens a new connection
+    pool.putconn(conn)
+    pool_stats()                     # {alias: {max_size, in_use, idle, ...}}
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+# Reused connections idle at least this long are pinged first when
+# CONN_HEALTH_CHECKS is on
+HEALTH_CHECK_AFTER = 5.0
+
+
+def record_latency(op: str, duration_ms: float):
+    """Add a duration to the cluster-wide latency histograms."""
+    # Imported late: chats.utils.performance imports models, which need this backend
+    from chats.utils.performance.latency import histograms
+
+    histograms.record(op, duration_ms)
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections."""
+
+    def __init__(self, alias: str, max_size: int, timeout: float = 10.0, max_idle: float = 300.0):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = deque()  # (connection, returned at)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.opened = 0
+        self.reused = 0
+        self.timeouts = 0
+        self.closed = False
+
+    def getconn(self, connect: Callable[[], Any], health_check: bool = False):
+        """
+        Check out a connection, opening one with connect() if none is idle.
+
+        Raises psycopg2.OperationalError after `timeout` seconds when all
+        max_size connections are checked out.
+        """
+        start = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.timeout)
+        record_latency('db_pool_wait', (time.perf_counter() - start) * 1000)
+        if not acquired:
+            with self._lock:
+                self.timeouts += 1
+            raise psycopg2.OperationalError(
+                f"Timed out after {self.timeout}s waiting for a pooled connection "
+                f"({self.alias}: {self.max_size} in use)"
+            )
+
+        try:
+            conn = self._take_idle(health_check)
+            if conn is None:
+                conn = connect()
+                with self._lock:
+                    self.opened += 1
+            else:
+                with self._lock:
+                    self.reused += 1
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.in_use += 1
+        return conn
+
+    def _take_idle(self, health_check: bool):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, returned_at = self._idle.pop()
+            idle_for = time.monotonic() - returned_at
+            if conn.closed or idle_for > self.max_idle:
+                _close_quietly(conn)
+                continue
+            if health_check and idle_for >= HEALTH_CHECK_AFTER and not self._is_usable(conn):
+                _close_quietly(conn)
+                continue
+            return conn
+
+    @staticmethod
+    def _is_usable(conn) -> bool:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except psycopg2.Error:
+            return False
+
+    def putconn(self, conn):
+        """Return a checked-out connection; rolls back an open transaction."""
+        keep = False
+        try:
+            if not conn.closed:
+                status = conn.info.transaction_status
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    conn.close()
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                keep = not conn.closed
+        except psycopg2.Error as e:
+            logger.warning(f"[DB POOL] Discarding connection that failed to reset: {e}")
+            _close_quietly(conn)
+
+        expired = []
+        now = time.monotonic()
+        with self._lock:
+            self.in_use -= 1
+            if keep and not self.closed:
+                self._idle.append((conn, now))
+            elif keep:
+                expired.append(conn)
+            while self._idle and now - self._idle[0][1] > self.max_idle:
+                expired.append(self._idle.popleft()[0])
+        self._slots.release()
+        for stale in expired:
+            _close_quietly(stale)
+
+    def close_all(self):
+        """Close idle connections; checked-out ones are closed when returned."""
+        with self._lock:
+            self.closed = True
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'in_use': self.in_use,
+                'idle': len(self._idle),
+                'opened': self.opened,
+                'reused': self.reused,
+                'timeouts': self.timeouts,
+            }
+
+
+_pools: Dict[Tuple[str, Optional[str]], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias: str, database: Optional[str], options: Mapping[str, Any]) -> ConnectionPool:
+    """The pool for an alias and database name, created on first use."""
+    key = (alias, database)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                alias,
+                max_size=int(options['max_size']),
+                timeout=float(options.get('timeout', 10)),
+                max_idle=float(options.get('max_idle', 300)),
+            )
+        return pool
+
+
+def close_pools(alias: Optional[str] = None):
+    """Close idle connections and drop the pools (all aliases by default)."""
+    with _pools_lock:
+        keys = [key for key in _pools if alias is None or key[0] == alias]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.close_all()
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """This process's pools: {alias: {max_size, in_use, idle, opened, reused, timeouts}}."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.alias: pool.stats() for pool in pools}
@@ -15,6 +15,9 @@ import os
 import sys
 from dotenv import load_dotenv
 
+from chatpop.utils.channel_layers import channel_layers_from_env
+from chatpop.utils.db_connections import db_connections_from_env
+
 # Load environment variables
 load_dotenv()
 
@@ -107,6 +110,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "media_analysis.utils.tracing.TraceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -142,19 +146,26 @@ ASGI_APPLICATION = "chatpop.asgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Connection pooling / persistent connections from DB_* (see chatpop/utils/db_connections.py)
+DATABASE_CONNECTIONS = db_connections_from_env()
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        # Django's postgresql backend plus OPTIONS["pool"] and connect timing
+        "ENGINE": "chatpop.db.postgresql",
         "NAME": os.getenv("POSTGRES_DB", "chatpop"),
         "USER": os.getenv("POSTGRES_USER", "chatpop_user"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "chatpop_pass"),
         "HOST": os.getenv("POSTGRES_HOST", "localhost"),
         "PORT": os.getenv("POSTGRES_PORT", "5432"),
+        "CONN_MAX_AGE": DATABASE_CONNECTIONS["CONN_MAX_AGE"],
+        "CONN_HEALTH_CHECKS": DATABASE_CONNECTIONS["CONN_HEALTH_CHECKS"],
         "OPTIONS": {
             # "prefer" = encrypt if server supports it, plain otherwise.
             # Local Docker Postgres: connects unencrypted (no SSL configured).
             # AWS RDS (rds.force_ssl=1): requires SSL — set POSTGRES_SSLMODE=require in .env.
             "sslmode": os.getenv("POSTGRES_SSLMODE", "prefer"),
+            **DATABASE_CONNECTIONS["OPTIONS"],
         },
     }
 }
@@ -206,14 +217,9 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Channels
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
-        "CONFIG": {
-            "hosts": [(os.getenv("REDIS_HOST", "localhost"), int(os.getenv("REDIS_PORT", "6379")))],
-        },
-    },
-}
+# Sharded over CHANNEL_LAYER_HOSTS (default REDIS_HOST:REDIS_PORT); backend,
+# capacity and expiry from CHANNEL_LAYER_* (see chatpop/utils/channel_layers.py)
+CHANNEL_LAYERS = channel_layers_from_env()
 
 # CORS Settings
 # Allow all origins in development for LAN/mobile testing
@@ -302,6 +308,8 @@ CACHES = {
         "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/0",
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # Counts Redis commands per trace span (media_analysis/utils/tracing.py)
+            "CONNECTION_POOL_CLASS": "media_analysis.utils.tracing.TracingConnectionPool",
             "CONNECTION_POOL_KWARGS": {"max_connections": 50},
         }
     }
@@ -311,6 +319,24 @@ CACHES = {
 MESSAGE_CACHE_MAX_COUNT = int(os.getenv("MESSAGE_CACHE_MAX_COUNT", "500"))  # Max messages per chat in Redis
 MESSAGE_CACHE_TTL_HOURS = int(os.getenv("MESSAGE_CACHE_TTL_HOURS", "24"))  # Auto-expire after 24 hours
 
+# Username Suggestion Pool (chats/utils/username/pool.py)
+USERNAME_POOL_TARGET_SIZE = int(os.getenv("USERNAME_POOL_TARGET_SIZE", "2000"))  # Names a refill tops the pool up to
+USERNAME_POOL_LOW_WATER = int(os.getenv("USERNAME_POOL_LOW_WATER", "500"))  # refill_username_pool worker refills below this
+
+# Room Cache (chats/utils/performance/room_cache.py)
+ROOM_CACHE_LOCAL_TTL_SECONDS = float(os.getenv("ROOM_CACHE_LOCAL_TTL_SECONDS", "2"))  # In-process tier; bounds cross-process staleness
+
+# Room Message Counts (chats/utils/performance/message_counts.py)
+MESSAGE_COUNT_FLUSH_INTERVAL_SECONDS = int(os.getenv("MESSAGE_COUNT_FLUSH_INTERVAL_SECONDS", "5"))  # Buffered deltas are written to ChatRoomMessageCount at most this often
+
+# Room Change Log (chats/utils/performance/room_changes.py)
+ROOM_CHANGE_LOG_MAX_EVENTS = int(os.getenv("ROOM_CHANGE_LOG_MAX_EVENTS", "1000"))  # Stream length per room; older cursors must resync
+ROOM_CHANGE_LOG_TTL_SECONDS = int(os.getenv("ROOM_CHANGE_LOG_TTL_SECONDS", str(24 * 3600)))  # Idle rooms drop their log
+
+# Latency Histograms (chats/utils/performance/latency.py)
+METRICS_FLUSH_INTERVAL_SECONDS = float(os.getenv("METRICS_FLUSH_INTERVAL_SECONDS", "1"))  # Each process adds its buffered buckets to Redis at most this often
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # Bearer token for /metrics scrapers; empty = staff sessions only
+
 # Constance - Dynamic Settings (editable in /admin/constance/config/)
 CONSTANCE_BACKEND = 'constance.backends.database.DatabaseBackend'
 CONSTANCE_CONFIG = {
@@ -559,6 +585,16 @@ Response JSON:
         'Temperature for chat suggestion generation (0.0-2.0). Higher = more creative/random, Lower = more deterministic. Lower temperature (0.3) provides more consistent, focused suggestions.',
         float
     ),
+    'PHOTO_ANALYSIS_NEAR_DUPLICATE_ENABLED': (
+        True,
+        'Reuse the suggestions of a previous upload whose perceptual hash is within PHOTO_ANALYSIS_NEAR_DUPLICATE_THRESHOLD bits (re-encoded or re-screenshotted copies of the same image) instead of calling the Vision API again.',
+        bool
+    ),
+    'PHOTO_ANALYSIS_NEAR_DUPLICATE_THRESHOLD': (
+        5,
+        'Maximum pHash Hamming distance (0-15) for a near-duplicate photo match. 0-5 = same image with minor edits/compression, 6-10 = resized/cropped, >10 = likely different images.',
+        int
+    ),
 
 
     # Music Recognition Settings
@@ -732,6 +768,12 @@ CLOUDFLARE_TURNSTILE_SECRET_KEY = "" if "test" in sys.argv else os.getenv("CLOUD
 # Enable performance tracking for photo analysis pipeline (disabled by default)
 MEDIA_ANALYSIS_PERFORMANCE_TRACKING = os.getenv("MEDIA_ANALYSIS_PERFORMANCE_TRACKING", "False") == "True"
 
+# Span Tracing (media_analysis/utils/tracing.py)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "True") == "True"
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "500"))  # Traces at least this slow are kept for /admin/monitor/traces/
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))  # Slow traces kept (shared by all processes)
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")  # Append every trace here as OTLP JSON lines; empty = off
+
 # Media Storage Settings
 # S3 is used iff AWS_STORAGE_BUCKET_NAME is set. Credentials come from
 # boto3's default chain: env vars, AWS_PROFILE (~/.aws/credentials), or
@@ -766,11 +808,28 @@ if AWS_STORAGE_BUCKET_NAME:
     AWS_DEFAULT_ACL = "private"      # Bucket is private; CDN/presigned only.
     AWS_QUERYSTRING_AUTH = True      # Sign URLs (CloudFront if configured, else S3).
     AWS_QUERYSTRING_EXPIRE = 3600    # 1 hour TTL on signed URLs.
+    # Uploads stream through boto3's upload_fileobj: objects above 8 MB go
+    # up as 8 MB multipart parts, at most 4 in flight (~32 MB per upload).
+    from boto3.s3.transfer import TransferConfig
+    AWS_S3_TRANSFER_CONFIG = TransferConfig(
+        multipart_threshold=8 * 1024 * 1024,
+        multipart_chunksize=8 * 1024 * 1024,
+        max_concurrency=4,
+    )
 else:
     DEFAULT_FILE_STORAGE = "django.core.files.storage.FileSystemStorage"
     MEDIA_ROOT = BASE_DIR / "media"
     MEDIA_URL = "/media/"
 
+# Proxied media (local storage) can be handed to the fronting server after
+# the access check instead of streaming bytes through Django:
+#   "" (default)        - Django streams the file / requested ranges
+#   "x-accel-redirect"  - nginx; MEDIA_ACCEL_REDIRECT_PREFIX must be an
+#                         `internal` location aliased to MEDIA_ROOT
+#   "x-sendfile"        - Apache mod_xsendfile, lighttpd, Caddy
+MEDIA_SENDFILE_MODE = os.getenv("MEDIA_SENDFILE_MODE", "")
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+
 # Logging Configuration
 LOGGING = {
     "version": 1,
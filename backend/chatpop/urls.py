@@ -43,6 +43,9 @@ urlpatterns = [
     path("admin/monitor/location-cache/analytics/point/<uuid:point_id>/", media_admin_views.location_analytics_point_details, name="location_analytics_point_details"),
     path("admin/monitor/location-cache/analytics/lod/", media_admin_views.location_analytics_lod, name="location_analytics_lod"),
 
+    # Slow traces (media_analysis/utils/tracing.py)
+    path("admin/monitor/traces/", media_admin_views.slow_traces_dashboard, name="slow_traces_dashboard"),
+
     # API Health Check
     path("admin/health/apis/", media_admin_views.api_health_dashboard, name="api_health_dashboard"),
     path("admin/health/apis/data/", media_admin_views.api_health_check, name="api_health_check"),
@@ -53,6 +56,9 @@ urlpatterns = [
 
     path("admin/", admin.site.urls),
 
+    # Prometheus scrape endpoint (cluster-wide latency histograms)
+    path("metrics", admin_views.prometheus_metrics, name="prometheus_metrics"),
+
     # API endpoints
     path("api/auth/", include('accounts.urls')),
     path("api/chats/", include('chats.urls')),
@@ -0,0 +1,106 @@
+"""
+Channel layer configuration from the environment.
+
+A single Redis carries every room's group_send traffic and group
+membership. channels_redis shards both over several hosts: group
+membership and group_send for a group go to the host its name hashes to
+(CRC32 over a 4096-slot ring split evenly between hosts), and each channel's
+messages to the host its name hashes to. The pub/sub variant shards
+subscriptions the same way and keeps no per-channel queues in Redis.
+
+Environment:
+    CHANNEL_LAYER_HOSTS     Comma-separated Redis URLs, e.g.
+                            redis://ws-redis-1:6379/0,redis://ws-redis-2:6379/0
+                            (default: REDIS_HOST:REDIS_PORT)
+    CHANNEL_LAYER_BACKEND   'core' (default) or 'pubsub'
+    CHANNEL_LAYER_CAPACITY  Messages queued per channel before group_send
+                            drops them (core only, default 100)
+    CHANNEL_LAYER_EXPIRY    Seconds an undelivered message lives (core only,
+                            default 60)
+
+Changing the host list remaps most groups: deploy it with a rolling restart
+so consumers re-join their groups on the new hosts.
+
+Usage (chatpop/settings.py):
+    CHANNEL_LAYERS = channel_layers_from_env()
+
+Benchmark host counts with `manage.py benchmark_channel_layer`.
+"""
+
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional
+
+BACKENDS = {
+    'core': 'channels_redis.core.RedisChannelLayer',
+    'pubsub': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+}
+
+
+def parse_hosts(value: Optional[str]) -> List[str]:
+    """Comma-separated Redis URLs -> list of URLs (host:port gets redis://)."""
+    hosts = []
+    for host in (value or '').split(','):
+        host = host.strip()
+        if not host:
+            continue
+        if '://' not in host:
+            host = f'redis://{host}'
+        hosts.append(host)
+    return hosts
+
+
+def build_channel_layer(hosts: List[Any], backend: str = 'core', capacity: int = 100,
+                        expiry: int = 60) -> Dict[str, Any]:
+    """
+    One CHANNEL_LAYERS entry.
+
+    Args:
+        hosts: Redis URLs or (host, port) tuples; groups are sharded across them
+        backend: 'core' or 'pubsub'
+        capacity: Per-channel queue length (core only)
+        expiry: Message expiry in seconds (core only)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown channel layer backend {backend!r}, expected one of {sorted(BACKENDS)}")
+
+    config: Dict[str, Any] = {'hosts': list(hosts)}
+    if backend == 'core':
+        config.update(capacity=capacity, expiry=expiry)
+    return {'BACKEND': BACKENDS[backend], 'CONFIG': config}
+
+
+def channel_layers_from_env(environ: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+    """CHANNEL_LAYERS setting from the CHANNEL_LAYER_* variables above."""
+    environ = os.environ if environ is None else environ
+
+    hosts: List[Any] = parse_hosts(environ.get('CHANNEL_LAYER_HOSTS'))
+    if not hosts:
+        hosts = [(environ.get('REDIS_HOST', 'localhost'), int(environ.get('REDIS_PORT', '6379')))]
+
+    return {
+        'default': build_channel_layer(
+            hosts,
+            backend=environ.get('CHANNEL_LAYER_BACKEND', 'core').strip().lower(),
+            capacity=int(environ.get('CHANNEL_LAYER_CAPACITY', '100')),
+            expiry=int(environ.get('CHANNEL_LAYER_EXPIRY', '60')),
+        ),
+    }
+
+
+@lru_cache(maxsize=None)
+def _ring(host_count: int):
+    """A layer over `host_count` placeholder hosts (no connections are opened)."""
+    from channels_redis.core import RedisChannelLayer
+
+    return RedisChannelLayer(hosts=[f'redis://shard-{i}:6379' for i in range(host_count)])
+
+
+def group_host_index(group: str, host_count: int) -> int:
+    """
+    Index of the host a group's membership and group_send land on.
+
+    Asks the core layer (RedisChannelLayer.consistent_hash); the pub/sub
+    layer places groups on the same ring.
+    """
+    return _ring(host_count).consistent_hash(group)
@@ -0,0 +1,90 @@
+"""
+Database connection reuse from the environment.
+
+With no CONN_MAX_AGE, every request and every database_sync_to_async
+call in ChatConsumer opens a fresh Postgres connection and closes it again
+(close_old_connections runs before and after each call). Two ways to reuse
+connections:
+
+- Pooling (DB_POOL=true): each worker process keeps up to DB_POOL_SIZE
+  connections in a process-wide pool (chatpop/db/postgresql). Closing a
+  Django connection hands it back to the pool instead of closing it, so
+  any thread can reuse it. Requires CONN_MAX_AGE = 0, which is forced here.
+- Persistent connections (DB_CONN_MAX_AGE > 0): each thread keeps its own
+  connection between requests. Under ASGI every HTTP request runs in a new
+  thread, so only long-lived threads (the consumers' sync executor)
+  benefit; idle connections left by finished request threads linger until
+  Postgres drops them. Prefer pooling under Daphne.
+
+Sizing: a process never runs more database work at once than its sync
+threads, ASGI_THREADS (asgiref's default executor, default
+min(32, cpu_count + 4)) plus the one thread-sensitive thread that
+database_sync_to_async uses. The default pool size is that, capped so that
+DB_WORKERS processes together stay within DB_MAX_CONNECTIONS.
+
+Environment:
+    DB_POOL                 'true' to pool connections (default false)
+    DB_POOL_SIZE            Connections per worker process (default: see above)
+    DB_POOL_TIMEOUT         Seconds a thread waits for a free connection
+                            before OperationalError (default 10)
+    DB_POOL_MAX_IDLE        Seconds an unused pooled connection is kept
+                            (default 300)
+    DB_WORKERS              Worker processes sharing the database (default 1)
+    DB_MAX_CONNECTIONS      Connections the deployment may use, i.e. Postgres
+                            max_connections less headroom for admin and
+                            migration sessions (default 90)
+    DB_CONN_MAX_AGE         Persistent connection lifetime in seconds without
+                            pooling (default 0; 'none' = unlimited)
+    DB_CONN_HEALTH_CHECKS   Check reused connections before handing them out
+                            (default true)
+
+Usage (chatpop/settings.py):
+    DATABASE_CONNECTIONS = db_connections_from_env()
+    DATABASES = {"default": {..., "CONN_MAX_AGE": DATABASE_CONNECTIONS["CONN_MAX_AGE"], ...}}
+
+Benchmark with `manage.py benchmark_db_connections`.
+"""
+
+import os
+from typing import Any, Dict, Mapping, Optional
+
+
+def _flag(value: Optional[str], default: bool) -> bool:
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def default_pool_size(environ: Optional[Mapping[str, str]] = None) -> int:
+    """Per-process pool size from thread, worker and connection-budget counts."""
+    environ = os.environ if environ is None else environ
+
+    threads = int(environ.get('ASGI_THREADS') or min(32, (os.cpu_count() or 1) + 4))
+    workers = max(1, int(environ.get('DB_WORKERS', '1')))
+    budget = int(environ.get('DB_MAX_CONNECTIONS', '90'))
+    return max(1, min(threads + 1, budget // workers))
+
+
+def db_connections_from_env(environ: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+    """
+    CONN_MAX_AGE, CONN_HEALTH_CHECKS and extra OPTIONS for DATABASES['default'].
+
+    OPTIONS['pool'] mirrors Django 5.1's option of the same name
+    ({max_size, timeout, max_idle}) and is only present when pooling is on.
+    """
+    environ = os.environ if environ is None else environ
+
+    max_age = environ.get('DB_CONN_MAX_AGE', '0').strip().lower()
+    settings: Dict[str, Any] = {
+        'CONN_MAX_AGE': None if max_age == 'none' else int(max_age or 0),
+        'CONN_HEALTH_CHECKS': _flag(environ.get('DB_CONN_HEALTH_CHECKS'), True),
+        'OPTIONS': {},
+    }
+    if _flag(environ.get('DB_POOL'), False):
+        settings['CONN_MAX_AGE'] = 0
+        settings['OPTIONS']['pool'] = {
+            'max_size': int(environ.get('DB_POOL_SIZE') or default_pool_size(environ)),
+            'timeout': float(environ.get('DB_POOL_TIMEOUT', '10')),
+            'max_idle': float(environ.get('DB_POOL_MAX_IDLE', '300')),
+        }
+    return settings
@@ -1,12 +1,18 @@
 """
 Media utilities for ChatPop.
 
-Provides audio transcoding and storage functionality for voice, photo, video messages, and avatars.
+Provides audio transcoding, video probing, bounded image resizing, avatar rendering and storage functionality for voice, photo, video messages, and avatars.
 """
 
 from .audio import transcode_webm_to_m4a
+from .video import probe_video, extract_thumbnail, MAX_VIDEO_DURATION_SECONDS
+from .image import load_resized, track_resource_usage, ImageTooLarge
+from .avatar_render import render_avatar_svg
 from .avatar import (
     generate_and_store_avatar,
+    generated_avatar_url,
+    ensure_generated_avatar,
+    render_generated_avatar,
     get_fallback_dicebear_url,
     fetch_dicebear_avatar,
 )
@@ -28,6 +34,12 @@ from .storage import (
 
 __all__ = [
     'transcode_webm_to_m4a',
+    'probe_video',
+    'extract_thumbnail',
+    'MAX_VIDEO_DURATION_SECONDS',
+    'load_resized',
+    'track_resource_usage',
+    'ImageTooLarge',
     'MediaStorage',
     'save_voice_message',
     'get_voice_message_url',
@@ -39,7 +51,11 @@ __all__ = [
     'save_avatar',
     'get_avatar_url',
     'delete_avatar',
+    'render_avatar_svg',
     'generate_and_store_avatar',
+    'generated_avatar_url',
+    'ensure_generated_avatar',
+    'render_generated_avatar',
     'get_fallback_dicebear_url',
     'fetch_dicebear_avatar',
     'PHOTO_CONTENT_TYPE_TO_EXT',
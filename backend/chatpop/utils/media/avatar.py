@@ -1,14 +1,43 @@
 """
 Avatar generation and storage utility.
-Fetches avatars from DiceBear API and stores them in S3/local storage.
+
+Avatars are rendered in-process (see avatar_render.py) rather than fetched
+from the DiceBear API. Assigning an avatar does no network or storage I/O:
+the avatar's storage path is derived from its renderer inputs and marked
+as assigned, and the SVG is rendered and written to storage the first time
+that path is fetched. Paths nobody was assigned (any seed can be put in a
+URL) are rendered per fetch and never written.
 """
 import io
+import logging
+import os
 import requests
-from typing import Optional
+from typing import Optional, Tuple
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from constance import config
 
-from .storage import save_avatar, get_avatar_url
+from .avatar_render import (
+    MAX_SEED_LENGTH,
+    RENDERER_VERSION,
+    decode_seed,
+    encode_seed,
+    normalize_style,
+    render_avatar_svg,
+)
+from .storage import (
+    GENERATED_AVATAR_ASSIGNED_KEY,
+    GENERATED_AVATAR_DIR,
+    GENERATED_AVATAR_STORED_KEY,
+    MediaStorage,
+    get_avatar_url,
+)
+
+logger = logging.getLogger(__name__)
+
+# Generated avatars never change once written
+GENERATED_AVATAR_STORED_TTL_SECONDS = 30 * 24 * 3600
 
 
 def get_dicebear_style() -> str:
@@ -55,37 +84,168 @@ def fetch_dicebear_avatar(seed: str, style: Optional[str] = None, size: Optional
         return None
 
 
-def generate_and_store_avatar(seed: str, style: Optional[str] = None, size: Optional[int] = None) -> Optional[str]:
+def generated_avatar_path(seed: str, style: Optional[str] = None, size: Optional[int] = None) -> Optional[str]:
     """
-    Fetch avatar from DiceBear and store it in S3/local storage.
+    Storage path of the locally rendered avatar for a seed.
 
-    Args:
-        seed: The seed string (typically username) for generating the avatar
-        style: DiceBear style (optional, uses Constance config if not provided)
-        size: Size in pixels (optional, uses Constance config if not provided)
+    The path encodes every renderer input, so equal seeds share one stored
+    file and the file can be rendered from its path alone.
 
     Returns:
-        Storage URL path (e.g., '/api/chats/media/avatars/uuid.svg'), or None if failed
+        e.g. 'avatars/generated/v1/pixel-art-40/Q29vbENhdA.svg', or None if
+        the seed is empty or too long
     """
-    avatar_content = fetch_dicebear_avatar(seed, style, size)
-    if avatar_content is None:
+    if not seed or len(seed) > MAX_SEED_LENGTH:
         return None
+    style = normalize_style(style if style is not None else get_dicebear_style())
+    if size is None:
+        size = get_dicebear_size()
+    return f"{GENERATED_AVATAR_DIR}/{RENDERER_VERSION}/{style}-{int(size)}/{encode_seed(seed)}.svg"
+
+
+def parse_generated_avatar_path(storage_path: str) -> Optional[Tuple[str, str, int]]:
+    """
+    Inverse of generated_avatar_path().
 
+    Returns:
+        (seed, style, size), or None if storage_path isn't a valid generated
+        avatar path for the current renderer version
+    """
+    parts = storage_path.split('/')
+    if len(parts) != 5 or '/'.join(parts[:3]) != f"{GENERATED_AVATAR_DIR}/{RENDERER_VERSION}":
+        return None
+    style, _, size = parts[3].rpartition('-')
+    token, ext = os.path.splitext(parts[4])
+    if ext != '.svg' or not size.isdigit() or normalize_style(style) != style:
+        return None
+    size = int(size)
+    if not 1 <= size <= 1024:
+        return None
+    seed = decode_seed(token)
+    if seed is None:
+        return None
+    return seed, style, size
+
+
+def is_assigned_avatar(storage_path: str, parsed: Optional[Tuple[str, str, int]] = None) -> bool:
+    """
+    True if a generated avatar path was assigned by generate_and_store_avatar()
+    and uses the configured style and size.
+    """
+    parsed = parsed or parse_generated_avatar_path(storage_path)
+    if parsed is None:
+        return False
+    _, style, size = parsed
+    if size != get_dicebear_size() or style != normalize_style(get_dicebear_style()):
+        return False
     try:
-        # Wrap content in a file-like object
-        file_obj = io.BytesIO(avatar_content)
+        return bool(cache.get(GENERATED_AVATAR_ASSIGNED_KEY.format(storage_path=storage_path)))
+    except Exception:
+        return False
+
 
-        # Save to storage
-        storage_path, storage_type = save_avatar(file_obj)
+def ensure_generated_avatar(storage_path: str) -> bool:
+    """
+    Render and store an assigned generated avatar if it isn't stored yet.
+
+    Called when a generated avatar is fetched. Once stored, a marker in the
+    cache lets later fetches (and CDN URL signing) skip the storage
+    existence check. Paths that were never assigned are not written; the
+    caller serves render_generated_avatar() instead.
+
+    Returns:
+        True if the avatar is stored, False if storage_path isn't a valid,
+        assigned generated avatar path or the write failed
+    """
+    parsed = parse_generated_avatar_path(storage_path)
+    if parsed is None:
+        return False
+
+    marker = GENERATED_AVATAR_STORED_KEY.format(storage_path=storage_path)
+    try:
+        if cache.get(marker):
+            return True
+    except Exception:
+        pass
 
-        # Get the proxy URL
-        url = get_avatar_url(storage_path)
+    if not is_assigned_avatar(storage_path, parsed):
+        return False
 
-        print(f"[Avatar] Generated and stored avatar for seed '{seed}': {url} (storage: {storage_type})")
-        return url
+    try:
+        if not default_storage.exists(storage_path):
+            seed, style, size = parsed
+            directory, filename = storage_path.rsplit('/', 1)
+            saved_path, storage_type = MediaStorage.save_file(
+                io.BytesIO(render_avatar_svg(seed, style, size)), directory, filename
+            )
+            if saved_path != storage_path:
+                # Lost a race with another writer; theirs is identical
+                MediaStorage.delete_file(saved_path)
+            logger.info(f"[Avatar] Rendered {storage_path} (storage: {storage_type})")
     except Exception as e:
-        print(f"[Avatar] Error storing avatar for seed '{seed}': {e}")
+        logger.error(f"[Avatar] Error storing generated avatar {storage_path}: {e}")
+        return False
+
+    try:
+        cache.set(marker, 1, timeout=GENERATED_AVATAR_STORED_TTL_SECONDS)
+    except Exception:
+        pass
+    return True
+
+
+def render_generated_avatar(storage_path: str) -> Optional[bytes]:
+    """
+    Render a generated avatar from its path without storing it.
+
+    Returns:
+        SVG bytes, or None if storage_path isn't a valid generated avatar path
+    """
+    parsed = parse_generated_avatar_path(storage_path)
+    if parsed is None:
+        return None
+    return render_avatar_svg(*parsed)
+
+
+def generated_avatar_url(seed: str, style: Optional[str] = None, size: Optional[int] = None) -> Optional[str]:
+    """
+    Proxy URL of the generated avatar for a seed, without assigning it.
+
+    Returns:
+        Proxy URL path, or None if the seed is empty or too long
+    """
+    storage_path = generated_avatar_path(seed, style, size)
+    if storage_path is None:
         return None
+    return get_avatar_url(storage_path)
+
+
+def generate_and_store_avatar(seed: str, style: Optional[str] = None, size: Optional[int] = None) -> Optional[str]:
+    """
+    Assign a locally rendered avatar for a seed.
+
+    No network or storage I/O: marks the avatar's generated path as
+    assigned and returns its proxy URL; the proxy renders and stores it on
+    first fetch (see ensure_generated_avatar()). Safe to call inside
+    join/registration requests.
+
+    Args:
+        seed: The seed string (typically username) for generating the avatar
+        style: DiceBear style (optional, uses Constance config if not provided)
+        size: Size in pixels (optional, uses Constance config if not provided)
+
+    Returns:
+        Proxy URL path (e.g., '/api/chats/media/avatars/generated/v1/pixel-art-40/<seed>.svg'),
+        or None if the seed is empty or too long
+    """
+    storage_path = generated_avatar_path(seed, style, size)
+    if storage_path is None:
+        return None
+    try:
+        cache.set(GENERATED_AVATAR_ASSIGNED_KEY.format(storage_path=storage_path), 1, timeout=None)
+    except Exception as e:
+        # Still a valid avatar; it is rendered per fetch instead of stored
+        logger.warning(f"[Avatar] Could not mark {storage_path} as assigned: {e}")
+    return get_avatar_url(storage_path)
 
 
 def get_fallback_dicebear_url(seed: str, style: Optional[str] = None, size: Optional[int] = None) -> str:
@@ -0,0 +1,213 @@
+"""
+Deterministic in-process avatar rendering.
+
+Replaces the DiceBear HTTP API for generated avatars. The same seed always
+renders the same SVG, so rendered avatars are addressed by their renderer
+inputs (version, style, size, seed) and stored at most once.
+
+Styles:
+- pixel-art: 12x12 mirrored pixel character (skin, hair, eyes, mouth,
+  clothing), in the spirit of DiceBear's default style
+- identicon: 5x5 mirrored block pattern
+- initials: up to two letters on a colored tile
+
+Any other DICEBEAR_STYLE renders as pixel-art.
+
+Usage:
+    svg = render_avatar_svg('CoolCat42', style='pixel-art', size=40)
+"""
+
+import base64
+import hashlib
+import html
+from typing import List, Optional, Tuple
+
+# Bump when the rendering changes so new avatars get new storage paths
+RENDERER_VERSION = 'v1'
+
+DEFAULT_STYLE = 'pixel-art'
+SUPPORTED_STYLES = ('pixel-art', 'identicon', 'initials')
+
+# Longest seed accepted in a generated avatar path (avatar_seed is max 50)
+MAX_SEED_LENGTH = 100
+
+_SKIN_COLORS = ('ffdbac', 'f5cfa0', 'eac393', 'e0b687', 'cb9e6e', 'b68655', 'a26d3d', '8d5524')
+_HAIR_COLORS = (
+    'cab188', '603a14', '83623b', 'a78961', '611c17', '603015',
+    '612616', '28150a', '009bbd', 'bd1700', '91cb15',
+)
+_EYE_COLORS = ('5b7c8b', '647b90', '697b94', '76778b', '588387', '876658', '3d2f1e')
+_MOUTH_COLORS = ('d29985', 'c98276', 'e35d6a', 'de0f0d')
+_CLOTHING_COLORS = (
+    '5bc0de', '428bca', '03396c', '88d8b0', '44c585', '00b159',
+    'ff6f69', 'd11141', 'ae0001', 'ffeead', 'ffc425', 'ffd969',
+)
+_TILE_COLORS = ('e57373', 'f06292', 'ba68c8', '9575cd', '7986cb', '64b5f6', '4db6ac', '81c784', 'ffb74d', 'a1887f')
+
+_PIXEL_GRID = 12
+
+
+class _SeedBytes:
+    """Deterministic choices drawn from the SHA-256 of the seed."""
+
+    def __init__(self, style: str, seed: str):
+        self._digest = hashlib.sha256(f'{RENDERER_VERSION}:{style}:{seed}'.encode()).digest()
+        self._position = 0
+
+    def byte(self) -> int:
+        value = self._digest[self._position % len(self._digest)]
+        self._position += 1
+        return value
+
+    def choice(self, options):
+        return options[self.byte() % len(options)]
+
+    def flag(self, percent: int) -> bool:
+        return self.byte() % 100 < percent
+
+
+def normalize_style(style: Optional[str]) -> str:
+    """Map a configured DiceBear style to a locally supported style."""
+    return style if style in SUPPORTED_STYLES else DEFAULT_STYLE
+
+
+def _pixel_art_layers(rng: _SeedBytes) -> List[Tuple[str, List[Tuple[int, int]]]]:
+    """(color, pixels) layers for the left half of the pixel-art character."""
+    skin = rng.choice(_SKIN_COLORS)
+    hair = rng.choice(_HAIR_COLORS)
+    eyes = rng.choice(_EYE_COLORS)
+    mouth = rng.choice(_MOUTH_COLORS)
+    clothing = rng.choice(_CLOTHING_COLORS)
+
+    # Face, neck and body (left half, columns 0-5; mirrored on render)
+    face = [(x, y) for y in range(2, 8) for x in range(2, 6)]
+    neck = [(4, 8), (5, 8)]
+    body = [(x, y) for y in range(9, 12) for x in range(1, 6)]
+
+    hair_style = rng.byte() % 4
+    hair_pixels = [(x, y) for y in (0, 1) for x in range(2, 6)]
+    if hair_style == 1:  # long: down the sides of the face
+        hair_pixels += [(1, y) for y in range(1, 8)]
+    elif hair_style == 2:  # spiky
+        hair_pixels = [(x, 1) for x in range(2, 6)] + [(2, 0), (4, 0)]
+    elif hair_style == 3:  # fringe
+        hair_pixels += [(2, 2), (3, 2)]
+
+    eye_pixels = [(3, 4)] if rng.flag(50) else [(3, 4), (4, 4)]
+    mouth_pixels = [(5, 6)] if rng.flag(60) else [(4, 6), (5, 6)]
+
+    layers = [
+        (skin, face + neck),
+        (clothing, body),
+        (hair, hair_pixels),
+        (eyes, eye_pixels),
+        (mouth, mouth_pixels),
+    ]
+    if rng.flag(25):
+        # Collar / shirt detail
+        layers.append((rng.choice(_CLOTHING_COLORS), [(4, 9), (5, 9)]))
+    return layers
+
+
+def _mirror(pixels: List[Tuple[int, int]], width: int) -> List[Tuple[int, int]]:
+    return pixels + [(width - 1 - x, y) for x, y in pixels]
+
+
+def _rects(color: str, pixels: List[Tuple[int, int]]) -> str:
+    """SVG rects for a set of pixels, merging horizontal runs."""
+    rows = {}
+    for x, y in set(pixels):
+        rows.setdefault(y, []).append(x)
+
+    parts = []
+    for y in sorted(rows):
+        xs = sorted(rows[y])
+        start = previous = xs[0]
+        for x in xs[1:] + [None]:
+            if x is not None and x == previous + 1:
+                previous = x
+                continue
+            parts.append(f'<rect x="{start}" y="{y}" width="{previous - start + 1}" height="1" fill="#{color}"/>')
+            if x is not None:
+                start = previous = x
+    return ''.join(parts)
+
+
+def _svg(size: int, view_box: int, body: str) -> str:
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {view_box} {view_box}" '
+        f'width="{size}" height="{size}" shape-rendering="crispEdges">{body}</svg>'
+    )
+
+
+def _render_pixel_art(rng: _SeedBytes, size: int) -> str:
+    body = ''.join(
+        _rects(color, _mirror(pixels, _PIXEL_GRID))
+        for color, pixels in _pixel_art_layers(rng)
+    )
+    return _svg(size, _PIXEL_GRID, body)
+
+
+def _render_identicon(rng: _SeedBytes, size: int) -> str:
+    color = rng.choice(_TILE_COLORS)
+    cells = [(x, y) for y in range(5) for x in range(3) if rng.flag(50)]
+    # Mirror columns 0-1 onto 3-4; column 2 is the axis
+    pixels = set(cells) | {(4 - x, y) for x, y in cells}
+    return _svg(size, 5, _rects(color, sorted(pixels)))
+
+
+def _render_initials(seed: str, rng: _SeedBytes, size: int) -> str:
+    words = [w for w in ''.join(c if c.isalnum() else ' ' for c in seed).split() if w]
+    if len(words) >= 2:
+        letters = words[0][0] + words[1][0]
+    else:
+        letters = (words[0][:2] if words else '?')
+    color = rng.choice(_TILE_COLORS)
+    body = (
+        f'<rect width="100" height="100" fill="#{color}"/>'
+        f'<text x="50" y="50" dy="0.35em" text-anchor="middle" font-family="Arial, sans-serif" '
+        f'font-size="42" font-weight="600" fill="#ffffff">{html.escape(letters.upper())}</text>'
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100" '
+        f'width="{size}" height="{size}">{body}</svg>'
+    )
+
+
+def render_avatar_svg(seed: str, style: Optional[str] = None, size: int = 40) -> bytes:
+    """
+    Render an avatar for a seed. Pure function of (seed, style, size).
+
+    Args:
+        seed: The seed string (typically username)
+        style: DiceBear style name (unsupported styles render as pixel-art)
+        size: Width/height in pixels
+
+    Returns:
+        SVG document as bytes
+    """
+    style = normalize_style(style)
+    rng = _SeedBytes(style, seed)
+    if style == 'identicon':
+        svg = _render_identicon(rng, size)
+    elif style == 'initials':
+        svg = _render_initials(seed, rng, size)
+    else:
+        svg = _render_pixel_art(rng, size)
+    return svg.encode()
+
+
+def encode_seed(seed: str) -> str:
+    """URL/path-safe, reversible encoding of a seed."""
+    return base64.urlsafe_b64encode(seed.encode()).decode().rstrip('=')
+
+
+def decode_seed(token: str) -> Optional[str]:
+    """Inverse of encode_seed(); None if the token is malformed."""
+    try:
+        seed = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not seed or len(seed) > MAX_SEED_LENGTH or encode_seed(seed) != token:
+        return None
+    return seed
@@ -0,0 +1,257 @@
+"""
+Bounded-memory image decoding and resizing.
+
+A 48 MP phone JPEG is about 150 MB as an RGB bitmap, while the derivatives
+we store are 1-2 MP. load_resized() never materializes more than it needs:
+
+1. The header is checked against a pixel ceiling (decompression bombs).
+2. JPEGs are decoded with libjpeg DCT scaling (Image.draft) at the smallest
+   1/2, 1/4 or 1/8 scale that still covers the target size.
+3. Image.reduce() box-shrinks by an integer factor to within REDUCING_GAP
+   of the target, so the final LANCZOS pass runs on a small image.
+4. EXIF orientation is applied last, on the small image.
+
+Used by chat photo uploads and media_analysis image processing.
+"""
+
+import io
+import logging
+import math
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO, Optional, Tuple, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Refuse to decode images with more pixels than this (admits 108 MP sensors)
+MAX_IMAGE_PIXELS = 120_000_000
+
+# reduce() stops once the image is within this factor of the target size;
+# LANCZOS does the rest
+REDUCING_GAP = 2
+
+# Modes Image.reduce() rejects ("image has wrong mode"); these go straight
+# to resize()
+UNREDUCIBLE_MODES = {'1', 'P', 'I;16', 'I;16L', 'I;16B', 'I;16N'}
+
+# EXIF tag holding the camera orientation (1 = upright)
+EXIF_ORIENTATION_TAG = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+class ImageTooLarge(ValueError):
+    """Raised when an image exceeds the decode pixel ceiling."""
+
+
+def fit_size(
+    size: Tuple[int, int],
+    max_dimension: Optional[int] = None,
+    max_megapixels: Optional[float] = None
+) -> Tuple[int, int]:
+    """
+    Largest size with the same aspect ratio that satisfies both limits.
+
+    Args:
+        size: (width, height)
+        max_dimension: Maximum width/height in pixels (None = unbounded)
+        max_megapixels: Maximum pixel count in millions (None = unbounded)
+
+    Returns:
+        (width, height), unchanged if already within the limits
+    """
+    width, height = size
+    scale = 1.0
+    if max_megapixels and width * height > max_megapixels * 1_000_000:
+        scale = math.sqrt(max_megapixels * 1_000_000 / (width * height))
+    if max_dimension and max(width, height) * scale > max_dimension:
+        scale = max_dimension / max(width, height)
+    if scale >= 1.0:
+        return size
+    # Epsilon keeps e.g. 4032 * (1920 / 4032) from truncating to 1919
+    return (
+        max(1, int(width * scale + 1e-6)),
+        max(1, int(height * scale + 1e-6)),
+    )
+
+
+def open_image(
+    source: Union[BinaryIO, bytes],
+    max_pixels: Optional[int] = None
+) -> Image.Image:
+    """
+    Open an image lazily (header only) and enforce the pixel ceiling.
+
+    Args:
+        source: File object or bytes containing image data
+        max_pixels: Maximum width * height accepted (default: MAX_IMAGE_PIXELS)
+
+    Returns:
+        Unloaded PIL Image
+
+    Raises:
+        ImageTooLarge: If the image exceeds max_pixels
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    elif hasattr(source, 'seek'):
+        source.seek(0)
+
+    try:
+        img = Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e))
+
+    if max_pixels is None:
+        max_pixels = MAX_IMAGE_PIXELS
+    width, height = img.size
+    if width * height > max_pixels:
+        raise ImageTooLarge(
+            f"Image too large ({width}x{height}, max {max_pixels / 1_000_000:.0f} MP)"
+        )
+    return img
+
+
+def flatten_to_rgb(img: Image.Image) -> Image.Image:
+    """Composite transparent images onto white and convert to a JPEG-safe mode."""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    if img.mode not in ('RGB', 'L'):
+        return img.convert('RGB')
+    return img
+
+
+def shrink(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """
+    Resize a decoded image: integer reduce() first (modes it supports), then LANCZOS.
+
+    Args:
+        img: Loaded PIL Image
+        size: Target (width, height), no larger than img.size
+
+    Returns:
+        Image of exactly `size`
+    """
+    if img.size == size:
+        return img
+    factor = min(img.width // size[0], img.height // size[1]) // REDUCING_GAP
+    if factor >= 2 and img.mode not in UNREDUCIBLE_MODES:
+        img = img.reduce(factor)
+    return img.resize(size, Image.LANCZOS)
+
+
+def decode_resized(
+    img: Image.Image,
+    max_dimension: Optional[int] = None,
+    max_megapixels: Optional[float] = None,
+    flatten: bool = True
+) -> Image.Image:
+    """
+    Decode an opened image at bounded size and return it upright.
+
+    Args:
+        img: Unloaded PIL Image from open_image()
+        max_dimension: Maximum width/height of the result
+        max_megapixels: Maximum pixel count (millions) of the result
+        flatten: Composite transparency onto white (for JPEG output)
+
+    Returns:
+        Loaded PIL Image with EXIF orientation applied
+    """
+    orientation = img.getexif().get(EXIF_ORIENTATION_TAG, 1)
+    original_size = img.size
+    target = fit_size(original_size, max_dimension, max_megapixels)
+
+    if target != original_size:
+        # JPEG only (no-op for other formats): decode at 1/2, 1/4 or 1/8 scale
+        img.draft('RGB', target)
+    img.load()
+
+    if flatten:
+        img = flatten_to_rgb(img)
+    img = shrink(img, target)
+
+    transpose = ORIENTATION_TRANSPOSE.get(orientation)
+    if transpose is not None:
+        img = img.transpose(transpose)
+
+    if target != original_size:
+        logger.info(
+            f"Bounded resize: {original_size[0]}x{original_size[1]} → {target[0]}x{target[1]}"
+        )
+    return img
+
+
+def load_resized(
+    source: Union[BinaryIO, bytes],
+    max_dimension: Optional[int] = None,
+    max_megapixels: Optional[float] = None,
+    max_pixels: Optional[int] = None,
+    flatten: bool = True
+) -> Image.Image:
+    """
+    Open, decode and resize an image without a full-resolution bitmap.
+
+    Example:
+        >>> img = load_resized(request.FILES['photo'], max_dimension=1920)
+        >>> img.save(output, format='JPEG', quality=80)
+
+    Raises:
+        ImageTooLarge: If the image exceeds max_pixels
+    """
+    img = open_image(source, max_pixels=max_pixels)
+    return decode_resized(img, max_dimension, max_megapixels, flatten=flatten)
+
+
+@dataclass
+class ResourceUsage:
+    """CPU time and memory high-water mark of a tracked block."""
+    cpu_ms: float = 0.0
+    peak_rss_mb: float = 0.0
+    peak_rss_growth_mb: float = 0.0
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+@contextmanager
+def track_resource_usage():
+    """
+    Measure CPU time (this thread) and peak RSS around a block.
+
+    peak_rss_growth_mb is how far the block raised the process high-water
+    mark; 0 means it fit within memory the process had already used.
+
+    Example:
+        >>> with track_resource_usage() as usage:
+        ...     img = load_resized(upload, max_dimension=1920)
+        >>> usage.cpu_ms, usage.peak_rss_mb
+    """
+    usage = ResourceUsage()
+    start_cpu = time.thread_time()
+    start_peak = _peak_rss_mb()
+    try:
+        yield usage
+    finally:
+        usage.cpu_ms = (time.thread_time() - start_cpu) * 1000
+        usage.peak_rss_mb = _peak_rss_mb()
+        usage.peak_rss_growth_mb = usage.peak_rss_mb - start_peak
@@ -2,25 +2,180 @@
 Media storage utility for voice messages and other media files.
 Automatically switches between local filesystem and S3 based on AWS credentials.
 """
+import hashlib
+import io
+import logging
 import os
-from typing import BinaryIO, Optional
+import threading
+import time
+from typing import BinaryIO, Dict, Iterable, NamedTuple, Optional, Tuple, Union
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.core.files.base import File
 import uuid
 
+logger = logging.getLogger(__name__)
+
+# Bytes read per iteration when streaming an upload into storage. S3 uploads
+# additionally buffer up to AWS_S3_TRANSFER_CONFIG's chunksize * concurrency.
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Proxy URL prefix served by VoiceStreamView / UserAvatarView
+MEDIA_PROXY_PREFIX = "/api/chats/media/"
+USER_AVATAR_PROXY_PREFIX = MEDIA_PROXY_PREFIX + "avatars/user/"
+
+# Signed CDN URLs: the Expires param is bucketed so the URL string is stable
+# for SIGNED_URL_BUCKET_SECONDS, and stays valid for about
+# SIGNED_URL_VALIDITY_SECONDS after it is issued.
+SIGNED_URL_BUCKET_SECONDS = 300
+SIGNED_URL_VALIDITY_SECONDS = 3600
+
+# Per-process memo of signed URLs for the current bucket
+SIGNED_URL_MEMO_MAX_ENTRIES = 20_000
+
+# Locally rendered avatars (see avatar.py). Their paths are derived from the
+# renderer inputs, and the object is written on first fetch; the marker key
+# records that it exists so it can be served straight from the CDN.
+GENERATED_AVATAR_DIR = "avatars/generated"
+GENERATED_AVATAR_STORED_KEY = "media:avatar_stored:{storage_path}"
+# Set when a generated avatar is assigned to a user or participation; only
+# assigned paths are written to storage (others are rendered per fetch)
+GENERATED_AVATAR_ASSIGNED_KEY = "media:avatar_assigned:{storage_path}"
+
+# Redis cache of user_id -> avatar storage path ('' = no stored avatar)
+AVATAR_PATH_CACHE_KEY = "media:avatar_path:user:{user_id}"
+AVATAR_PATH_CACHE_TTL_SECONDS = 3600
+
+
+class StreamingSource(io.RawIOBase):
+    """
+    Forward-only file-like view over a file handle, bytes, or an iterable of
+    byte chunks that hashes (SHA-256) and counts bytes as they are read.
+
+    Deliberately not seekable: storage backends then read it front to back
+    in chunks (FileSystemStorage writes each chunk; boto3's upload_fileobj
+    uses multipart upload above its threshold) and never buffer the whole
+    file.
+    """
+
+    def __init__(self, source: Union[BinaryIO, bytes, Iterable[bytes]]):
+        super().__init__()
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        if hasattr(source, 'read'):
+            if hasattr(source, 'seek'):
+                try:
+                    source.seek(0)
+                except (OSError, ValueError):
+                    pass
+            self._file = source
+            self._chunks = None
+        else:
+            self._file = None
+            self._chunks = iter(source)
+        self._pending = b''
+        self._sha256 = hashlib.sha256()
+        self.bytes_read = 0
+
+    @property
+    def sha256(self) -> str:
+        """Hex digest of the bytes read so far (the whole file once consumed)."""
+        return self._sha256.hexdigest()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def _next_chunk(self, size: int) -> bytes:
+        if self._file is not None:
+            chunk = self._file.read(size)
+            return chunk.encode() if isinstance(chunk, str) else chunk
+        # Skip empty chunks so they are not mistaken for end of stream
+        for chunk in self._chunks:
+            if chunk:
+                return chunk
+        return b''
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            return b''.join(iter(lambda: self.read(UPLOAD_CHUNK_SIZE), b''))
+
+        buffer = bytearray(self._pending)
+        while len(buffer) < size:
+            chunk = self._next_chunk(size - len(buffer))
+            if not chunk:
+                break
+            buffer += chunk
+        data, self._pending = bytes(buffer[:size]), bytes(buffer[size:])
+
+        self._sha256.update(data)
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class SavedFile(NamedTuple):
+    """Result of MediaStorage.save_stream()."""
+    storage_path: str
+    storage_type: str
+    size: int
+    sha256: str
+
+
+class _SignedUrlMemo:
+    """
+    Signed URLs keyed by (storage_path, absolute expiry).
+
+    Signing is deterministic for a given path and absolute expiry, so within
+    one expiry bucket every caller can share one signature. Entries from
+    earlier buckets are dropped on rollover; the memo is also cleared if it
+    outgrows SIGNED_URL_MEMO_MAX_ENTRIES.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expires = None
+        self._urls: Dict[Tuple[str, int], str] = {}
+
+    def get(self, key: Tuple[str, int]) -> Optional[str]:
+        return self._urls.get(key)
+
+    def put(self, key: Tuple[str, int], url: str):
+        with self._lock:
+            if key[1] != self._expires or len(self._urls) >= SIGNED_URL_MEMO_MAX_ENTRIES:
+                self._urls = {}
+                self._expires = key[1]
+            self._urls[key] = url
+
+    def clear(self):
+        with self._lock:
+            self._urls = {}
+            self._expires = None
+
+
+_signed_url_memo = _SignedUrlMemo()
+
 
 class MediaStorage:
     """Hybrid storage system that uses S3 when configured, local filesystem otherwise"""
 
     @staticmethod
     def is_s3_configured() -> bool:
-        """Check if AWS S3 credentials are configured"""
-        return bool(
-            settings.AWS_ACCESS_KEY_ID and
-            settings.AWS_SECRET_ACCESS_KEY and
-            settings.AWS_STORAGE_BUCKET_NAME
-        )
+        """
+        Check if S3 storage is configured.
+
+        Mirrors settings.py: S3 is used iff AWS_STORAGE_BUCKET_NAME is set
+        (credentials come from boto3's default chain, not Django settings).
+        """
+        return bool(getattr(settings, 'AWS_STORAGE_BUCKET_NAME', ''))
 
     @staticmethod
     def get_storage_type() -> str:
@@ -28,33 +183,60 @@ class MediaStorage:
         return 's3' if MediaStorage.is_s3_configured() else 'local'
 
     @staticmethod
-    def save_file(file_obj: BinaryIO, directory: str, filename: Optional[str] = None) -> tuple[str, str]:
+    def save_stream(
+        source: Union[BinaryIO, bytes, Iterable[bytes]],
+        directory: str,
+        filename: Optional[str] = None
+    ) -> SavedFile:
         """
-        Save a file to storage (S3 or local based on configuration).
+        Stream a file handle, bytes, or iterable of byte chunks into storage.
+
+        Memory use is bounded by the chunk size regardless of file size:
+        local storage writes chunk by chunk, S3 uses multipart upload for
+        large objects. The SHA-256 and size are computed on the fly.
 
         Args:
-            file_obj: File object to save
+            source: File object, bytes, or iterable of bytes chunks
             directory: Directory/prefix to save under (e.g., 'voice_messages')
             filename: Optional filename (auto-generated if not provided)
 
         Returns:
-            tuple: (storage_path, storage_type) where storage_type is 's3' or 'local'
+            SavedFile(storage_path, storage_type, size, sha256)
         """
         if filename is None:
             # Generate unique filename preserving extension if present
-            ext = getattr(file_obj, 'name', '').split('.')[-1] if hasattr(file_obj, 'name') else 'webm'
+            ext = getattr(source, 'name', '').split('.')[-1] if hasattr(source, 'name') else 'webm'
             filename = f"{uuid.uuid4()}.{ext}"
 
-        # Build storage path
-        storage_path = os.path.join(directory, filename)
+        stream = StreamingSource(source)
+
+        # Save to storage (Django will use S3 backend if configured, otherwise local).
+        # The backend may pick a different name if the path is taken.
+        storage_path = default_storage.save(
+            os.path.join(directory, filename),
+            File(stream, name=filename)
+        )
+
+        return SavedFile(storage_path, MediaStorage.get_storage_type(), stream.bytes_read, stream.sha256)
+
+    @staticmethod
+    def save_file(file_obj: BinaryIO, directory: str, filename: Optional[str] = None) -> tuple[str, str]:
+        """
+        Save a file to storage (S3 or local based on configuration).
 
-        # Read file content
-        content = file_obj.read()
+        The file is streamed in chunks (see save_stream()), never read into
+        memory as a whole.
 
-        # Save to storage (Django will use S3 backend if configured, otherwise local)
-        default_storage.save(storage_path, ContentFile(content))
+        Args:
+            file_obj: File object (or bytes / iterable of byte chunks) to save
+            directory: Directory/prefix to save under (e.g., 'voice_messages')
+            filename: Optional filename (auto-generated if not provided)
 
-        return storage_path, MediaStorage.get_storage_type()
+        Returns:
+            tuple: (storage_path, storage_type) where storage_type is 's3' or 'local'
+        """
+        saved = MediaStorage.save_stream(file_obj, directory, filename)
+        return saved.storage_path, saved.storage_type
 
     @staticmethod
     def delete_file(storage_path: str) -> bool:
@@ -91,6 +273,43 @@ class MediaStorage:
         # Format: /api/chats/media/voice_messages/<filename>
         return f"/api/chats/media/{storage_path}"
 
+    @staticmethod
+    def sign_storage_path(storage_path: str) -> Optional[str]:
+        """
+        CDN-signed URL for a storage path, memoized per expiry bucket.
+
+        Returns None if S3 storage isn't configured, signing fails, or the
+        path is a generated avatar that hasn't been written yet (the proxy
+        renders it on first fetch).
+        """
+        if not storage_path or not MediaStorage.is_s3_configured():
+            return None
+
+        # Time-bucket the Expires param so URLs are stable across reads in
+        # the same 5-minute window. The URL still has ~1 hour of validity
+        # past the bucket boundary, so a viewer mid-load doesn't get a 403
+        # if their request crosses a bucket edge.
+        now = int(time.time())
+        absolute_expires = (
+            (now + SIGNED_URL_VALIDITY_SECONDS) // SIGNED_URL_BUCKET_SECONDS
+        ) * SIGNED_URL_BUCKET_SECONDS
+
+        key = (storage_path, absolute_expires)
+        url = _signed_url_memo.get(key)
+        if url is None:
+            if storage_path.startswith(GENERATED_AVATAR_DIR + "/"):
+                try:
+                    if not cache.get(GENERATED_AVATAR_STORED_KEY.format(storage_path=storage_path)):
+                        return None
+                except Exception:
+                    return None
+            try:
+                url = default_storage.url(storage_path, expire=absolute_expires - now)
+            except Exception:
+                return None
+            _signed_url_memo.put(key, url)
+        return url
+
     @staticmethod
     def proxy_url_to_cdn_url(proxy_url):
         """
@@ -106,6 +325,11 @@ class MediaStorage:
         message. With time-bucketed URLs, src stays identical across
         re-renders within the bucket, so React reuses the loaded image.
 
+        Signing is memoized per (path, bucket) (see sign_storage_path()), and
+        avatars/user/<id> paths are resolved through the Redis avatar path
+        cache, so repeated calls cost a dict lookup. Use
+        resolve_avatar_urls() to resolve many user avatars at once.
+
         Returns None when:
           - proxy_url is empty
           - it's not a /api/chats/media/ proxy URL (e.g., external DiceBear URL)
@@ -116,46 +340,114 @@ class MediaStorage:
 
         Caller falls back to the original proxy URL when this returns None.
         """
-        import time
-        from django.conf import settings
-        from django.core.files.storage import default_storage
-
         if not proxy_url:
             return None
-        if not getattr(settings, "AWS_STORAGE_BUCKET_NAME", ""):
+        if not MediaStorage.is_s3_configured():
             return None
-        prefix = "/api/chats/media/"
-        if not proxy_url.startswith(prefix):
+        if not proxy_url.startswith(MEDIA_PROXY_PREFIX):
             return None  # external URL — leave as-is
 
-        path = proxy_url[len(prefix):]
+        if proxy_url.startswith(USER_AVATAR_PROXY_PREFIX):
+            user_id = proxy_url[len(USER_AVATAR_PROXY_PREFIX):].rstrip("/")
+            return MediaStorage.resolve_avatar_urls([user_id]).get(user_id)
 
-        # avatars/user/<user_id>: resolve user → storage path via single DB hit.
-        if path.startswith("avatars/user/"):
-            user_id = path[len("avatars/user/"):].rstrip("/")
+        return MediaStorage.sign_storage_path(proxy_url[len(MEDIA_PROXY_PREFIX):])
+
+    @staticmethod
+    def get_avatar_storage_paths(user_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Storage paths of users' stored avatars, in one Redis MGET plus at
+        most one DB query for the misses.
+
+        Args:
+            user_ids: User UUIDs (strings)
+
+        Returns:
+            dict: user_id -> storage path, '' for users without a stored
+            avatar (or that don't exist)
+        """
+        from accounts.models import User
+
+        user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids if user_id))
+        if not user_ids:
+            return {}
+
+        keys = {AVATAR_PATH_CACHE_KEY.format(user_id=user_id): user_id for user_id in user_ids}
+        try:
+            cached = cache.get_many(list(keys))
+        except Exception as e:
+            logger.warning(f"[MediaStorage] Avatar path cache read failed: {e}")
+            cached = {}
+        paths = {keys[key]: value for key, value in cached.items()}
+
+        missing = [user_id for user_id in user_ids if user_id not in paths]
+        if missing:
             try:
-                from accounts.models import User
-                user = User.objects.only("avatar_url").get(id=user_id)
-            except (User.DoesNotExist, ValueError):
-                return None
-            if not user.avatar_url or not user.avatar_url.startswith(prefix):
-                return None
-            path = user.avatar_url[len(prefix):]
+                rows = dict(User.objects.filter(id__in=missing).order_by().values_list('id', 'avatar_url'))
+            except (ValueError, DjangoValidationError):
+                # Malformed UUID in the batch: fall back to per-id lookups
+                rows = {}
+                for user_id in missing:
+                    try:
+                        rows.update(User.objects.filter(id=user_id).values_list('id', 'avatar_url'))
+                    except (ValueError, DjangoValidationError):
+                        continue
+            rows = {str(user_id): avatar_url for user_id, avatar_url in rows.items()}
+
+            fetched = {}
+            for user_id in missing:
+                avatar_url = rows.get(user_id) or ''
+                # Only proxy URLs point at our storage
+                if avatar_url.startswith(MEDIA_PROXY_PREFIX):
+                    fetched[user_id] = avatar_url[len(MEDIA_PROXY_PREFIX):]
+                else:
+                    fetched[user_id] = ''
+            paths.update(fetched)
 
-        # Time-bucket the Expires param so URLs are stable across reads in
-        # the same 5-minute window. The URL still has ~1 hour of validity
-        # past the bucket boundary, so a viewer mid-load doesn't get a 403
-        # if their request crosses a bucket edge.
-        BUCKET_SECONDS = 300       # URL string changes every 5 minutes
-        VALIDITY_SECONDS = 3600    # URL works for 1 hour from now
-        now = int(time.time())
-        absolute_expires = ((now + VALIDITY_SECONDS) // BUCKET_SECONDS) * BUCKET_SECONDS
-        expire_in = absolute_expires - now
+            try:
+                cache.set_many(
+                    {AVATAR_PATH_CACHE_KEY.format(user_id=user_id): path for user_id, path in fetched.items()},
+                    timeout=AVATAR_PATH_CACHE_TTL_SECONDS,
+                )
+            except Exception as e:
+                logger.warning(f"[MediaStorage] Avatar path cache write failed: {e}")
 
+        return paths
+
+    @staticmethod
+    def resolve_avatar_urls(user_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        CDN-signed avatar URLs for many users at once.
+
+        Used when serializing a page of messages/participants: one Redis
+        MGET (and at most one DB query) for the whole page instead of a
+        User lookup per avatar.
+
+        Args:
+            user_ids: User UUIDs (strings)
+
+        Returns:
+            dict: user_id -> signed URL, or None if S3 isn't configured, the
+            user has no stored avatar, or signing fails (callers fall back
+            to the /api/chats/media/avatars/user/<id> proxy URL)
+        """
+        user_ids = [str(user_id) for user_id in user_ids if user_id]
+        if not MediaStorage.is_s3_configured():
+            return {user_id: None for user_id in user_ids}
+
+        paths = MediaStorage.get_avatar_storage_paths(user_ids)
+        return {
+            user_id: MediaStorage.sign_storage_path(paths.get(user_id, ''))
+            for user_id in user_ids
+        }
+
+    @staticmethod
+    def invalidate_avatar_path(user_id) -> None:
+        """Drop a user's cached avatar storage path (call after changing User.avatar_url)."""
         try:
-            return default_storage.url(path, expire=expire_in)
-        except Exception:
-            return None
+            cache.delete(AVATAR_PATH_CACHE_KEY.format(user_id=user_id))
+        except Exception as e:
+            logger.warning(f"[MediaStorage] Avatar path cache invalidation failed: {e}")
 
     @staticmethod
     def get_file(storage_path: str) -> Optional[BinaryIO]:
@@ -0,0 +1,338 @@
+"""
+HTTP serving of stored media with Range support.
+
+Used by the media proxy (VoiceStreamView), which serves voice, photo and
+video files. The file is opened once and only the requested bytes are
+read, in chunks, so a seek in an audio player costs the size of the range
+rather than the size of the file.
+
+- Single, multiple (multipart/byteranges) and suffix ("bytes=-500") ranges
+- ETag / If-None-Match (304) and If-Range validation
+- Optional hand-off to the fronting server via X-Accel-Redirect (nginx) or
+  X-Sendfile (Apache, lighttpd, Caddy) when MEDIA_SENDFILE_MODE is set and
+  files are on local storage
+
+Usage:
+    response = serve_media_file(request, storage_path)
+"""
+
+import hashlib
+import logging
+import os
+import re
+import uuid
+from typing import BinaryIO, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import quote_etag
+
+from .storage import MediaStorage
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per iteration when streaming a range
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Requests asking for more ranges than this get the full file instead
+# (RFC 7233 §6.1: many small ranges are a denial-of-service vector)
+MAX_RANGES = 16
+
+SENDFILE_ACCEL_REDIRECT = 'x-accel-redirect'
+SENDFILE_XSENDFILE = 'x-sendfile'
+
+_EXTENSION_CONTENT_TYPES = {
+    # Audio
+    'mp3': 'audio/mpeg',
+    'mpeg': 'audio/mpeg',
+    'ogg': 'audio/ogg',
+    'wav': 'audio/wav',
+    # Images
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'gif': 'image/gif',
+    'heic': 'image/heic',
+    'heif': 'image/heic',
+    'svg': 'image/svg+xml',
+    # Video
+    'mp4': 'video/mp4',
+    'webm': 'video/webm',
+    'mov': 'video/quicktime',
+    'm4v': 'video/x-m4v',
+}
+
+_RANGE_SPEC_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+def content_type_for_path(storage_path: str) -> str:
+    """
+    Content-Type of a stored media file, from its extension.
+
+    .m4a/.mp4 and .webm under a voice directory are audio; elsewhere they
+    are video.
+    """
+    ext = storage_path.lower().rsplit('.', 1)[-1] if '.' in storage_path else ''
+    if 'voice' in storage_path:
+        if ext in ('m4a', 'mp4'):
+            return 'audio/mp4'
+        if ext == 'webm':
+            return 'audio/webm'
+    return _EXTENSION_CONTENT_TYPES.get(ext, 'application/octet-stream')
+
+
+def parse_range_header(header: str, file_size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a Range header into inclusive (start, end) byte ranges.
+
+    Args:
+        header: Value of the Range header
+        file_size: Size of the file in bytes
+
+    Returns:
+        None if the header should be ignored (malformed, not bytes, too many
+        ranges) and the full file served; [] if no range is satisfiable (416);
+        otherwise the satisfiable ranges in request order.
+    """
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs:
+        return None
+
+    parts = specs.split(',')
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        match = _RANGE_SPEC_RE.match(part)
+        if not match:
+            return None
+        first, last = match.groups()
+        if not first and not last:
+            return None
+
+        if not first:
+            # Suffix range: the last N bytes
+            suffix_length = int(last)
+            if suffix_length == 0:
+                continue
+            start = max(0, file_size - suffix_length)
+            end = file_size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else file_size - 1
+            if last and end < start:
+                return None
+            end = min(end, file_size - 1)
+
+        if start < file_size:
+            ranges.append((start, end))
+
+    return ranges
+
+
+def file_etag(storage_path: str, file_size: int) -> str:
+    """Strong ETag from path, size and modification time."""
+    try:
+        modified = default_storage.get_modified_time(storage_path).timestamp()
+    except Exception:
+        modified = 0
+    digest = hashlib.md5(f"{storage_path}:{file_size}:{modified}".encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    return any(tag.strip() in (etag, '*') for tag in header.split(','))
+
+
+class _RangeStream:
+    """Body of a (possibly multipart) range response read from an open file."""
+
+    def __init__(self, file_obj: BinaryIO, ranges: List[Tuple[int, int]],
+                 separators: Optional[List[bytes]] = None, closing: bytes = b''):
+        self.file_obj = file_obj
+        self.ranges = ranges
+        self.separators = separators
+        self.closing = closing
+
+    def _segments(self):
+        """Yield literal bytes and (offset, length) reads in body order."""
+        for index, (start, end) in enumerate(self.ranges):
+            if self.separators:
+                yield self.separators[index]
+            offset = start
+            while offset <= end:
+                length = min(STREAM_CHUNK_SIZE, end - offset + 1)
+                yield (offset, length)
+                offset += length
+        if self.closing:
+            yield self.closing
+
+    def _read(self, offset: int, length: int) -> bytes:
+        self.file_obj.seek(offset)
+        return self.file_obj.read(length)
+
+    def close(self):
+        # Called by Django when the response finishes or the client goes away
+        self.file_obj.close()
+
+
+class RangeFileIterator(_RangeStream):
+    """Stream byte ranges in STREAM_CHUNK_SIZE chunks (WSGI)."""
+
+    def __iter__(self):
+        for segment in self._segments():
+            if isinstance(segment, bytes):
+                yield segment
+            else:
+                yield self._read(*segment)
+
+
+class AsyncRangeFileIterator(_RangeStream):
+    """
+    Stream byte ranges in STREAM_CHUNK_SIZE chunks (ASGI).
+
+    Django buffers synchronous iterators completely before sending them
+    under ASGI, so reads are done one chunk at a time in a worker thread.
+    """
+
+    async def __aiter__(self):
+        read = sync_to_async(self._read, thread_sensitive=False)
+        for segment in self._segments():
+            if isinstance(segment, bytes):
+                yield segment
+            else:
+                yield await read(*segment)
+
+
+def _is_asgi_request(request) -> bool:
+    # DRF wraps the Django request
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def _sendfile_response(storage_path: str, content_type: str) -> Optional[HttpResponse]:
+    """X-Accel-Redirect / X-Sendfile response, or None if not configured."""
+    mode = getattr(settings, 'MEDIA_SENDFILE_MODE', '').lower()
+    if not mode:
+        return None
+
+    try:
+        local_path = default_storage.path(storage_path)
+    except NotImplementedError:
+        # Remote storage: nothing on local disk to hand off
+        return None
+
+    response = HttpResponse(content_type=content_type)
+    if mode == SENDFILE_ACCEL_REDIRECT:
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + storage_path.lstrip('/')
+    elif mode == SENDFILE_XSENDFILE:
+        response['X-Sendfile'] = local_path
+    else:
+        logger.warning(f"[MediaStream] Unknown MEDIA_SENDFILE_MODE: {mode}")
+        return None
+    return response
+
+
+def serve_media_file(request, storage_path: str, content_type: Optional[str] = None) -> HttpResponse:
+    """
+    Serve a stored file, honoring Range, If-Range and If-None-Match.
+
+    Args:
+        request: The incoming request
+        storage_path: Path of the file in storage
+        content_type: Override the extension-based Content-Type
+
+    Returns:
+        200, 206, 304 or 416 response. Bodies are streamed from the file
+        (or handed to the fronting server in sendfile mode).
+
+    Raises:
+        Http404: If the file does not exist
+    """
+    content_type = content_type or content_type_for_path(storage_path)
+
+    if not MediaStorage.file_exists(storage_path):
+        raise Http404("Media file not found")
+
+    # The fronting server handles Range/If-Range itself
+    sendfile = _sendfile_response(storage_path, content_type)
+    if sendfile is not None:
+        logger.info(f"[MediaStream] Sendfile hand-off: {storage_path}")
+        return sendfile
+
+    file_obj = MediaStorage.get_file(storage_path)
+    if not file_obj:
+        raise Http404("Media file not found")
+
+    file_obj.seek(0, os.SEEK_END)
+    file_size = file_obj.tell()
+    file_obj.seek(0)
+    etag = file_etag(storage_path, file_size)
+
+    if _etag_matches(request.headers.get('If-None-Match', ''), etag):
+        file_obj.close()
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    iterator_class = AsyncRangeFileIterator if _is_asgi_request(request) else RangeFileIterator
+
+    ranges = None
+    range_header = request.headers.get('Range', '')
+    if range_header:
+        if_range = request.headers.get('If-Range', '').strip()
+        # A stale If-Range validator means "send me the whole new file"
+        if not if_range or if_range == etag:
+            ranges = parse_range_header(range_header, file_size)
+
+    if ranges == []:
+        file_obj.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{file_size}'
+        return response
+
+    if not ranges:
+        response = StreamingHttpResponse(
+            iterator_class(file_obj, [(0, file_size - 1)] if file_size else []),
+            content_type=content_type,
+        )
+        response['Content-Length'] = str(file_size)
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(
+            iterator_class(file_obj, ranges),
+            content_type=content_type,
+            status=206,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        boundary = uuid.uuid4().hex
+        separators = [
+            (
+                f'\r\n--{boundary}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n'
+            ).encode()
+            for start, end in ranges
+        ]
+        closing = f'\r\n--{boundary}--\r\n'.encode()
+        response = StreamingHttpResponse(
+            iterator_class(file_obj, ranges, separators=separators, closing=closing),
+            content_type=f'multipart/byteranges; boundary={boundary}',
+            status=206,
+        )
+        response['Content-Length'] = str(
+            sum(len(s) for s in separators)
+            + sum(end - start + 1 for start, end in ranges)
+            + len(closing)
+        )
+
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,94 @@
+"""
+Video probing and thumbnail utilities.
+
+Wraps the ffprobe/ffmpeg invocations used for video messages so they can
+run either inside VideoUploadView or in a media job worker.
+"""
+
+import json
+import os
+import subprocess
+from typing import NamedTuple, Optional
+
+# Maximum accepted video message length
+MAX_VIDEO_DURATION_SECONDS = 30
+
+
+class VideoInfo(NamedTuple):
+    """Duration and display dimensions of a video."""
+    duration: float
+    width: Optional[int]
+    height: Optional[int]
+
+
+def probe_video(path: str) -> VideoInfo:
+    """
+    Read duration and display dimensions with ffprobe.
+
+    Dimensions are swapped for 90/270 degree rotations (phone videos are
+    recorded landscape with rotation metadata).
+
+    Args:
+        path: Local path to the video file
+
+    Returns:
+        VideoInfo(duration, width, height)
+    """
+    probe_cmd = [
+        'ffprobe', '-v', 'quiet', '-print_format', 'json',
+        '-show_format', '-show_streams', path
+    ]
+    probe_result = subprocess.run(probe_cmd, capture_output=True, text=True)
+    probe_data = json.loads(probe_result.stdout)
+    duration = float(probe_data.get('format', {}).get('duration', 0))
+
+    # Extract video dimensions from the video stream
+    video_width = None
+    video_height = None
+    for stream in probe_data.get('streams', []):
+        if stream.get('codec_type') == 'video':
+            video_width = int(stream['width']) if 'width' in stream else None
+            video_height = int(stream['height']) if 'height' in stream else None
+            # Check tags first (older ffprobe)
+            rotation = int(stream.get('tags', {}).get('rotate', '0'))
+            # Check side_data_list (newer ffprobe)
+            if rotation == 0:
+                for sd in stream.get('side_data_list', []):
+                    if 'rotation' in sd:
+                        rotation = int(sd['rotation'])
+                        break
+            # Swap dimensions for 90/270 degree rotations
+            if video_width and video_height and abs(rotation) in (90, 270):
+                video_width, video_height = video_height, video_width
+            break
+
+    return VideoInfo(duration, video_width, video_height)
+
+
+def extract_thumbnail(path: str, width: int = 480) -> Optional[bytes]:
+    """
+    Render the first frame as a JPEG with ffmpeg.
+
+    Args:
+        path: Local path to the video file
+        width: Thumbnail width in pixels (height keeps aspect ratio)
+
+    Returns:
+        JPEG bytes, or None if ffmpeg produced no frame
+    """
+    thumb_path = path + '_thumb.jpg'
+    thumb_cmd = [
+        'ffmpeg', '-y', '-i', path,
+        '-vframes', '1', '-f', 'image2',
+        '-vf', f'scale={width}:-1',
+        thumb_path
+    ]
+    subprocess.run(thumb_cmd, capture_output=True)
+
+    if not os.path.exists(thumb_path):
+        return None
+    try:
+        with open(thumb_path, 'rb') as thumb_file:
+            return thumb_file.read()
+    finally:
+        os.unlink(thumb_path)
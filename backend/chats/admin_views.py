@@ -2,13 +2,59 @@
 Custom admin views for ChatPop monitoring dashboards.
 """
 
+import hmac
+import logging
+
+from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
+from django.db import DatabaseError, connection
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from chatpop.db.postgresql import pool as db_pool
 from chats.utils.performance.monitoring import monitor
+from chats.utils.username.pool import pool_stats
 from datetime import datetime
 import time
 
+logger = logging.getLogger(__name__)
+
+
+def _database_connections():
+    """
+    Connection reuse settings, this process's pool and server-side counts.
+
+    Pool wait and connect times are cluster-wide latency histograms
+    ('db_pool_wait', 'db_connect') and come with the other operations.
+    """
+    database = settings.DATABASES['default']
+    stats = {
+        'pooling': bool(database['OPTIONS'].get('pool')),
+        'conn_max_age': database['CONN_MAX_AGE'],
+        'pool': db_pool.pool_stats().get('default'),
+        'server': None,
+    }
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT state, count(*) FROM pg_stat_activity "
+                "WHERE datname = current_database() GROUP BY state"
+            )
+            by_state = {state: count for state, count in cursor.fetchall()}
+            cursor.execute("SHOW max_connections")
+            max_connections = int(cursor.fetchone()[0])
+    except DatabaseError as e:
+        logger.warning(f"[METRICS] Failed to read pg_stat_activity: {e}")
+        return stats
+
+    stats['server'] = {
+        'active': by_state.get('active', 0),
+        'idle': by_state.get('idle', 0),
+        'idle_in_transaction': by_state.get('idle in transaction', 0),
+        'total': sum(by_state.values()),
+        'max_connections': max_connections,
+    }
+    return stats
+
 
 @staff_member_required
 def chat_cache_dashboard(request):
@@ -44,6 +90,13 @@ def chat_cache_api(request):
     total_cache_reads = cache_hits + cache_misses + cache_partial
     hit_rate = (cache_hits / total_cache_reads * 100) if total_cache_reads > 0 else 0
 
+    # Cluster-wide latency percentiles and hit rate (all processes)
+    try:
+        window_minutes = min(max(int(request.GET.get('window', 5)), 1), 60)
+    except ValueError:
+        window_minutes = 5
+    cluster = monitor.histograms.snapshot(minutes=window_minutes)
+
     # Get recent events
     events = monitor.get_recent_events(limit=limit, chat_code=chat_code)
 
@@ -94,6 +147,34 @@ def chat_cache_api(request):
             'hybrid_queries': metrics.get('hybrid_query_count', 0),
             'hit_rate': round(hit_rate, 1),
         },
+        'cluster': {
+            'window_minutes': window_minutes,
+            'hit_rate': cluster['hit_rate'],
+            'operations': cluster['operations'],
+        },
+        'username_pool': pool_stats(),
+        'db_connections': _database_connections(),
         'events': formatted_events,
         'timestamp': time.time(),
     })
+
+
+def prometheus_metrics(request):
+    """
+    Prometheus text export of the cluster-wide operation latency histograms.
+
+    Scrapers authenticate with `Authorization: Bearer <METRICS_TOKEN>`;
+    without a configured token only staff sessions can read it.
+    """
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    authorized = (
+        bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+    ) or (request.user.is_authenticated and request.user.is_staff)
+    if not authorized:
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+
+    return HttpResponse(
+        monitor.histograms.prometheus_text(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -3,7 +3,12 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from .utils.security.auth import ChatSessionValidator
 from .utils.performance.cache import MessageCache, UnacknowledgedGiftCache, RoomNotificationCache
+from .utils.performance.avatar_directory import AvatarDirectory
+from .utils.performance.room_cache import RoomCache
+from .utils.performance.room_changes import RoomChangeLog
 from .models import ChatRoom, Message, ChatParticipation, ChatBlock
+from media_analysis.utils.jobs import chat_upload_group
+from media_analysis.utils.tracing import span, start_trace
 from urllib.parse import parse_qs
 
 
@@ -93,6 +98,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
 
+        # Join this participant's upload group (async media job results)
+        if self.chat_room_id:
+            self.media_job_group_name = chat_upload_group(self.chat_room_id, self.username)
+            await self.channel_layer.group_add(
+                self.media_job_group_name,
+                self.channel_name
+            )
+
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -116,6 +129,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.room_group_name,
                 self.channel_name
             )
+        if hasattr(self, 'media_job_group_name'):
+            await self.channel_layer.group_discard(
+                self.media_job_group_name,
+                self.channel_name
+            )
 
     async def receive(self, text_data):
         data = json.loads(text_data)
@@ -127,6 +145,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if data.get('type') == 'ping':
             return
 
+        # One trace per inbound frame (media_analysis/utils/tracing.py)
+        with start_trace(f"ws {data.get('type') or 'message'}", kind='consumer', chat_code=self.chat_code):
+            await self._receive(data)
+
+    async def _receive(self, data):
         # Reconnect handshake — client sends `{type:'hello', last_seen_id}`
         # right after the socket opens (only if it has prior messages). We
         # respond with at most BACKFILL_LIMIT messages strictly newer than
@@ -137,6 +160,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self._handle_hello(data)
             return
 
+        # Delta sync — `{type:'sync', cursor}` returns every change (messages,
+        # deletes, highlights, reactions, pins, bans) after the cursor from
+        # the room's change log (see RoomChangeLog).
+        if data.get('type') == 'sync':
+            await self._handle_sync(data)
+            return
+
+        # Replay — `{type:'resume', seq}` re-delivers the exact frames
+        # broadcast after `seq` (every room frame carries its `seq`).
+        if data.get('type') == 'resume':
+            await self._handle_resume(data)
+            return
+
         if self.read_only:
             return  # Read-only connections cannot send messages
 
@@ -170,36 +206,41 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         # Save message to PostgreSQL and Redis (dual-write)
         try:
-            message_obj = await self.save_message(
-                chat_code=self.chat_code,
-                username=session_data['username'],
-                user_id=session_data.get('user_id'),
-                content=message_text,
-                reply_to_id=reply_to_id,
-                voice_url=voice_url,
-                voice_duration=voice_duration,
-                voice_waveform=voice_waveform,
-                photo_url=photo_url,
-                photo_width=photo_width,
-                photo_height=photo_height,
-                video_url=video_url,
-                video_duration=video_duration,
-                video_thumbnail_url=video_thumbnail_url,
-                video_width=video_width,
-                video_height=video_height
-            )
+            with span('save_message'):
+                message_obj = await self.save_message(
+                    chat_code=self.chat_code,
+                    username=session_data['username'],
+                    user_id=session_data.get('user_id'),
+                    content=message_text,
+                    reply_to_id=reply_to_id,
+                    voice_url=voice_url,
+                    voice_duration=voice_duration,
+                    voice_waveform=voice_waveform,
+                    photo_url=photo_url,
+                    photo_width=photo_width,
+                    photo_height=photo_height,
+                    video_url=video_url,
+                    video_duration=video_duration,
+                    video_thumbnail_url=video_thumbnail_url,
+                    video_width=video_width,
+                    video_height=video_height
+                )
 
             # Serialize for broadcast (includes username_is_reserved)
-            message_data = await self.serialize_message_for_broadcast(message_obj)
-
-            # Broadcast to room group
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'chat_message',
-                    'message_data': message_data,
-                }
-            )
+            with span('serialize'):
+                message_data = await self.serialize_message_for_broadcast(message_obj)
+
+            # Record in the room's event log and broadcast with its `seq`
+            # (async twin of RoomChangeLog.publish)
+            event = {
+                'type': 'chat_message',
+                'message_data': message_data,
+            }
+            with span('broadcast'):
+                seq = await database_sync_to_async(RoomChangeLog.append)(
+                    message_obj.chat_room_id, RoomChangeLog.MESSAGE, {}, event
+                )
+                await self.channel_layer.group_send(self.room_group_name, {**event, 'seq': seq})
 
             # Room notification indicators (Redis SET-based, non-blocking)
             # Use participation_id as stable identity (survives session refreshes)
@@ -277,6 +318,85 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'messages': filtered,
         }))
 
+    async def _handle_sync(self, data):
+        """
+        Delta sync from a change-log cursor. Responds with
+        {type:'sync', cursor, has_more, messages, deleted, highlights,
+        reactions, bans[, pinned_messages]} or {type:'sync_overflow'} when
+        the log no longer reaches back to the cursor (client does a full
+        loadMessages()).
+        """
+        try:
+            cursor = int(data.get('cursor'))
+        except (TypeError, ValueError):
+            return
+        if self.chat_room_id is None:
+            return
+
+        changes = await database_sync_to_async(RoomChangeLog.changes_since)(self.chat_room_id, cursor)
+        if changes is None:
+            await self.send(text_data=json.dumps({
+                'type': 'sync_overflow',
+            }))
+            return
+
+        # Same blocked-user filtering as the hello backfill
+        changes['messages'] = [
+            m for m in changes['messages']
+            if m.get('username') not in self.blocked_usernames
+            or m.get('is_from_host')
+        ]
+
+        await self.send(text_data=json.dumps({
+            'type': 'sync',
+            **changes,
+        }))
+
+    # Connection-control events that are logged but not replayed
+    RESUME_SKIP_TYPES = {'user_kicked'}
+
+    async def _handle_resume(self, data):
+        """
+        Replay broadcast events after a seq through this connection's own
+        handlers (so block filtering and recipient-only events apply), then
+        {type:'resumed', seq, has_more}. Frames may overlap live ones that
+        arrived since connect; clients drop any seq they already applied.
+        Responds {type:'resume_overflow'} when the log no longer reaches
+        back to the seq (client does a full loadMessages()).
+        """
+        try:
+            seq = int(data.get('seq'))
+        except (TypeError, ValueError):
+            return
+        if self.chat_room_id is None:
+            return
+
+        replay = await database_sync_to_async(RoomChangeLog.events_since)(self.chat_room_id, seq)
+        if replay is None:
+            await self.send(text_data=json.dumps({
+                'type': 'resume_overflow',
+            }))
+            return
+
+        for event_seq, event in replay['events']:
+            if event['type'] in self.RESUME_SKIP_TYPES:
+                continue
+            handler = getattr(self, event['type'], None)
+            if handler is not None:
+                await handler({**event, 'seq': event_seq})
+
+        await self.send(text_data=json.dumps({
+            'type': 'resumed',
+            'seq': replay['cursor'],
+            'has_more': replay['has_more'],
+        }))
+
+    async def _send_event(self, event, payload):
+        """Send a room event's frame, tagged with its event-log `seq`."""
+        if event.get('seq') is not None:
+            payload = {**payload, 'seq': event['seq']}
+        await self.send(text_data=json.dumps(payload))
+
     async def chat_message(self, event):
         # Filter messages from blocked users
         message_data = event['message_data']
@@ -300,50 +420,50 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 return
 
         # Send message to WebSocket
-        await self.send(text_data=json.dumps(message_data))
+        await self._send_event(event, message_data)
 
     async def message_reaction(self, event):
         # Send reaction update to WebSocket
-        await self.send(text_data=json.dumps(event['reaction_data']))
+        await self._send_event(event, event['reaction_data'])
 
     async def message_deleted(self, event):
         # Send message deletion notification to WebSocket
-        await self.send(text_data=json.dumps({
+        await self._send_event(event, {
             'type': 'message_deleted',
             'message_id': event['message_id'],
             'pinned_messages': event.get('pinned_messages', []),
-        }))
+        })
 
     async def message_unpinned(self, event):
         # Send unpin notification to WebSocket
-        await self.send(text_data=json.dumps({
+        await self._send_event(event, {
             'type': 'message_unpinned',
             'message_id': event['message_id'],
             'pinned_messages': event.get('pinned_messages', []),
-        }))
+        })
 
     async def message_pinned(self, event):
         # Send pin update notification to WebSocket
-        await self.send(text_data=json.dumps({
+        await self._send_event(event, {
             'type': 'message_pinned',
             'message': event['message'],
             'is_top_pin': event.get('is_top_pin', False),
-        }))
+        })
 
     async def message_highlight(self, event):
         # Send highlight update notification to WebSocket
-        await self.send(text_data=json.dumps({
+        await self._send_event(event, {
             'type': 'message_highlight',
             'message': event['message'],
             'is_highlight': event.get('is_highlight', False),
-        }))
+        })
 
     async def broadcast_sticky_update(self, event):
         """Broadcast sticky set/clear to all clients."""
-        await self.send(text_data=json.dumps({
+        await self._send_event(event, {
             'type': 'broadcast_sticky_update',
             'message': event.get('message'),
-        }))
+        })
 
     async def block_update(self, event):
         """Handle block/unblock updates from user_block_views.py"""
@@ -362,16 +482,23 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'blocked_username': blocked_username
         }))
 
+    async def media_job_update(self, event):
+        """Handle async upload completion from media_analysis.utils.jobs"""
+        await self.send(text_data=json.dumps({
+            'type': 'media_job',
+            'job': event['job']
+        }))
+
     async def user_kicked(self, event):
         """Handle user being kicked from chat by host (ChatBlock)"""
         kicked_username = event.get('username')
 
         # Only send notification if this is the kicked user
         if self.username == kicked_username:
-            await self.send(text_data=json.dumps({
+            await self._send_event(event, {
                 'type': 'kicked',
                 'message': event.get('message', 'You have been removed from this chat by the host')
-            }))
+            })
             # Wait a moment to ensure message is transmitted before closing
             import asyncio
             await asyncio.sleep(0.1)
@@ -380,19 +507,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def user_ban_status(self, event):
         """Broadcast ban/unban status change to all connected clients."""
-        await self.send(text_data=json.dumps({
+        await self._send_event(event, {
             'type': 'ban_status_changed',
             'username': event.get('username'),
             'is_banned': event.get('is_banned', True),
-        }))
+        })
 
     async def spotlight_update(self, event):
         """Broadcast spotlight add/remove to all clients in the room."""
-        await self.send(text_data=json.dumps({
+        await self._send_event(event, {
             'type': 'spotlight_update',
             'action': event.get('action'),
             'username': event.get('username'),
-        }))
+        })
 
     async def site_banned(self, event):
         """Handle user being site-wide banned by staff (SiteBan)"""
@@ -420,29 +547,29 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if recipient and recipient in self.blocked_usernames and sender_username != self.username:
             return
 
-        await self.send(text_data=json.dumps(message_data))
+        await self._send_event(event, message_data)
 
     async def gift_received(self, event):
         """Gift popup notification - only forwarded to recipient."""
         if self.username == event.get('recipient_username'):
-            await self.send(text_data=json.dumps({
+            await self._send_event(event, {
                 'type': 'gift_received',
                 'gift': event['gift'],
-            }))
+            })
 
     async def gift_acknowledged(self, event):
         """Gift acknowledged - broadcast message IDs to all clients."""
-        await self.send(text_data=json.dumps({
+        await self._send_event(event, {
             'type': 'gift_acknowledged',
             'message_ids': event['message_ids'],
-        }))
+        })
 
     @database_sync_to_async
     def resolve_participation_id(self, chat_code, username, user_id, session_key):
         """Resolve stable participation ID for notification tracking."""
         try:
             from chats.models import ChatParticipation
-            chat_room = ChatRoom.objects.get(code=chat_code)
+            chat_room = RoomCache.resolve_by_code(chat_code).to_model()
             return RoomNotificationCache.resolve_participation_id(
                 chat_room, username=username, user_id=user_id, session_key=session_key
             )
@@ -453,7 +580,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
     def resolve_room_id(self, chat_code):
         """Resolve chat code to room UUID for Redis notification keys."""
         try:
-            return str(ChatRoom.objects.values_list('id', flat=True).get(code=chat_code))
+            return RoomCache.resolve_by_code(chat_code).id
         except ChatRoom.DoesNotExist:
             return None
 
@@ -461,9 +588,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
     def is_public_chat(self, chat_code):
         """Check if a chat room is public. Also stores room_id for notification cache."""
         try:
-            room = ChatRoom.objects.get(code=chat_code)
-            self.chat_room_id = str(room.id)
-            return room.access_mode == ChatRoom.ACCESS_PUBLIC
+            room = RoomCache.resolve_by_code(chat_code)
+            self.chat_room_id = room.id
+            return room.is_public
         except ChatRoom.DoesNotExist:
             return False
 
@@ -471,8 +598,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
     def get_unacked_gifts(self):
         """Get unacknowledged gifts for this user from Redis."""
         try:
-            chat_room = ChatRoom.objects.get(code=self.chat_code)
-            return UnacknowledgedGiftCache.get_unacked(str(chat_room.id), self.username)
+            room = RoomCache.resolve_by_code(self.chat_code)
+            return UnacknowledgedGiftCache.get_unacked(room.id, self.username)
         except ChatRoom.DoesNotExist:
             return []
 
@@ -493,7 +620,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         Returns: Message instance
         """
         # Get chat room
-        chat_room = ChatRoom.objects.get(code=chat_code)
+        chat_room = RoomCache.resolve_by_code(chat_code).to_model()
 
         # Get user if user_id provided
         user = None
@@ -543,13 +670,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
             except Exception as e:
                 print(f"❌ Redis cache error for message {message.id}: {e}")
 
-        # Invalidate message activity cache so discovery modals show fresh data
-        try:
-            from media_analysis.utils.message_activity import invalidate_message_activity_cache
-            invalidate_message_activity_cache(str(chat_room.id))
-        except Exception as e:
-            print(f"⚠️  Message activity cache invalidation failed: {e}")
-
         return message
 
     @database_sync_to_async
@@ -559,8 +679,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         Includes username_is_reserved flag computed from participation.
         """
-        from chatpop.utils.media import get_fallback_dicebear_url
-
         # Compute username_is_reserved
         username_is_reserved = MessageCache._compute_username_is_reserved(message)
 
@@ -581,21 +699,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 'is_pinned': message.reply_to.is_pinned,
             }
 
-        # Get avatar_url from ChatParticipation (always populated at join time)
-        avatar_url = None
-        try:
-            participation = ChatParticipation.objects.get(
-                chat_room=message.chat_room,
-                username__iexact=message.username
-            )
-            if participation.avatar_url:
-                avatar_url = participation.avatar_url
-        except ChatParticipation.DoesNotExist:
-            pass
-
-        # Fallback to DiceBear for orphaned/legacy data
-        if not avatar_url:
-            avatar_url = get_fallback_dicebear_url(message.username, style=None)
+        # Avatar from the room's directory (ChatParticipation.avatar_url, always
+        # populated at join time); DiceBear fallback for orphaned/legacy data
+        avatar_url = AvatarDirectory.avatar_url(message.chat_room_id, message.username, style=None)
 
         # Check if sender is banned (single indexed query)
         from django.utils import timezone as tz
@@ -688,7 +794,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         # Get chat room
         try:
-            chat_room = ChatRoom.objects.get(code=chat_code)
+            chat_room = RoomCache.resolve_by_code(chat_code).to_model()
         except ChatRoom.DoesNotExist:
             return False, None
 
@@ -0,0 +1,205 @@
+"""
+Management command to benchmark the channel layer against host count.
+
+Builds a channel layer over 1..N Redis hosts (see
+chatpop/utils/channel_layers.py), joins `--members` channels to each of
+`--groups` room groups, fires `--messages` group_sends round-robin across
+the groups and waits until every member has received every message.
+Reports group_sends/sec and deliveries/sec per host count and backend.
+
+With --spawn, throwaway redis-server processes are started on free local
+ports (no Docker needed) and stopped afterwards; otherwise --hosts lists
+existing Redis URLs and the first 1..N are used.
+
+One benchmark process is usually bound by its own event loop before a
+single Redis is; run several copies against the same --hosts to see the
+ceiling move with host count.
+
+Usage:
+    ./venv/bin/python manage.py benchmark_channel_layer --spawn [--host-counts 1,2,4]
+        [--backend core|pubsub|both] [--groups 50] [--members 10] [--messages 2000]
+        [--concurrency 50] [--json results.json]
+    ./venv/bin/python manage.py benchmark_channel_layer --hosts redis://a:6379,redis://b:6379
+
+Examples:
+    # Compare 1, 2 and 4 local Redis processes for both layer variants
+    ./venv/bin/python manage.py benchmark_channel_layer --spawn --host-counts 1,2,4 --backend both
+"""
+import asyncio
+import json
+import shutil
+import socket
+import subprocess
+import time
+
+import redis
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from chatpop.utils.channel_layers import BACKENDS, build_channel_layer, group_host_index, parse_hosts
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def spawn_redis_servers(count: int):
+    """Start `count` throwaway redis-server processes -> (processes, URLs)."""
+    binary = shutil.which('redis-server')
+    if binary is None:
+        raise CommandError('redis-server not found on PATH (needed for --spawn)')
+
+    processes, urls = [], []
+    for _ in range(count):
+        port = _free_port()
+        processes.append(subprocess.Popen(
+            [binary, '--port', str(port), '--save', '', '--appendonly', 'no'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+        urls.append(f'redis://127.0.0.1:{port}/0')
+
+    for url in urls:
+        client = redis.Redis.from_url(url)
+        for _ in range(50):
+            try:
+                client.ping()
+                break
+            except redis.ConnectionError:
+                time.sleep(0.1)
+        else:
+            stop_redis_servers(processes)
+            raise CommandError(f'redis-server at {url} did not start')
+    return processes, urls
+
+
+def stop_redis_servers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait(timeout=10)
+
+
+def _make_layer(backend: str, hosts, capacity: int):
+    config = build_channel_layer(hosts, backend=backend, capacity=capacity)
+    # Own key prefix: flush() then only deletes benchmark keys on shared hosts
+    return import_string(config['BACKEND'])(prefix='asgi-bench', **config['CONFIG'])
+
+
+async def run_benchmark(backend: str, hosts, groups: int, members: int, messages: int,
+                        concurrency: int = 50, timeout: float = 60.0) -> dict:
+    """
+    One run: `messages` group_sends over `groups` groups of `members` channels.
+
+    Returns:
+        Dict with host/group counts, send and end-to-end timings, rates and
+        per-host group counts.
+    """
+    # Core queues one copy per group_send on this process's "specific."
+    # key (shared by all its channels), so it must hold the whole burst
+    capacity = messages + 100
+    layer = _make_layer(backend, hosts, capacity)
+    group_names = [f'chat_bench{i}' for i in range(groups)]
+    per_group = [messages // groups + (1 if i < messages % groups else 0) for i in range(groups)]
+
+    channels = []
+    for group, expected in zip(group_names, per_group):
+        for _ in range(members):
+            channel = await layer.new_channel()
+            await layer.group_add(group, channel)
+            channels.append((channel, expected))
+
+    async def drain(channel, expected):
+        for _ in range(expected):
+            await layer.receive(channel)
+
+    receivers = [asyncio.ensure_future(drain(channel, expected)) for channel, expected in channels]
+    # Let pub/sub subscriptions settle before publishing
+    await asyncio.sleep(0.2)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(index):
+        async with semaphore:
+            await layer.group_send(group_names[index % groups], {'type': 'bench.message', 'n': index})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(messages)))
+    send_seconds = time.perf_counter() - start
+    try:
+        await asyncio.wait_for(asyncio.gather(*receivers), timeout)
+        delivered = messages * members
+    except asyncio.TimeoutError:
+        delivered = None
+    total_seconds = time.perf_counter() - start
+
+    await layer.flush()
+
+    groups_per_host = [0] * len(hosts)
+    for group in group_names:
+        groups_per_host[group_host_index(group, len(hosts))] += 1
+
+    return {
+        'backend': backend,
+        'hosts': len(hosts),
+        'groups': groups,
+        'members': members,
+        'messages': messages,
+        'send_seconds': round(send_seconds, 4),
+        'total_seconds': round(total_seconds, 4),
+        'sends_per_second': round(messages / send_seconds, 1),
+        'deliveries_per_second': round(delivered / total_seconds, 1) if delivered else None,
+        'groups_per_host': groups_per_host,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark channel layer group_send throughput against Redis host count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spawn', action='store_true', help='Start local redis-server processes')
+        parser.add_argument('--hosts', type=str, help='Comma-separated Redis URLs to use instead of --spawn')
+        parser.add_argument('--host-counts', type=str, default='1,2,4', help='Host counts to compare (default: 1,2,4)')
+        parser.add_argument('--backend', choices=sorted(BACKENDS) + ['both'], default='core')
+        parser.add_argument('--groups', type=int, default=50, help='Room groups (default: 50)')
+        parser.add_argument('--members', type=int, default=10, help='Channels per group (default: 10)')
+        parser.add_argument('--messages', type=int, default=2000, help='group_sends per run (default: 2000)')
+        parser.add_argument('--concurrency', type=int, default=50, help='Concurrent group_sends (default: 50)')
+        parser.add_argument('--json', type=str, help='Write results to this JSON file')
+
+    def handle(self, *args, **options):
+        host_counts = sorted({int(count) for count in options['host_counts'].split(',')})
+        backends = sorted(BACKENDS) if options['backend'] == 'both' else [options['backend']]
+
+        processes = []
+        if options['spawn']:
+            processes, urls = spawn_redis_servers(max(host_counts))
+        else:
+            urls = parse_hosts(options['hosts'])
+            if len(urls) < max(host_counts):
+                raise CommandError(f'--hosts lists {len(urls)} hosts, need {max(host_counts)} (or use --spawn)')
+
+        results = []
+        try:
+            for backend in backends:
+                for count in host_counts:
+                    result = asyncio.run(run_benchmark(
+                        backend, urls[:count], options['groups'], options['members'],
+                        options['messages'], options['concurrency'],
+                    ))
+                    results.append(result)
+                    deliveries = result['deliveries_per_second']
+                    deliveries = f'{deliveries:>10,.0f} deliveries/s' if deliveries else 'timed out'
+                    self.stdout.write(
+                        f"  {backend:<7} {count} host(s)  {result['sends_per_second']:>10,.0f} sends/s  {deliveries}"
+                    )
+                    self.stdout.write(f"      groups per host {result['groups_per_host']}")
+        finally:
+            if processes:
+                stop_redis_servers(processes)
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\n✓ Wrote {len(results)} results to {options['json']}"))
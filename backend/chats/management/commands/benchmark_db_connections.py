@@ -0,0 +1,156 @@
+"""
+Management command to benchmark database connect storms with and without pooling.
+
+Starts `--threads` threads together (a burst of requests arriving at
+once), each running `--requests` emulated requests: close_old_connections,
+SELECT 1, close_old_connections - the same lifecycle as a REST request or
+a database_sync_to_async call in ChatConsumer. Reports per-request
+latency (connect or pool checkout included) and how many physical
+connections each mode opened.
+
+Modes (see chatpop/utils/db_connections.py):
+    per_request   CONN_MAX_AGE = 0, no pool: a new connection every request
+    persistent    CONN_MAX_AGE = None: each thread keeps one connection (best
+                  case; ASGI request threads don't live long enough for this)
+    pooled        OPTIONS['pool'] with --pool-size connections shared by all
+                  threads
+
+Usage:
+    ./venv/bin/python manage.py benchmark_db_connections [--threads 32] [--requests 20]
+        [--pool-size N] [--modes per_request,persistent,pooled] [--json results.json]
+
+Examples:
+    # 64 concurrent request threads sharing a pool of 8 connections
+    ./venv/bin/python manage.py benchmark_db_connections --threads 64 --pool-size 8
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from chatpop.db.postgresql.base import DatabaseWrapper
+from chatpop.db.postgresql.pool import close_pools, pool_stats
+from chatpop.utils.db_connections import default_pool_size
+from chats.utils.performance.ws_load import percentiles
+
+MODES = ('per_request', 'persistent', 'pooled')
+
+
+def _settings_for(mode: str, pool_size: int, timeout: float) -> dict:
+    settings_dict = {**connection.settings_dict, 'OPTIONS': dict(connection.settings_dict['OPTIONS'])}
+    settings_dict['OPTIONS'].pop('pool', None)
+    settings_dict['CONN_MAX_AGE'] = None if mode == 'persistent' else 0
+    if mode == 'pooled':
+        settings_dict['OPTIONS']['pool'] = {'max_size': pool_size, 'timeout': timeout}
+    return settings_dict
+
+
+def run_connect_storm(mode: str, threads: int, requests: int, pool_size: int, timeout: float = 30.0) -> dict:
+    """
+    One mode: `threads` threads x `requests` requests each, started together.
+
+    Returns:
+        Dict with mode, counts, latency percentiles (ms), requests/sec,
+        physical connections opened and errors.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {list(MODES)}")
+
+    alias = f'benchmark_{mode}'
+    settings_dict = _settings_for(mode, pool_size, timeout)
+    barrier = threading.Barrier(threads)
+    lock = threading.Lock()
+    latencies, errors = [], []
+    connects = [0]
+
+    def worker():
+        db = DatabaseWrapper(settings_dict, alias)
+        samples, opened = [], 0
+        barrier.wait()
+        try:
+            for _ in range(requests):
+                start = time.perf_counter()
+                db.close_if_unusable_or_obsolete()
+                opened += db.connection is None
+                with db.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                samples.append((time.perf_counter() - start) * 1000)
+                db.close_if_unusable_or_obsolete()
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+        finally:
+            db.close()
+        with lock:
+            latencies.extend(samples)
+            connects[0] += opened
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    if mode == 'pooled':
+        connects[0] = pool_stats().get(alias, {}).get('opened', 0)
+        close_pools(alias)
+
+    return {
+        'mode': mode,
+        'threads': threads,
+        'requests': len(latencies),
+        'pool_size': pool_size if mode == 'pooled' else None,
+        'latency_ms': percentiles(latencies),
+        'requests_per_second': round(len(latencies) / seconds, 1) if seconds else None,
+        'connections_opened': connects[0],
+        'errors': errors[:5],
+        'error_count': len(errors),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark connect-storm latency with per-request, persistent and pooled database connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32, help='Concurrent request threads (default: 32)')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per thread (default: 20)')
+        parser.add_argument('--pool-size', type=int, help='Pooled connections (default: DB_POOL_SIZE sizing)')
+        parser.add_argument('--modes', type=str, default=','.join(MODES),
+                            help=f"Comma-separated modes (default: {','.join(MODES)})")
+        parser.add_argument('--json', type=str, help='Write results to this JSON file')
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = sorted(set(modes) - set(MODES))
+        if unknown:
+            raise CommandError(f"Unknown mode(s) {', '.join(unknown)}; choose from {', '.join(MODES)}")
+
+        pool_options = settings.DATABASES['default']['OPTIONS'].get('pool') or {}
+        pool_size = options['pool_size'] or pool_options.get('max_size') or default_pool_size()
+
+        self.stdout.write(
+            f"Connect storm: {options['threads']} threads x {options['requests']} requests, pool size {pool_size}"
+        )
+        results = []
+        for mode in modes:
+            result = run_connect_storm(mode, options['threads'], options['requests'], pool_size)
+            results.append(result)
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"  {mode:<12} p50 {latency['p50']}ms  p99 {latency['p99']}ms  max {latency['max']}ms  "
+                f"{result['requests_per_second']:>8,.0f} req/s  {result['connections_opened']} connections opened"
+            )
+            if result['error_count']:
+                self.stdout.write(self.style.WARNING(
+                    f"      {result['error_count']} thread(s) failed: {result['errors'][0]}"
+                ))
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\n✓ Wrote {len(results)} results to {options['json']}"))
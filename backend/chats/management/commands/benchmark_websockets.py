@@ -0,0 +1,94 @@
+"""
+Management command to load-test ChatConsumer end to end.
+
+Drives the in-process ASGI application through one or more room mixes
+(see chats/utils/performance/ws_load.py): a connect storm, chat traffic
+fanned out to every socket of each room, and reconnects with the `hello`
+backfill. Creates throwaway rooms and deletes them afterwards.
+
+Usage:
+    ./venv/bin/python manage.py benchmark_websockets [--scenario smoke|mixed|busy|fanout]
+        [--rooms N] [--listeners N] [--senders N] [--messages N] [--reconnects N]
+        [--capacity N] [--json results.json]
+
+Options:
+    --scenario      Named room mix, repeatable (default: mixed)
+    --rooms, ...    Override one field of every selected mix
+    --capacity      Channel layer capacity for the run (default: configured)
+    --json          Write the results to this file for comparison across commits
+
+Examples:
+    # Quick end-to-end check
+    ./venv/bin/python manage.py benchmark_websockets --scenario smoke
+
+    # 1000 sockets in one room, without the per-process capacity ceiling
+    ./venv/bin/python manage.py benchmark_websockets --scenario fanout --capacity 100000 --json fanout.json
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from chats.utils.performance.ws_load import SCENARIOS, run_load_test
+
+MIX_FIELDS = ('rooms', 'listeners', 'senders', 'messages', 'reconnects')
+
+
+def _format(stats):
+    if not stats['count']:
+        return '-'
+    return f"p50 {stats['p50']}  p95 {stats['p95']}  p99 {stats['p99']}  max {stats['max']} ms"
+
+
+class Command(BaseCommand):
+    help = 'Load-test the chat WebSocket consumer with scripted room mixes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=sorted(SCENARIOS),
+            help='Named room mix, repeatable (default: mixed)',
+        )
+        for field in MIX_FIELDS:
+            parser.add_argument(f'--{field}', type=int, help=f'Override {field} of every selected mix')
+        parser.add_argument(
+            '--capacity',
+            type=int,
+            help='Channel layer capacity for the run (default: configured)',
+        )
+        parser.add_argument(
+            '--json',
+            type=str,
+            help='Write the results to this JSON file',
+        )
+
+    def handle(self, *args, **options):
+        overrides = {field: options[field] for field in MIX_FIELDS if options[field] is not None}
+
+        results = []
+        for scenario in options['scenario'] or ['mixed']:
+            mix = SCENARIOS[scenario]._replace(**overrides)
+            self.stdout.write(self.style.SUCCESS(f'\n{scenario}: {dict(mix._asdict())}'))
+
+            result = run_load_test(mix, scenario=scenario, capacity=options['capacity'])
+            results.append(result)
+
+            self.stdout.write(
+                f"  Connections:     {result['connections']} in {result['connect_storm_seconds']}s"
+            )
+            self.stdout.write(f"  Connect:         {_format(result['connect_ms'])}")
+            self.stdout.write(f"  Send-to-receive: {_format(result['send_to_receive_ms'])}")
+            self.stdout.write(f"  Hello backfill:  {_format(result['backfill_ms'])}")
+            self.stdout.write(
+                f"  Throughput:      {result['messages_per_second']} messages/s, "
+                f"{result['deliveries_per_second']} deliveries/s"
+            )
+            self.stdout.write(f"  Deliveries:      {result['deliveries']} ({result['lost']} lost)")
+            self.stdout.write(
+                f"  Calls:           {result['db_queries']} DB queries, {result['redis_commands']} Redis commands"
+            )
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\n✓ Wrote {len(results)} results to {options['json']}"))
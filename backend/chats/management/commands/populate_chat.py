@@ -9,14 +9,13 @@ Usage:
 """
 import random
 import time
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from accounts.models import User
 from chats.models import ChatRoom, Message
 from chats.serializers import MessageSerializer
 from chats.utils.performance.cache import MessageCache
+from chats.utils.performance.room_changes import RoomChangeLog
 
 
 # Pool of realistic chat messages
@@ -286,19 +285,18 @@ class Command(BaseCommand):
     def _broadcast_message(self, chat_room, message):
         """Broadcast a message via WebSocket"""
         import json
-        channel_layer = get_channel_layer()
         serializer = MessageSerializer(message, context={'request': None})
         # Convert to JSON and back to ensure all types are serializable (UUIDs -> strings)
         message_data = json.loads(json.dumps(serializer.data, default=str))
 
-        # Use chat_room.code to match the consumer's group naming: f'chat_{chat_code}'
         # Key must be 'message_data' to match what the consumer expects in chat_message handler
-        async_to_sync(channel_layer.group_send)(
-            f"chat_{chat_room.code}",
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 "type": "chat_message",
                 "message_data": message_data,
-            }
+            },
+            RoomChangeLog.MESSAGE,
         )
 
     def _ensure_participation(self, chat_room, username, user=None):
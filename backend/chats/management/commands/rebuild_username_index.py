@@ -0,0 +1,33 @@
+"""
+Management command to rebuild the Redis taken-username index.
+
+Reads every User.reserved_username and ChatParticipation.username from
+PostgreSQL and swaps a fresh, complete `username:taken` set into place
+(see chats/utils/username/availability.py). Until it has run, names
+missing from the index are confirmed in the DB; afterwards "free" answers
+need no SQL. Run after a deploy to a fresh Redis, a Redis flush, a failed
+index write, raw SQL changes or a database restore; signalled ORM writes
+keep the index current.
+
+Usage:
+    ./venv/bin/python manage.py rebuild_username_index
+
+Examples:
+    # After loading fixtures or restoring a database
+    ./venv/bin/python manage.py rebuild_username_index
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from chats.utils.username.availability import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Redis index of taken usernames from PostgreSQL'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_index()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stdout.write(self.style.SUCCESS(f'✓ Indexed {count} usernames in {elapsed_ms:.0f}ms'))
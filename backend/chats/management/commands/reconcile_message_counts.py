@@ -0,0 +1,63 @@
+"""
+Management command to repair drift in stored room message counts
+(ChatRoomMessageCount).
+
+The counts are maintained on write (see
+chats/utils/performance/message_counts.py), but messages created with
+bulk_create, hard-deleted, or written while both Redis and the fallback
+UPDATE failed are not reflected. This command flushes pending Redis deltas,
+recounts non-deleted messages and fixes the rooms that disagree.
+
+Usage:
+    ./venv/bin/python manage.py reconcile_message_counts [--chat CHAT_CODE] [--dry-run]
+
+Options:
+    --chat      Only check rooms with this code
+    --dry-run   Report drifted rooms without fixing them
+
+Examples:
+    # Repair every room
+    ./venv/bin/python manage.py reconcile_message_counts
+
+    # See how far a single chat has drifted
+    ./venv/bin/python manage.py reconcile_message_counts --chat ABC123 --dry-run
+"""
+from django.core.management.base import BaseCommand
+
+from chats.models import ChatRoom
+from chats.utils.performance.message_counts import reconcile_message_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount messages and repair drifted room message counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chat',
+            type=str,
+            help='Specific chat code to check (optional, checks all chats if omitted)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without writing',
+        )
+
+    def handle(self, *args, **options):
+        chat_code = options.get('chat')
+        dry_run = options['dry_run']
+
+        room_ids = None
+        if chat_code:
+            room_ids = list(ChatRoom.objects.filter(code=chat_code).values_list('pk', flat=True))
+            if not room_ids:
+                self.stdout.write(self.style.ERROR(f'Chat not found: {chat_code}'))
+                return
+
+        drifted = reconcile_message_counts(room_ids, dry_run=dry_run)
+
+        for room_id, (stored, actual) in drifted.items():
+            self.stdout.write(f'{room_id}: stored {stored}, actual {actual}')
+
+        verb = 'Found' if dry_run else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'\n✓ {verb} {len(drifted)} drifted chats'))
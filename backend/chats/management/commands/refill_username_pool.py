@@ -0,0 +1,72 @@
+"""
+Management command to keep the username suggestion pool filled.
+
+Polls the pool size and, when it drops below USERNAME_POOL_LOW_WATER,
+refills it to USERNAME_POOL_TARGET_SIZE with validated, currently free
+usernames (see chats/utils/username/pool.py).
+
+Usage:
+    ./venv/bin/python manage.py refill_username_pool [--once] [--stats]
+
+Options:
+    --once: Refill to the target size once and exit instead of polling
+    --poll-interval: Seconds between pool size checks (default: 2.0)
+    --stats: Print pool size and counters and exit
+
+Examples:
+    # Background refiller (run alongside the web workers)
+    ./venv/bin/python manage.py refill_username_pool
+
+    # Warm the pool after a deploy or Redis flush
+    ./venv/bin/python manage.py refill_username_pool --once
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from chats.utils.username.pool import low_water, pool_size, pool_stats, refill_pool
+
+
+class Command(BaseCommand):
+    help = 'Keep the Redis username suggestion pool above its low-water mark'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Refill to the target size once and exit instead of polling',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds between pool size checks (default: 2.0)',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print pool size and counters and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, value in pool_stats().items():
+                self.stdout.write(f'  {name}: {value}')
+            return
+
+        if options['once']:
+            added = refill_pool()
+            self.stdout.write(self.style.SUCCESS(f'✓ Added {added} usernames (pool size: {pool_size()})'))
+            return
+
+        self.stdout.write(f'Username pool refiller started (low water: {low_water()})')
+        try:
+            while True:
+                if pool_size() < low_water():
+                    added = refill_pool()
+                    self.stdout.write(f'  +{added} usernames (pool size: {pool_size()})')
+                close_old_connections()
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
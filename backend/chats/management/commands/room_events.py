@@ -0,0 +1,73 @@
+"""
+Management command to inspect a chat room's event log.
+
+Every room broadcast (messages, reactions, pins, deletes, bans, gifts,
+sticky and spotlight updates) is appended to a capped Redis stream
+(see chats/utils/performance/room_changes.py). This command prints the
+stream's counter, retained range and entries.
+
+Usage:
+    ./venv/bin/python manage.py room_events CHAT_CODE [--after SEQ] [--limit N] [--full]
+
+Options:
+    --after     Show entries after this sequence number (default: newest)
+    --limit     Number of entries to show (default: 20)
+    --full      Print each entry's broadcast event as JSON
+
+Examples:
+    # Newest 20 events of a chat
+    ./venv/bin/python manage.py room_events ABC123
+
+    # What a client resuming from seq 1760000000000042 would replay
+    ./venv/bin/python manage.py room_events ABC123 --after 1760000000000042 --full
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chats.models import ChatRoom
+from chats.utils.performance.room_changes import RoomChangeLog
+
+
+class Command(BaseCommand):
+    help = "Inspect a chat room's Redis event log"
+
+    def add_arguments(self, parser):
+        parser.add_argument('chat_code', type=str, help='Chat code')
+        parser.add_argument(
+            '--after',
+            type=int,
+            help='Show entries after this sequence number',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Number of entries to show (default: 20)',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help="Print each entry's broadcast event",
+        )
+
+    def handle(self, *args, **options):
+        chat_room = ChatRoom.objects.filter(code=options['chat_code']).first()
+        if chat_room is None:
+            raise CommandError(f"Chat not found: {options['chat_code']}")
+
+        info = RoomChangeLog.inspect(chat_room.id, after=options['after'], limit=options['limit'])
+
+        self.stdout.write(self.style.SUCCESS(f'\n{chat_room.name} ({chat_room.code}) — {chat_room.id}'))
+        self.stdout.write(f"  Current seq: {info['current']}")
+        self.stdout.write(f"  Retained:    {info['length']} entries ({info['oldest']} .. {info['newest']})")
+        self.stdout.write(f"  TTL:         {info['ttl']}s\n")
+
+        for entry in info['entries']:
+            event_type = entry['event']['type'] if entry['event'] else '-'
+            self.stdout.write(f"  {entry['seq']}  {entry['kind']:<9} {event_type:<24} {json.dumps(entry['data'])}")
+            if options['full'] and entry['event']:
+                self.stdout.write(f"      {json.dumps(entry['event'])}")
+
+        if not info['entries']:
+            self.stdout.write('  (no entries)')
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-18 21:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0021_remove_chatparticipation_room_last_read'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(condition=models.Q(('discovery_radius_miles__isnull', False), ('is_active', True), ('latitude__isnull', False), ('longitude__isnull', False)), fields=['latitude', 'longitude'], name='chatroom_discovery_geo_idx'),
+        ),
+    ]
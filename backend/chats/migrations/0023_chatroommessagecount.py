@@ -0,0 +1,39 @@
+# Generated by Django 5.0.14 on 2026-10-19 03:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_message_counts(apps, schema_editor):
+    ChatRoomMessageCount = apps.get_model('chats', 'ChatRoomMessageCount')
+    Message = apps.get_model('chats', 'Message')
+    counts = (
+        Message.objects.filter(is_deleted=False)
+        .order_by().values('chat_room').annotate(n=Count('id'))
+    )
+    ChatRoomMessageCount.objects.bulk_create(
+        [ChatRoomMessageCount(chat_room_id=row['chat_room'], count=row['n']) for row in counts],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['chat_room'],
+        update_fields=['count'],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0022_chatroom_discovery_geo_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatRoomMessageCount',
+            fields=[
+                ('chat_room', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='message_count_row', serialize=False, to='chats.chatroom')),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_message_counts, migrations.RunPython.noop),
+    ]
@@ -250,6 +250,17 @@ class ChatRoom(models.Model):
             models.Index(fields=['code', 'source']),
             models.Index(fields=['host', 'code']),
             models.Index(fields=['created_at']),
+            # Bounding-box prefilter for location-based discovery
+            models.Index(
+                fields=['latitude', 'longitude'],
+                name='chatroom_discovery_geo_idx',
+                condition=models.Q(
+                    is_active=True,
+                    latitude__isnull=False,
+                    longitude__isnull=False,
+                    discovery_radius_miles__isnull=False,
+                ),
+            ),
         ]
         constraints = [
             # Manual rooms: code must be unique per user (allows robert/bar-room and alice/bar-room)
@@ -292,10 +303,26 @@ class ChatRoom(models.Model):
         username = self.host.reserved_username if self.host.reserved_username else self.host.email.split('@')[0]
         return f"/chat/{username}/{self.code}"
 
-    @property
-    def message_count(self):
-        """Get count of non-deleted messages"""
-        return self.messages.filter(is_deleted=False).count()
+
+class ChatRoomMessageCount(models.Model):
+    """
+    Non-deleted message count for a chat room, maintained by
+    chats/utils/performance/message_counts.py.
+
+    Kept off ChatRoom so that saving a stale ChatRoom instance can never
+    overwrite it: the count is only changed by F() updates. A room without
+    a row has no counted messages yet.
+    """
+    chat_room = models.OneToOneField(
+        ChatRoom,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='message_count_row'
+    )
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.chat_room_id}: {self.count} messages"
 
 
 class Message(models.Model):
@@ -3,10 +3,11 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError as DjangoValidationError
 from constance import config
 from .models import ChatRoom, Message, Transaction, ChatParticipation, ChatTheme, MessageReaction, GiftCatalogItem
+from .utils.performance.avatar_directory import AvatarDirectory
+from .utils.performance.message_counts import message_counts_for_rooms
 from .utils.username.validators import validate_username
 from accounts.serializers import UserSerializer
 from accounts.models import User
-from chatpop.utils.media import get_fallback_dicebear_url
 
 
 class ChatThemeSerializer(serializers.ModelSerializer):
@@ -58,6 +59,15 @@ class ChatThemeSerializer(serializers.ModelSerializer):
         return size_map.get(size_px, f'w-10 h-10')
 
 
+class ChatRoomListSerializer(serializers.ListSerializer):
+    """Reads message counts for the whole list in one batch (see ChatRoomSerializer.get_message_count)"""
+
+    def to_representation(self, data):
+        rooms = list(data.all() if hasattr(data, 'all') else data)
+        self._context['message_counts'] = message_counts_for_rooms(rooms)
+        return super().to_representation(rooms)
+
+
 class ChatRoomSerializer(serializers.ModelSerializer):
     """Serializer for ChatRoom model"""
     host = UserSerializer(read_only=True)
@@ -76,9 +86,13 @@ class ChatRoomSerializer(serializers.ModelSerializer):
             'message_count', 'is_active', 'created_at'
         ]
         read_only_fields = ['id', 'code', 'host', 'url', 'created_at']
+        list_serializer_class = ChatRoomListSerializer
 
     def get_message_count(self, obj):
-        return obj.messages.filter(is_deleted=False).count()
+        counts = self.context.get('message_counts')
+        if counts is None or str(obj.id) not in counts:
+            counts = message_counts_for_rooms([obj])
+        return counts[str(obj.id)]
 
     def get_is_location_discoverable(self, obj):
         """Check if chat has location-based discovery enabled"""
@@ -305,6 +319,21 @@ class ChatRoomJoinSerializer(serializers.Serializer):
         return value
 
 
+class MessageListSerializer(serializers.ListSerializer):
+    """Looks up sender avatars for the whole list in one batch (see MessageSerializer.get_avatar_url)"""
+
+    def to_representation(self, data):
+        messages = list(data.all() if hasattr(data, 'all') else data)
+        usernames_by_room = {}
+        for message in messages:
+            usernames_by_room.setdefault(message.chat_room_id, set()).add(message.username)
+        self._context['avatar_entries'] = {
+            room_id: AvatarDirectory.lookup(room_id, usernames)
+            for room_id, usernames in usernames_by_room.items()
+        }
+        return super().to_representation(messages)
+
+
 class MessageSerializer(serializers.ModelSerializer):
     """Serializer for Message model"""
     user = UserSerializer(read_only=True)
@@ -325,6 +354,7 @@ class MessageSerializer(serializers.ModelSerializer):
             'is_from_host', 'username_is_reserved', 'time_until_unpin', 'avatar_url', 'created_at', 'is_deleted',
             'gift_recipient', 'is_gift_acknowledged', 'is_highlight', 'highlighted_at'
         ]
+        list_serializer_class = MessageListSerializer
         read_only_fields = [
             'id', 'user', 'message_type',
             'voice_url', 'voice_duration', 'voice_waveform',
@@ -380,21 +410,11 @@ class MessageSerializer(serializers.ModelSerializer):
         - Proxy URL for registered users using reserved_username
         - Direct storage URL for anonymous users or different usernames
 
-        Fallback to DiceBear for orphaned/legacy data only.
+        Read through the room's AvatarDirectory (batched by
+        MessageListSerializer). Fallback to DiceBear for orphaned/legacy data only.
         """
-        # Look up ChatParticipation - avatar_url should always be populated
-        try:
-            participation = ChatParticipation.objects.get(
-                chat_room=obj.chat_room,
-                username__iexact=obj.username
-            )
-            if participation.avatar_url:
-                return participation.avatar_url
-        except ChatParticipation.DoesNotExist:
-            pass
-
-        # Fallback to DiceBear for orphaned/legacy data
-        return get_fallback_dicebear_url(obj.username)
+        entries = self.context.get('avatar_entries', {}).get(obj.chat_room_id)
+        return AvatarDirectory.avatar_url(obj.chat_room_id, obj.username, entries)
 
 
 class MessageCreateSerializer(serializers.ModelSerializer):
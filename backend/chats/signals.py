@@ -0,0 +1,148 @@
+"""
+Signal handlers for the chats app.
+
+- Keep the taken-username index (chats/utils/username/availability.py) in
+  step with User.reserved_username and ChatParticipation.username. Changes
+  are applied once the surrounding transaction commits, so a rolled-back
+  write never marks a name taken.
+- Invalidate RoomCache snapshots (chats/utils/performance/room_cache.py)
+  when a room, its theme or its host changes. Invalidation runs right away
+  (so this transaction reads its own writes) and again on commit (so a
+  concurrent reader that loaded the old row cannot re-cache it).
+- Invalidate RoomPayloadCache detail JSON
+  (chats/utils/performance/room_payload_cache.py) alongside the snapshots,
+  and when the host's subscriptions change or the host joins or leaves.
+- Keep each room's AvatarDirectory (chats/utils/performance/avatar_directory.py)
+  in step with its participations' usernames and avatars, on commit.
+- Count new messages towards the room's ChatRoomMessageCount
+  (chats/utils/performance/message_counts.py) once they commit.
+  Soft-deletes are counted by the delete views.
+"""
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from accounts.models import User, UserSubscription
+from chats.models import ChatParticipation, ChatRoom, ChatTheme, Message
+from chats.utils.performance.avatar_directory import AvatarDirectory
+from chats.utils.performance.message_counts import record_message_count
+from chats.utils.performance.room_cache import HOST_EXCLUDED_FIELDS, RoomCache
+from chats.utils.performance.room_payload_cache import RoomPayloadCache
+from chats.utils.username.availability import mark_taken, recheck_usernames
+
+# Model -> username field tracked by the index
+USERNAME_FIELDS = {
+    User: 'reserved_username',
+    ChatParticipation: 'username',
+}
+
+
+@receiver(post_init, sender=User)
+@receiver(post_init, sender=ChatParticipation)
+def remember_indexed_username(sender, instance, **kwargs):
+    """Record the loaded username so a later save can detect a rename."""
+    # __dict__ rather than getattr: a deferred field must not trigger a query
+    instance._indexed_username = instance.__dict__.get(USERNAME_FIELDS[sender])
+
+
+# The avatar directory receivers must stay above index_saved_username, which
+# advances _indexed_username to the saved value.
+
+@receiver(post_save, sender=ChatParticipation)
+def record_participation_avatar(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not {'username', 'avatar_url'} & set(update_fields):
+        return
+    previous = None if created else getattr(instance, '_indexed_username', None)
+    transaction.on_commit(partial(AvatarDirectory.record, instance, previous))
+
+
+@receiver(post_delete, sender=ChatParticipation)
+def forget_participation_avatar(sender, instance, **kwargs):
+    transaction.on_commit(partial(AvatarDirectory.forget, instance.chat_room_id, instance.username))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=ChatParticipation)
+def index_saved_username(sender, instance, created, update_fields=None, **kwargs):
+    field = USERNAME_FIELDS[sender]
+    if update_fields is not None and field not in update_fields:
+        return
+
+    username = getattr(instance, field)
+    previous = getattr(instance, '_indexed_username', None)
+    instance._indexed_username = username
+
+    if username and (created or username != previous):
+        transaction.on_commit(partial(mark_taken, username))
+    if previous and (not username or previous.lower() != username.lower()):
+        transaction.on_commit(partial(recheck_usernames, [previous]))
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=ChatParticipation)
+def unindex_deleted_username(sender, instance, **kwargs):
+    username = getattr(instance, USERNAME_FIELDS[sender])
+    if username:
+        transaction.on_commit(partial(recheck_usernames, [username]))
+
+
+def _invalidate_now_and_on_commit(func, *args):
+    func(*args)
+    transaction.on_commit(partial(func, *args))
+
+
+@receiver(post_save, sender=ChatRoom)
+@receiver(post_delete, sender=ChatRoom)
+def invalidate_room_snapshot(sender, instance, **kwargs):
+    # Host username only if already loaded (the URL alias is re-validated on read anyway)
+    host_username = instance.host.reserved_username if ChatRoom.host.is_cached(instance) else None
+    _invalidate_now_and_on_commit(RoomCache.invalidate_room, instance.pk, instance.code, host_username)
+    _invalidate_now_and_on_commit(RoomPayloadCache.invalidate_room, instance.pk)
+
+
+@receiver(post_save, sender=ChatTheme)
+@receiver(post_delete, sender=ChatTheme)
+def invalidate_theme_snapshot(sender, instance, **kwargs):
+    _invalidate_now_and_on_commit(RoomCache.invalidate_theme, instance.pk)
+    _invalidate_now_and_on_commit(RoomPayloadCache.invalidate_theme, instance.pk)
+
+
+@receiver(post_save, sender=User)
+def invalidate_hosted_room_snapshots(sender, instance, created, update_fields=None, **kwargs):
+    """Room snapshots embed the host row; skip saves that only touch excluded fields."""
+    if created:
+        return
+    if update_fields is not None and set(update_fields) <= set(HOST_EXCLUDED_FIELDS):
+        return
+    _invalidate_now_and_on_commit(RoomCache.invalidate_host, instance.pk)
+    _invalidate_now_and_on_commit(RoomPayloadCache.invalidate_hosts, instance.pk)
+
+
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+def invalidate_subscription_counts(sender, instance, **kwargs):
+    """Room payloads embed the host's subscriber and subscription counts."""
+    _invalidate_now_and_on_commit(
+        RoomPayloadCache.invalidate_hosts, instance.subscriber_id, instance.subscribed_to_id
+    )
+
+
+@receiver(post_save, sender=ChatParticipation)
+@receiver(post_delete, sender=ChatParticipation)
+def invalidate_host_joined(sender, instance, created=False, update_fields=None, **kwargs):
+    """Room payloads record whether the host has joined (non-anonymously)."""
+    if not created and update_fields is not None and not {'user', 'is_anonymous_identity'} & set(update_fields):
+        return
+    if instance.user_id is None:
+        return
+    _invalidate_now_and_on_commit(RoomPayloadCache.participation_changed, instance.chat_room_id, instance.user_id)
+
+
+@receiver(post_save, sender=Message)
+def count_created_message(sender, instance, created, **kwargs):
+    if created and not instance.is_deleted:
+        # robust: a counter failure must not break the caller after its commit
+        transaction.on_commit(partial(record_message_count, instance.chat_room_id, 1), robust=True)
@@ -0,0 +1,233 @@
+"""
+Tests for the per-room avatar directory.
+
+Tests chats.utils.performance.avatar_directory.AvatarDirectory (Redis hash,
+single-query fallback, fill races), the ChatParticipation signal
+handlers that maintain it, and the message serializers that read it.
+
+Benchmark for serializing 100 messages against the previous query per
+message (tagged `slow`):
+
+    ./venv/bin/python -m pytest chats/tests/tests_avatar_directory.py -m slow
+"""
+import time
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+from chats.models import ChatParticipation, ChatRoom, Message
+from chats.serializers import MessageSerializer
+from chats.tests import cache_helpers
+from chats.utils.performance.avatar_directory import AvatarDirectory
+from chats.utils.performance.cache import MessageCache
+
+
+def _participation_queries(captured):
+    """ChatParticipation lookups among captured queries (ignores e.g. constance reads)."""
+    return [q for q in captured.captured_queries if '"chats_chatparticipation"' in q['sql']]
+
+
+class AvatarDirectoryTestCase(TestCase):
+    def setUp(self):
+        cache_helpers.flush_cache()
+        self.host = User.objects.create_user(email='host@test.com', password='x', reserved_username='HostUser')
+        self.room = ChatRoom.objects.create(name='Room', code='avatar-room', host=self.host)
+
+    def tearDown(self):
+        cache_helpers.flush_cache()
+
+    def _join(self, username, avatar_url=None, user=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ChatParticipation.objects.create(
+                chat_room=self.room, username=username, user=user,
+                avatar_url=avatar_url or f'https://cdn.test/{username}.png',
+            )
+
+    def _seed_messages(self):
+        """100 messages from 10 joined senders, written without signals."""
+        for i in range(10):
+            self._join(f'Sender{i}')
+        return Message.objects.bulk_create([
+            Message(chat_room=self.room, username=f'Sender{i % 10}', content=f'message {i}')
+            for i in range(100)
+        ])
+
+    def _hash(self):
+        client = cache_helpers.redis_client()
+        return {
+            k.decode(): v for k, v in client.hgetall(AvatarDirectory.KEY.format(room_id=self.room.id)).items()
+        }
+
+
+class SignalTests(AvatarDirectoryTestCase):
+    """Test directory maintenance on participation writes."""
+
+    def test_join_records_entry(self):
+        self._join('HostUser', user=self.host)
+        self._join('CoolCat42')
+
+        with CaptureQueriesContext(connection) as captured:
+            entries = AvatarDirectory.lookup(self.room.id, ['hostuser', 'COOLCAT42'])
+
+        self.assertEqual(_participation_queries(captured), [])
+        self.assertEqual(entries, {
+            'hostuser': 'https://cdn.test/HostUser.png',
+            'coolcat42': 'https://cdn.test/CoolCat42.png',
+        })
+
+    def test_avatar_change_overwrites(self):
+        participation = self._join('CoolCat42')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.avatar_url = 'https://cdn.test/new.png'
+            participation.save(update_fields=['avatar_url'])
+
+        self.assertEqual(AvatarDirectory.avatar_url(self.room.id, 'CoolCat42'), 'https://cdn.test/new.png')
+
+    def test_unrelated_update_skips_directory(self):
+        participation = self._join('CoolCat42')
+
+        with patch.object(AvatarDirectory, 'record') as record:
+            with self.captureOnCommitCallbacks(execute=True):
+                participation.save(update_fields=['is_spotlight'])
+
+        record.assert_not_called()
+
+    def test_rename_drops_old_name(self):
+        participation = self._join('CoolCat42')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.username = 'WarmDog7'
+            participation.save()
+
+        self.assertEqual(set(self._hash()), {'warmdog7'})
+
+    def test_delete_forgets(self):
+        participation = self._join('CoolCat42')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.delete()
+
+        self.assertEqual(self._hash(), {})
+        self.assertEqual(AvatarDirectory.lookup(self.room.id, ['CoolCat42']), {})
+
+    def test_reserved_username_change_keeps_entry(self):
+        self._join('HostUser', user=self.host)
+
+        with patch.object(AvatarDirectory, 'forget') as forget:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.host.reserved_username = 'NewHost'
+                self.host.save()
+
+        forget.assert_not_called()
+        self.assertEqual(AvatarDirectory.avatar_url(self.room.id, 'HostUser'), 'https://cdn.test/HostUser.png')
+
+
+class LookupTests(AvatarDirectoryTestCase):
+    """Test the single-query fallback and fills."""
+
+    def test_miss_fills_with_one_query(self):
+        # bulk_create sends no post_save
+        ChatParticipation.objects.bulk_create([
+            ChatParticipation(chat_room=self.room, username=f'Bulk{i}', avatar_url=f'https://cdn.test/{i}.png')
+            for i in range(20)
+        ])
+        usernames = [f'bulk{i}' for i in range(20)] + ['NoSuchUser']
+
+        with CaptureQueriesContext(connection) as cold:
+            entries = AvatarDirectory.lookup(self.room.id, usernames)
+        with CaptureQueriesContext(connection) as warm:
+            AvatarDirectory.lookup(self.room.id, [f'bulk{i}' for i in range(20)])
+
+        self.assertEqual(len(entries), 20)
+        self.assertEqual(len(_participation_queries(cold)), 1)
+        self.assertEqual(_participation_queries(warm), [])
+
+    def test_fill_does_not_overwrite_newer_entry(self):
+        participation = self._join('CoolCat42')
+        stale = AvatarDirectory._load(self.room.id, ['coolcat42'])
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.avatar_url = 'https://cdn.test/new.png'
+            participation.save(update_fields=['avatar_url'])
+
+        AvatarDirectory._fill(AvatarDirectory.KEY.format(room_id=self.room.id), stale)
+
+        self.assertEqual(AvatarDirectory.avatar_url(self.room.id, 'CoolCat42'), 'https://cdn.test/new.png')
+
+    def test_orphaned_username_falls_back_to_dicebear(self):
+        self.assertIn('dicebear', AvatarDirectory.avatar_url(self.room.id, 'Ghost123'))
+
+    def test_redis_failure_falls_back_to_db(self):
+        self._join('CoolCat42')
+
+        with patch.object(AvatarDirectory, '_get_redis_client', side_effect=ConnectionError('redis down')):
+            url = AvatarDirectory.avatar_url(self.room.id, 'CoolCat42')
+
+        self.assertEqual(url, 'https://cdn.test/CoolCat42.png')
+
+
+class SerializationTests(AvatarDirectoryTestCase):
+    """Test message serialization costs at most one participation query."""
+
+    def setUp(self):
+        super().setUp()
+        self.messages = self._seed_messages()
+
+    def test_message_serializer_list(self):
+        cache_helpers.flush_cache()
+        messages = Message.objects.filter(chat_room=self.room).select_related('user', 'reply_to', 'chat_room')
+
+        with CaptureQueriesContext(connection) as captured:
+            data = MessageSerializer(messages, many=True).data
+
+        self.assertEqual(len(_participation_queries(captured)), 1)
+        self.assertEqual(data[0]['avatar_url'], f"https://cdn.test/{data[0]['username']}.png")
+
+    def test_message_cache_serialization(self):
+        message = Message.objects.select_related('user', 'reply_to', 'chat_room').get(pk=self.messages[0].pk)
+
+        with CaptureQueriesContext(connection) as captured:
+            data = MessageCache._serialize_message(message)
+
+        self.assertEqual(_participation_queries(captured), [])
+        self.assertEqual(data['avatar_url'], 'https://cdn.test/Sender0.png')
+
+
+@tag('slow')
+class AvatarSerializationBenchmark(AvatarDirectoryTestCase):
+    """Serialize 100 messages: query per message vs AvatarDirectory."""
+
+    def _legacy_avatar_url(self, message):
+        try:
+            participation = ChatParticipation.objects.get(chat_room=message.chat_room, username__iexact=message.username)
+            return participation.avatar_url
+        except ChatParticipation.DoesNotExist:
+            return None
+
+    def test_directory_is_faster(self):
+        rounds = 20
+        self._seed_messages()
+        messages = list(Message.objects.filter(chat_room=self.room).select_related('chat_room'))
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            legacy = [self._legacy_avatar_url(message) for message in messages]
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                entries = AvatarDirectory.lookup(self.room.id, [message.username for message in messages])
+                current = [AvatarDirectory.avatar_url(self.room.id, message.username, entries) for message in messages]
+            directory_ms = (time.perf_counter() - start) * 1000
+
+        print(f'\n[avatar benchmark] {rounds} x {len(messages)} messages')
+        print(f'  query per message {legacy_ms / rounds:8.2f}ms/page')
+        print(f'  avatar directory  {directory_ms / rounds:8.2f}ms/page')
+
+        self.assertEqual(legacy, current)
+        self.assertEqual(_participation_queries(captured), [])
+        self.assertLess(directory_ms, legacy_ms)
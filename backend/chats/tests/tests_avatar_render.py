@@ -0,0 +1,188 @@
+"""
+Tests for locally rendered avatars.
+
+Tests chatpop.utils.media.avatar_render (deterministic SVG rendering),
+generated avatar paths, and lazy render-on-fetch through the media proxy
+and UserAvatarView.
+"""
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from chatpop.utils.media import avatar, storage
+from chatpop.utils.media.avatar import (
+    ensure_generated_avatar,
+    generate_and_store_avatar,
+    generated_avatar_path,
+    generated_avatar_url,
+    parse_generated_avatar_path,
+)
+from chatpop.utils.media.avatar_render import render_avatar_svg
+from chatpop.utils.media.storage import MediaStorage
+from ..models import ChatParticipation, ChatRoom
+from ..views import ChatRoomJoinView
+
+
+class RenderAvatarTests(TestCase):
+    """Test render_avatar_svg()."""
+
+    def test_deterministic(self):
+        self.assertEqual(render_avatar_svg('CoolCat42'), render_avatar_svg('CoolCat42'))
+
+    def test_seeds_differ(self):
+        svgs = {render_avatar_svg(f'user{i}') for i in range(20)}
+
+        self.assertEqual(len(svgs), 20)
+
+    def test_valid_svg_at_size(self):
+        for style in ('pixel-art', 'identicon', 'initials'):
+            root = ET.fromstring(render_avatar_svg('Happy Otter', style=style, size=64))
+
+            self.assertEqual(root.tag, '{http://www.w3.org/2000/svg}svg')
+            self.assertEqual(root.get('width'), '64')
+
+    def test_unsupported_style_renders_pixel_art(self):
+        self.assertEqual(
+            render_avatar_svg('seed', style='bottts'),
+            render_avatar_svg('seed', style='pixel-art')
+        )
+
+    def test_initials_escaped(self):
+        svg = render_avatar_svg('<b>', style='initials').decode()
+
+        self.assertNotIn('<b>', svg)
+
+
+class GeneratedAvatarPathTests(TestCase):
+    """Test generated_avatar_path() / parse_generated_avatar_path()."""
+
+    def test_round_trip(self):
+        path = generated_avatar_path('Cool Cat/42', style='identicon', size=80)
+
+        self.assertTrue(path.startswith('avatars/generated/v1/identicon-80/'))
+        self.assertEqual(parse_generated_avatar_path(path), ('Cool Cat/42', 'identicon', 80))
+
+    def test_invalid_paths_rejected(self):
+        valid = generated_avatar_path('seed', style='pixel-art', size=40)
+        for path in (
+            valid.replace('.svg', '.png'),
+            valid.replace('v1', 'v0'),
+            valid.replace('pixel-art-40', 'bottts-40'),
+            valid.replace('pixel-art-40', 'pixel-art-99999'),
+            'avatars/generated/v1/pixel-art-40/!!!.svg',
+            'avatars/generated/v1/pixel-art-40/../../x.svg',
+        ):
+            self.assertIsNone(parse_generated_avatar_path(path), path)
+
+    def test_empty_or_long_seed(self):
+        self.assertIsNone(generate_and_store_avatar(''))
+        self.assertIsNone(generate_and_store_avatar('x' * 500))
+
+
+class LazyAvatarTests(TestCase):
+    """Test that assignment does no I/O and only assigned avatars are stored on fetch."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, AWS_STORAGE_BUCKET_NAME='')
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        cache.clear()
+
+    @patch('chatpop.utils.media.avatar.requests.get', side_effect=AssertionError('network call'))
+    def test_generate_does_no_io(self, mock_get):
+        with patch.object(MediaStorage, 'save_file', side_effect=AssertionError('storage write')):
+            url = generate_and_store_avatar('alice')
+
+        self.assertEqual(url, f"/api/chats/media/{generated_avatar_path('alice')}")
+
+    @patch('chatpop.utils.media.avatar.requests.get', side_effect=AssertionError('network call'))
+    def test_join_assigns_avatar_without_network(self, mock_get):
+        host = User.objects.create_user(email='host@test.com', password='testpass123', reserved_username='hosty')
+        room = ChatRoom.objects.create(name='Room', host=host)
+        participation = ChatParticipation.objects.create(chat_room=room, username='guest', ip_address='127.0.0.1')
+
+        ChatRoomJoinView()._generate_avatar_for_participation(participation, room, avatar_seed='picked')
+
+        participation.refresh_from_db()
+        self.assertEqual(participation.avatar_url, generate_and_store_avatar('picked'))
+        self.assertFalse(MediaStorage.file_exists(generated_avatar_path('picked')))
+
+    def test_first_fetch_renders_and_stores(self):
+        generate_and_store_avatar('bob')
+        path = generated_avatar_path('bob')
+        url = reverse('chats:media-stream', kwargs={'storage_path': path})
+
+        with patch.object(avatar, 'render_avatar_svg', wraps=avatar.render_avatar_svg) as render:
+            first = self.client.get(url)
+            second = self.client.get(url)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Content-Type'], 'image/svg+xml')
+        self.assertIn('immutable', first['Cache-Control'])
+        self.assertEqual(b''.join(second.streaming_content), render_avatar_svg('bob'))
+        self.assertTrue(MediaStorage.file_exists(path))
+        self.assertEqual(render.call_count, 1)
+
+    def test_unassigned_avatar_is_served_without_storing(self):
+        path = generated_avatar_path('nobody-has-this-seed')
+        url = reverse('chats:media-stream', kwargs={'storage_path': path})
+
+        with patch.object(MediaStorage, 'save_file', side_effect=AssertionError('storage write')):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(response.content, render_avatar_svg('nobody-has-this-seed'))
+        self.assertFalse(MediaStorage.file_exists(path))
+
+    def test_assigned_seed_at_another_size_is_not_stored(self):
+        generate_and_store_avatar('erin')
+        path = generated_avatar_path('erin', size=512)
+
+        self.assertFalse(ensure_generated_avatar(path))
+        response = self.client.get(reverse('chats:media-stream', kwargs={'storage_path': path}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(MediaStorage.file_exists(path))
+
+    def test_unknown_generated_path_404(self):
+        url = reverse('chats:media-stream', kwargs={'storage_path': 'avatars/generated/v1/pixel-art-40/!!!.svg'})
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_user_avatar_view_does_not_write(self):
+        user = User.objects.create_user(email='carol@test.com', password='testpass123', reserved_username='carol')
+
+        response = self.client.get(reverse('chats:user-avatar', kwargs={'user_id': user.id}))
+
+        user.refresh_from_db()
+        self.assertFalse(user.avatar_url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], generated_avatar_url('carol'))
+
+    @override_settings(AWS_STORAGE_BUCKET_NAME='test-bucket')
+    def test_cdn_signing_waits_for_stored_avatar(self):
+        generate_and_store_avatar('dave')
+        path = generated_avatar_path('dave')
+        storage._signed_url_memo.clear()
+
+        with patch.object(storage.default_storage, 'url', return_value='https://cdn.test/signed'):
+            self.assertIsNone(MediaStorage.sign_storage_path(path))
+            with patch.object(storage.default_storage, 'exists', return_value=True):
+                self.assertTrue(ensure_generated_avatar(path))
+            self.assertEqual(MediaStorage.sign_storage_path(path), 'https://cdn.test/signed')
+        storage._signed_url_memo.clear()
@@ -0,0 +1,271 @@
+"""
+Tests for memoized CDN URL signing and batched avatar resolution.
+
+Tests MediaStorage.sign_storage_path() (per-bucket memo),
+resolve_avatar_urls() (Redis MGET + one DB query) and
+MessageCache._enrich_many().
+
+Benchmark for enriching 500 cached messages against the previous
+per-field signing path (tagged `slow`):
+
+    ./venv/bin/python -m pytest chats/tests/tests_cdn_urls.py -m slow
+"""
+import hashlib
+import hmac
+import json
+import time
+import uuid
+from unittest.mock import Mock, patch
+
+from django.db import connection
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+from chatpop.utils.media import storage
+from chatpop.utils.media.storage import MediaStorage
+from chats.tests import cache_helpers, factories
+from chats.utils.performance.cache import MessageCache
+
+S3_SETTINGS = {'AWS_STORAGE_BUCKET_NAME': 'test-bucket'}
+
+
+def _user_queries(captured):
+    """User lookups among captured queries (ignores e.g. constance reads)."""
+    return [q for q in captured.captured_queries if '"accounts_user"' in q['sql']]
+
+
+class FakeSigner:
+    """Stands in for default_storage.url(): HMAC-signs and counts calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, path, expire=None):
+        self.calls += 1
+        expires = int(time.time()) + expire
+        signature = hmac.new(b'key', f'{path}:{expires}'.encode(), hashlib.sha256).hexdigest()
+        return f'https://cdn.test/{path}?Expires={expires}&Signature={signature}'
+
+
+class CdnTestMixin:
+    def setUp(self):
+        super().setUp()
+        cache_helpers.flush_cache()
+        storage._signed_url_memo.clear()
+        self.signer = FakeSigner()
+        self.storage_patch = patch.object(storage, 'default_storage', Mock(url=self.signer))
+        self.storage_patch.start()
+
+    def tearDown(self):
+        self.storage_patch.stop()
+        storage._signed_url_memo.clear()
+        cache_helpers.flush_cache()
+        super().tearDown()
+
+    def _user_with_avatar(self):
+        user = factories.make_user()
+        user.avatar_url = f'/api/chats/media/avatars/{uuid.uuid4().hex}.svg'
+        user.save(update_fields=['avatar_url'])
+        return user
+
+
+@override_settings(**S3_SETTINGS)
+class SignStoragePathTests(CdnTestMixin, TestCase):
+    """Test the per-bucket signing memo."""
+
+    def test_signed_once_per_bucket(self):
+        first = MediaStorage.sign_storage_path('photos/a.jpg')
+        second = MediaStorage.sign_storage_path('photos/a.jpg')
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.signer.calls, 1)
+
+    def test_bucket_rollover_resigns(self):
+        now = 1_700_000_000
+        with patch.object(storage.time, 'time', return_value=now):
+            first = MediaStorage.sign_storage_path('photos/a.jpg')
+        with patch.object(storage.time, 'time', return_value=now + storage.SIGNED_URL_BUCKET_SECONDS):
+            second = MediaStorage.sign_storage_path('photos/a.jpg')
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.signer.calls, 2)
+        # Only the current bucket is retained
+        self.assertEqual(len(storage._signed_url_memo._urls), 1)
+
+    def test_expiry_stable_within_bucket(self):
+        now = 1_700_000_000 - 1_700_000_000 % storage.SIGNED_URL_BUCKET_SECONDS
+        with patch.object(storage.time, 'time', return_value=now + 1):
+            first = MediaStorage.sign_storage_path('photos/a.jpg')
+        storage._signed_url_memo.clear()
+        with patch.object(storage.time, 'time', return_value=now + 200):
+            second = MediaStorage.sign_storage_path('photos/a.jpg')
+
+        # Same string even when signed twice in one bucket
+        self.assertEqual(first, second)
+
+    @override_settings(AWS_STORAGE_BUCKET_NAME='')
+    def test_local_storage_not_signed(self):
+        self.assertIsNone(MediaStorage.proxy_url_to_cdn_url('/api/chats/media/photos/a.jpg'))
+        self.assertEqual(self.signer.calls, 0)
+
+    def test_external_url_not_signed(self):
+        self.assertIsNone(MediaStorage.proxy_url_to_cdn_url('https://api.dicebear.com/7.x/x.svg'))
+
+
+@override_settings(**S3_SETTINGS)
+class ResolveAvatarUrlsTests(CdnTestMixin, TestCase):
+    """Test batched avatar resolution."""
+
+    def test_one_query_then_cached(self):
+        users = [self._user_with_avatar() for _ in range(5)]
+        no_avatar = factories.make_user()
+        ids = [str(u.id) for u in users] + [str(no_avatar.id), str(uuid.uuid4())]
+
+        with self.assertNumQueries(1):
+            urls = MediaStorage.resolve_avatar_urls(ids)
+        with self.assertNumQueries(0):
+            again = MediaStorage.resolve_avatar_urls(ids)
+
+        self.assertEqual(urls, again)
+        for user in users:
+            self.assertTrue(urls[str(user.id)].startswith('https://cdn.test/avatars/'))
+        self.assertIsNone(urls[str(no_avatar.id)])
+        self.assertIsNone(urls[ids[-1]])
+        self.assertEqual(self.signer.calls, 5)
+
+    def test_malformed_id_does_not_break_batch(self):
+        user = self._user_with_avatar()
+
+        urls = MediaStorage.resolve_avatar_urls([str(user.id), 'not-a-uuid'])
+
+        self.assertIsNotNone(urls[str(user.id)])
+        self.assertIsNone(urls['not-a-uuid'])
+
+    def test_avatar_change_invalidates_cached_path(self):
+        user = self._user_with_avatar()
+        before = MediaStorage.resolve_avatar_urls([str(user.id)])[str(user.id)]
+
+        user.avatar_url = '/api/chats/media/avatars/new.svg'
+        user.save(update_fields=['avatar_url'])
+
+        after = MediaStorage.resolve_avatar_urls([str(user.id)])[str(user.id)]
+        self.assertNotEqual(before, after)
+        self.assertIn('avatars/new.svg', after)
+
+    def test_proxy_url_uses_avatar_cache(self):
+        user = self._user_with_avatar()
+        proxy = f'/api/chats/media/avatars/user/{user.id}'
+        MediaStorage.proxy_url_to_cdn_url(proxy)
+
+        with self.assertNumQueries(0):
+            url = MediaStorage.proxy_url_to_cdn_url(proxy)
+
+        self.assertTrue(url.startswith('https://cdn.test/avatars/'))
+
+
+def _cache_messages(room_id, users, count):
+    """Write `count` message dicts straight into the room's Redis cache."""
+    client = cache_helpers.redis_client()
+    data_key = MessageCache.MSG_DATA_KEY.format(room_id=room_id)
+    timeline_key = MessageCache.TIMELINE_KEY.format(room_id=room_id)
+    now = time.time()
+    pipe = client.pipeline()
+    for i in range(count):
+        user = users[i % len(users)]
+        msg = {
+            'id': str(uuid.uuid4()),
+            'username': user.reserved_username,
+            'content': f'message {i}',
+            'avatar_url': f'/api/chats/media/avatars/user/{user.id}',
+            'photo_url': f'/api/chats/media/photos/{(i // 4) % 50}.jpg' if i % 4 == 0 else None,
+        }
+        pipe.hset(data_key, msg['id'], json.dumps(msg))
+        pipe.zadd(timeline_key, {msg['id']: now + i})
+    pipe.execute()
+
+
+@override_settings(**S3_SETTINGS)
+class EnrichManyTests(CdnTestMixin, TestCase):
+    """Test MessageCache read-time CDN enrichment."""
+
+    def setUp(self):
+        super().setUp()
+        self.room_id = str(uuid.uuid4())
+        self.users = [self._user_with_avatar() for _ in range(20)]
+        _cache_messages(self.room_id, self.users, 500)
+
+    def test_page_resolves_avatars_in_one_query(self):
+        with CaptureQueriesContext(connection) as captured:
+            messages = MessageCache.get_messages(self.room_id, limit=500)
+
+        self.assertEqual(len(_user_queries(captured)), 1)
+
+        self.assertEqual(len(messages), 500)
+        self.assertTrue(all(m['avatar_url'].startswith('https://cdn.test/') for m in messages))
+        # 20 avatars + 50 distinct photos, each signed once
+        self.assertEqual(self.signer.calls, 70)
+
+    def test_warm_read_has_no_queries_or_signing(self):
+        MessageCache.get_messages(self.room_id, limit=500)
+        calls = self.signer.calls
+
+        with CaptureQueriesContext(connection) as captured:
+            MessageCache.get_messages(self.room_id, limit=500)
+
+        self.assertEqual(_user_queries(captured), [])
+        self.assertEqual(self.signer.calls, calls)
+
+
+def _legacy_enrich(msg, signer):
+    """_enrich_with_cdn_urls() before memoization: a sign per field, a User lookup per avatar."""
+    prefix = '/api/chats/media/'
+    for field in MessageCache.CDN_URL_FIELDS:
+        path = msg.get(field)
+        if not path or not path.startswith(prefix):
+            continue
+        path = path[len(prefix):]
+        if path.startswith('avatars/user/'):
+            user = User.objects.only('avatar_url').get(id=path[len('avatars/user/'):])
+            path = user.avatar_url[len(prefix):]
+        msg[field] = signer(path, expire=3600)
+    return msg
+
+
+@tag('slow')
+@override_settings(**S3_SETTINGS)
+class EnrichBenchmark(CdnTestMixin, TestCase):
+    """Enriching 500 cached messages: per-field signing vs memoized + batched."""
+
+    def test_memoized_enrichment_is_cheaper(self):
+        room_id = str(uuid.uuid4())
+        users = [self._user_with_avatar() for _ in range(25)]
+        _cache_messages(room_id, users, 500)
+        client = cache_helpers.redis_client()
+        raw = client.hvals(MessageCache.MSG_DATA_KEY.format(room_id=room_id))
+
+        legacy_signer = FakeSigner()
+        with CaptureQueriesContext(connection) as legacy_queries:
+            start = time.perf_counter()
+            for value in raw:
+                _legacy_enrich(json.loads(value), legacy_signer)
+            legacy_ms = (time.perf_counter() - start) * 1000
+
+        results = []
+        for label in ('cold', 'warm'):
+            calls = self.signer.calls
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                MessageCache.get_messages(room_id, limit=500)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            results.append((label, elapsed_ms, len(_user_queries(queries)), self.signer.calls - calls))
+
+        print('\n[cdn enrichment benchmark] 500 messages, 25 users')
+        print(f'  legacy  {legacy_ms:7.1f}ms queries={len(_user_queries(legacy_queries))} signs={legacy_signer.calls}')
+        for label, elapsed_ms, query_count, signs in results:
+            print(f'  {label:<7} {elapsed_ms:7.1f}ms queries={query_count} signs={signs}')
+
+        self.assertEqual(len(_user_queries(legacy_queries)), 500)
+        self.assertLessEqual(results[0][2], 1)
+        self.assertEqual(results[1][2:], (0, 0))
+        self.assertLess(results[1][1], legacy_ms)
@@ -0,0 +1,109 @@
+"""
+Tests for the sharded channel layer configuration.
+
+Tests chatpop.utils.channel_layers (env parsing, backend selection, group
+placement), and group placement and the benchmark_channel_layer command
+against local redis-server processes (tagged `slow`):
+
+    ./venv/bin/python -m pytest chats/tests/tests_channel_layers.py -m slow
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+import redis
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import SimpleTestCase, tag
+from django.utils.module_loading import import_string
+
+from chatpop.utils.channel_layers import (
+    BACKENDS, build_channel_layer, channel_layers_from_env, group_host_index, parse_hosts,
+)
+from chats.management.commands.benchmark_channel_layer import spawn_redis_servers, stop_redis_servers
+
+
+class ChannelLayerConfigTests(SimpleTestCase):
+    """Test CHANNEL_LAYERS built from the environment."""
+
+    def test_defaults_to_cache_redis(self):
+        layers = channel_layers_from_env({'REDIS_HOST': 'redis', 'REDIS_PORT': '6381'})
+
+        self.assertEqual(layers['default']['BACKEND'], BACKENDS['core'])
+        self.assertEqual(layers['default']['CONFIG']['hosts'], [('redis', 6381)])
+
+    def test_sharded_hosts(self):
+        layers = channel_layers_from_env({
+            'CHANNEL_LAYER_HOSTS': 'redis://ws-1:6379/0, ws-2:6379,',
+            'CHANNEL_LAYER_CAPACITY': '500',
+        })
+
+        config = layers['default']['CONFIG']
+        self.assertEqual(config['hosts'], ['redis://ws-1:6379/0', 'redis://ws-2:6379'])
+        self.assertEqual(config['capacity'], 500)
+
+    def test_pubsub_backend(self):
+        layers = channel_layers_from_env({'CHANNEL_LAYER_BACKEND': 'PubSub'})
+
+        self.assertEqual(layers['default']['BACKEND'], BACKENDS['pubsub'])
+        # capacity/expiry are core-only options
+        self.assertNotIn('capacity', layers['default']['CONFIG'])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            build_channel_layer(['redis://localhost:6379'], backend='rabbitmq')
+
+    def test_groups_spread_across_hosts(self):
+        counts = [0, 0, 0, 0]
+        for i in range(1000):
+            counts[group_host_index(f'chat_room{i}', 4)] += 1
+
+        self.assertTrue(all(150 < count < 350 for count in counts), counts)
+        self.assertEqual(group_host_index('chat_room1', 1), 0)
+
+    def test_parse_hosts_empty(self):
+        self.assertEqual(parse_hosts(None), [])
+        self.assertEqual(parse_hosts(' , '), [])
+
+
+@tag('slow')
+@unittest.skipUnless(shutil.which('redis-server'), 'redis-server not installed')
+class ChannelLayerBenchmarkTests(SimpleTestCase):
+    """Run the layer and the benchmark against spawned redis-server processes."""
+
+    def test_group_membership_lands_on_reported_host(self):
+        processes, urls = spawn_redis_servers(2)
+        try:
+            config = build_channel_layer(urls)
+            layer = import_string(config['BACKEND'])(**config['CONFIG'])
+            groups = [f'chat_room{i}' for i in range(20)]
+            for group in groups:
+                async_to_sync(layer.group_add)(group, 'specific.test!member')
+
+            for index, url in enumerate(urls):
+                keys = {key.decode() for key in redis.Redis.from_url(url).keys('asgi:group:*')}
+                self.assertEqual(
+                    keys, {f'asgi:group:{group}' for group in groups if group_host_index(group, 2) == index}
+                )
+        finally:
+            stop_redis_servers(processes)
+
+    def test_benchmark_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'results.json')
+            call_command(
+                'benchmark_channel_layer', spawn=True, host_counts='1,2', backend='both',
+                groups=4, members=3, messages=40, json=path, stdout=StringIO(),
+            )
+            with open(path) as f:
+                results = json.load(f)
+
+        self.assertEqual([(r['backend'], r['hosts']) for r in results], [
+            ('core', 1), ('core', 2), ('pubsub', 1), ('pubsub', 2),
+        ])
+        for result in results:
+            self.assertIsNotNone(result['deliveries_per_second'])
+            self.assertEqual(sum(result['groups_per_host']), 4)
@@ -0,0 +1,192 @@
+"""
+Tests for database connection reuse.
+
+Tests chatpop.utils.db_connections (env parsing and pool sizing), the
+pooled chatpop.db.postgresql backend, the dashboard's db_connections block
+and the benchmark_db_connections command.
+"""
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from psycopg2 import extensions
+
+from accounts.models import User
+from chatpop.db.postgresql.base import DatabaseWrapper
+from chatpop.db.postgresql.pool import close_pools, pool_stats
+from chatpop.utils.db_connections import db_connections_from_env, default_pool_size
+from chats.tests import cache_helpers
+from chats.utils.performance.latency import LatencyHistograms, histograms
+
+ALIAS = 'pool_test'
+
+
+def pooled_settings(max_size=2, timeout=5.0, **overrides):
+    settings_dict = {**connection.settings_dict, 'CONN_MAX_AGE': 0, **overrides}
+    settings_dict['OPTIONS'] = {
+        **connection.settings_dict['OPTIONS'],
+        'pool': {'max_size': max_size, 'timeout': timeout},
+    }
+    return settings_dict
+
+
+def backend_pid(db):
+    with db.cursor() as cursor:
+        cursor.execute('SELECT pg_backend_pid()')
+        return cursor.fetchone()[0]
+
+
+class DbConnectionSettingsTests(SimpleTestCase):
+    """Test DATABASES connection settings built from the environment."""
+
+    def test_defaults_close_after_each_request_without_pool(self):
+        config = db_connections_from_env({})
+
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertEqual(config['OPTIONS'], {})
+
+    def test_persistent_connections(self):
+        self.assertEqual(db_connections_from_env({'DB_CONN_MAX_AGE': '60'})['CONN_MAX_AGE'], 60)
+        self.assertIsNone(db_connections_from_env({'DB_CONN_MAX_AGE': 'None'})['CONN_MAX_AGE'])
+        self.assertFalse(db_connections_from_env({'DB_CONN_HEALTH_CHECKS': 'false'})['CONN_HEALTH_CHECKS'])
+
+    def test_pooling_forces_conn_max_age_zero(self):
+        config = db_connections_from_env({
+            'DB_POOL': 'true', 'DB_CONN_MAX_AGE': '60', 'DB_POOL_SIZE': '12', 'DB_POOL_TIMEOUT': '2.5',
+        })
+
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool'], {'max_size': 12, 'timeout': 2.5, 'max_idle': 300.0})
+
+    def test_default_size_follows_threads_within_the_budget(self):
+        self.assertEqual(default_pool_size({'ASGI_THREADS': '16'}), 17)
+        self.assertEqual(
+            default_pool_size({'ASGI_THREADS': '16', 'DB_WORKERS': '8', 'DB_MAX_CONNECTIONS': '90'}), 11,
+        )
+        self.assertEqual(
+            db_connections_from_env({'DB_POOL': 'true', 'ASGI_THREADS': '4'})['OPTIONS']['pool']['max_size'], 5,
+        )
+
+
+class ConnectionPoolTests(TransactionTestCase):
+    """Test the pooled backend against the test database."""
+
+    def setUp(self):
+        cache_helpers.flush_cache()
+
+    def tearDown(self):
+        close_pools(ALIAS)
+        cache_helpers.flush_cache()
+
+    def test_connections_are_shared_between_threads(self):
+        pids = []
+
+        def request():
+            db = DatabaseWrapper(pooled_settings(), ALIAS)
+            pids.append(backend_pid(db))
+            db.close_if_unusable_or_obsolete()
+
+        for _ in range(3):
+            thread = threading.Thread(target=request)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(len(set(pids)), 1)
+        self.assertEqual(pool_stats()[ALIAS], {
+            'max_size': 2, 'in_use': 0, 'idle': 1, 'opened': 1, 'reused': 2, 'timeouts': 0,
+        })
+
+    def test_open_transaction_is_rolled_back_on_return(self):
+        first = DatabaseWrapper(pooled_settings(), ALIAS)
+        first.set_autocommit(False)
+        pid = backend_pid(first)
+        raw = first.connection
+        self.assertEqual(raw.info.transaction_status, extensions.TRANSACTION_STATUS_INTRANS)
+        first.close()
+
+        second = DatabaseWrapper(pooled_settings(), ALIAS)
+        self.assertEqual(backend_pid(second), pid)
+        self.assertEqual(raw.info.transaction_status, extensions.TRANSACTION_STATUS_IDLE)
+        self.assertTrue(second.get_autocommit())
+        second.close()
+
+    def test_exhausted_pool_times_out(self):
+        holder = DatabaseWrapper(pooled_settings(max_size=1, timeout=0.05), ALIAS)
+        holder.ensure_connection()
+        waiter = DatabaseWrapper(pooled_settings(max_size=1, timeout=0.05), ALIAS)
+
+        with self.assertRaises(OperationalError):
+            waiter.ensure_connection()
+
+        holder.close()
+        waiter.ensure_connection()
+        waiter.close()
+        self.assertEqual(pool_stats()[ALIAS]['timeouts'], 1)
+
+    def test_wait_and_connect_times_are_recorded(self):
+        db = DatabaseWrapper(pooled_settings(), ALIAS)
+        db.ensure_connection()
+        db.close()
+        histograms.flush()
+
+        operations = LatencyHistograms().snapshot()['operations']
+        self.assertGreaterEqual(operations['db_pool_wait']['count'], 1)
+        self.assertGreaterEqual(operations['db_connect']['count'], 1)
+
+    def test_pooling_requires_conn_max_age_zero(self):
+        db = DatabaseWrapper(pooled_settings(CONN_MAX_AGE=60), ALIAS)
+        with self.assertRaises(ImproperlyConfigured):
+            db.ensure_connection()
+
+    def test_close_pools_closes_idle_connections(self):
+        db = DatabaseWrapper(pooled_settings(), ALIAS)
+        db.ensure_connection()
+        raw = db.connection
+        db.close()
+
+        close_pools(ALIAS)
+
+        self.assertTrue(raw.closed)
+        self.assertNotIn(ALIAS, pool_stats())
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    def test_command_compares_modes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'results.json')
+            call_command(
+                'benchmark_db_connections', '--threads', '4', '--requests', '3', '--pool-size', '2',
+                '--json', path, stdout=StringIO(),
+            )
+            with open(path) as f:
+                results = {result['mode']: result for result in json.load(f)}
+
+        self.assertEqual(set(results), {'per_request', 'persistent', 'pooled'})
+        for result in results.values():
+            self.assertEqual(result['requests'], 12)
+            self.assertEqual(result['error_count'], 0)
+            self.assertIsNotNone(result['latency_ms']['p99'])
+        self.assertEqual(results['per_request']['connections_opened'], 12)
+        self.assertEqual(results['persistent']['connections_opened'], 4)
+        self.assertLessEqual(results['pooled']['connections_opened'], 2)
+        self.assertNotIn('benchmark_pooled', pool_stats())
+
+
+class DashboardTests(TestCase):
+    def test_dashboard_api_includes_database_connections(self):
+        staff = User.objects.create_user(email='staff@example.com', password='pw', is_staff=True)
+        self.client.force_login(staff)
+
+        data = self.client.get('/admin/monitor/chat-cache/api/').json()['db_connections']
+
+        self.assertFalse(data['pooling'])
+        self.assertIsNone(data['pool'])
+        self.assertGreaterEqual(data['server']['total'], 1)
+        self.assertGreater(data['server']['max_connections'], 0)
@@ -117,7 +117,7 @@ class HostFirstJoinTests(TestCase):
 
         # Should succeed
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['code'], self.chat_room.code)
+        self.assertEqual(response.json()['code'], self.chat_room.code)
 
     @allure.title("Host can join first")
     @allure.description("Host should be able to join their own chat")
@@ -167,7 +167,7 @@ class HostFirstJoinTests(TestCase):
 
         # Should succeed
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['code'], self.chat_room.code)
+        self.assertEqual(response.json()['code'], self.chat_room.code)
 
     @allure.title("Non-host can join after host joins")
     @allure.description("Non-host users should be able to join after host joins")
@@ -224,7 +224,7 @@ class HostFirstJoinTests(TestCase):
 
         # Should succeed
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['code'], self.chat_room.code)
+        self.assertEqual(response.json()['code'], self.chat_room.code)
 
     @allure.title("Anonymous user can join after host joins")
     @allure.description("Anonymous users should be able to join after host joins")
@@ -0,0 +1,160 @@
+"""
+Tests for the cluster-wide latency histograms (chats/utils/performance/latency.py).
+
+Separate LatencyHistograms instances stand in for separate worker
+processes: each buffers its own buckets and flushes them into the shared
+Redis hashes that snapshot() and the /metrics endpoint read.
+"""
+
+from unittest.mock import PropertyMock, patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from accounts.models import User
+from chats.tests import cache_helpers
+from chats.utils.performance.latency import (
+    LatencyHistograms, bucket_for, bucket_upper_ms, percentile_ms,
+)
+from chats.utils.performance.monitoring import CacheMonitor, monitor
+
+
+class BucketTests(SimpleTestCase):
+    def test_bucket_bounds_hold_the_duration_within_nine_percent(self):
+        for duration_ms in (0.005, 0.3, 1.0, 12.5, 250.0, 4000.0):
+            upper = bucket_upper_ms(bucket_for(duration_ms))
+            self.assertGreaterEqual(upper, duration_ms)
+            self.assertLess(upper, duration_ms * 1.091)
+
+    def test_sub_microsecond_durations_share_bucket_zero(self):
+        self.assertEqual(bucket_for(0), 0)
+        self.assertEqual(bucket_for(0.0005), 0)
+
+    def test_percentiles(self):
+        buckets = {bucket_for(1.0): 90, bucket_for(100.0): 10}
+        self.assertEqual(percentile_ms(buckets, 50), round(bucket_upper_ms(bucket_for(1.0)), 3))
+        self.assertEqual(percentile_ms(buckets, 90), round(bucket_upper_ms(bucket_for(1.0)), 3))
+        self.assertEqual(percentile_ms(buckets, 99), round(bucket_upper_ms(bucket_for(100.0)), 3))
+        self.assertIsNone(percentile_ms({}, 50))
+
+
+class CrossProcessAggregationTests(SimpleTestCase):
+    def setUp(self):
+        # Drop whatever earlier tests left in this process's monitor buffer
+        monitor.histograms.flush()
+        cache_helpers.flush_cache()
+
+    def tearDown(self):
+        cache_helpers.flush_cache()
+
+    def test_snapshot_merges_every_process(self):
+        worker_a, worker_b, dashboard = LatencyHistograms(), LatencyHistograms(), LatencyHistograms()
+        for _ in range(99):
+            worker_a.record('db_read', 2.0)
+        worker_b.record('db_read', 500.0)
+        worker_a.flush()
+        worker_b.flush()
+
+        db_read = dashboard.snapshot()['operations']['db_read']
+        self.assertEqual(db_read['count'], 100)
+        self.assertLess(db_read['p50_ms'], 2.2)
+        self.assertGreater(db_read['max_ms'], 500.0)
+        self.assertAlmostEqual(db_read['mean_ms'], (99 * 2.0 + 500.0) / 100, places=1)
+
+    def test_hit_rate_and_cache_read_row_cover_all_outcomes(self):
+        worker_a, worker_b = LatencyHistograms(), LatencyHistograms()
+        for _ in range(3):
+            worker_a.record('cache_hit', 1.0)
+        worker_b.record('cache_miss', 10.0)
+        worker_a.flush()
+        worker_b.flush()
+
+        snapshot = LatencyHistograms().snapshot()
+        self.assertEqual(snapshot['hit_rate'], 75.0)
+        self.assertEqual(snapshot['operations']['cache_read']['count'], 4)
+
+    @override_settings(METRICS_FLUSH_INTERVAL_SECONDS=3600)
+    def test_records_are_buffered_until_the_flush_interval(self):
+        worker, dashboard = LatencyHistograms(), LatencyHistograms()
+        worker.record('cache_write', 1.0)
+        self.assertEqual(dashboard.snapshot()['operations'], {})
+
+        # Reading from the recording process flushes its own buffer first
+        self.assertEqual(worker.snapshot()['operations']['cache_write']['count'], 1)
+
+    @override_settings(METRICS_FLUSH_INTERVAL_SECONDS=0)
+    def test_monitor_records_operations(self):
+        with patch.object(CacheMonitor, 'enabled', new_callable=PropertyMock, return_value=True):
+            monitor.log_db_read('ABC123', count=10, duration_ms=4.0)
+            monitor.log_cache_read('ABC123', hit=True, count=10, duration_ms=0.5)
+
+        operations = LatencyHistograms().snapshot()['operations']
+        self.assertEqual(operations['db_read']['count'], 1)
+        self.assertEqual(operations['cache_hit']['count'], 1)
+
+    @override_settings(METRICS_FLUSH_INTERVAL_SECONDS=0)
+    def test_disabled_monitor_records_nothing(self):
+        with patch.object(CacheMonitor, 'enabled', new_callable=PropertyMock, return_value=False):
+            with patch.object(monitor.histograms, 'record') as record:
+                monitor.log_db_read('ABC123', count=10, duration_ms=4.0)
+
+        record.assert_not_called()
+        self.assertEqual(LatencyHistograms().snapshot()['operations'], {})
+
+    def test_prometheus_buckets_are_cumulative(self):
+        worker = LatencyHistograms()
+        worker.record('hybrid_query', 0.01)
+        worker.record('hybrid_query', 3.0)
+        worker.record('hybrid_query', 3.0)
+        worker.record('hybrid_query', 90000.0)  # beyond the largest finite bound
+
+        lines = worker.prometheus_text().splitlines()
+        self.assertIn('# TYPE chatpop_operation_duration_seconds histogram', lines)
+        counts = [
+            int(line.rsplit(' ', 1)[1]) for line in lines
+            if line.startswith('chatpop_operation_duration_seconds_bucket{operation="hybrid_query"')
+        ]
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(counts[0], 1)
+        self.assertEqual(counts[-2], 3)
+        self.assertEqual(counts[-1], 4)
+        self.assertIn('chatpop_operation_duration_seconds_count{operation="hybrid_query"} 4', lines)
+        self.assertIn('chatpop_operation_duration_seconds_bucket{operation="hybrid_query",le="+Inf"} 4', lines)
+
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        # Drop whatever earlier tests left in this process's monitor buffer
+        monitor.histograms.flush()
+        cache_helpers.flush_cache()
+        worker = LatencyHistograms()
+        worker.record('db_read', 5.0)
+        worker.flush()
+
+    def tearDown(self):
+        cache_helpers.flush_cache()
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_anonymous_and_wrong_token_are_rejected(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_bearer_token_gets_prometheus_text(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'chatpop_operation_duration_seconds_count{operation="db_read"} 1', response.content)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_staff_session_without_token(self):
+        staff = User.objects.create_user(email='staff@example.com', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_dashboard_api_includes_cluster_latency(self):
+        staff = User.objects.create_user(email='staff@example.com', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        data = self.client.get('/admin/monitor/chat-cache/api/', {'window': 10}).json()
+        self.assertEqual(data['cluster']['window_minutes'], 10)
+        self.assertEqual(data['cluster']['operations']['db_read']['count'], 1)
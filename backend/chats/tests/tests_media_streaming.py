@@ -0,0 +1,239 @@
+"""
+Tests for range streaming of proxied media files.
+
+Tests chatpop.utils.media.streaming (Range parsing, If-Range, ETags,
+sendfile hand-off) through the media proxy endpoint.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from chatpop.utils.media.streaming import (
+    AsyncRangeFileIterator,
+    RangeFileIterator,
+    STREAM_CHUNK_SIZE,
+    content_type_for_path,
+    parse_range_header,
+)
+from ..models import ChatRoom
+from ..utils.security.auth import ChatSessionValidator
+
+
+class ParseRangeHeaderTests(TestCase):
+    """Test parse_range_header()."""
+
+    def test_single_range(self):
+        self.assertEqual(parse_range_header('bytes=0-99', 1000), [(0, 99)])
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_range_header('bytes=900-', 1000), [(900, 999)])
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range_header('bytes=-100', 1000), [(900, 999)])
+        self.assertEqual(parse_range_header('bytes=-5000', 1000), [(0, 999)])
+
+    def test_end_clamped_to_file_size(self):
+        self.assertEqual(parse_range_header('bytes=500-5000', 1000), [(500, 999)])
+
+    def test_multiple_ranges(self):
+        self.assertEqual(
+            parse_range_header('bytes=0-9, 20-29,-5', 100),
+            [(0, 9), (20, 29), (95, 99)]
+        )
+
+    def test_unsatisfiable(self):
+        self.assertEqual(parse_range_header('bytes=1000-', 1000), [])
+
+    def test_malformed_ignored(self):
+        self.assertIsNone(parse_range_header('bytes=abc', 1000))
+        self.assertIsNone(parse_range_header('items=0-1', 1000))
+        self.assertIsNone(parse_range_header('bytes=9-1', 1000))
+
+    def test_too_many_ranges_ignored(self):
+        header = 'bytes=' + ','.join(f'{i}-{i}' for i in range(50))
+
+        self.assertIsNone(parse_range_header(header, 1000))
+
+    def test_content_types(self):
+        self.assertEqual(content_type_for_path('voice_messages/a.m4a'), 'audio/mp4')
+        self.assertEqual(content_type_for_path('voice_messages/a.webm'), 'audio/webm')
+        self.assertEqual(content_type_for_path('videos/a.webm'), 'video/webm')
+        self.assertEqual(content_type_for_path('photos/a.JPG'), 'image/jpeg')
+
+
+class RangeFileIteratorTests(TestCase):
+    """Test that only the requested bytes are read, in bounded chunks."""
+
+    class CountingFile:
+        def __init__(self, data):
+            self.data = data
+            self.position = 0
+            self.reads = []
+            self.closed = False
+
+        def seek(self, offset, whence=0):
+            self.position = offset
+
+        def read(self, size):
+            self.reads.append(size)
+            chunk = self.data[self.position:self.position + size]
+            self.position += len(chunk)
+            return chunk
+
+        def close(self):
+            self.closed = True
+
+    def test_reads_only_requested_range(self):
+        data = bytes(range(256)) * 2048  # 512 KB
+        file_obj = self.CountingFile(data)
+        start, end = 100_000, 100_000 + 3 * STREAM_CHUNK_SIZE
+
+        body = b''.join(RangeFileIterator(file_obj, [(start, end)]))
+
+        self.assertEqual(body, data[start:end + 1])
+        self.assertEqual(sum(file_obj.reads), end - start + 1)
+        self.assertLessEqual(max(file_obj.reads), STREAM_CHUNK_SIZE)
+
+    def test_async_iterator_matches_sync(self):
+        data = os.urandom(200_000)
+        ranges = [(0, 10), (150_000, 199_999)]
+
+        async def collect():
+            return b''.join([chunk async for chunk in AsyncRangeFileIterator(self.CountingFile(data), ranges)])
+
+        self.assertEqual(
+            asyncio.run(collect()),
+            b''.join(RangeFileIterator(self.CountingFile(data), ranges))
+        )
+
+    def test_close_closes_file(self):
+        file_obj = self.CountingFile(b'abc')
+
+        RangeFileIterator(file_obj, [(0, 2)]).close()
+
+        self.assertTrue(file_obj.closed)
+
+
+class MediaStreamViewTests(TestCase):
+    """Test Range/ETag handling on the media proxy endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            AWS_STORAGE_BUCKET_NAME='',
+            MEDIA_SENDFILE_MODE='',
+        )
+        self.settings_override.enable()
+
+        self.data = os.urandom(100_000)
+        os.makedirs(os.path.join(self.media_root, 'voice_messages'))
+        with open(os.path.join(self.media_root, 'voice_messages', 'clip.m4a'), 'wb') as f:
+            f.write(self.data)
+
+        host = User.objects.create_user(
+            email='host@test.com',
+            password='testpass123',
+            reserved_username='streamhost'
+        )
+        chat = ChatRoom.objects.create(name='Stream Chat', host=host, voice_enabled=True)
+        session_token = ChatSessionValidator.create_session_token(
+            chat_code=chat.code,
+            username='listener'
+        )
+        self.url = reverse('chats:media-stream', kwargs={'storage_path': 'voice_messages/clip.m4a'})
+        self.url += f'?session_token={session_token}'
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'audio/mp4')
+        self.assertEqual(response['Content-Length'], str(len(self.data)))
+        self.assertIn('ETag', response)
+        self.assertEqual(self._body(response), self.data)
+
+    def test_single_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-1999')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1999/{len(self.data)}')
+        self.assertEqual(self._body(response), self.data[1000:2000])
+
+    def test_suffix_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self._body(response), self.data[-10:])
+
+    def test_multi_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-3,50000-50003')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges; boundary='))
+        body = self._body(response)
+        self.assertEqual(response['Content-Length'], str(len(body)))
+        self.assertIn(f'Content-Range: bytes 0-3/{len(self.data)}'.encode(), body)
+        self.assertIn(self.data[50000:50004], body)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_if_range_matching_etag_serves_range(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+
+        self.assertEqual(response.status_code, 206)
+
+    def test_if_range_stale_etag_serves_full_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), self.data)
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_file_404(self):
+        url = self.url.replace('clip.m4a', 'missing.m4a')
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE_MODE='x-accel-redirect', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_accel_redirect_mode(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/voice_messages/clip.m4a')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SENDFILE_MODE='x-sendfile')
+    def test_xsendfile_mode(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(self.media_root, 'voice_messages', 'clip.m4a')
+        )
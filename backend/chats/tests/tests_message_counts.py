@@ -0,0 +1,237 @@
+"""
+Tests for maintained room message counts.
+
+Tests chats.utils.performance.message_counts (buffered deltas, flushing,
+Redis fallback, reconciliation), the Message post_save signal and delete
+views that feed it, and ChatRoomSerializer.message_count reading the stored
+count instead of running a COUNT per room.
+"""
+import uuid
+from importlib import import_module
+from io import StringIO
+from unittest.mock import patch
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from chats.models import ChatParticipation, ChatRoom, ChatRoomMessageCount, Message
+from chats.serializers import ChatRoomSerializer
+from chats.tests import cache_helpers
+from chats.utils.performance import message_counts
+from chats.utils.performance.message_counts import (
+    flush_message_counts,
+    message_counts_for_rooms,
+    reconcile_message_counts,
+)
+from chats.utils.performance.room_cache import RoomCache
+from chats.utils.security.auth import ChatSessionValidator
+
+
+def _message_queries(captured):
+    """Queries on the message table among captured queries."""
+    return [q for q in captured.captured_queries if '"chats_message"' in q['sql']]
+
+
+class MessageCountTestCase(TestCase):
+    def setUp(self):
+        cache_helpers.flush_cache()
+        RoomCache.clear_local()
+        self.host = User.objects.create_user(email='host@test.com', password='x', reserved_username='HostUser')
+        self.room = ChatRoom.objects.create(name='Room', code='count-room', host=self.host)
+
+    def tearDown(self):
+        RoomCache.clear_local()
+        cache_helpers.flush_cache()
+
+    def _send(self, count=1, room=None):
+        messages = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                messages.append(Message.objects.create(
+                    chat_room=room or self.room, username='HostUser', content=f'message {i}'
+                ))
+        return messages
+
+    def _stored(self, room=None):
+        row = ChatRoomMessageCount.objects.filter(chat_room=room or self.room).first()
+        return row.count if row else 0
+
+    def _count(self):
+        """What a request would report: fresh row plus pending delta."""
+        return message_counts_for_rooms([ChatRoom.objects.get(pk=self.room.pk)])[str(self.room.id)]
+
+
+class RecordTests(MessageCountTestCase):
+    """Test buffering and flushing of deltas."""
+
+    def test_first_write_flushes_then_buffers(self):
+        self._send(3)
+
+        # The first write took the flush lock; the rest wait for the next flush
+        self.assertEqual(self._stored(), 1)
+        self.assertEqual(self._count(), 3)
+
+        flush_message_counts()
+        self.assertEqual(self._stored(), 3)
+        self.assertEqual(self._count(), 3)
+
+    def test_rolled_back_message_not_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Message.objects.create(chat_room=self.room, username='HostUser', content='ghost')
+                    raise RuntimeError('rollback')
+            except RuntimeError:
+                pass
+
+        self.assertEqual(self._count(), 0)
+
+    def test_redis_unavailable_updates_stored_count(self):
+        with patch.object(message_counts, '_get_redis_client', side_effect=ConnectionError('redis down')):
+            self._send(2)
+            self.assertEqual(self._count(), 2)
+
+        self.assertEqual(self._stored(), 2)
+
+    def test_failed_flush_keeps_deltas(self):
+        self._send(3)
+
+        with patch.object(message_counts, '_apply_deltas', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                flush_message_counts()
+
+        self.assertEqual(self._count(), 3)
+        flush_message_counts()
+        self.assertEqual(self._stored(), 3)
+
+    def test_full_save_does_not_overwrite_count(self):
+        stale = ChatRoom.objects.get(pk=self.room.pk)
+        self._send(2)
+        flush_message_counts()
+
+        stale.name = 'Renamed'
+        stale.save()
+
+        self.assertEqual(self._stored(), 2)
+        self.assertEqual(ChatRoom.objects.get(pk=self.room.pk).name, 'Renamed')
+
+    def test_deleted_room_delta_skipped(self):
+        self._send(2)
+        self.room.delete()
+
+        flush_message_counts()
+
+        self.assertFalse(ChatRoomMessageCount.objects.exists())
+
+    def test_force_insert_of_loaded_instance(self):
+        copy = ChatRoom.objects.get(pk=self.room.pk)
+        copy.pk = uuid.uuid4()
+        copy.code = 'copied-room'
+
+        copy.save(force_insert=True)
+
+        self.assertEqual(ChatRoom.objects.filter(host=self.host).count(), 2)
+
+
+class SoftDeleteTests(MessageCountTestCase):
+    """Test the delete view decrements exactly once."""
+
+    def setUp(self):
+        super().setUp()
+        ChatParticipation.objects.create(chat_room=self.room, user=self.host, username='HostUser')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.host)
+        self.session_token = ChatSessionValidator.create_session_token(
+            chat_code=self.room.code, username='HostUser', user_id=str(self.host.id)
+        )
+
+    def test_delete_twice_decrements_once(self):
+        message, _ = self._send(2)
+        url = f'/api/chats/HostUser/{self.room.code}/messages/{message.id}/delete/'
+
+        self.client.post(url, {'session_token': self.session_token}, format='json')
+        response = self.client.post(url, {'session_token': self.session_token}, format='json')
+
+        self.assertTrue(response.data['already_deleted'])
+        self.assertEqual(self._count(), 1)
+
+
+class SerializerTests(MessageCountTestCase):
+    """Test ChatRoomSerializer.message_count."""
+
+    def test_list_without_message_queries(self):
+        for i in range(5):
+            room = ChatRoom.objects.create(name=f'Room {i}', code=f'room-{i}', host=self.host)
+            self._send(i, room=room)
+
+        rooms = ChatRoom.objects.filter(host=self.host).select_related('host', 'theme')
+        with CaptureQueriesContext(connection) as captured:
+            data = ChatRoomSerializer(rooms, many=True).data
+
+        self.assertEqual(_message_queries(captured), [])
+        self.assertEqual(
+            {item['code']: item['message_count'] for item in data},
+            {'count-room': 0, **{f'room-{i}': i for i in range(5)}},
+        )
+
+    def test_soft_deleted_excluded(self):
+        first, _ = self._send(2)
+        Message.objects.filter(pk=first.pk).update(is_deleted=True)
+        message_counts.record_message_count(self.room.id, -1)
+
+        self.assertEqual(ChatRoomSerializer(ChatRoom.objects.get(pk=self.room.pk)).data['message_count'], 1)
+
+    def test_room_cache_model(self):
+        self._send(2)
+        chat_room = RoomCache.resolve('count-room', 'HostUser').to_model()
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(ChatRoomSerializer(chat_room).data['message_count'], 2)
+
+        self.assertEqual(_message_queries(captured), [])
+
+
+class ReconcileTests(MessageCountTestCase):
+    """Test reconcile_message_counts() and manage.py reconcile_message_counts."""
+
+    def setUp(self):
+        super().setUp()
+        # bulk_create sends no post_save, so the stored count drifts
+        Message.objects.bulk_create([
+            Message(chat_room=self.room, username='HostUser', content=f'bulk {i}') for i in range(4)
+        ] + [Message(chat_room=self.room, username='HostUser', content='gone', is_deleted=True)])
+        self.other = ChatRoom.objects.create(name='Other', code='other-room', host=self.host)
+        self._send(1, room=self.other)
+
+    def test_repairs_drift(self):
+        drifted = reconcile_message_counts()
+
+        self.assertEqual(drifted, {str(self.room.id): (0, 4)})
+        self.assertEqual(self._stored(), 4)
+        self.assertEqual(self._stored(self.other), 1)
+
+    def test_migration_backfill(self):
+        backfill = import_module('chats.migrations.0023_chatroommessagecount').backfill_message_counts
+
+        backfill(apps, None)
+
+        self.assertEqual(self._stored(), 4)
+        self.assertEqual(self._stored(self.other), 1)
+
+    def test_dry_run(self):
+        drifted = reconcile_message_counts(dry_run=True)
+
+        self.assertEqual(drifted, {str(self.room.id): (0, 4)})
+        self.assertEqual(self._stored(), 0)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('reconcile_message_counts', '--chat', 'count-room', stdout=out)
+
+        self.assertIn('Repaired 1 drifted chats', out.getvalue())
+        self.assertEqual(self._stored(), 4)
@@ -0,0 +1,203 @@
+"""
+Tests for location-based chat discovery (NearbyDiscoverableChatsView).
+
+Coverage:
+- Two-way radius check (user radius AND chat's discovery radius).
+- Host-joined requirement and inactive/unlocated rooms excluded.
+- Distance ordering, rounding, and database-side pagination.
+- Bounding-box helper near the poles and the antimeridian.
+- Benchmark at 100k synthetic rooms (tagged `slow`):
+
+    ./venv/bin/python -m pytest chats/tests/tests_nearby_discovery.py -m slow
+"""
+
+import random
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, tag
+from rest_framework.test import APIClient
+
+from chats.models import ChatParticipation, ChatRoom
+from chats.tests import factories
+from chats.utils.geo import bounding_box_filter
+
+# Times Square, NYC
+ORIGIN_LAT = 40.758000
+ORIGIN_LON = -73.985500
+# ~1 mile of latitude
+ONE_MILE_LAT = 1 / 69.09
+
+
+def _make_located_room(host, lat_offset_miles, discovery_radius=5, join_host=True, **kwargs):
+    room = ChatRoom.objects.create(
+        code=f'geo-{uuid.uuid4().hex[:8]}',
+        name=kwargs.pop('name', 'Nearby Chat'),
+        host=host,
+        latitude=Decimal(f'{ORIGIN_LAT + lat_offset_miles * ONE_MILE_LAT:.6f}'),
+        longitude=Decimal(f'{ORIGIN_LON:.6f}'),
+        discovery_radius_miles=discovery_radius,
+        **kwargs,
+    )
+    if join_host:
+        factories.make_participation(room, host.reserved_username, user=host)
+    return room
+
+
+class NearbyDiscoveryTests(TestCase):
+    """Filtering, ordering and pagination of nearby discoverable chats."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.host = factories.make_user()
+
+    def tearDown(self):
+        cache.clear()
+
+    def _search(self, radius=5, offset=0, limit=20):
+        response = self.client.post('/api/chats/nearby/', {
+            'latitude': ORIGIN_LAT,
+            'longitude': ORIGIN_LON,
+            'radius': radius,
+            'offset': offset,
+            'limit': limit,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_results_sorted_by_distance(self):
+        far = _make_located_room(self.host, 3, name='Far')
+        near = _make_located_room(self.host, 0.5, name='Near')
+        mid = _make_located_room(self.host, -2, name='Mid')
+
+        data = self._search(radius=5)
+
+        self.assertEqual([c['code'] for c in data['chats']], [near.code, mid.code, far.code])
+        self.assertEqual(data['chats'][0]['distance_miles'], 0.5)
+        self.assertEqual(data['total_count'], 3)
+
+    def test_user_radius_excludes_distant_rooms(self):
+        _make_located_room(self.host, 0.5)
+        _make_located_room(self.host, 3)
+
+        data = self._search(radius=1)
+
+        self.assertEqual(data['total_count'], 1)
+
+    def test_chat_discovery_radius_excludes_user(self):
+        # Chat is 3 miles away but only wants to be found within 1 mile
+        _make_located_room(self.host, 3, discovery_radius=1)
+
+        data = self._search(radius=5)
+
+        self.assertEqual(data['total_count'], 0)
+
+    def test_host_not_joined_excluded(self):
+        _make_located_room(self.host, 0.5, join_host=False)
+
+        data = self._search(radius=5)
+
+        self.assertEqual(data['total_count'], 0)
+
+    def test_inactive_room_excluded(self):
+        _make_located_room(self.host, 0.5, is_active=False)
+
+        data = self._search(radius=5)
+
+        self.assertEqual(data['total_count'], 0)
+
+    def test_pagination(self):
+        rooms = [_make_located_room(self.host, 0.1 * (i + 1)) for i in range(5)]
+
+        page1 = self._search(radius=5, offset=0, limit=2)
+        page3 = self._search(radius=5, offset=4, limit=2)
+
+        self.assertEqual([c['code'] for c in page1['chats']], [rooms[0].code, rooms[1].code])
+        self.assertTrue(page1['has_more'])
+        self.assertEqual([c['code'] for c in page3['chats']], [rooms[4].code])
+        self.assertFalse(page3['has_more'])
+        self.assertEqual(page3['total_count'], 5)
+
+
+class BoundingBoxTests(TestCase):
+    """Bounding-box helper edge cases."""
+
+    def test_box_contains_radius(self):
+        box = bounding_box_filter(ORIGIN_LAT, ORIGIN_LON, 5)
+
+        self.assertLess(box['latitude__gte'], Decimal(str(ORIGIN_LAT - 5 * ONE_MILE_LAT)) + Decimal('0.0001'))
+        self.assertGreater(box['latitude__lte'], Decimal(str(ORIGIN_LAT + 5 * ONE_MILE_LAT)) - Decimal('0.0001'))
+        self.assertIn('longitude__gte', box)
+
+    def test_no_longitude_bound_near_pole(self):
+        box = bounding_box_filter(89.99, 0, 5)
+
+        self.assertNotIn('longitude__gte', box)
+
+    def test_no_longitude_bound_across_antimeridian(self):
+        box = bounding_box_filter(0, 179.99, 5)
+
+        self.assertNotIn('longitude__lte', box)
+
+
+@tag('slow')
+class NearbyDiscoveryBenchmarkTest(TransactionTestCase):
+    """Request latency with 100k located rooms spread across the US."""
+
+    ROOM_COUNT = 100_000
+    REQUESTS = 20
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        host = factories.make_user()
+
+        rng = random.Random(42)
+        rooms = [
+            ChatRoom(
+                id=uuid.uuid4(),
+                code=f'bench-{i}',
+                name=f'Bench {i}',
+                host=host,
+                latitude=Decimal(f'{rng.uniform(25.0, 49.0):.6f}'),
+                longitude=Decimal(f'{rng.uniform(-124.0, -67.0):.6f}'),
+                discovery_radius_miles=rng.choice([1, 5, 10, 25, 50]),
+            )
+            for i in range(self.ROOM_COUNT)
+        ]
+        ChatRoom.objects.bulk_create(rooms, batch_size=5000)
+        ChatParticipation.objects.bulk_create(
+            [
+                ChatParticipation(chat_room=room, user=host, username=host.reserved_username)
+                for room in rooms
+            ],
+            batch_size=5000,
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_nearby_latency_at_100k_rooms(self):
+        timings = []
+        for _ in range(self.REQUESTS):
+            start = time.perf_counter()
+            response = self.client.post('/api/chats/nearby/', {
+                'latitude': ORIGIN_LAT,
+                'longitude': ORIGIN_LON,
+                'radius': 50,
+                'limit': 20,
+            }, format='json')
+            timings.append((time.perf_counter() - start) * 1000)
+            self.assertEqual(response.status_code, 200)
+
+        p50 = statistics.median(timings)
+        print(
+            f'\n[nearby benchmark] rooms={self.ROOM_COUNT} '
+            f'matches={response.data["total_count"]} '
+            f'p50={p50:.1f}ms max={max(timings):.1f}ms'
+        )
+        self.assertLess(p50, 250)
@@ -0,0 +1,256 @@
+"""
+Tests for photo message uploads and bounded-memory image resizing.
+
+Tests chatpop.utils.media.image (draft decode, reduce + LANCZOS, pixel
+ceiling) and PhotoUploadView.
+
+Per-upload CPU / peak RSS benchmark against the previous full-decode path
+(tagged `slow`):
+
+    ./venv/bin/python -m pytest chats/tests/tests_photo_upload.py -m slow
+"""
+import io
+import os
+import random
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings, tag
+from django.urls import reverse
+from PIL import Image, ImageOps
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from chatpop.utils.media.image import (
+    EXIF_ORIENTATION_TAG,
+    ImageTooLarge,
+    fit_size,
+    load_resized,
+    open_image,
+    track_resource_usage,
+)
+from ..models import ChatRoom
+from ..utils.security.auth import ChatSessionValidator
+
+
+def _make_image_bytes(width, height, format='JPEG', mode='RGB', orientation=None, seed=0):
+    """Build a noisy image so JPEG decode cost is realistic."""
+    rng = random.Random(seed)
+    small = Image.new(mode, (32, 24))
+    small.putdata([
+        tuple(rng.randrange(256) for _ in range(len(mode)))
+        for _ in range(32 * 24)
+    ])
+    img = small.resize((width, height), Image.BILINEAR)
+
+    output = io.BytesIO()
+    save_kwargs = {'quality': 90} if format == 'JPEG' else {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION_TAG] = orientation
+        save_kwargs['exif'] = exif.tobytes()
+    img.save(output, format=format, **save_kwargs)
+    return output.getvalue()
+
+
+def _legacy_resize(data, max_dimension):
+    """PhotoUploadView before bounded resizing: full decode, then LANCZOS."""
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+        img = background
+    width, height = img.size
+    if width > max_dimension or height > max_dimension:
+        if width > height:
+            size = (max_dimension, int(height * (max_dimension / width)))
+        else:
+            size = (int(width * (max_dimension / height)), max_dimension)
+        img = img.resize(size, Image.Resampling.LANCZOS)
+    return img
+
+
+class BoundedResizeTests(TestCase):
+    """Test load_resized() and its helpers."""
+
+    def test_fit_size_max_dimension(self):
+        self.assertEqual(fit_size((4032, 3024), max_dimension=1920), (1920, 1440))
+        self.assertEqual(fit_size((3024, 4032), max_dimension=1920), (1440, 1920))
+        self.assertEqual(fit_size((800, 600), max_dimension=1920), (800, 600))
+
+    def test_fit_size_both_limits(self):
+        width, height = fit_size((4000, 3000), max_dimension=1920, max_megapixels=1.0)
+
+        self.assertLessEqual(width * height, 1_000_000)
+        self.assertLessEqual(max(width, height), 1920)
+
+    def test_large_jpeg_decoded_at_reduced_scale(self):
+        data = _make_image_bytes(4000, 3000)
+        img = open_image(data)
+
+        img.draft('RGB', fit_size(img.size, max_dimension=480))
+
+        # libjpeg DCT scaling: 1/8 is the largest factor that still covers 480px
+        self.assertEqual(img.size, (500, 375))
+
+    def test_jpeg_resized_to_exact_target(self):
+        img = load_resized(_make_image_bytes(4000, 3000), max_dimension=1920)
+
+        self.assertEqual(img.size, (1920, 1440))
+        self.assertEqual(img.mode, 'RGB')
+
+    def test_matches_full_decode_visually(self):
+        data = _make_image_bytes(4000, 3000)
+
+        bounded = load_resized(data, max_dimension=800)
+        legacy = _legacy_resize(data, 800)
+
+        diff = [abs(a - b) for a, b in zip(bounded.convert('L').getdata(), legacy.convert('L').getdata())]
+        self.assertLess(sum(diff) / len(diff), 3)
+
+    def test_exif_orientation_applied(self):
+        img = load_resized(_make_image_bytes(4000, 3000, orientation=6), max_dimension=1920)
+
+        self.assertEqual(img.size, (1440, 1920))
+
+    def test_png_transparency_flattened(self):
+        img = load_resized(_make_image_bytes(2400, 1200, format='PNG', mode='RGBA'), max_dimension=1200)
+
+        self.assertEqual(img.mode, 'RGB')
+        self.assertEqual(img.size, (1200, 600))
+
+    def test_small_image_not_upscaled(self):
+        img = load_resized(_make_image_bytes(640, 480), max_dimension=1920)
+
+        self.assertEqual(img.size, (640, 480))
+
+    def test_pixel_ceiling_checked_before_decode(self):
+        data = _make_image_bytes(1000, 1000)
+
+        with self.assertRaises(ImageTooLarge):
+            load_resized(data, max_dimension=100, max_pixels=500_000)
+
+    def test_track_resource_usage(self):
+        with track_resource_usage() as usage:
+            load_resized(_make_image_bytes(1200, 900), max_dimension=600)
+
+        self.assertGreater(usage.cpu_ms, 0)
+        self.assertGreater(usage.peak_rss_mb, 0)
+        self.assertGreaterEqual(usage.peak_rss_growth_mb, 0)
+
+
+class PhotoUploadViewTests(TestCase):
+    """Test PhotoUploadView resizing and limits."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            AWS_ACCESS_KEY_ID='',
+            AWS_SECRET_ACCESS_KEY='',
+            AWS_STORAGE_BUCKET_NAME='',
+        )
+        self.settings_override.enable()
+
+        self.host = User.objects.create_user(
+            email='host@test.com',
+            password='testpass123',
+            reserved_username='photohost'
+        )
+        self.chat = ChatRoom.objects.create(name='Photo Chat', host=self.host, photo_enabled=True)
+        self.session_token = ChatSessionValidator.create_session_token(
+            chat_code=self.chat.code,
+            username='photouser'
+        )
+        self.url = reverse('chats:photo-upload', kwargs={'username': 'photohost', 'code': self.chat.code})
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _upload(self, data, content_type='image/jpeg'):
+        return self.client.post(self.url, {
+            'photo': SimpleUploadedFile('photo.jpg', data, content_type=content_type),
+            'session_token': self.session_token,
+        }, format='multipart')
+
+    def test_large_photo_resized_and_rotated(self):
+        response = self._upload(_make_image_bytes(4000, 3000, orientation=6))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['width'], response.data['height']), (1440, 1920))
+
+    @patch('chatpop.utils.media.image.MAX_IMAGE_PIXELS', 1_000_000)
+    def test_photo_over_pixel_ceiling_rejected(self):
+        response = self._upload(_make_image_bytes(1200, 1000))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('too large', response.data['error'])
+
+
+def _peak_rss_mb_in_child(fn, *args):
+    """
+    Run fn(*args) in a forked child and return (cpu_ms, peak RSS growth MB).
+
+    A fresh process gives a true per-upload high-water mark; the child's
+    RSS at fork time is subtracted.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        with open('/proc/self/statm') as statm:
+            start_rss_mb = int(statm.read().split()[1]) * resource.getpagesize() / 2**20
+        start_cpu = time.process_time()
+        fn(*args)
+        cpu_ms = (time.process_time() - start_cpu) * 1000
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        os.write(write_fd, struct.pack('dd', cpu_ms, peak_mb - start_rss_mb))
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as pipe:
+        payload = pipe.read()
+    os.waitpid(pid, 0)
+    return struct.unpack('dd', payload)
+
+
+@tag('slow')
+class BoundedResizeBenchmark(TestCase):
+    """Per-upload CPU time and peak RSS: full decode vs bounded resize."""
+
+    FIXTURES = [
+        # (label, width, height, format, mode)
+        ('12MP JPEG', 4032, 3024, 'JPEG', 'RGB'),
+        ('48MP JPEG', 8064, 6048, 'JPEG', 'RGB'),
+        ('4MP PNG RGBA', 2000, 2000, 'PNG', 'RGBA'),
+    ]
+
+    def test_bounded_resize_is_cheaper(self):
+        if not sys.platform.startswith('linux'):
+            self.skipTest('Benchmark reads /proc and Linux ru_maxrss units')
+
+        max_dimension = 1920
+        print('\n[photo resize benchmark] max_dimension=1920')
+        for i, (label, width, height, format, mode) in enumerate(self.FIXTURES):
+            data = _make_image_bytes(width, height, format=format, mode=mode, seed=i)
+            legacy_cpu, legacy_rss = _peak_rss_mb_in_child(_legacy_resize, data, max_dimension)
+            bounded_cpu, bounded_rss = _peak_rss_mb_in_child(
+                lambda d: load_resized(d, max_dimension=max_dimension), data
+            )
+            print(
+                f'  {label:<14} legacy={legacy_cpu:.0f}ms/+{legacy_rss:.0f}MB '
+                f'bounded={bounded_cpu:.0f}ms/+{bounded_rss:.0f}MB'
+            )
+            if format == 'JPEG':
+                self.assertLess(bounded_cpu, legacy_cpu)
+                self.assertLess(bounded_rss, legacy_rss)
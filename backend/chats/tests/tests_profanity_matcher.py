@@ -0,0 +1,156 @@
+"""
+Tests for the compiled banned-word matcher.
+
+Tests chats.utils.username.matcher.AhoCorasick and that
+UsernameValidator's automaton-based find_banned_words() and precompiled
+normalization tables give exactly the results of the previous
+nested-loop implementation.
+
+Benchmark over words.py adjective + noun + number combinations (tagged
+`slow`):
+
+    ./venv/bin/python -m pytest chats/tests/tests_profanity_matcher.py -m slow
+"""
+import random
+import re
+import string
+import time
+
+from django.test import SimpleTestCase, tag
+
+from chats.utils.username import profanity
+from chats.utils.username.matcher import AhoCorasick
+from chats.utils.username.words import ADJECTIVES, NOUNS
+
+
+def _legacy_normalize(validator, text):
+    """UsernameValidator.normalize_text() before precompiled tables."""
+    if not text:
+        return ""
+    text = text.lower().replace("_", "")
+    multi_char_leet = {k: v for k, v in validator.LEET_MAP.items() if len(k) > 1}
+    for leet_char, normal_char in sorted(multi_char_leet.items(), key=lambda x: len(x[0]), reverse=True):
+        text = text.replace(leet_char, normal_char)
+    single_char_leet = {k: v for k, v in validator.LEET_MAP.items() if len(k) == 1}
+    for leet_char, normal_char in single_char_leet.items():
+        text = text.replace(leet_char, normal_char)
+    return re.sub(r"(.)\1{2,}", r"\1\1", text)
+
+
+def _legacy_find_banned_words(validator, text):
+    """UsernameValidator.find_banned_words() before the automaton."""
+    found_banned = set()
+    normalized_text = _legacy_normalize(validator, text).lower()
+    if normalized_text in validator.allowlist_tokens:
+        return set()
+    if normalized_text in validator.normalized_banned:
+        found_banned.add(normalized_text)
+        return found_banned
+    for banned_word in validator.normalized_banned:
+        if len(banned_word) >= 3 and banned_word in normalized_text:
+            is_protected = False
+            for normalized_allowed in validator.normalized_allowlist.keys():
+                if banned_word in normalized_allowed and normalized_allowed in normalized_text:
+                    is_protected = True
+                    break
+            if not is_protected:
+                found_banned.add(banned_word)
+    return found_banned
+
+
+def _sample_usernames(count, seed=0):
+    """Generator-style names plus leet-speak and known-profane inputs."""
+    rng = random.Random(seed)
+    names = [
+        f"{rng.choice(ADJECTIVES)}{rng.choice(NOUNS)}{rng.randint(1, 99999)}"
+        for _ in range(count)
+    ]
+    names += [
+        "password123", "class1cal", "assess_me", "titan_99", "4ss_h0le", "p0rn_star",
+        "c0ck_99", "fuk_u", "d1ckh3ad", "5h1t_face", "pu55y_cat", "4ss3ssm3nt",
+        "good_c1ass", "my_p4ss", "phuckz", "sexxxy", "Sussex_Fan", "cocoa_nut",
+    ]
+    return names
+
+
+class AhoCorasickTests(SimpleTestCase):
+    """Test the automaton against naive substring search."""
+
+    def test_overlapping_and_nested_patterns(self):
+        matcher = AhoCorasick(["he", "she", "his", "hers"])
+
+        self.assertEqual(matcher.find("ushers"), {"he", "she", "hers"})
+        self.assertEqual(matcher.find("ahishers"), {"he", "she", "his", "hers"})
+        self.assertEqual(matcher.find("xyz"), set())
+
+    def test_matches_naive_search(self):
+        rng = random.Random(1)
+        patterns = {"".join(rng.choice("abc") for _ in range(rng.randint(1, 5))) for _ in range(40)}
+        matcher = AhoCorasick(patterns)
+
+        for _ in range(300):
+            text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 20)))
+            self.assertEqual(matcher.find(text), {p for p in patterns if p in text}, text)
+
+    def test_empty_pattern_ignored(self):
+        self.assertEqual(AhoCorasick(["", "ab"]).find("ab"), {"ab"})
+
+
+class CompiledValidatorEquivalenceTests(SimpleTestCase):
+    """Test that compiled matching is identical to the nested loops."""
+
+    def setUp(self):
+        self.validator = profanity._validator
+
+    def test_normalize_matches_sequential_replace(self):
+        rng = random.Random(2)
+        alphabet = string.ascii_letters + string.digits + "_"
+        for _ in range(2000):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 15)))
+            self.assertEqual(
+                self.validator.normalize_text(text),
+                _legacy_normalize(self.validator, text),
+                text
+            )
+
+    def test_chained_single_char_leet(self):
+        # "2" -> "z" -> "s", as with in-order str.replace
+        self.assertEqual(self.validator.normalize_text("a2b"), "asb")
+
+    def test_find_banned_words_matches_legacy(self):
+        for username in _sample_usernames(300):
+            self.assertEqual(
+                self.validator.find_banned_words(username),
+                _legacy_find_banned_words(self.validator, username),
+                username
+            )
+
+
+@tag('slow')
+class BannedWordMatcherBenchmark(SimpleTestCase):
+    """find_banned_words(): nested loops vs Aho-Corasick."""
+
+    def test_compiled_matcher_is_faster(self):
+        validator = profanity._validator
+        usernames = _sample_usernames(2000, seed=3)
+
+        start = time.perf_counter()
+        legacy = [_legacy_find_banned_words(validator, u) for u in usernames]
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        compiled = [validator.find_banned_words(u) for u in usernames]
+        compiled_ms = (time.perf_counter() - start) * 1000
+
+        print(
+            f'\n[banned-word matcher benchmark] {len(usernames)} usernames, '
+            f'{len(validator.normalized_banned)} banned, {len(validator.normalized_allowlist)} allowlisted'
+        )
+        print(f'  legacy   {legacy_ms:8.1f}ms ({legacy_ms * 1000 / len(usernames):6.1f}µs/username)')
+        print(f'  compiled {compiled_ms:8.1f}ms ({compiled_ms * 1000 / len(usernames):6.1f}µs/username)')
+
+        self.assertEqual(compiled, legacy)
+        self.assertLess(compiled_ms, legacy_ms)
+        # Two automaton passes per username: well under a millisecond each,
+        # whatever the size of the banned list
+        self.assertLess(compiled_ms / len(usernames), 1.0)
@@ -0,0 +1,311 @@
+"""
+Tests for the two-tier room cache.
+
+Tests chats.utils.performance.room_cache.RoomCache (local LRU, Redis
+snapshots, compare-and-set fills), RoomRecord.to_model(), invalidation via
+chats/signals.py, get_chat_room_by_url(), and the host settings update
+saving the DB row rather than the snapshot.
+
+Benchmark for 2,000 lookups against the previous query per lookup (tagged
+`slow`):
+
+    ./venv/bin/python -m pytest chats/tests/tests_room_cache.py -m slow
+"""
+import time
+from unittest.mock import patch
+
+from django.db import connection
+from django.http import Http404
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from chats.models import ChatRoom, ChatTheme
+from chats.tests import cache_helpers
+from chats.utils.performance import room_cache
+from chats.utils.performance.room_cache import RoomCache, RoomRecord
+from chats.views import get_chat_room_by_url
+
+
+def _room_queries(captured):
+    """Room / host / theme lookups among captured queries (ignores e.g. constance reads)."""
+    return [
+        q for q in captured.captured_queries
+        if '"chats_chatroom"' in q['sql'] or '"accounts_user"' in q['sql']
+    ]
+
+
+class RoomCacheTestCase(TestCase):
+    def setUp(self):
+        cache_helpers.flush_cache()
+        RoomCache.clear_local()
+        self.theme = ChatTheme.objects.create(theme_id='test-theme', name='Test Theme')
+        self.host = User.objects.create_user(email='host@test.com', password='x', reserved_username='HostUser')
+        self.room = ChatRoom.objects.create(
+            name='Room', code='hot-room', host=self.host, theme=self.theme, voice_enabled=True
+        )
+
+    def tearDown(self):
+        RoomCache.clear_local()
+        cache_helpers.flush_cache()
+
+
+class ResolveTests(RoomCacheTestCase):
+    """Test lookups through each tier."""
+
+    def test_record_fields(self):
+        record = RoomCache.resolve('hot-room', 'hostuser')
+
+        self.assertEqual(record.id, str(self.room.id))
+        self.assertEqual(record.host_id, str(self.host.id))
+        self.assertEqual(record.host_username, 'HostUser')
+        self.assertEqual(record.theme_id, 'test-theme')
+        self.assertTrue(record.voice_enabled)
+        self.assertTrue(record.is_public)
+        with self.assertRaises(AttributeError):
+            record.voice_enabled = False
+
+    def test_local_then_redis_then_db(self):
+        with CaptureQueriesContext(connection) as cold:
+            RoomCache.resolve('hot-room', 'HostUser')
+        with CaptureQueriesContext(connection) as local:
+            RoomCache.resolve('hot-room', 'HostUser')
+        RoomCache.clear_local()
+        with CaptureQueriesContext(connection) as redis:
+            record = RoomCache.resolve('hot-room', 'HostUser')
+
+        self.assertEqual(len(_room_queries(cold)), 1)
+        self.assertEqual(_room_queries(local), [])
+        self.assertEqual(_room_queries(redis), [])
+        self.assertEqual(record.id, str(self.room.id))
+
+    def test_not_found(self):
+        self.assertIsNone(RoomCache.resolve('hot-room', 'someoneelse'))
+        self.assertIsNone(RoomCache.resolve('missing', 'HostUser'))
+        with self.assertRaises(ChatRoom.DoesNotExist):
+            RoomCache.resolve_by_code('missing')
+
+    def test_inactive_room_not_resolved(self):
+        self.room.is_active = False
+        self.room.save()
+
+        self.assertIsNone(RoomCache.resolve('hot-room', 'HostUser'))
+        # The code lookup mirrors ChatRoom.objects.get(code=...)
+        self.assertFalse(RoomCache.resolve_by_code('hot-room').is_active)
+
+    def test_redis_unavailable_falls_back_to_db(self):
+        with patch.object(RoomCache, '_get_redis_client', side_effect=ConnectionError('redis down')):
+            record = RoomCache.resolve('hot-room', 'HostUser')
+
+        self.assertEqual(record.id, str(self.room.id))
+
+    @override_settings(ROOM_CACHE_LOCAL_TTL_SECONDS=0)
+    def test_local_tier_disabled(self):
+        RoomCache.resolve('hot-room', 'HostUser')
+
+        self.assertEqual(len(RoomCache._local), 0)
+
+
+class ToModelTests(RoomCacheTestCase):
+    """Test RoomRecord.to_model()."""
+
+    def test_model_without_queries(self):
+        record = RoomCache.resolve('hot-room', 'HostUser')
+
+        with CaptureQueriesContext(connection) as captured:
+            chat_room = record.to_model()
+            self.assertEqual(chat_room.host, self.host)
+            self.assertEqual(chat_room.host.reserved_username, 'HostUser')
+            self.assertEqual(chat_room.theme.theme_id, 'test-theme')
+            self.assertEqual(chat_room.created_at, self.room.created_at)
+
+        self.assertEqual(_room_queries(captured), [])
+
+    def test_fresh_instance_per_call(self):
+        record = RoomCache.resolve('hot-room', 'HostUser')
+
+        first = record.to_model()
+        first.name = 'Changed'
+
+        self.assertEqual(record.to_model().name, 'Room')
+
+    def test_save_keeps_excluded_fields(self):
+        chat_room = RoomCache.resolve('hot-room', 'HostUser').to_model()
+        chat_room.video_enabled = True
+        chat_room.save()
+
+        self.room.refresh_from_db()
+        self.assertTrue(self.room.video_enabled)
+        self.assertTrue(User.objects.get(pk=self.host.pk).check_password('x'))
+
+
+class InvalidationTests(RoomCacheTestCase):
+    """Test that writes are visible to the next lookup."""
+
+    def test_room_save(self):
+        RoomCache.resolve('hot-room', 'HostUser')
+
+        self.room.voice_enabled = False
+        self.room.save(update_fields=['voice_enabled'])
+
+        self.assertFalse(RoomCache.resolve('hot-room', 'HostUser').voice_enabled)
+
+    def test_room_delete(self):
+        RoomCache.resolve('hot-room', 'HostUser')
+
+        self.room.delete()
+
+        self.assertIsNone(RoomCache.resolve('hot-room', 'HostUser'))
+
+    def test_theme_change(self):
+        RoomCache.resolve('hot-room', 'HostUser')
+
+        self.theme.name = 'Renamed Theme'
+        self.theme.save()
+
+        self.assertEqual(RoomCache.resolve('hot-room', 'HostUser').to_model().theme.name, 'Renamed Theme')
+
+    def test_host_rename(self):
+        RoomCache.resolve('hot-room', 'HostUser')
+
+        self.host.reserved_username = 'NewHost'
+        self.host.save()
+
+        self.assertIsNone(RoomCache.resolve('hot-room', 'HostUser'))
+        self.assertEqual(RoomCache.resolve('hot-room', 'NewHost').host_username, 'NewHost')
+
+    def test_stale_alias_not_trusted(self):
+        # Alias left behind (e.g. raw SQL rename): the snapshot no longer matches
+        RoomCache.resolve('hot-room', 'HostUser')
+        User.objects.filter(pk=self.host.pk).update(reserved_username='NewHost')
+        RoomCache.invalidate_host(self.host.pk)
+
+        self.assertIsNone(RoomCache.resolve('hot-room', 'HostUser'))
+
+    def test_last_login_does_not_invalidate(self):
+        RoomCache.resolve('hot-room', 'HostUser')
+        generation = cache_helpers.redis_client().get(RoomCache.GENERATION_KEY)
+
+        self.host.save(update_fields=['last_login'])
+
+        self.assertEqual(cache_helpers.redis_client().get(RoomCache.GENERATION_KEY), generation)
+
+    def test_fill_after_concurrent_invalidation_rejected(self):
+        # Reader looked up (generation g), loaded the old row, then a writer invalidated
+        alias_key = RoomCache.URL_ALIAS_KEY.format(host='hostuser', code='hot-room')
+        _, generation = RoomCache._read_redis(alias_key)
+        stale = RoomRecord.from_model(ChatRoom.objects.select_related('host', 'theme').get(pk=self.room.pk))
+        RoomCache.invalidate_room(self.room.pk)
+
+        RoomCache._fill_redis(alias_key, stale, generation)
+
+        record, _ = RoomCache._read_redis(alias_key)
+        self.assertIsNone(record)
+
+
+class GetChatRoomByUrlTests(RoomCacheTestCase):
+    """Test the view helper on top of RoomCache."""
+
+    def test_returns_model(self):
+        chat_room = get_chat_room_by_url('hot-room', 'HOSTUSER')
+
+        self.assertIsInstance(chat_room, ChatRoom)
+        self.assertEqual(chat_room.pk, self.room.pk)
+
+    def test_404(self):
+        with self.assertRaises(Http404):
+            get_chat_room_by_url('missing', 'HostUser')
+
+    def test_discover_default(self):
+        discover = User.objects.create_user(email='discover@test.com', password='x', reserved_username='discover')
+        ChatRoom.objects.create(name='AI', code='ai-room', host=discover, source=ChatRoom.SOURCE_AI)
+
+        self.assertEqual(get_chat_room_by_url('ai-room').code, 'ai-room')
+
+
+class RoomUpdateViewTests(RoomCacheTestCase):
+    """Test that the host settings update saves the DB row, not the cached snapshot."""
+
+    def test_update_keeps_concurrent_changes(self):
+        RoomCache.resolve('hot-room', 'HostUser')
+        # Changed behind the cache's back (queryset update sends no signal)
+        other_theme = ChatTheme.objects.create(theme_id='other-theme', name='Other Theme')
+        ChatRoom.objects.filter(pk=self.room.pk).update(theme=other_theme)
+
+        client = APIClient()
+        client.force_authenticate(self.host)
+        response = client.put(
+            reverse('chats:chat-update', kwargs={'username': 'HostUser', 'code': 'hot-room'}),
+            {'name': 'Renamed'}, format='json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.name, 'Renamed')
+        self.assertEqual(self.room.theme_id, other_theme.pk)
+
+
+class LocalCacheTests(TestCase):
+    """Test the in-process TTL LRU."""
+
+    def _record(self, code):
+        return RoomRecord(
+            id=code, code=code, name=code, source='manual', access_mode='public', is_active=True,
+            host_id='1', host_username='h', voice_enabled=False, video_enabled=False,
+            photo_enabled=True, theme_locked=False, theme_pk=None, theme_id=None,
+            broadcast_message_id=None, room_json='{}', host_json='{}',
+        )
+
+    def test_lru_eviction(self):
+        local = room_cache._LocalRoomCache(max_entries=2)
+        local.put('a', self._record('a'), 60)
+        local.put('b', self._record('b'), 60)
+        local.get('a')
+        local.put('c', self._record('c'), 60)
+
+        self.assertIsNotNone(local.get('a'))
+        self.assertIsNone(local.get('b'))
+
+    def test_ttl_expiry(self):
+        local = room_cache._LocalRoomCache(max_entries=2)
+        with patch.object(room_cache.time, 'monotonic', return_value=100.0):
+            local.put('a', self._record('a'), 2)
+        with patch.object(room_cache.time, 'monotonic', return_value=102.0):
+            self.assertIsNone(local.get('a'))
+
+
+@tag('slow')
+class RoomLookupBenchmark(RoomCacheTestCase):
+    """2,000 room lookups: join + iexact query vs RoomCache."""
+
+    def test_cache_is_faster(self):
+        lookups = 2000
+
+        start = time.perf_counter()
+        for _ in range(lookups):
+            ChatRoom.objects.filter(
+                host__reserved_username__iexact='hostuser', code='hot-room', is_active=True
+            ).select_related('host', 'theme').first()
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        results = []
+        for label, clear_local in (('redis', True), ('local', False)):
+            RoomCache.resolve('hot-room', 'HostUser')
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                for _ in range(lookups):
+                    if clear_local:
+                        RoomCache.clear_local()
+                    RoomCache.resolve('hot-room', 'HostUser').to_model()
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            results.append((label, elapsed_ms))
+            self.assertEqual(_room_queries(captured), [], label)
+
+        print(f'\n[room lookup benchmark] {lookups} lookups')
+        print(f'  db    {legacy_ms:8.1f}ms ({legacy_ms * 1000 / lookups:6.1f}µs/lookup)')
+        for label, elapsed_ms in results:
+            print(f'  {label:<5} {elapsed_ms:8.1f}ms ({elapsed_ms * 1000 / lookups:6.1f}µs/lookup, incl. to_model)')
+
+        self.assertLess(results[1][1], legacy_ms)
@@ -0,0 +1,349 @@
+"""
+Tests for the per-room event log.
+
+Tests chats.utils.performance.room_changes.RoomChangeLog (sequence numbers,
+compaction, resync detection, publishing and replay), the views that record
+changes, RoomSyncView, the WebSocket `sync` and `resume` ops and the admin
+inspection tools.
+"""
+import json
+from io import StringIO
+from unittest.mock import AsyncMock, patch
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from chats.consumers import ChatConsumer
+from chats.models import ChatParticipation, ChatRoom, Message
+from chats.tests import cache_helpers
+from chats.utils.performance.cache import MessageCache
+from chats.utils.performance.room_cache import RoomCache
+from chats.utils.performance.room_changes import RoomChangeLog
+from chats.utils.security.auth import ChatSessionValidator
+
+
+class RoomChangesMixin:
+    def setUp(self):
+        cache_helpers.flush_cache()
+        RoomCache.clear_local()
+        self.host = User.objects.create_user(email='host@test.com', password='x', reserved_username='HostUser')
+        self.room = ChatRoom.objects.create(name='Room', code='sync-room', host=self.host)
+
+    def tearDown(self):
+        RoomCache.clear_local()
+        cache_helpers.flush_cache()
+
+    def _message(self, message_id, username='CoolCat42'):
+        return {'id': message_id, 'username': username, 'content': f'message {message_id}'}
+
+    def _append(self, kind, data):
+        return RoomChangeLog.append(self.room.id, kind, data)
+
+
+class RoomChangesTestCase(RoomChangesMixin, TestCase):
+    pass
+
+
+class RoomChangeLogTests(RoomChangesTestCase):
+    """Test sequencing and compaction."""
+
+    def test_sequence_increases(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+
+        first = self._append(RoomChangeLog.MESSAGE, self._message('m1'))
+        second = self._append(RoomChangeLog.MESSAGE, self._message('m2'))
+
+        self.assertEqual((first, second), (cursor + 1, cursor + 2))
+
+    def test_no_changes(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+
+        changes = RoomChangeLog.changes_since(self.room.id, cursor)
+
+        self.assertEqual(changes['cursor'], cursor)
+        self.assertEqual(changes['messages'], [])
+        self.assertFalse(changes['has_more'])
+
+    def test_compaction(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+        self._append(RoomChangeLog.MESSAGE, self._message('m1'))
+        self._append(RoomChangeLog.MESSAGE, self._message('m2'))
+        self._append(RoomChangeLog.DELETE, {'message_id': 'm1'})
+        self._append(RoomChangeLog.HIGHLIGHT, {'message_id': 'm2', 'is_highlight': True})
+        self._append(RoomChangeLog.REACTION, {'message_id': 'm0', 'emoji': '🔥', 'delta': 1})
+        self._append(RoomChangeLog.REACTION, {'message_id': 'm0', 'emoji': '👍', 'delta': 1})
+        self._append(RoomChangeLog.REACTION, {'message_id': 'm0', 'emoji': '👍', 'delta': -1})
+        self._append(RoomChangeLog.BAN, {'username': 'Troll', 'is_banned': True})
+        last = self._append(RoomChangeLog.BAN, {'username': 'Troll', 'is_banned': False})
+
+        changes = RoomChangeLog.changes_since(self.room.id, cursor)
+
+        self.assertEqual(changes['cursor'], last)
+        self.assertEqual([m['id'] for m in changes['messages']], ['m2'])
+        self.assertTrue(changes['messages'][0]['is_highlight'])
+        self.assertEqual(changes['deleted'], ['m1'])
+        self.assertEqual(changes['highlights'], {'m2': True})
+        self.assertEqual(changes['reactions'], {'m0': {'🔥': 1}})
+        self.assertEqual(changes['bans'], {'Troll': False})
+        self.assertNotIn('pinned_messages', changes)
+
+    def test_pin_change_includes_pinned_list(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+        self._append(RoomChangeLog.UNPIN, {'message_id': 'm1'})
+
+        changes = RoomChangeLog.changes_since(self.room.id, cursor)
+
+        self.assertEqual(changes['pinned_messages'], [])
+
+    def test_paging(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+        for i in range(5):
+            self._append(RoomChangeLog.MESSAGE, self._message(f'm{i}'))
+
+        first = RoomChangeLog.changes_since(self.room.id, cursor, limit=3)
+        second = RoomChangeLog.changes_since(self.room.id, first['cursor'], limit=3)
+
+        self.assertTrue(first['has_more'])
+        self.assertEqual([m['id'] for m in first['messages']], ['m0', 'm1', 'm2'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual([m['id'] for m in second['messages']], ['m3', 'm4'])
+
+    @override_settings(ROOM_CHANGE_LOG_MAX_EVENTS=10)
+    def test_trimmed_cursor_resyncs(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+        # MAXLEN ~ trims whole stream nodes (100 entries by default)
+        for i in range(300):
+            self._append(RoomChangeLog.REACTION, {'message_id': 'm0', 'emoji': '🔥', 'delta': 1})
+
+        self.assertIsNone(RoomChangeLog.changes_since(self.room.id, cursor))
+
+    def test_expired_log_resyncs_without_reusing_sequences(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+        self._append(RoomChangeLog.MESSAGE, self._message('m1'))
+        client = cache_helpers.redis_client()
+        client.delete(*RoomChangeLog._keys(self.room.id))
+
+        self.assertIsNone(RoomChangeLog.changes_since(self.room.id, cursor))
+        self.assertGreater(self._append(RoomChangeLog.MESSAGE, self._message('m2')), cursor + 1)
+        self.assertIsNone(RoomChangeLog.changes_since(self.room.id, cursor))
+
+    def test_cursor_ahead_resyncs(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+
+        self.assertIsNone(RoomChangeLog.changes_since(self.room.id, cursor + 5))
+
+
+class PublishTests(RoomChangesTestCase):
+    """Test publishing and replay reads."""
+
+    def test_publish_broadcasts_with_seq(self):
+        with patch('channels.layers.get_channel_layer') as get_channel_layer:
+            get_channel_layer.return_value.group_send = AsyncMock()
+            seq = RoomChangeLog.publish(
+                self.room.id, self.room.code, {'type': 'spotlight_update', 'action': 'add', 'username': 'CoolCat42'}
+            )
+
+        get_channel_layer.return_value.group_send.assert_called_once_with(
+            f'chat_{self.room.code}',
+            {'type': 'spotlight_update', 'action': 'add', 'username': 'CoolCat42', 'seq': seq},
+        )
+
+    def test_events_since(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+        with patch('channels.layers.get_channel_layer') as get_channel_layer:
+            get_channel_layer.return_value.group_send = AsyncMock()
+            first = RoomChangeLog.publish(
+                self.room.id, self.room.code, {'type': 'chat_message', 'message_data': self._message('m1')},
+                RoomChangeLog.MESSAGE,
+            )
+            self._append(RoomChangeLog.HIGHLIGHT, {'message_id': 'm1', 'is_highlight': True})
+            last = RoomChangeLog.publish(
+                self.room.id, self.room.code, {'type': 'gift_acknowledged', 'message_ids': ['m1']}
+            )
+
+        replay = RoomChangeLog.events_since(self.room.id, cursor)
+        changes = RoomChangeLog.changes_since(self.room.id, cursor)
+
+        # Record-only entries have nothing to replay
+        self.assertEqual([seq for seq, _ in replay['events']], [first, last])
+        self.assertEqual(replay['events'][1][1], {'type': 'gift_acknowledged', 'message_ids': ['m1']})
+        self.assertEqual(replay['cursor'], last)
+        # Published messages still compact into the delta sync
+        self.assertEqual([m['id'] for m in changes['messages']], ['m1'])
+        self.assertTrue(changes['messages'][0]['is_highlight'])
+
+    def test_inspect(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+        for i in range(5):
+            self._append(RoomChangeLog.MESSAGE, self._message(f'm{i}'))
+
+        newest = RoomChangeLog.inspect(self.room.id, limit=2)
+        after = RoomChangeLog.inspect(self.room.id, after=cursor, limit=2)
+
+        self.assertEqual(newest['length'], 5)
+        self.assertEqual(newest['current'], cursor + 5)
+        self.assertEqual([e['seq'] for e in newest['entries']], [cursor + 4, cursor + 5])
+        self.assertEqual([e['data']['id'] for e in after['entries']], ['m0', 'm1'])
+
+
+class SyncViewTests(RoomChangesTestCase):
+    """Test the views that record changes and RoomSyncView."""
+
+    def setUp(self):
+        super().setUp()
+        ChatParticipation.objects.create(chat_room=self.room, user=self.host, username='HostUser')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.host)
+        self.session_token = ChatSessionValidator.create_session_token(
+            chat_code=self.room.code, username='HostUser', user_id=str(self.host.id)
+        )
+        self.base = f'/api/chats/HostUser/{self.room.code}'
+
+    def test_message_list_returns_cursor(self):
+        response = self.client.get(f'{self.base}/messages/')
+
+        self.assertEqual(response.data['cursor'], RoomChangeLog.current_cursor(self.room.id))
+
+    def test_sync_after_delete_and_reaction(self):
+        message = Message.objects.create(chat_room=self.room, username='HostUser', content='hello')
+        MessageCache.add_message(message)
+        cursor = self.client.get(f'{self.base}/messages/').data['cursor']
+
+        self.client.post(
+            f'{self.base}/messages/{message.id}/react/',
+            {'emoji': '👍', 'username': 'HostUser', 'session_token': self.session_token}, format='json',
+        )
+        self.client.post(
+            f'{self.base}/messages/{message.id}/delete/',
+            {'session_token': self.session_token}, format='json',
+        )
+        response = self.client.get(f'{self.base}/sync/', {'cursor': cursor})
+
+        self.assertFalse(response.data['resync'])
+        self.assertEqual(response.data['deleted'], [str(message.id)])
+        self.assertEqual(response.data['reactions'], {str(message.id): {'👍': 1}})
+
+    def test_unknown_cursor_resyncs(self):
+        response = self.client.get(f'{self.base}/sync/', {'cursor': 1})
+
+        self.assertEqual(response.data, {'resync': True})
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'{self.base}/sync/', {'cursor': 'latest'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete_broadcast_is_replayable(self):
+        message = Message.objects.create(chat_room=self.room, username='HostUser', content='hello')
+        MessageCache.add_message(message)
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+
+        self.client.post(
+            f'{self.base}/messages/{message.id}/delete/',
+            {'session_token': self.session_token}, format='json',
+        )
+        replay = RoomChangeLog.events_since(self.room.id, cursor)
+
+        self.assertEqual(len(replay['events']), 1)
+        self.assertEqual(replay['events'][0][1]['type'], 'message_deleted')
+        self.assertEqual(replay['events'][0][1]['message_id'], str(message.id))
+
+
+class AdminInspectionTests(RoomChangesTestCase):
+    """Test the admin events view and the room_events command."""
+
+    def setUp(self):
+        super().setUp()
+        self.cursor = RoomChangeLog.current_cursor(self.room.id)
+        self._append(RoomChangeLog.BAN, {'username': 'Troll', 'is_banned': True})
+        self.url = f'/api/chats/admin/{self.room.id}/events/'
+
+    def test_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(user=self.host)
+
+        self.assertEqual(client.get(self.url).status_code, 403)
+
+    def test_view(self):
+        staff = User.objects.create_user(email='staff@test.com', password='x', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(user=staff)
+
+        response = client.get(self.url, {'after': self.cursor})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['entries'][0]['kind'], RoomChangeLog.BAN)
+
+    def test_command(self):
+        out = StringIO()
+
+        call_command('room_events', self.room.code, stdout=out)
+
+        self.assertIn(f'{self.cursor + 1}  ban', out.getvalue())
+
+
+class SyncOpTests(RoomChangesMixin, TransactionTestCase):
+    """Test the WebSocket `sync` op (database_sync_to_async needs real transactions)."""
+
+    def _consumer(self, blocked=()):
+        consumer = ChatConsumer()
+        consumer.chat_room_id = self.room.id
+        consumer.blocked_usernames = set(blocked)
+        consumer.send = AsyncMock()
+        return consumer
+
+    def _sent(self, consumer):
+        return json.loads(consumer.send.call_args.kwargs['text_data'])
+
+    def test_sync(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+        self._append(RoomChangeLog.MESSAGE, self._message('m1', username='Troll'))
+        self._append(RoomChangeLog.MESSAGE, self._message('m2'))
+        consumer = self._consumer(blocked={'Troll'})
+
+        async_to_sync(consumer._handle_sync)({'type': 'sync', 'cursor': cursor})
+
+        sent = self._sent(consumer)
+        self.assertEqual(sent['type'], 'sync')
+        self.assertEqual([m['id'] for m in sent['messages']], ['m2'])
+
+    def test_overflow(self):
+        consumer = self._consumer()
+
+        async_to_sync(consumer._handle_sync)({'type': 'sync', 'cursor': 1})
+
+        self.assertEqual(self._sent(consumer), {'type': 'sync_overflow'})
+
+    def _frames(self, consumer):
+        return [json.loads(call.kwargs['text_data']) for call in consumer.send.call_args_list]
+
+    def test_resume_replays_frames(self):
+        cursor = RoomChangeLog.current_cursor(self.room.id)
+        events = [
+            {'type': 'chat_message', 'message_data': self._message('m1', username='Troll')},
+            {'type': 'chat_message', 'message_data': self._message('m2')},
+            {'type': 'user_kicked', 'username': 'CoolCat42', 'message': 'bye'},
+            {'type': 'spotlight_update', 'action': 'add', 'username': 'CoolCat42'},
+        ]
+        seqs = [RoomChangeLog.append(self.room.id, RoomChangeLog.EVENT, {}, event) for event in events]
+        consumer = self._consumer(blocked={'Troll'})
+        consumer.username = 'CoolCat42'
+
+        async_to_sync(consumer._handle_resume)({'type': 'resume', 'seq': cursor})
+
+        frames = self._frames(consumer)
+        # Blocked sender filtered, kick not replayed, every frame tagged with its seq
+        self.assertEqual([(f.get('id') or f['type'], f['seq']) for f in frames[:-1]], [
+            ('m2', seqs[1]), ('spotlight_update', seqs[3]),
+        ])
+        self.assertEqual(frames[-1], {'type': 'resumed', 'seq': seqs[3], 'has_more': False})
+
+    def test_resume_overflow(self):
+        consumer = self._consumer()
+
+        async_to_sync(consumer._handle_resume)({'type': 'resume', 'seq': 1})
+
+        self.assertEqual(self._sent(consumer), {'type': 'resume_overflow'})
@@ -0,0 +1,188 @@
+"""
+Tests for the pre-rendered room detail JSON.
+
+Tests chats.utils.performance.room_payload_cache.RoomPayloadCache (cached
+bytes, theme splicing, ETag / 304, fill races), the signal handlers that
+invalidate it, and ChatRoomDetailView serving it.
+"""
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.models import User, UserSubscription
+from chats.models import ChatParticipation, ChatRoom, ChatTheme, Message
+from chats.serializers import ChatRoomSerializer
+from chats.tests import cache_helpers
+from chats.utils.performance.room_cache import RoomCache
+from chats.utils.performance.room_payload_cache import RoomPayloadCache
+
+
+def _detail_queries(captured):
+    """Queries the detail view used to run per request (participation, subscription, theme)."""
+    tables = ('"chats_chatparticipation"', '"accounts_usersubscription"', '"chats_chattheme"')
+    return [q for q in captured.captured_queries if any(table in q['sql'] for table in tables)]
+
+
+class RoomPayloadTestCase(TestCase):
+    def setUp(self):
+        cache_helpers.flush_cache()
+        RoomCache.clear_local()
+        self.host = User.objects.create_user(email='host@test.com', password='x', reserved_username='HostUser')
+        self.theme = ChatTheme.objects.create(theme_id='payload-theme', name='Payload Theme')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room = ChatRoom.objects.create(name='Room', code='payload-room', host=self.host, theme=self.theme)
+            ChatParticipation.objects.create(chat_room=self.room, user=self.host, username='HostUser')
+        self.client = APIClient()
+        self.url = f'/api/chats/HostUser/{self.room.code}/'
+
+    def tearDown(self):
+        RoomCache.clear_local()
+        cache_helpers.flush_cache()
+
+    def _get(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+
+class ServeTests(RoomPayloadTestCase):
+    """Test the detail view serves the cached JSON."""
+
+    def test_matches_serializer(self):
+        response = self._get()
+
+        expected = ChatRoomSerializer(ChatRoom.objects.select_related('host', 'theme').get(pk=self.room.pk)).data
+        expected.pop('access_code', None)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json(), expected)
+
+    def test_warm_request_skips_serialization_queries(self):
+        self._get()
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self._get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(_detail_queries(captured), [])
+
+    def test_etag_not_modified(self):
+        etag = self._get()['ETag']
+
+        response = self._get(**{'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_new_message_changes_etag(self):
+        first = self._get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(chat_room=self.room, username='HostUser', content='hi')
+
+        second = self._get(**{'If-None-Match': first['ETag']})
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['message_count'], first.json()['message_count'] + 1)
+
+    def test_redis_failure_renders(self):
+        with patch.object(RoomPayloadCache, '_get_redis_client', side_effect=ConnectionError('redis down')):
+            response = self._get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['code'], self.room.code)
+
+
+class InvalidationTests(RoomPayloadTestCase):
+    """Test signals drop stale payloads."""
+
+    def setUp(self):
+        super().setUp()
+        self._get()
+
+    def test_room_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.name = 'Renamed'
+            self.room.save()
+
+        self.assertEqual(self._get().json()['name'], 'Renamed')
+
+    def test_theme_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.theme.name = 'New Name'
+            self.theme.save()
+
+        self.assertEqual(self._get().json()['theme']['name'], 'New Name')
+
+    def test_host_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.host.first_name = 'Hosty'
+            self.host.save()
+
+        self.assertEqual(self._get().json()['host']['first_name'], 'Hosty')
+
+    def test_subscription_updates_host_counts(self):
+        fan = User.objects.create_user(email='fan@test.com', password='x', reserved_username='Fan')
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSubscription.objects.create(subscriber=fan, subscribed_to=self.host)
+
+        self.assertEqual(self._get().json()['host']['subscriber_count'], 1)
+
+    def test_host_leaving_hides_room(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ChatParticipation.objects.filter(chat_room=self.room, user=self.host).delete()
+
+        self.assertEqual(self._get().status_code, 404)
+
+    def test_other_user_joining_keeps_payload(self):
+        guest = User.objects.create_user(email='guest@test.com', password='x', reserved_username='Guest')
+        with self.captureOnCommitCallbacks(execute=True):
+            ChatParticipation.objects.create(chat_room=self.room, user=guest, username='Guest')
+
+        key = RoomPayloadCache.PAYLOAD_KEY.format(room_id=self.room.id)
+        self.assertTrue(cache_helpers.redis_client().exists(key))
+
+    def test_stale_fill_rejected(self):
+        chat_room = RoomCache.resolve(self.room.code, 'HostUser').to_model()
+        cache_helpers.redis_client().delete(RoomPayloadCache.PAYLOAD_KEY.format(room_id=self.room.id))
+        _, generation = RoomPayloadCache._read_redis(self.room.id)
+        room_json, theme_json, host_joined = RoomPayloadCache._render_room(chat_room, {str(self.room.id): 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.name = 'Renamed'
+            self.room.save()
+        RoomPayloadCache._fill_redis(chat_room, generation, room_json, theme_json, host_joined)
+
+        self.assertEqual(self._get().json()['name'], 'Renamed')
+
+
+class HostJoinedTests(TestCase):
+    """Test the host-joined check folded into the payload."""
+
+    def setUp(self):
+        cache_helpers.flush_cache()
+        RoomCache.clear_local()
+        self.host = User.objects.create_user(email='host@test.com', password='x', reserved_username='HostUser')
+        self.room = ChatRoom.objects.create(name='Room', code='unjoined-room', host=self.host)
+        self.client = APIClient()
+        self.url = f'/api/chats/HostUser/{self.room.code}/'
+
+    def tearDown(self):
+        RoomCache.clear_local()
+        cache_helpers.flush_cache()
+
+    def test_host_joining_reveals_room(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ChatParticipation.objects.create(chat_room=self.room, user=self.host, username='HostUser')
+
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_host_sees_room_before_joining(self):
+        self.client.force_authenticate(user=self.host)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['theme'])
@@ -0,0 +1,310 @@
+"""
+Tests for the Redis taken-username index.
+
+Tests chats.utils.username.availability (lookups, self-healing misses,
+rebuild, the complete index answering "free" without SQL), the
+User / ChatParticipation signal handlers that maintain it, failed writes
+dropping completeness, and orderings of concurrent writes that must never leave a
+free name marked taken.
+"""
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+from chats import signals
+from chats.models import ChatParticipation, ChatRoom
+from chats.tests import cache_helpers
+from chats.utils.username import availability
+from chats.utils.username.availability import is_username_taken, rebuild_index
+from chats.utils.username.validators import is_username_globally_available
+
+
+def _indexed():
+    members = {m.decode() for m in cache_helpers.redis_client().smembers(availability.TAKEN_KEY)}
+    return members - {availability.COMPLETE_MEMBER}
+
+
+def _is_complete():
+    return bool(cache_helpers.redis_client().sismember(availability.TAKEN_KEY, availability.COMPLETE_MEMBER))
+
+
+def _username_queries(captured):
+    """Username lookups among captured queries (ignores e.g. constance reads)."""
+    return [
+        q for q in captured.captured_queries
+        if '"accounts_user"' in q['sql'] or '"chats_chatparticipation"' in q['sql']
+    ]
+
+
+class UsernameIndexTestCase(TestCase):
+    def setUp(self):
+        cache_helpers.flush_cache()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.host = User.objects.create_user(email='host@test.com', password='x', reserved_username='HostName')
+            self.room = ChatRoom.objects.create(name='Room', host=self.host)
+
+    def tearDown(self):
+        cache_helpers.flush_cache()
+
+    def _join(self, username, room=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ChatParticipation.objects.create(
+                chat_room=room or self.room, username=username, ip_address='127.0.0.1'
+            )
+
+
+class SignalTests(UsernameIndexTestCase):
+    """Test index maintenance on save / delete."""
+
+    def test_create_indexes_lowercase(self):
+        self._join('CoolCat42')
+
+        self.assertEqual(_indexed(), {'hostname', 'coolcat42'})
+
+    def test_delete_unindexes(self):
+        participation = self._join('CoolCat42')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.delete()
+
+        self.assertNotIn('coolcat42', _indexed())
+
+    def test_delete_keeps_name_held_elsewhere(self):
+        other_room = ChatRoom.objects.create(name='Other', host=self.host)
+        first = self._join('CoolCat42')
+        self._join('coolcat42', room=other_room)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        self.assertIn('coolcat42', _indexed())
+
+    def test_cascade_delete_unindexes(self):
+        self._join('CoolCat42')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.delete()
+
+        self.assertNotIn('coolcat42', _indexed())
+
+    def test_rename_swaps_names(self):
+        user = User.objects.get(pk=self.host.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.reserved_username = 'NewName'
+            user.save()
+
+        self.assertEqual(_indexed(), {'newname'})
+
+    def test_clearing_reserved_username(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.host.reserved_username = None
+            self.host.save(update_fields=['reserved_username'])
+
+        self.assertEqual(_indexed(), set())
+
+    def test_unrelated_update_skips_index(self):
+        with patch.object(signals, 'mark_taken') as mark, patch.object(signals, 'recheck_usernames') as recheck:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.host.save(update_fields=['avatar_url'])
+
+        mark.assert_not_called()
+        recheck.assert_not_called()
+
+    def test_deferred_load_does_not_query(self):
+        with self.assertNumQueries(1):
+            User.objects.only('id').get(pk=self.host.pk)
+
+    def test_rolled_back_create_not_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    ChatParticipation.objects.create(chat_room=self.room, username='Ghost123', ip_address='127.0.0.1')
+                    raise RuntimeError('rollback')
+            except RuntimeError:
+                pass
+
+        self.assertNotIn('ghost123', _indexed())
+        self.assertFalse(is_username_taken('Ghost123'))
+
+
+class LookupTests(UsernameIndexTestCase):
+    """Test is_username_taken() / is_username_globally_available()."""
+
+    def test_taken_answer_without_sql(self):
+        self._join('CoolCat42')
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertTrue(is_username_taken('COOLCAT42'))
+            self.assertFalse(is_username_globally_available('coolcat42'))
+
+        self.assertEqual(_username_queries(captured), [])
+
+    def test_free_answer_confirmed_in_db(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertTrue(is_username_globally_available('FreeName1'))
+
+        self.assertEqual(len(_username_queries(captured)), 2)
+
+    def test_miss_for_unsignalled_write_heals(self):
+        # bulk_create sends no post_save
+        ChatParticipation.objects.bulk_create([
+            ChatParticipation(chat_room=self.room, username='BulkName7', ip_address='127.0.0.1')
+        ])
+        self.assertNotIn('bulkname7', _indexed())
+
+        self.assertTrue(is_username_taken('BulkName7'))
+        self.assertIn('bulkname7', _indexed())
+
+    def test_redis_failure_falls_back_to_db(self):
+        self._join('CoolCat42')
+
+        with patch.object(availability, '_redis', side_effect=ConnectionError('redis down')):
+            self.assertTrue(is_username_taken('CoolCat42'))
+            self.assertFalse(is_username_taken('FreeName1'))
+
+
+class CompleteIndexTests(UsernameIndexTestCase):
+    """Test the rebuilt index answering both ways without SQL."""
+
+    def setUp(self):
+        super().setUp()
+        rebuild_index()
+
+    def test_free_answer_without_sql(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertFalse(is_username_taken('FreeName1'))
+            self.assertTrue(is_username_globally_available('FreeName1'))
+            self.assertTrue(is_username_taken('hostname'))
+
+        self.assertEqual(_username_queries(captured), [])
+
+    def test_signalled_writes_keep_index_complete(self):
+        participation = self._join('CoolCat42')
+        self.assertTrue(is_username_taken('coolcat42'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.delete()
+
+        self.assertFalse(is_username_taken('coolcat42'))
+        self.assertTrue(_is_complete())
+
+    def test_sync_after_unsignalled_rename(self):
+        self._join('CoolCat42')
+        ChatParticipation.objects.filter(username='CoolCat42').update(username='WarmDog7')
+
+        availability.sync_usernames(['CoolCat42', 'WarmDog7'])
+
+        self.assertEqual(_indexed(), {'hostname', 'warmdog7'})
+        self.assertTrue(_is_complete())
+
+    def test_failed_add_drops_completeness(self):
+        with patch.object(availability, '_write', side_effect=ConnectionError('redis down')):
+            self._join('CoolCat42')
+
+        self.assertFalse(_is_complete())
+        self.assertTrue(is_username_taken('CoolCat42'))
+        self.assertIn('coolcat42', _indexed())
+
+    def test_write_during_rebuild_survives_swap(self):
+        iterator = QuerySet.iterator
+
+        def join_while_reading(queryset, *args, **kwargs):
+            availability.mark_taken('LateJoin1')
+            return iterator(queryset, *args, **kwargs)
+
+        with patch.object(QuerySet, 'iterator', autospec=True, side_effect=join_while_reading):
+            rebuild_index()
+
+        self.assertIn('latejoin1', _indexed())
+        self.assertTrue(_is_complete())
+
+    def test_lost_index_falls_back_to_db(self):
+        cache_helpers.redis_client().delete(availability.TAKEN_KEY)
+        availability.mark_taken('CoolCat42')
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertFalse(is_username_taken('FreeName1'))
+
+        self.assertEqual(len(_username_queries(captured)), 2)
+
+
+class RaceTests(UsernameIndexTestCase):
+    """Interleavings of concurrent writes; a free name must never stay indexed."""
+
+    def test_delete_recheck_after_concurrent_join(self):
+        # A leaves while B joins with the same name; B commits first
+        a = self._join('CoolCat42')
+        other_room = ChatRoom.objects.create(name='Other', host=self.host)
+        with self.captureOnCommitCallbacks() as delete_callbacks:
+            a.delete()
+        self._join('CoolCat42', room=other_room)
+
+        for callback in delete_callbacks:
+            callback()
+
+        self.assertIn('coolcat42', _indexed())
+
+    def test_delete_recheck_before_concurrent_join_commits(self):
+        # A's recheck runs before B's row is visible, then B's commit re-adds
+        a = self._join('CoolCat42')
+        with self.captureOnCommitCallbacks(execute=True):
+            a.delete()
+        self.assertNotIn('coolcat42', _indexed())
+
+        self._join('CoolCat42')
+
+        self.assertIn('coolcat42', _indexed())
+
+    def test_two_holders_leave(self):
+        other_room = ChatRoom.objects.create(name='Other', host=self.host)
+        a = self._join('CoolCat42')
+        b = self._join('CoolCat42', room=other_room)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            a.delete()
+            b.delete()
+        # Rechecks run after both deletes committed, in either order
+        for callback in reversed(callbacks):
+            callback()
+
+        self.assertNotIn('coolcat42', _indexed())
+        self.assertTrue(is_username_globally_available('CoolCat42'))
+
+    def test_stale_member_removed_by_recheck(self):
+        availability.mark_taken('NeverUsed1')
+
+        availability.recheck_usernames(['NeverUsed1'])
+
+        self.assertNotIn('neverused1', _indexed())
+
+
+class RebuildTests(UsernameIndexTestCase):
+    """Test rebuild_index() and manage.py rebuild_username_index."""
+
+    def test_rebuild_matches_db(self):
+        ChatParticipation.objects.bulk_create([
+            ChatParticipation(chat_room=self.room, username=f'Bulk{i:03d}', ip_address='127.0.0.1')
+            for i in range(30)
+        ] + [ChatParticipation(chat_room=self.room, username='bulk000', ip_address='127.0.0.1')])
+        availability.mark_taken('StaleName')
+
+        count = rebuild_index()
+
+        expected = {'hostname'} | {f'bulk{i:03d}' for i in range(30)}
+        self.assertEqual(count, len(expected))
+        self.assertEqual(_indexed(), expected)
+        self.assertTrue(_is_complete())
+
+    def test_command(self):
+        out = StringIO()
+        call_command('rebuild_username_index', stdout=out)
+
+        self.assertIn('Indexed 1 usernames', out.getvalue())
+        self.assertEqual(_indexed(), {'hostname'})
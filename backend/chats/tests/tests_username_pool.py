@@ -0,0 +1,237 @@
+"""
+Tests for the pre-validated username suggestion pool.
+
+Tests chats.utils.username.pool (batched refill, SPOP + reservation,
+counters), its use by generate_username(), and the refill_username_pool
+command.
+
+Benchmark for 200 suggestions against the per-attempt validate + query
+loop (tagged `slow`):
+
+    ./venv/bin/python -m pytest chats/tests/tests_username_pool.py -m slow
+"""
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+from chats.models import ChatParticipation, ChatRoom
+from chats.tests import cache_helpers
+from chats.utils.username import pool
+from chats.utils.username.generator import generate_username
+
+POOL_SETTINGS = {'USERNAME_POOL_TARGET_SIZE': 50, 'USERNAME_POOL_LOW_WATER': 10}
+
+
+def _username_queries(captured):
+    """Username lookups among captured queries (ignores e.g. constance reads)."""
+    return [
+        q for q in captured.captured_queries
+        if '"accounts_user"' in q['sql'] or '"chats_chatparticipation"' in q['sql']
+    ]
+
+
+def _pool_members():
+    return {m.decode() for m in cache_helpers.redis_client().smembers(pool.POOL_KEY)}
+
+
+@override_settings(**POOL_SETTINGS)
+class PoolTestCase(TestCase):
+    def setUp(self):
+        cache_helpers.flush_cache()
+
+    def tearDown(self):
+        cache_helpers.flush_cache()
+
+    def _seed_pool(self, *names):
+        cache_helpers.redis_client().sadd(pool.POOL_KEY, *names)
+
+
+class RefillTests(PoolTestCase):
+    """Test refill_pool() and the batched availability filter."""
+
+    def test_refill_to_target(self):
+        added = pool.refill_pool()
+
+        self.assertEqual(added, 50)
+        self.assertEqual(pool.pool_size(), 50)
+        self.assertGreater(cache_helpers.redis_client().ttl(pool.POOL_KEY), 0)
+
+    @patch.object(pool, 'REFILL_MAX_ROUNDS', 1)
+    def test_refill_checks_availability_in_one_query(self):
+        with CaptureQueriesContext(connection) as captured:
+            pool.refill_pool()
+
+        queries = _username_queries(captured)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('UNION', queries[0]['sql'])
+
+    def test_taken_names_dropped(self):
+        host = User.objects.create_user(email='host@test.com', password='x', reserved_username='TakenUser1')
+        room = ChatRoom.objects.create(name='Room', host=host)
+        ChatParticipation.objects.create(chat_room=room, username='InChat22', ip_address='127.0.0.1')
+        cache.set('username:reserved:heldname3', 'someone', 60)
+
+        free = pool._drop_taken({
+            'takenuser1': 'takenUser1',
+            'inchat22': 'InChat22',
+            'heldname3': 'HeldName3',
+            'freename4': 'FreeName4',
+        })
+
+        self.assertEqual(free, {'freename4': 'FreeName4'})
+
+    def test_candidates_pass_validation(self):
+        with patch.object(pool, 'validate_username', side_effect=pool.ValidationError('no')):
+            self.assertEqual(pool._generate_candidates(20), {})
+
+
+class PopTests(PoolTestCase):
+    """Test pop_username()."""
+
+    def test_pop_reserves_for_identity(self):
+        self._seed_pool('HappyOtter12')
+
+        username = pool.pop_username('session_a', ttl=60)
+
+        self.assertEqual(username, 'HappyOtter12')
+        self.assertEqual(cache.get('username:reserved:happyotter12'), 'session_a')
+        self.assertEqual(_pool_members(), set())
+
+    def test_pop_skips_names_reserved_since_refill(self):
+        self._seed_pool('HappyOtter12')
+        cache.set('username:reserved:happyotter12', 'session_b', 60)
+
+        self.assertIsNone(pool.pop_username('session_a', ttl=60))
+        self.assertEqual(cache.get('username:reserved:happyotter12'), 'session_b')
+        self.assertEqual(pool.pool_stats()['collisions'], 1)
+
+    def test_pop_skips_names_claimed_since_refill(self):
+        self._seed_pool('HappyOtter12')
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(email='otter@test.com', password='x', reserved_username='happyotter12')
+
+        self.assertIsNone(pool.pop_username('session_a', ttl=60))
+        self.assertIsNone(cache.get('username:reserved:happyotter12'))
+        self.assertEqual(pool.pool_stats()['collisions'], 1)
+
+    def test_empty_pool_counts_miss(self):
+        self.assertIsNone(pool.pop_username('session_a', ttl=60))
+        self.assertEqual(pool.pool_stats()['misses'], 1)
+
+    def test_low_water_counter(self):
+        pool.refill_pool(target=12)
+
+        for _ in range(4):
+            pool.pop_username('session_a', ttl=60)
+
+        stats = pool.pool_stats()
+        self.assertEqual(stats['hits'], 4)
+        self.assertEqual(stats['size'], 8)
+        # Pops that left 9 and 8 names (low water is 10)
+        self.assertEqual(stats['low_water_pops'], 2)
+
+
+class GenerateFromPoolTests(PoolTestCase):
+    """Test generate_username() serving suggestions from the pool."""
+
+    def test_pooled_name_without_queries(self):
+        self._seed_pool('CalmHeron77')
+
+        with CaptureQueriesContext(connection) as captured:
+            username, remaining = generate_username('session_a', chat_code='ROOM1')
+
+        self.assertEqual(username, 'CalmHeron77')
+        self.assertEqual(_username_queries(captured), [])
+        self.assertIn('CalmHeron77', cache.get('username:generated_for_session:session_a'))
+        self.assertIn('CalmHeron77', cache.get('username:generated_for_chat:ROOM1:session_a'))
+        self.assertIn('calmheron77', cache.get('chat:ROOM1:recent_suggestions'))
+
+    def test_empty_pool_refilled_inline(self):
+        username, _ = generate_username('session_a')
+
+        self.assertIsNotNone(username)
+        self.assertEqual(pool.pool_size(), 49)
+        self.assertEqual(pool.pool_stats()['refills'], 1)
+
+    def test_falls_back_when_refill_in_progress(self):
+        cache.add(pool.REFILL_LOCK_KEY, 1, 30)
+
+        username, _ = generate_username('session_a')
+
+        self.assertIsNotNone(username)
+        self.assertEqual(pool.pool_size(), 0)
+        self.assertEqual(cache.get(f'username:reserved:{username.lower()}'), 'session_a')
+
+    def test_suggestions_unique(self):
+        pool.refill_pool()
+
+        names = {generate_username(f'session_{i}')[0] for i in range(50)}
+
+        self.assertEqual(len(names), 50)
+
+
+class RefillCommandTests(PoolTestCase):
+    """Test manage.py refill_username_pool."""
+
+    def test_once(self):
+        out = StringIO()
+        call_command('refill_username_pool', '--once', stdout=out)
+
+        self.assertEqual(pool.pool_size(), 50)
+        self.assertIn('Added 50 usernames', out.getvalue())
+
+    def test_stats(self):
+        out = StringIO()
+        call_command('refill_username_pool', '--stats', stdout=out)
+
+        self.assertIn('size: 0', out.getvalue())
+        self.assertIn('low_water: 10', out.getvalue())
+
+
+@tag('slow')
+@override_settings(USERNAME_POOL_TARGET_SIZE=500, USERNAME_POOL_LOW_WATER=100)
+class SuggestionBenchmark(PoolTestCase):
+    """200 suggestions: per-attempt validate + query loop vs pool."""
+
+    def _run(self, label, count):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            for i in range(count):
+                self.assertIsNotNone(generate_username(f'{label}_{i}')[0])
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        return elapsed_ms, len(_username_queries(captured))
+
+    def test_pool_is_faster(self):
+        # Existing participants, so availability queries hit real rows
+        host = User.objects.create_user(email='host@test.com', password='x', reserved_username='BenchHost')
+        room = ChatRoom.objects.create(name='Room', host=host)
+        ChatParticipation.objects.bulk_create(
+            ChatParticipation(chat_room=room, username=f'Guest{i}', ip_address='127.0.0.1')
+            for i in range(2000)
+        )
+
+        # Held refill lock: every call takes the fallback loop
+        cache.add(pool.REFILL_LOCK_KEY, 1, 300)
+        legacy_ms, legacy_queries = self._run('legacy', 200)
+        cache.delete(pool.REFILL_LOCK_KEY)
+
+        start = time.perf_counter()
+        pool.refill_pool()
+        refill_ms = (time.perf_counter() - start) * 1000
+        pooled_ms, pooled_queries = self._run('pooled', 200)
+
+        print('\n[username suggestion benchmark] 200 suggestions')
+        print(f'  legacy {legacy_ms:8.1f}ms ({legacy_ms / 200:5.2f}ms/suggestion) queries={legacy_queries}')
+        print(f'  pooled {pooled_ms:8.1f}ms ({pooled_ms / 200:5.2f}ms/suggestion) queries={pooled_queries}')
+        print(f'  refill {refill_ms:8.1f}ms (500 names, off the request path)')
+
+        self.assertGreaterEqual(legacy_queries, 400)
+        self.assertEqual(pooled_queries, 0)
+        self.assertLess(pooled_ms + refill_ms, legacy_ms)
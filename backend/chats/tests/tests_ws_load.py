@@ -0,0 +1,79 @@
+"""
+End-to-end WebSocket load test (chats/utils/performance/ws_load.py).
+
+Runs the `smoke` mix through the real ChatConsumer and checks the harness
+delivers and reports everything. Tagged `slow`:
+
+    ./venv/bin/python -m pytest chats/tests/tests_ws_load.py -m slow
+"""
+
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase, tag
+
+from chats.models import ChatRoom
+from chats.tests import cache_helpers
+from chats.utils.performance.ws_load import CODE_PREFIX, SCENARIOS, percentiles, run_load_test
+
+
+class PercentilesTests(SimpleTestCase):
+    def test_nearest_rank(self):
+        stats = percentiles([float(n) for n in range(1, 101)])
+        self.assertEqual(stats['p50'], 50.0)
+        self.assertEqual(stats['p95'], 95.0)
+        self.assertEqual(stats['p99'], 99.0)
+        self.assertEqual(stats['max'], 100.0)
+        self.assertEqual(stats['count'], 100)
+
+    def test_empty_sample(self):
+        self.assertEqual(percentiles([])['p50'], None)
+        self.assertEqual(percentiles([])['count'], 0)
+
+
+@tag('slow')
+class WebSocketLoadTest(TransactionTestCase):
+    def setUp(self):
+        cache_helpers.flush_cache()
+
+    def tearDown(self):
+        cache_helpers.flush_cache()
+
+    def test_smoke_mix_delivers_every_message(self):
+        mix = SCENARIOS['smoke']
+        result = run_load_test(mix, scenario='smoke')
+
+        per_room = mix.listeners + mix.senders
+        self.assertEqual(result['connections'], mix.rooms * (per_room + mix.reconnects))
+        self.assertEqual(result['messages_sent'], mix.rooms * mix.senders * mix.messages)
+        self.assertEqual(
+            result['deliveries'], mix.rooms * (mix.senders * mix.messages * per_room + mix.reconnects),
+        )
+        self.assertEqual(result['lost'], 0)
+        self.assertEqual(result['backfill_ms']['count'], mix.rooms * mix.reconnects)
+        self.assertIsNotNone(result['send_to_receive_ms']['p99'])
+        self.assertGreater(result['db_queries'], 0)
+        self.assertGreater(result['redis_commands'], 0)
+        # Load-test rooms are cleaned up
+        self.assertFalse(ChatRoom.objects.filter(code__startswith=CODE_PREFIX).exists())
+
+    def test_command_writes_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'results.json')
+            call_command(
+                'benchmark_websockets', '--scenario', 'smoke', '--rooms', '1', '--json', path,
+                stdout=StringIO(),
+            )
+            with open(path) as f:
+                results = json.load(f)
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['scenario'], 'smoke')
+        self.assertEqual(results[0]['mix']['rooms'], 1)
+        self.assertEqual(results[0]['lost'], 0)
+        for key in ('connect_ms', 'send_to_receive_ms', 'backfill_ms', 'messages_per_second',
+                    'db_queries', 'redis_commands', 'commit'):
+            self.assertIn(key, results[0])
@@ -2,7 +2,7 @@ from django.urls import path
 from .views import (
     ChatRoomCreateView, ChatRoomDetailView, ChatRoomUpdateView, ChatRoomJoinView, RefreshSessionView, MyChatsView,
     ChatConfigView, NearbyDiscoverableChatsView,
-    MessageListView, MessageCreateView, MessagePinView, AddToPinView, MessageHighlightView, BroadcastStickyView, MessageDeleteView, MessageUnpinView, PinTiersView,
+    MessageListView, RoomSyncView, MessageCreateView, MessagePinView, AddToPinView, MessageHighlightView, BroadcastStickyView, MessageDeleteView, MessageUnpinView, PinTiersView,
     UsernameValidationView, MyParticipationView, UpdateMyThemeView, SuggestUsernameView,
     DismissIntroView, MarkRoomReadView,
     VoiceUploadView, VoiceStreamView, PhotoUploadView, VideoUploadView, UserAvatarView,
@@ -14,7 +14,7 @@ from .views import (
     PhotoAnalysisView, ChatRoomCreateFromPhotoView, ChatRoomCreateFromLocationView, ChatRoomCreateFromMusicView,
     GiftCatalogView, SendGiftView, AcknowledgeGiftView,
     # Admin/Staff moderation views
-    AdminChatDetailView, AdminMessageListView, AdminMessageDeleteView, AdminMessageUnpinView,
+    AdminChatDetailView, AdminMessageListView, AdminMessageDeleteView, AdminMessageUnpinView, AdminRoomEventsView,
     AdminSiteBanListView, AdminSiteBanCreateView, AdminSiteBanRevokeView, AdminChatBanCreateView,
 )
 
@@ -26,6 +26,7 @@ urlpatterns = [
     path('admin/<uuid:room_id>/messages/', AdminMessageListView.as_view(), name='admin-message-list'),
     path('admin/<uuid:room_id>/messages/<uuid:message_id>/delete/', AdminMessageDeleteView.as_view(), name='admin-message-delete'),
     path('admin/<uuid:room_id>/messages/<uuid:message_id>/unpin/', AdminMessageUnpinView.as_view(), name='admin-message-unpin'),
+    path('admin/<uuid:room_id>/events/', AdminRoomEventsView.as_view(), name='admin-room-events'),
     path('admin/<uuid:room_id>/ban/', AdminChatBanCreateView.as_view(), name='admin-chat-ban'),
     path('admin/site-bans/', AdminSiteBanListView.as_view(), name='admin-site-bans-list'),
     path('admin/site-bans/create/', AdminSiteBanCreateView.as_view(), name='admin-site-ban-create'),
@@ -60,6 +61,7 @@ urlpatterns = [
     path('discover/<str:code>/update/', ChatRoomUpdateView.as_view(), name='chat-update-ai'),
     path('discover/<str:code>/join/', ChatRoomJoinView.as_view(), name='chat-join-ai'),
     path('discover/<str:code>/messages/', MessageListView.as_view(), name='message-list-ai'),
+    path('discover/<str:code>/sync/', RoomSyncView.as_view(), name='room-sync-ai'),
     path('discover/<str:code>/messages/send/', MessageCreateView.as_view(), name='message-create-ai'),
     path('discover/<str:code>/pin-tiers/', PinTiersView.as_view(), name='pin-tiers-ai'),
     path('discover/<str:code>/messages/<uuid:message_id>/pin/', MessagePinView.as_view(), name='message-pin-ai'),
@@ -99,6 +101,7 @@ urlpatterns = [
     path('<str:username>/<str:code>/update/', ChatRoomUpdateView.as_view(), name='chat-update'),
     path('<str:username>/<str:code>/join/', ChatRoomJoinView.as_view(), name='chat-join'),
     path('<str:username>/<str:code>/messages/', MessageListView.as_view(), name='message-list'),
+    path('<str:username>/<str:code>/sync/', RoomSyncView.as_view(), name='room-sync'),
     path('<str:username>/<str:code>/messages/send/', MessageCreateView.as_view(), name='message-create'),
     path('<str:username>/<str:code>/pin-tiers/', PinTiersView.as_view(), name='pin-tiers'),
     path('<str:username>/<str:code>/messages/<uuid:message_id>/pin/', MessagePinView.as_view(), name='message-pin'),
@@ -0,0 +1,87 @@
+"""
+Geospatial helpers for location-based chat discovery.
+
+Discovery filters rooms in PostgreSQL instead of Python:
+1. A latitude/longitude bounding box around the user narrows candidates
+   using the partial (latitude, longitude) index on ChatRoom.
+2. A Haversine distance annotation filters the box down to the true
+   circle and orders the results, so only the requested page is loaded.
+"""
+import math
+from decimal import Decimal
+from typing import Dict
+
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_MILES = 3959
+
+
+def bounding_box_filter(latitude: float, longitude: float, radius_miles: float) -> Dict[str, Decimal]:
+    """
+    Build queryset filter kwargs for the box enclosing a radius around a point.
+
+    The box is a superset of the circle, so it only ever over-includes; the
+    exact distance check happens in `haversine_miles`. Longitude bounds are
+    dropped near the poles and when the box would cross the antimeridian.
+
+    Args:
+        latitude: Center latitude in degrees
+        longitude: Center longitude in degrees
+        radius_miles: Search radius in miles
+
+    Returns:
+        Dict of `latitude__gte`/`latitude__lte` (and longitude equivalents
+        when safe) suitable for `QuerySet.filter(**kwargs)`
+
+    Examples:
+        >>> bounding_box_filter(40.7128, -74.0060, 5)['latitude__gte']
+        Decimal('40.640441')
+    """
+    lat_delta = math.degrees(radius_miles / EARTH_RADIUS_MILES)
+    box = {
+        'latitude__gte': Decimal(f'{latitude - lat_delta:.6f}'),
+        'latitude__lte': Decimal(f'{latitude + lat_delta:.6f}'),
+    }
+
+    if abs(latitude) + lat_delta >= 90:
+        return box
+
+    lon_delta = math.degrees(radius_miles / (EARTH_RADIUS_MILES * math.cos(math.radians(latitude))))
+    if longitude - lon_delta < -180 or longitude + lon_delta > 180:
+        return box
+
+    box['longitude__gte'] = Decimal(f'{longitude - lon_delta:.6f}')
+    box['longitude__lte'] = Decimal(f'{longitude + lon_delta:.6f}')
+    return box
+
+
+def haversine_miles(latitude: float, longitude: float) -> ExpressionWrapper:
+    """
+    Build a SQL expression for the distance in miles from a point to each row.
+
+    Uses the row's `latitude`/`longitude` columns and the Haversine formula.
+    The `asin` argument is clamped to 1.0 so floating point error on
+    antipodal points can't raise a domain error.
+
+    Args:
+        latitude: Reference latitude in degrees
+        longitude: Reference longitude in degrees
+
+    Returns:
+        Expression suitable for `QuerySet.annotate(distance_miles=...)`
+    """
+    row_lat = Radians(Cast('latitude', FloatField()))
+    row_lon = Radians(Cast('longitude', FloatField()))
+    user_lat = math.radians(latitude)
+    user_lon = math.radians(longitude)
+
+    a = (
+        Power(Sin((row_lat - Value(user_lat)) / Value(2.0)), 2)
+        + Value(math.cos(user_lat)) * Cos(row_lat)
+        * Power(Sin((row_lon - Value(user_lon)) / Value(2.0)), 2)
+    )
+    return ExpressionWrapper(
+        Value(2.0 * EARTH_RADIUS_MILES) * ASin(Least(Sqrt(a), Value(1.0))),
+        output_field=FloatField(),
+    )
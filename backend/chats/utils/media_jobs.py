@@ -0,0 +1,133 @@
+"""
+Media job handlers for chat voice and video uploads.
+
+Run by the media job worker (media_analysis.utils.jobs) when an upload
+asked for asynchronous processing. Each handler reads the staged upload
+from storage, does the ffmpeg/ffprobe work, and returns the same fields
+the synchronous upload response would have contained.
+"""
+
+import logging
+import os
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from chatpop.utils.media import (
+    MediaStorage,
+    MAX_VIDEO_DURATION_SECONDS,
+    extract_thumbnail,
+    get_video_message_url,
+    get_voice_message_url,
+    probe_video,
+    save_video_thumbnail,
+    save_voice_message,
+    transcode_webm_to_m4a,
+)
+from media_analysis.utils.jobs import JobRejected
+
+logger = logging.getLogger(__name__)
+
+
+def _open_staged(storage_path: str):
+    staged = MediaStorage.get_file(storage_path)
+    if staged is None:
+        raise JobRejected(f"Staged upload not found: {storage_path}")
+    return staged
+
+
+def transcode_voice_job(payload: dict) -> dict:
+    """
+    Transcode a staged WebM voice message to M4A.
+
+    Payload:
+        storage_path: Staged WebM file
+
+    Returns:
+        {'voice_url', 'storage_path', 'storage_type'} of the M4A file
+    """
+    staged_path = payload['storage_path']
+    staged = _open_staged(staged_path)
+    try:
+        transcoded = transcode_webm_to_m4a(staged)
+    finally:
+        staged.close()
+
+    storage_path, storage_type = save_voice_message(transcoded, content_type='audio/mp4')
+    MediaStorage.delete_file(staged_path)
+    logger.info(f"[VoiceJob] Transcoded {staged_path} -> {storage_path}")
+
+    return {
+        'voice_url': get_voice_message_url(storage_path),
+        'storage_path': storage_path,
+        'storage_type': storage_type,
+    }
+
+
+def process_video_job(payload: dict) -> dict:
+    """
+    Validate duration and generate the thumbnail for a stored video.
+
+    Videos longer than MAX_VIDEO_DURATION_SECONDS are deleted and the job
+    is rejected.
+
+    Payload:
+        storage_path: Stored video file
+
+    Returns:
+        {'video_url', 'duration', 'thumbnail_url', 'width', 'height',
+         'storage_path', 'storage_type'}
+    """
+    storage_path = payload['storage_path']
+
+    # Local storage: probe the stored file in place; otherwise stream a copy
+    try:
+        local_path = default_storage.path(storage_path)
+    except NotImplementedError:
+        local_path = None
+
+    if local_path is not None:
+        if not os.path.exists(local_path):
+            raise JobRejected(f"Staged upload not found: {storage_path}")
+        tmp_path = local_path
+    else:
+        stored = _open_staged(storage_path)
+        suffix = os.path.splitext(storage_path)[1] or '.mp4'
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            try:
+                for chunk in stored.chunks():
+                    tmp.write(chunk)
+            finally:
+                stored.close()
+            tmp_path = tmp.name
+
+    try:
+        info = probe_video(tmp_path)
+        logger.info(f"[VideoJob] {storage_path}: {info.duration}s, {info.width}x{info.height}")
+
+        if info.duration > MAX_VIDEO_DURATION_SECONDS:
+            MediaStorage.delete_file(storage_path)
+            raise JobRejected(f'Video too long (max {MAX_VIDEO_DURATION_SECONDS} seconds)')
+
+        thumbnail_url = None
+        thumbnail = extract_thumbnail(tmp_path)
+        if thumbnail is not None:
+            thumb_storage_path, _ = save_video_thumbnail(
+                ContentFile(thumbnail),
+                os.path.basename(storage_path)
+            )
+            thumbnail_url = get_video_message_url(thumb_storage_path)
+    finally:
+        if local_path is None:
+            os.unlink(tmp_path)
+
+    return {
+        'video_url': get_video_message_url(storage_path),
+        'duration': round(info.duration, 2),
+        'thumbnail_url': thumbnail_url,
+        'width': info.width,
+        'height': info.height,
+        'storage_path': storage_path,
+        'storage_type': payload.get('storage_type', MediaStorage.get_storage_type()),
+    }
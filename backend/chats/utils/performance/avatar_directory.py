@@ -0,0 +1,165 @@
+"""
+Per-room avatar directory for message serialization.
+
+Every serialized message shows its sender's avatar, which lives on the
+sender's ChatParticipation. Instead of one ChatParticipation query per
+message, each room keeps a Redis hash of its participants:
+
+    room:{room_id}:avatar_urls   HASH lowercase username -> JSON avatar_url (or null)
+
+Only the avatar is stored: username_is_reserved is computed from the
+message's own user (MessageCache._compute_username_is_reserved()), which
+serializers load anyway.
+
+Entries are written when a participation is saved (join, avatar change)
+and removed when it is deleted or renamed (chats/signals.py). Lookups for
+usernames missing from the hash (expired key, writes that skipped signals)
+fall back to a single IN query for the whole batch and fill the hash, so
+serializing a page of messages costs at most one query.
+
+Fills use HSETNX and writes use HSET: a reader that loaded a row before a
+concurrent avatar change cannot overwrite the newer entry.
+
+Usage:
+    entries = AvatarDirectory.lookup(room_id, usernames)   # {lowercase username: avatar_url}
+    url = AvatarDirectory.avatar_url(room_id, username)    # DiceBear fallback
+"""
+
+import json
+import logging
+from typing import Dict, Iterable, Optional
+
+from django.core.cache import cache
+from django.db.models.functions import Lower
+
+logger = logging.getLogger(__name__)
+
+
+class AvatarDirectory:
+    """Redis-backed map of a room's participants to their avatars."""
+
+    KEY = "room:{room_id}:avatar_urls"
+    # Refreshed on every write; an expired room refills from one query per page
+    TTL_SECONDS = 24 * 3600
+
+    @classmethod
+    def _get_redis_client(cls):
+        """Get raw Redis client from django-redis"""
+        return cache.client.get_client()
+
+    @classmethod
+    def _key(cls, room_id) -> str:
+        return cls.KEY.format(room_id=room_id)
+
+    @classmethod
+    def lookup(cls, room_id, usernames: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Directory entries for the given usernames in one room.
+
+        Args:
+            room_id: ChatRoom UUID
+            usernames: Usernames in any case
+
+        Returns:
+            Dict mapping lowercase username -> stored avatar URL (None if the
+            participation has none). Usernames with no participation in the
+            room are absent.
+        """
+        lowered = list({username.lower() for username in usernames if username})
+        if not lowered:
+            return {}
+
+        entries: Dict[str, Optional[str]] = {}
+        key = cls._key(room_id)
+        try:
+            values = cls._get_redis_client().hmget(key, lowered)
+            for username, raw in zip(lowered, values):
+                if raw is not None:
+                    entries[username] = json.loads(raw)
+        except Exception as e:
+            logger.warning(f"[AVATAR_DIRECTORY] Lookup failed for room {room_id}, using DB: {e}")
+
+        missing = [username for username in lowered if username not in entries]
+        if missing:
+            loaded = cls._load(room_id, missing)
+            entries.update(loaded)
+            cls._fill(key, loaded)
+        return entries
+
+    @classmethod
+    def _load(cls, room_id, usernames) -> Dict[str, Optional[str]]:
+        """One IN query for usernames the hash could not answer."""
+        from chats.models import ChatParticipation
+
+        participations = (
+            ChatParticipation.objects.filter(chat_room_id=room_id)
+            .annotate(username_lower=Lower('username'))
+            .filter(username_lower__in=usernames)
+            .order_by('first_joined_at')
+            .values_list('username_lower', 'avatar_url')
+        )
+        loaded: Dict[str, Optional[str]] = {}
+        for username_lower, avatar_url in participations:
+            # Same name held twice (legacy data): the earliest joiner keeps it
+            loaded.setdefault(username_lower, avatar_url or None)
+        return loaded
+
+    @classmethod
+    def _fill(cls, key: str, entries: Dict[str, Optional[str]]):
+        if not entries:
+            return
+        try:
+            pipe = cls._get_redis_client().pipeline(transaction=False)
+            for username, avatar_url in entries.items():
+                pipe.hsetnx(key, username, json.dumps(avatar_url))
+            pipe.expire(key, cls.TTL_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[AVATAR_DIRECTORY] Fill failed for {key}: {e}")
+
+    @classmethod
+    def avatar_url(cls, room_id, username: str, entries: Optional[Dict[str, Optional[str]]] = None,
+                   style: Optional[str] = None) -> str:
+        """
+        Avatar URL for a sender, falling back to DiceBear for usernames with
+        no participation (orphaned/legacy data) or no stored avatar.
+
+        Args:
+            room_id: ChatRoom UUID
+            username: Sender username
+            entries: Result of lookup() for a batch; looked up if omitted
+            style: DiceBear style for the fallback
+        """
+        from chatpop.utils.media import get_fallback_dicebear_url
+
+        if entries is None:
+            entries = cls.lookup(room_id, [username])
+        avatar_url = entries.get(username.lower())
+        if avatar_url:
+            return avatar_url
+        return get_fallback_dicebear_url(username, style=style)
+
+    @classmethod
+    def record(cls, participation, previous_username: Optional[str] = None):
+        """Write (or overwrite) a participation's entry; drop its previous name."""
+        key = cls._key(participation.chat_room_id)
+        try:
+            pipe = cls._get_redis_client().pipeline(transaction=False)
+            if previous_username and previous_username.lower() != participation.username.lower():
+                pipe.hdel(key, previous_username.lower())
+            pipe.hset(key, participation.username.lower(), json.dumps(participation.avatar_url or None))
+            pipe.expire(key, cls.TTL_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[AVATAR_DIRECTORY] Failed to record {participation.username} in {key}: {e}")
+
+    @classmethod
+    def forget(cls, room_id, *usernames: str):
+        """Remove entries; the next lookup reloads them from the DB."""
+        names = [username.lower() for username in usernames if username]
+        if not names:
+            return
+        try:
+            cls._get_redis_client().hdel(cls._key(room_id), *names)
+        except Exception as e:
+            logger.warning(f"[AVATAR_DIRECTORY] Failed to remove {names} from room {room_id}: {e}")
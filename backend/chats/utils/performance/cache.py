@@ -31,6 +31,7 @@ from uuid import UUID
 from django.core.cache import cache
 from django.conf import settings
 from chats.models import Message, ChatParticipation
+from .avatar_directory import AvatarDirectory
 from .monitoring import monitor
 
 logger = logging.getLogger(__name__)
@@ -133,8 +134,15 @@ class MessageCache:
         """Get raw Redis client from django-redis"""
         return cache.client.get_client()
 
+    # Message fields holding /api/chats/media/ proxy URLs
+    CDN_URL_FIELDS = ("avatar_url", "voice_url", "photo_url", "video_url", "video_thumbnail_url")
+
     @classmethod
-    def _enrich_with_cdn_urls(cls, msg: Dict[str, Any]) -> Dict[str, Any]:
+    def _enrich_with_cdn_urls(
+        cls,
+        msg: Dict[str, Any],
+        avatar_urls: Optional[Dict[str, Optional[str]]] = None
+    ) -> Dict[str, Any]:
         """
         Replace proxy URLs in a cached message dict with directly-fetchable
         CloudFront-signed URLs. Mutates AND returns the dict.
@@ -144,20 +152,55 @@ class MessageCache:
         cache would expire (1-hour TTL on signatures) and the next reader
         would get 403s. Signing at read time guarantees fresh URLs.
 
-        Cost: one HMAC sign per non-empty media field per message read
-        (microseconds). Avatars in the /api/chats/media/avatars/user/<id>
-        form additionally require a single User lookup the first time we
-        sign for that user; otherwise zero DB hits.
-        """
-        from chatpop.utils.media.storage import MediaStorage
-
-        for field in ("avatar_url", "voice_url", "photo_url", "video_url", "video_thumbnail_url"):
-            cdn_url = MediaStorage.proxy_url_to_cdn_url(msg.get(field))
+        Cost: signatures are memoized per (path, 5-minute bucket), so each
+        distinct asset is signed once per bucket per process. Avatars in the
+        /api/chats/media/avatars/user/<id> form are looked up in
+        avatar_urls (from resolve_avatar_urls(), see _enrich_many()) or,
+        for a single message, through the Redis avatar path cache.
+        """
+        from chatpop.utils.media.storage import MediaStorage, USER_AVATAR_PROXY_PREFIX
+
+        for field in cls.CDN_URL_FIELDS:
+            proxy_url = msg.get(field)
+            if (
+                avatar_urls is not None
+                and field == "avatar_url"
+                and proxy_url
+                and proxy_url.startswith(USER_AVATAR_PROXY_PREFIX)
+            ):
+                cdn_url = avatar_urls.get(proxy_url[len(USER_AVATAR_PROXY_PREFIX):].rstrip("/"))
+            else:
+                cdn_url = MediaStorage.proxy_url_to_cdn_url(proxy_url)
             if cdn_url:
                 msg[field] = cdn_url
 
         return msg
 
+    @classmethod
+    def _enrich_many(cls, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        _enrich_with_cdn_urls() for a page of messages.
+
+        All avatars/user/<id> avatars on the page are resolved with one
+        resolve_avatar_urls() call (one Redis MGET, at most one DB query).
+        Mutates AND returns the list.
+        """
+        from chatpop.utils.media.storage import MediaStorage, USER_AVATAR_PROXY_PREFIX
+
+        if not messages or not MediaStorage.is_s3_configured():
+            return messages
+
+        user_ids = {
+            msg["avatar_url"][len(USER_AVATAR_PROXY_PREFIX):].rstrip("/")
+            for msg in messages
+            if (msg.get("avatar_url") or "").startswith(USER_AVATAR_PROXY_PREFIX)
+        }
+        avatar_urls = MediaStorage.resolve_avatar_urls(user_ids) if user_ids else {}
+
+        for msg in messages:
+            cls._enrich_with_cdn_urls(msg, avatar_urls=avatar_urls)
+        return messages
+
     @classmethod
     def _get_avatar_url(cls, message: Message) -> str:
         """
@@ -167,23 +210,10 @@ class MessageCache:
         - Proxy URL for registered users using reserved_username
         - Direct storage URL for anonymous users or different usernames
 
+        Read through the room's AvatarDirectory (Redis hash, DB on a miss).
         Fallback to DiceBear for orphaned/legacy data only.
         """
-        from chatpop.utils.media import get_fallback_dicebear_url
-
-        # Look up ChatParticipation - avatar_url should always be populated
-        try:
-            participation = ChatParticipation.objects.get(
-                chat_room=message.chat_room,
-                username__iexact=message.username
-            )
-            if participation.avatar_url:
-                return participation.avatar_url
-        except ChatParticipation.DoesNotExist:
-            pass
-
-        # Fallback to DiceBear for orphaned/legacy data
-        return get_fallback_dicebear_url(message.username)
+        return AvatarDirectory.avatar_url(message.chat_room_id, message.username)
 
     @classmethod
     def _serialize_message(cls, message: Message, username_is_reserved: bool = False, avatar_url: str = None) -> Dict[str, Any]:
@@ -266,12 +296,13 @@ class MessageCache:
         return message.username.lower() == message.user.reserved_username.lower()
 
     @classmethod
-    def _queue_message_to_pipeline(cls, pipe, message: Message, ttl_seconds: int):
+    def _queue_message_to_pipeline(cls, pipe, message: Message, ttl_seconds: int, avatar_url: str = None):
         """Queue all Redis writes for a single message onto an existing pipeline.
 
         Adds: msg_data HSET, timeline ZADD, all relevant filter index ZADDs.
         Does NOT add: protected-SET SADD or registry SADD — those are deferred
         so callers (single-message vs bulk hydration) can batch them efficiently.
+        Bulk callers pass avatar_url from one AvatarDirectory.lookup() per batch.
 
         Returns:
             (touched_indexes: List[str], message_data: Dict, message_id: str)
@@ -285,7 +316,7 @@ class MessageCache:
 
         # Serialize
         username_is_reserved = cls._compute_username_is_reserved(message)
-        message_data = cls._serialize_message(message, username_is_reserved)
+        message_data = cls._serialize_message(message, username_is_reserved, avatar_url)
         message_json = json.dumps(message_data)
 
         # 1. msg_data HSET
@@ -646,15 +677,13 @@ class MessageCache:
                 continue
             try:
                 raw = val.decode() if isinstance(val, bytes) else val
-                msg = json.loads(raw)
-                # Enrich with direct CDN URLs for media fields. Read-time
-                # signing keeps URLs fresh even when cache is older than the
-                # signature TTL.
-                cls._enrich_with_cdn_urls(msg)
-                messages.append(msg)
+                messages.append(json.loads(raw))
             except (json.JSONDecodeError, AttributeError):
                 continue
-        return messages
+        # Enrich with direct CDN URLs for media fields. Read-time
+        # signing keeps URLs fresh even when cache is older than the
+        # signature TTL.
+        return cls._enrich_many(messages)
 
     @classmethod
     def get_messages(cls, room_id: Union[str, UUID], limit: int = 50) -> List[Dict[str, Any]]:
@@ -940,10 +969,14 @@ class MessageCache:
         protected_ids: List[str] = []
         hydrated_count = 0
 
-        for msg in qs:
+        messages = list(qs)
+        avatar_entries = AvatarDirectory.lookup(room_id_str, [msg.username for msg in messages])
+
+        for msg in messages:
             try:
                 touched, message_data, message_id = cls._queue_message_to_pipeline(
-                    pipe, msg, ttl_seconds
+                    pipe, msg, ttl_seconds,
+                    avatar_url=AvatarDirectory.avatar_url(room_id_str, msg.username, avatar_entries),
                 )
                 all_touched.update(touched)
                 if cls._is_protected(message_data):
@@ -1062,10 +1095,14 @@ class MessageCache:
         protected_ids: List[str] = []
         hydrated_count = 0
 
-        for msg in qs:
+        messages = list(qs)
+        avatar_entries = AvatarDirectory.lookup(room_id_str, [msg.username for msg in messages])
+
+        for msg in messages:
             try:
                 touched, message_data, message_id = cls._queue_message_to_pipeline(
-                    pipe, msg, ttl_seconds
+                    pipe, msg, ttl_seconds,
+                    avatar_url=AvatarDirectory.avatar_url(room_id_str, msg.username, avatar_entries),
                 )
                 all_touched.update(touched)
                 if cls._is_protected(message_data):
@@ -1422,12 +1459,13 @@ class MessageCache:
                             expired_ids.append(mid)
                             continue
 
-                    cls._enrich_with_cdn_urls(msg_data)
                     messages.append(msg_data)
                 except (json.JSONDecodeError, ValueError):
                     expired_ids.append(mid)
                     continue
 
+            cls._enrich_many(messages)
+
             # Clean up expired entries
             if expired_ids:
                 pipe = redis_client.pipeline()
@@ -1460,11 +1498,18 @@ class MessageCache:
                 is_deleted=False
             ).select_related('user', 'chat_room', 'reply_to').order_by('-current_pin_amount')
 
+            pinned_messages = list(pinned_messages)
+            # Also warms the avatar directory for add_pinned_message() below
+            avatar_entries = AvatarDirectory.lookup(room_id, [message.username for message in pinned_messages])
+
             messages = []
             for message in pinned_messages:
                 # Serialize and add to cache
                 username_is_reserved = cls._compute_username_is_reserved(message)
-                msg_data = cls._serialize_message(message, username_is_reserved)
+                msg_data = cls._serialize_message(
+                    message, username_is_reserved,
+                    AvatarDirectory.avatar_url(room_id, message.username, avatar_entries),
+                )
                 messages.append(msg_data)
 
                 # Repopulate Redis cache
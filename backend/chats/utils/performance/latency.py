@@ -0,0 +1,249 @@
+"""
+Cluster-wide latency histograms for CacheMonitor operations.
+
+CacheMonitor's counters and event buffer live in one worker process, so a
+dashboard request only sees the worker that served it. Every operation it
+times (cache_hit / cache_partial_hit / cache_miss, cache_write, db_read,
+db_write, hydration, eviction, hybrid_query) is also recorded here, as are
+the database backend's connect and pool checkout times (db_connect,
+db_pool_wait; see chatpop/db/postgresql):
+
+1. Durations go into log-bucketed histograms (HDR style: SUB_BUCKETS
+   buckets per doubling, so any percentile is within ~9% of the true
+   value) held in process memory.
+2. At most once per METRICS_FLUSH_INTERVAL_SECONDS the recording process
+   adds its buckets to Redis hashes with HINCRBY, both to a cumulative hash
+   (Prometheus counters) and to a per-minute hash kept for WINDOW_RETENTION
+   (dashboard percentiles over the last few minutes).
+3. Readers merge the hashes of every process: `snapshot()` for percentiles
+   and hit ratios, `prometheus_text()` for the /metrics endpoint.
+
+Bucket i covers durations up to 2 ** (i / SUB_BUCKETS) microseconds.
+
+Redis keys:
+    metrics:latency:ops                 SET of recorded operations
+    metrics:latency:{op}                HASH bucket -> count, plus sum_us (cumulative)
+    metrics:latency:{op}:{minute}       HASH bucket -> count, plus sum_us (one minute)
+
+Usage:
+    histograms.record('db_read', 12.5)
+    histograms.snapshot(minutes=5)      # {op: {count, mean_ms, p50_ms, p95_ms, p99_ms, ...}}
+    histograms.prometheus_text()
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+OPS_KEY = 'metrics:latency:ops'
+SUB_BUCKETS = 8
+SUM_FIELD = 'sum_us'
+
+# Minutes of per-minute hashes kept for the dashboard window
+WINDOW_RETENTION = 60
+
+# Prometheus `le` bounds: powers of two from 16us to ~33.5s
+PROMETHEUS_BOUNDS_US = [2 ** exponent for exponent in range(4, 26)]
+
+CACHE_READ_OPS = ('cache_hit', 'cache_partial_hit', 'cache_miss')
+
+
+def _get_redis_client():
+    """Get raw Redis client from django-redis"""
+    return cache.client.get_client()
+
+
+def _op_key(op: str, minute: Optional[int] = None) -> str:
+    return f'metrics:latency:{op}' if minute is None else f'metrics:latency:{op}:{minute}'
+
+
+def bucket_for(duration_ms: float) -> int:
+    """Histogram bucket of a duration (sub-microsecond durations share bucket 0)."""
+    duration_us = duration_ms * 1000
+    if duration_us <= 1:
+        return 0
+    return math.ceil(math.log2(duration_us) * SUB_BUCKETS)
+
+
+def bucket_upper_ms(bucket: int) -> float:
+    """Largest duration in ms a bucket holds."""
+    return 2 ** (bucket / SUB_BUCKETS) / 1000
+
+
+def percentile_ms(buckets: Dict[int, int], p: float) -> Optional[float]:
+    """Upper bound of the bucket holding the p-th percentile (None if empty)."""
+    total = sum(buckets.values())
+    if not total:
+        return None
+    rank = max(1, math.ceil(total * p / 100))
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        if seen >= rank:
+            return round(bucket_upper_ms(bucket), 3)
+    return None
+
+
+def _merge(hashes: Iterable[Dict]) -> Tuple[Dict[int, int], int]:
+    """Redis hashes -> (bucket counts, total sum_us)."""
+    buckets: Dict[int, int] = defaultdict(int)
+    sum_us = 0
+    for fields in hashes:
+        for field, value in fields.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field == SUM_FIELD:
+                sum_us += int(value)
+            else:
+                buckets[int(field)] += int(value)
+    return buckets, sum_us
+
+
+class LatencyHistograms:
+    """Per-process histogram buffer flushed into shared Redis hashes."""
+
+    def __init__(self):
+        self._buckets = defaultdict(lambda: defaultdict(int))
+        self._sums = defaultdict(int)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, op: str, duration_ms: float):
+        """Add one duration; flushes to Redis when the interval has passed."""
+        with self._lock:
+            self._buckets[op][bucket_for(duration_ms)] += 1
+            self._sums[op] += int(duration_ms * 1000)
+            due = time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_INTERVAL_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Add this process's buffered buckets to the Redis hashes."""
+        with self._lock:
+            buckets, sums = self._buckets, self._sums
+            self._buckets = defaultdict(lambda: defaultdict(int))
+            self._sums = defaultdict(int)
+            self._last_flush = time.monotonic()
+        if not buckets:
+            return
+
+        minute = int(time.time() // 60)
+        try:
+            pipe = _get_redis_client().pipeline(transaction=False)
+            pipe.sadd(OPS_KEY, *buckets)
+            for op, counts in buckets.items():
+                for key in (_op_key(op), _op_key(op, minute)):
+                    for bucket, count in counts.items():
+                        pipe.hincrby(key, bucket, count)
+                    pipe.hincrby(key, SUM_FIELD, sums[op])
+                pipe.expire(_op_key(op, minute), WINDOW_RETENTION * 60)
+            pipe.execute()
+        except Exception as e:
+            # Metrics are best-effort; this batch is dropped
+            logger.warning(f"[METRICS] Failed to flush latency histograms: {e}")
+
+    def _read(self, minutes: Optional[int]) -> Dict[str, Tuple[Dict[int, int], int]]:
+        """{op: (buckets, sum_us)} over the last `minutes` (None: cumulative)."""
+        self.flush()
+        try:
+            redis_client = _get_redis_client()
+            ops = sorted(op.decode() if isinstance(op, bytes) else op for op in redis_client.smembers(OPS_KEY))
+            pipe = redis_client.pipeline(transaction=False)
+            if minutes is None:
+                for op in ops:
+                    pipe.hgetall(_op_key(op))
+                results = pipe.execute()
+                return {op: _merge([fields]) for op, fields in zip(ops, results)}
+
+            current = int(time.time() // 60)
+            window = range(current - minutes + 1, current + 1)
+            for op in ops:
+                for minute in window:
+                    pipe.hgetall(_op_key(op, minute))
+            results = pipe.execute()
+            return {
+                op: _merge(results[i * len(window):(i + 1) * len(window)])
+                for i, op in enumerate(ops)
+            }
+        except Exception as e:
+            logger.warning(f"[METRICS] Failed to read latency histograms: {e}")
+            return {}
+
+    def snapshot(self, minutes: Optional[int] = 5) -> Dict:
+        """
+        Cluster-wide latency and hit ratio.
+
+        Args:
+            minutes: Window in minutes (None: since the hashes were created)
+
+        Returns:
+            {
+                'operations': {op: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}},
+                'hit_rate': 87.5,   # % of cache reads that were full hits, None if none
+            }
+        Operations include a merged 'cache_read' row over the three outcomes.
+        """
+        data = self._read(minutes)
+        read_buckets: Dict[int, int] = defaultdict(int)
+        read_sum = 0
+        for op in CACHE_READ_OPS:
+            buckets, sum_us = data.get(op, ({}, 0))
+            read_sum += sum_us
+            for bucket, count in buckets.items():
+                read_buckets[bucket] += count
+        if read_buckets:
+            data['cache_read'] = (read_buckets, read_sum)
+
+        operations = {}
+        for op, (buckets, sum_us) in sorted(data.items()):
+            count = sum(buckets.values())
+            if not count:
+                continue
+            operations[op] = {
+                'count': count,
+                'mean_ms': round(sum_us / count / 1000, 3),
+                'p50_ms': percentile_ms(buckets, 50),
+                'p95_ms': percentile_ms(buckets, 95),
+                'p99_ms': percentile_ms(buckets, 99),
+                'max_ms': round(bucket_upper_ms(max(buckets)), 3),
+            }
+
+        reads = operations.get('cache_read', {}).get('count', 0)
+        hits = operations.get('cache_hit', {}).get('count', 0)
+        return {
+            'operations': operations,
+            'hit_rate': round(hits / reads * 100, 1) if reads else None,
+        }
+
+    def prometheus_text(self) -> str:
+        """Cumulative histograms in the Prometheus text exposition format."""
+        name = 'chatpop_operation_duration_seconds'
+        lines: List[str] = [
+            f'# HELP {name} Duration of cache and database operations and database connects.',
+            f'# TYPE {name} histogram',
+        ]
+        for op, (buckets, sum_us) in sorted(self._read(None).items()):
+            ordered = sorted(buckets.items())
+            index = 0
+            cumulative = 0
+            for bound_us in PROMETHEUS_BOUNDS_US:
+                # Fine buckets whose upper bound fits under this `le`
+                while index < len(ordered) and 2 ** (ordered[index][0] / SUB_BUCKETS) <= bound_us:
+                    cumulative += ordered[index][1]
+                    index += 1
+                lines.append(f'{name}_bucket{{operation="{op}",le="{bound_us / 1e6:g}"}} {cumulative}')
+            total = sum(buckets.values())
+            lines.append(f'{name}_bucket{{operation="{op}",le="+Inf"}} {total}')
+            lines.append(f'{name}_sum{{operation="{op}"}} {sum_us / 1e6:g}')
+            lines.append(f'{name}_count{{operation="{op}"}} {total}')
+        return '\n'.join(lines) + '\n'
+
+
+histograms = LatencyHistograms()
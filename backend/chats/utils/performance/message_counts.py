@@ -0,0 +1,234 @@
+"""
+Maintained per-room message counts (ChatRoomMessageCount).
+
+ChatRoomSerializer used to run COUNT(*) over a room's messages for every
+serialized room. The count is now a row kept current on write, in its own
+table so that ChatRoom saves never touch it:
+
+1. Message creates / soft-deletes add +1 / -1 to a Redis hash of pending
+   deltas (one HINCRBY, no row lock on the ChatRoom row, so hot rooms do
+   not serialize their writers on it).
+2. At most once per MESSAGE_COUNT_FLUSH_INTERVAL_SECONDS a writer takes the
+   whole hash and applies it to ChatRoomMessageCount in one F() UPDATE.
+3. Readers add the room's pending delta to the stored count, so counts are
+   exact between flushes (one query and one HMGET for a whole page of rooms).
+
+If Redis is unavailable the delta is applied to the stored count directly.
+Messages removed without a signal (hard deletes, bulk_create, raw SQL) are
+repaired by:
+
+    ./venv/bin/python manage.py reconcile_message_counts
+
+Redis keys:
+    room_msg_count:pending      HASH room_id -> delta not yet stored
+    room_msg_count:flush_lock   held for the flush interval by the flusher
+
+Usage:
+    record_message_count(room_id, +1)
+    message_counts_for_rooms(rooms)   # {room_id: count}
+    flush_message_counts()
+"""
+
+import logging
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'room_msg_count:pending'
+FLUSH_LOCK_KEY = 'room_msg_count:flush_lock'
+
+RECONCILE_BATCH_SIZE = 500
+
+# Atomically read and clear the pending deltas so each one is applied once
+_TAKE_LUA = """
+local entries = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return entries
+"""
+
+
+def _get_redis_client():
+    """Get raw Redis client from django-redis"""
+    return cache.client.get_client()
+
+
+def _apply_deltas(deltas: Dict[str, int]) -> int:
+    """Add deltas to the rooms' ChatRoomMessageCount rows in a single UPDATE."""
+    from chats.models import ChatRoom, ChatRoomMessageCount
+
+    deltas = {room_id: delta for room_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    # Rooms without a row start counting from zero (deleted rooms are skipped)
+    new_rooms = ChatRoom.objects.filter(pk__in=deltas.keys(), message_count_row__isnull=True)
+    ChatRoomMessageCount.objects.bulk_create(
+        [ChatRoomMessageCount(chat_room_id=room_id) for room_id in new_rooms.values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    return ChatRoomMessageCount.objects.filter(pk__in=deltas.keys()).update(
+        count=F('count') + Case(
+            *[When(pk=room_id, then=Value(delta)) for room_id, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def record_message_count(room_id, delta: int = 1) -> None:
+    """
+    Buffer a change to a room's message count.
+
+    Called with delta=1 when a message is created and delta=-1 when it is
+    soft-deleted, once the write has committed.
+
+    Args:
+        room_id: ChatRoom UUID
+        delta: Amount to add to the count
+    """
+    try:
+        _get_redis_client().hincrby(PENDING_KEY, str(room_id), delta)
+    except Exception as e:
+        logger.warning(f"[MESSAGE_COUNT] Redis unavailable, updating stored count directly: {e}")
+        _apply_deltas({str(room_id): delta})
+        return
+
+    if cache.add(FLUSH_LOCK_KEY, 1, settings.MESSAGE_COUNT_FLUSH_INTERVAL_SECONDS):
+        flush_message_counts()
+
+
+def flush_message_counts() -> int:
+    """
+    Apply every pending delta to the stored counts.
+
+    Returns:
+        int: Number of rooms updated
+    """
+    client = _get_redis_client()
+    entries = client.eval(_TAKE_LUA, 1, PENDING_KEY)
+    deltas = {
+        entries[i].decode(): int(entries[i + 1])
+        for i in range(0, len(entries), 2)
+    }
+    try:
+        updated = _apply_deltas(deltas)
+    except Exception:
+        # Put the deltas back for the next flush rather than losing them
+        pipe = client.pipeline(transaction=False)
+        for room_id, delta in deltas.items():
+            pipe.hincrby(PENDING_KEY, room_id, delta)
+        pipe.execute()
+        raise
+    if updated:
+        logger.debug(f"[MESSAGE_COUNT] Flushed deltas for {updated} rooms")
+    return updated
+
+
+def pending_message_counts(room_ids: Iterable) -> Dict[str, int]:
+    """
+    Deltas not yet flushed to the stored counts, for each room (0 if none).
+
+    Args:
+        room_ids: ChatRoom UUIDs
+
+    Returns:
+        Dict mapping room_id (str) -> pending delta
+    """
+    keys = [str(room_id) for room_id in room_ids]
+    if not keys:
+        return {}
+    try:
+        values = _get_redis_client().hmget(PENDING_KEY, keys)
+    except Exception as e:
+        logger.warning(f"[MESSAGE_COUNT] Pending deltas unavailable, using stored counts only: {e}")
+        return dict.fromkeys(keys, 0)
+    return {key: int(value) if value else 0 for key, value in zip(keys, values)}
+
+
+def message_counts_for_rooms(rooms: Iterable) -> Dict[str, int]:
+    """
+    Current non-deleted message count for each room: the stored count plus
+    any pending delta.
+
+    Args:
+        rooms: ChatRoom instances
+
+    Returns:
+        Dict mapping room_id (str) -> message count
+    """
+    from chats.models import ChatRoomMessageCount
+
+    stored = {str(room.id): 0 for room in rooms}
+    if stored:
+        stored.update(
+            (str(room_id), count)
+            for room_id, count in ChatRoomMessageCount.objects.filter(pk__in=stored.keys()).values_list('pk', 'count')
+        )
+
+    pending = pending_message_counts(stored.keys())
+    # Deltas for messages that predate the stored counts can dip below zero
+    return {
+        room_id: max(0, count + pending[room_id])
+        for room_id, count in stored.items()
+    }
+
+
+def reconcile_message_counts(room_ids: Optional[Iterable] = None, dry_run: bool = False) -> Dict[str, tuple]:
+    """
+    Recount non-deleted messages and repair rooms whose stored count has
+    drifted.
+
+    Pending deltas are flushed first so the stored count is comparable with a
+    fresh COUNT. A message committed between the flush and the repair can
+    be counted twice (once by the recount, once by its pending delta);
+    the next run corrects that.
+
+    Args:
+        room_ids: Rooms to check (default: every room)
+        dry_run: Report drift without writing
+
+    Returns:
+        Dict mapping room_id (str) -> (stored, actual) for each drifted room
+    """
+    from chats.models import ChatRoom, ChatRoomMessageCount, Message
+
+    flush_message_counts()
+
+    actual = Coalesce(
+        Subquery(
+            Message.objects.filter(chat_room=OuterRef('pk'), is_deleted=False)
+            .order_by().values('chat_room').annotate(n=Count('id')).values('n'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+    rooms = ChatRoom.objects.all()
+    if room_ids is not None:
+        rooms = rooms.filter(pk__in=list(room_ids))
+
+    drifted: Dict[str, tuple] = {}
+    ids = list(rooms.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), RECONCILE_BATCH_SIZE):
+        batch = (
+            ChatRoom.objects.filter(pk__in=ids[start:start + RECONCILE_BATCH_SIZE])
+            .annotate(stored=Coalesce('message_count_row__count', Value(0)), actual=actual)
+            .filter(~Q(stored=F('actual')))
+            .values_list('pk', 'stored', 'actual')
+        )
+        batch_drift = {room_id: (stored, count) for room_id, stored, count in batch}
+        if batch_drift and not dry_run:
+            ChatRoomMessageCount.objects.bulk_create(
+                [ChatRoomMessageCount(chat_room_id=room_id) for room_id in batch_drift],
+                ignore_conflicts=True,
+            )
+            # Recount inside the UPDATE so messages written since the read are included
+            ChatRoomMessageCount.objects.filter(pk__in=batch_drift.keys()).update(count=actual)
+        drifted.update({str(room_id): counts for room_id, counts in batch_drift.items()})
+
+    if drifted:
+        logger.info(f"[MESSAGE_COUNT] Reconciled {len(drifted)} rooms{' (dry run)' if dry_run else ''}")
+    return drifted
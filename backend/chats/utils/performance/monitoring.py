@@ -11,6 +11,8 @@ Features:
 - Aggregated metrics (always tracked, minimal overhead)
 - Adaptive sampling based on current traffic
 - Zero overhead when monitoring is disabled
+- Cluster-wide latency histograms in Redis (see latency.py), recorded
+  while monitoring is enabled
 
 Usage:
     from .monitoring import monitor
@@ -33,6 +35,8 @@ from datetime import datetime
 from typing import Dict, List, Optional, Literal
 from django.conf import settings
 
+from .latency import histograms
+
 
 class CacheMonitor:
     """
@@ -59,6 +63,9 @@ class CacheMonitor:
         self.ops_counter = deque(maxlen=10)  # Last 10 seconds
         self.ops_lock = threading.Lock()
 
+        # Latency histograms shared by all processes via Redis
+        self.histograms = histograms
+
         # Monitoring mode (cached, refreshed on check)
         self._enabled_cache = None
         self._enabled_cache_time = 0
@@ -150,6 +157,9 @@ class CacheMonitor:
             self.metrics[f'{metric_type}_count'] += 1
             if duration_ms > 0:
                 self.metrics[f'{metric_type}_total_ms'] += duration_ms
+        # Latency histograms flush to Redis: only when monitoring is enabled
+        if self.enabled:
+            self.histograms.record(metric_type, duration_ms)
 
     # Public API: Cache operations
 
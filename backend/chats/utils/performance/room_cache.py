@@ -0,0 +1,435 @@
+"""
+Two-tier cache for resolving chat rooms by URL (host username + code) or code.
+
+Almost every chat REST endpoint and WebSocket handler starts by looking up
+its room. RoomCache answers that from:
+
+1. An in-process TTL LRU (ROOM_CACHE_LOCAL_TTL_SECONDS, default 2s), and
+2. Redis snapshots of the room row, its host and its theme,
+
+falling back to the same DB query as before.
+
+Lookups return a RoomRecord: an immutable record of the fields request
+handling branches on (feature flags, access mode, theme, host ids).
+RoomRecord.to_model() builds a ChatRoom instance (host and theme attached)
+from the snapshot without a query, for code that needs a model instance.
+The snapshot may be stale, so it is for reads: writers save it only with
+update_fields or reload the row first.
+
+Redis keys:
+    room_alias:url:{host}:{code}  -> room id (host lowercased)
+    room_alias:code:{code}        -> room id
+    room:{room_id}:snapshot       HASH: room, host (JSON), theme_pk
+    room_theme:{theme_pk}         theme JSON
+    room_snapshot:generation      bumped by every invalidation
+
+Aliases are only hints: a snapshot is used only if its host username /
+code still match the lookup, so renames never resolve through stale
+aliases. Fills are compare-and-set on the generation, so a reader that
+loaded the DB row before a concurrent save cannot write the old row back.
+
+Invalidated by chats/signals.py on ChatRoom / ChatTheme save and delete and
+host User changes. Other processes' local tiers expire within the local TTL.
+
+Usage:
+    record = RoomCache.resolve(code, username)     # None if not found
+    record = RoomCache.resolve_by_code(code)       # raises ChatRoom.DoesNotExist
+    chat_room = record.to_model()
+"""
+
+import datetime
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# Fields left out of snapshots (large, secret, or changing on every login)
+ROOM_EXCLUDED_FIELDS = ('name_embedding',)
+HOST_EXCLUDED_FIELDS = ('password', 'last_login')
+
+# KEYS: alias, generation. ARGV: snapshot key prefix and suffix, theme key
+# prefix. Returns {generation} on a miss, else {generation, room JSON,
+# host JSON, theme pk, theme JSON}.
+_LOOKUP_LUA = """
+local generation = redis.call('GET', KEYS[2]) or '0'
+local room_id = redis.call('GET', KEYS[1])
+if not room_id then
+    return {generation}
+end
+local snapshot = redis.call('HMGET', ARGV[1] .. room_id .. ARGV[2], 'room', 'host', 'theme_pk')
+if not snapshot[1] or not snapshot[2] then
+    return {generation}
+end
+local theme = ''
+if snapshot[3] and snapshot[3] ~= '' then
+    theme = redis.call('GET', ARGV[3] .. snapshot[3])
+    if not theme then
+        return {generation}
+    end
+end
+return {generation, snapshot[1], snapshot[2], snapshot[3] or '', theme}
+"""
+
+# KEYS: generation, alias, snapshot, theme. ARGV: expected generation,
+# room id, ttl, room JSON, host JSON, theme pk, theme JSON
+_FILL_LUA = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+redis.call('HSET', KEYS[3], 'room', ARGV[4], 'host', ARGV[5], 'theme_pk', ARGV[6])
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+if ARGV[6] ~= '' then
+    redis.call('SET', KEYS[4], ARGV[7], 'EX', ARGV[3])
+end
+return 1
+"""
+
+
+class _SnapshotEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder without its millisecond truncation of datetimes
+    (a snapshot must round-trip exactly: to_model() instances get saved)."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _concrete_fields(model, excluded=()):
+    return [f for f in model._meta.concrete_fields if f.name not in excluded]
+
+
+def _dump(instance, excluded=()) -> str:
+    return json.dumps(
+        {f.attname: f.value_from_object(instance) for f in _concrete_fields(type(instance), excluded)},
+        cls=_SnapshotEncoder,
+    )
+
+
+def _load(model, raw: str, excluded=()):
+    """Model instance from a _dump() string, as if loaded from the DB."""
+    values = json.loads(raw)
+    fields = _concrete_fields(model, excluded)
+    return model.from_db(
+        'default',
+        [f.attname for f in fields],
+        [f.to_python(values.get(f.attname)) for f in fields],
+    )
+
+
+@dataclass(frozen=True)
+class RoomRecord:
+    """Immutable snapshot of a chat room, its host and its theme."""
+
+    id: str
+    code: str
+    name: str
+    source: str
+    access_mode: str
+    is_active: bool
+    host_id: str
+    host_username: Optional[str]
+    voice_enabled: bool
+    video_enabled: bool
+    photo_enabled: bool
+    theme_locked: bool
+    theme_pk: Optional[str]
+    theme_id: Optional[str]
+    broadcast_message_id: Optional[str]
+
+    room_json: str = field(repr=False, compare=False)
+    host_json: str = field(repr=False, compare=False)
+    theme_json: str = field(default='', repr=False, compare=False)
+
+    @property
+    def is_public(self) -> bool:
+        from chats.models import ChatRoom
+        return self.access_mode == ChatRoom.ACCESS_PUBLIC
+
+    @classmethod
+    def from_json(cls, room_json: str, host_json: str, theme_json: str = '') -> 'RoomRecord':
+        room = json.loads(room_json)
+        host = json.loads(host_json)
+        theme = json.loads(theme_json) if theme_json else {}
+        broadcast_id = room.get('broadcast_message_id')
+        return cls(
+            id=str(room['id']),
+            code=room['code'],
+            name=room['name'],
+            source=room['source'],
+            access_mode=room['access_mode'],
+            is_active=room['is_active'],
+            host_id=str(room['host_id']),
+            host_username=host.get('reserved_username'),
+            voice_enabled=room['voice_enabled'],
+            video_enabled=room['video_enabled'],
+            photo_enabled=room['photo_enabled'],
+            theme_locked=room['theme_locked'],
+            theme_pk=str(room['theme_id']) if room.get('theme_id') is not None else None,
+            theme_id=theme.get('theme_id'),
+            broadcast_message_id=str(broadcast_id) if broadcast_id else None,
+            room_json=room_json,
+            host_json=host_json,
+            theme_json=theme_json,
+        )
+
+    @classmethod
+    def from_model(cls, chat_room) -> 'RoomRecord':
+        """Record for a ChatRoom loaded with select_related('host', 'theme')."""
+        theme = chat_room.theme
+        return cls.from_json(
+            _dump(chat_room, ROOM_EXCLUDED_FIELDS),
+            _dump(chat_room.host, HOST_EXCLUDED_FIELDS),
+            _dump(theme) if theme is not None else '',
+        )
+
+    def to_model(self):
+        """
+        A fresh ChatRoom instance (host and theme attached) built without a
+        query. Excluded fields (name_embedding, host password) are deferred.
+        """
+        from accounts.models import User
+        from chats.models import ChatRoom, ChatTheme
+
+        chat_room = _load(ChatRoom, self.room_json, ROOM_EXCLUDED_FIELDS)
+        chat_room.host = _load(User, self.host_json, HOST_EXCLUDED_FIELDS)
+        if self.theme_json:
+            chat_room.theme = _load(ChatTheme, self.theme_json)
+        return chat_room
+
+
+class _LocalRoomCache:
+    """Thread-safe TTL LRU of RoomRecords, keyed by alias key."""
+
+    def __init__(self, max_entries: int):
+        self._entries: 'OrderedDict[str, Tuple[float, RoomRecord]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def get(self, key: str) -> Optional[RoomRecord]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, record = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return record
+
+    def put(self, key: str, record: RoomRecord, ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, record)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RoomCache:
+    """Resolve chat rooms through the local LRU, Redis snapshots, then the DB."""
+
+    URL_ALIAS_KEY = "room_alias:url:{host}:{code}"
+    CODE_ALIAS_KEY = "room_alias:code:{code}"
+    SNAPSHOT_KEY = "room:{room_id}:snapshot"
+    THEME_KEY = "room_theme:{theme_pk}"
+    GENERATION_KEY = "room_snapshot:generation"
+
+    TTL_SECONDS = 10 * 60
+    LOCAL_MAX_ENTRIES = 2048
+
+    _local = _LocalRoomCache(LOCAL_MAX_ENTRIES)
+    _scripts = {}
+
+    @classmethod
+    def _get_redis_client(cls):
+        return cache.client.get_client()
+
+    @classmethod
+    def _script(cls, client, name, source):
+        script = cls._scripts.get(name)
+        if script is None:
+            script = cls._scripts[name] = client.register_script(source)
+        return script
+
+    @classmethod
+    def local_ttl(cls) -> float:
+        return getattr(settings, 'ROOM_CACHE_LOCAL_TTL_SECONDS', 2.0)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def resolve(cls, code: str, username: Optional[str] = None) -> Optional[RoomRecord]:
+        """
+        Active room at /{username}/{code}/ (username case-insensitive,
+        defaults to 'discover'), or None.
+        """
+        from chats.models import ChatRoom
+
+        host = (username or 'discover').lower()
+        alias_key = cls.URL_ALIAS_KEY.format(host=host, code=code)
+
+        def matches(record):
+            return (
+                record.is_active and record.code == code
+                and (record.host_username or '').lower() == host
+            )
+
+        def load():
+            return ChatRoom.objects.filter(
+                host__reserved_username__iexact=host,
+                code=code,
+                is_active=True
+            ).select_related('host', 'theme').first()
+
+        return cls._resolve(alias_key, matches, load)
+
+    @classmethod
+    def resolve_by_code(cls, code: str) -> RoomRecord:
+        """
+        Room with this code, like ChatRoom.objects.get(code=code).
+
+        Raises:
+            ChatRoom.DoesNotExist / ChatRoom.MultipleObjectsReturned
+        """
+        from chats.models import ChatRoom
+
+        def load():
+            return ChatRoom.objects.select_related('host', 'theme').get(code=code)
+
+        return cls._resolve(
+            cls.CODE_ALIAS_KEY.format(code=code),
+            lambda record: record.code == code,
+            load,
+        )
+
+    @classmethod
+    def _resolve(cls, alias_key, matches, load):
+        record = cls._local.get(alias_key)
+        if record is not None:
+            return record
+
+        record, generation = cls._read_redis(alias_key)
+        if record is not None and not matches(record):
+            record = None
+
+        if record is None:
+            chat_room = load()
+            if chat_room is None:
+                return None
+            record = RoomRecord.from_model(chat_room)
+            if generation is not None:
+                cls._fill_redis(alias_key, record, generation)
+
+        cls._local.put(alias_key, record, cls.local_ttl())
+        return record
+
+    @classmethod
+    def _read_redis(cls, alias_key) -> Tuple[Optional[RoomRecord], Optional[str]]:
+        """(record or None, generation); generation None if Redis is unavailable."""
+        try:
+            client = cls._get_redis_client()
+            result = cls._script(client, 'lookup', _LOOKUP_LUA)(
+                keys=[alias_key, cls.GENERATION_KEY],
+                args=[*cls.SNAPSHOT_KEY.split('{room_id}'), cls.THEME_KEY.split('{theme_pk}')[0]],
+                client=client,
+            )
+        except Exception as e:
+            logger.warning(f"[ROOM_CACHE] Redis lookup failed for {alias_key}: {e}")
+            return None, None
+
+        generation = result[0].decode() if isinstance(result[0], bytes) else str(result[0])
+        if len(result) < 5:
+            return None, generation
+        room_json, host_json, _, theme_json = (
+            value.decode() if isinstance(value, bytes) else value for value in result[1:]
+        )
+        try:
+            return RoomRecord.from_json(room_json, host_json, theme_json), generation
+        except (KeyError, ValueError) as e:
+            logger.warning(f"[ROOM_CACHE] Bad snapshot behind {alias_key}: {e}")
+            return None, generation
+
+    @classmethod
+    def _fill_redis(cls, alias_key, record: RoomRecord, generation: str):
+        try:
+            client = cls._get_redis_client()
+            theme_pk = record.theme_pk or ''
+            cls._script(client, 'fill', _FILL_LUA)(
+                keys=[
+                    cls.GENERATION_KEY,
+                    alias_key,
+                    cls.SNAPSHOT_KEY.format(room_id=record.id),
+                    cls.THEME_KEY.format(theme_pk=theme_pk),
+                ],
+                args=[
+                    generation, record.id, cls.TTL_SECONDS,
+                    record.room_json, record.host_json, theme_pk, record.theme_json,
+                ],
+                client=client,
+            )
+        except Exception as e:
+            logger.warning(f"[ROOM_CACHE] Redis fill failed for {alias_key}: {e}")
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _invalidate(cls, keys):
+        cls._local.clear()
+        try:
+            pipe = cls._get_redis_client().pipeline()
+            pipe.incr(cls.GENERATION_KEY)
+            if keys:
+                pipe.delete(*keys)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[ROOM_CACHE] Invalidation failed: {e}")
+
+    @classmethod
+    def invalidate_room(cls, room_id, code: Optional[str] = None, host_username: Optional[str] = None):
+        """Drop a room's snapshot (and its aliases, when code/host are given)."""
+        keys = [cls.SNAPSHOT_KEY.format(room_id=room_id)]
+        if code:
+            keys.append(cls.CODE_ALIAS_KEY.format(code=code))
+            if host_username:
+                keys.append(cls.URL_ALIAS_KEY.format(host=host_username.lower(), code=code))
+        cls._invalidate(keys)
+
+    @classmethod
+    def invalidate_host(cls, user_id):
+        """Drop snapshots of every room hosted by a user (host fields are embedded)."""
+        from chats.models import ChatRoom
+
+        room_ids = ChatRoom.objects.filter(host_id=user_id).values_list('id', flat=True)
+        cls._invalidate([cls.SNAPSHOT_KEY.format(room_id=room_id) for room_id in room_ids])
+
+    @classmethod
+    def invalidate_theme(cls, theme_pk):
+        cls._invalidate([cls.THEME_KEY.format(theme_pk=theme_pk)])
+
+    @classmethod
+    def clear_local(cls):
+        cls._local.clear()
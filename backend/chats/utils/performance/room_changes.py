@@ -0,0 +1,400 @@
+"""
+Per-room event log for cursor-based delta sync and replay.
+
+A reconnecting client used to either replay the WebSocket `hello` backfill
+(new messages only, at most BACKFILL_LIMIT) or refetch the whole message
+window, and had no way to catch up on deletes, reactions, pins or bans it
+missed. Every such change is now appended to a capped Redis stream per
+room, numbered with a per-room sequence assigned at write time:
+
+    room:{room_id}:seq       last assigned sequence number
+    room:{room_id}:changes   STREAM, entry ID "{seq}-0", fields kind, data (JSON)
+                             and event (JSON channel-layer event, if broadcast)
+
+A client keeps the highest sequence it has seen (the `cursor` of a message
+list or sync response, or the `seq` of any live frame) and asks for
+everything after it:
+
+    GET /api/chats/{username}/{code}/sync/?cursor=N   or   WS {type: 'sync', cursor: N}
+
+The answer is compacted: new messages, deleted IDs, highlight states,
+reaction count deltas, the current pinned list (if any pin changed) and
+ban states. If the stream no longer reaches back to the cursor (trimmed
+past ROOM_CHANGE_LOG_MAX_EVENTS, expired after ROOM_CHANGE_LOG_TTL_SECONDS
+idle, or Redis was flushed) the client is told to resync with a full load.
+
+Room broadcasts go through RoomChangeLog.publish(), which records the
+event and sends it to the room group tagged with its `seq`; the consumer
+puts that `seq` on every frame. A client that saw every frame up to N can
+replay the exact frames it missed:
+
+    WS {type: 'resume', seq: N}
+
+Staff can read a room's stream with `manage.py room_events` or
+GET /api/chats/admin/{room_id}/events/.
+
+Sequences are seeded from the Redis clock when a room's counter is
+(re)created, so they keep increasing across expiry and a stale cursor can
+never match a newer epoch.
+
+Usage:
+    seq = RoomChangeLog.publish(room_id, room_code, {'type': 'message_deleted', ...},
+                                RoomChangeLog.DELETE, {'message_id': ...})
+    seq = RoomChangeLog.append(room_id, RoomChangeLog.HIGHLIGHT, data)   # record only
+    cursor = RoomChangeLog.current_cursor(room_id)
+    changes = RoomChangeLog.changes_since(room_id, cursor)   # None => resync
+    replay = RoomChangeLog.events_since(room_id, cursor)     # None => resync
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple, Union
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Seed a missing counter from the server clock (microseconds) so a
+# recreated counter starts above every sequence it handed out before
+_SEED = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    local now = redis.call('TIME')
+    redis.call('SET', KEYS[1], now[1] .. string.format('%06d', tonumber(now[2])))
+end
+"""
+
+# KEYS: seq, stream. ARGV: max events, ttl, kind, data JSON, event JSON or ''.
+# Returns seq.
+_APPEND_LUA = _SEED + """
+redis.call('INCR', KEYS[1])
+-- As a string: Lua would format a number this size in exponent notation
+local seq = redis.call('GET', KEYS[1])
+if ARGV[5] == '' then
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[1], seq .. '-0', 'kind', ARGV[3], 'data', ARGV[4])
+else
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[1], seq .. '-0',
+        'kind', ARGV[3], 'data', ARGV[4], 'event', ARGV[5])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return seq
+"""
+
+# KEYS: seq. ARGV: ttl. Returns the current sequence.
+_CURRENT_LUA = _SEED + """
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return redis.call('GET', KEYS[1])
+"""
+
+# KEYS: seq, stream. ARGV: first entry ID, count.
+# Returns {} if the room has no counter, else {current seq, oldest ID, entries}.
+_READ_LUA = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return {}
+end
+local oldest = redis.call('XRANGE', KEYS[2], '-', '+', 'COUNT', 1)
+local oldest_id = ''
+if oldest[1] then
+    oldest_id = oldest[1][1]
+end
+return {current, oldest_id, redis.call('XRANGE', KEYS[2], ARGV[1], '+', 'COUNT', ARGV[2])}
+"""
+
+
+def _seq_of(entry_id) -> int:
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    return int(entry_id.split('-', 1)[0])
+
+
+def _decode(entry) -> Tuple[int, str, Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Stream entry -> (seq, kind, data, event)."""
+    entry_id, fields = entry
+    # Flat [k, v, ...] from Lua, a dict from redis-py's XRANGE
+    pairs = fields.items() if isinstance(fields, dict) else zip(fields[::2], fields[1::2])
+    fields = {(k.decode() if isinstance(k, bytes) else k): v for k, v in pairs}
+    kind = fields['kind'].decode() if isinstance(fields['kind'], bytes) else fields['kind']
+    event = json.loads(fields['event']) if fields.get('event') else None
+    return _seq_of(entry_id), kind, json.loads(fields['data']), event
+
+
+class RoomChangeLog:
+    """Capped Redis stream of a room's changes, addressed by sequence number."""
+
+    SEQ_KEY = "room:{room_id}:seq"
+    STREAM_KEY = "room:{room_id}:changes"
+
+    # Change kinds
+    MESSAGE = 'message'          # data: broadcast message payload
+    DELETE = 'delete'            # data: {message_id}
+    HIGHLIGHT = 'highlight'      # data: {message_id, is_highlight}
+    REACTION = 'reaction'        # data: {message_id, emoji, delta}
+    PIN = 'pin'                  # data: {message_id}
+    UNPIN = 'unpin'              # data: {message_id}
+    BAN = 'ban'                  # data: {username, is_banned}
+    EVENT = 'event'              # data: {}; other broadcasts (gifts, sticky, spotlight, kicks)
+
+    # Entries read per sync; clients page with has_more
+    SYNC_LIMIT = 500
+
+    _scripts = {}
+
+    @classmethod
+    def _get_redis_client(cls):
+        """Get raw Redis client from django-redis"""
+        return cache.client.get_client()
+
+    @classmethod
+    def _script(cls, client, name, source):
+        script = cls._scripts.get(name)
+        if script is None:
+            script = cls._scripts[name] = client.register_script(source)
+        return script
+
+    @classmethod
+    def _keys(cls, room_id):
+        room_id = str(room_id)
+        return [cls.SEQ_KEY.format(room_id=room_id), cls.STREAM_KEY.format(room_id=room_id)]
+
+    @classmethod
+    def append(cls, room_id: Union[str, UUID], kind: str, data: Dict[str, Any],
+               event: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """
+        Record a change.
+
+        Args:
+            room_id: ChatRoom UUID
+            kind: One of the change kinds above
+            data: JSON-safe payload for the kind
+            event: Channel-layer event broadcast for it, kept for replay
+
+        Returns:
+            The change's sequence number, or None if Redis is unavailable
+            (clients that missed it will be told to resync).
+        """
+        try:
+            client = cls._get_redis_client()
+            seq = cls._script(client, 'append', _APPEND_LUA)(
+                keys=cls._keys(room_id),
+                args=[
+                    settings.ROOM_CHANGE_LOG_MAX_EVENTS,
+                    settings.ROOM_CHANGE_LOG_TTL_SECONDS,
+                    kind,
+                    json.dumps(data),
+                    json.dumps(event) if event is not None else '',
+                ],
+                client=client,
+            )
+            return int(seq)
+        except Exception as e:
+            logger.warning(f"[ROOM_CHANGES] Failed to append {kind} for room {room_id}: {e}")
+            return None
+
+    @classmethod
+    def publish(cls, room_id: Union[str, UUID], room_code: str, event: Dict[str, Any],
+                kind: str = EVENT, data: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """
+        Record a room event and broadcast it to the room's WebSocket group
+        with its sequence number as `seq`.
+
+        Args:
+            room_id: ChatRoom UUID
+            room_code: ChatRoom code (group chat_{code})
+            event: JSON-safe channel-layer event ({'type': handler, ...})
+            kind: Change kind for delta sync (EVENT if sync ignores it)
+            data: Payload for the kind; MESSAGE takes the event's message_data
+
+        Returns:
+            The event's sequence number, or None if Redis is unavailable
+            (the event is still broadcast).
+        """
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        seq = cls.append(room_id, kind, data or {}, event=event)
+        async_to_sync(get_channel_layer().group_send)(f'chat_{room_code}', {**event, 'seq': seq})
+        return seq
+
+    @classmethod
+    def current_cursor(cls, room_id: Union[str, UUID]) -> Optional[int]:
+        """
+        Latest sequence number of a room, to hand out with a full load.
+        Read it before loading the data it describes, so nothing written in
+        between is skipped by the next sync.
+        """
+        try:
+            client = cls._get_redis_client()
+            seq = cls._script(client, 'current', _CURRENT_LUA)(
+                keys=cls._keys(room_id)[:1],
+                args=[settings.ROOM_CHANGE_LOG_TTL_SECONDS],
+                client=client,
+            )
+            return int(seq)
+        except Exception as e:
+            logger.warning(f"[ROOM_CHANGES] Failed to read cursor for room {room_id}: {e}")
+            return None
+
+    @classmethod
+    def changes_since(cls, room_id: Union[str, UUID], cursor: int, limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Compacted changes after `cursor`.
+
+        Args:
+            room_id: ChatRoom UUID
+            cursor: Highest sequence number the client has applied
+            limit: Maximum entries to read (default SYNC_LIMIT)
+
+        Returns:
+            None if the log cannot answer from this cursor (client must do a
+            full load), else a dict:
+                cursor           sequence to sync from next time
+                has_more         more entries follow; sync again from cursor
+                messages         new messages, oldest first (deleted ones left out)
+                deleted          IDs of messages deleted since the cursor
+                highlights       {message_id: is_highlight}
+                reactions        {message_id: {emoji: count delta}}
+                pinned_messages  current pinned list, only if a pin changed
+                bans             {username: is_banned}
+        """
+        read = cls._read(room_id, cursor, limit)
+        if read is None:
+            return None
+        entries, next_cursor, has_more = read
+        return cls._compact(room_id, entries, next_cursor, has_more)
+
+    @classmethod
+    def events_since(cls, room_id: Union[str, UUID], cursor: int, limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Broadcast events after `cursor`, uncompacted, for replay.
+
+        Returns:
+            None if the log cannot answer from this cursor, else a dict:
+                cursor    sequence to resume from next time
+                has_more  more entries follow; resume again from cursor
+                events    [(seq, channel-layer event)], oldest first
+        """
+        read = cls._read(room_id, cursor, limit)
+        if read is None:
+            return None
+        entries, next_cursor, has_more = read
+        events = []
+        for entry in entries:
+            seq, _, _, event = _decode(entry)
+            if event is not None:
+                events.append((seq, event))
+        return {'cursor': next_cursor, 'has_more': has_more, 'events': events}
+
+    @classmethod
+    def _read(cls, room_id, cursor: int, limit: Optional[int]) -> Optional[Tuple[list, int, bool]]:
+        """Raw entries after `cursor` -> (entries, next cursor, has_more), None => resync."""
+        limit = limit or cls.SYNC_LIMIT
+        try:
+            client = cls._get_redis_client()
+            result = cls._script(client, 'read', _READ_LUA)(
+                keys=cls._keys(room_id),
+                args=[f'{cursor + 1}-0', limit + 1],
+                client=client,
+            )
+        except Exception as e:
+            logger.warning(f"[ROOM_CHANGES] Failed to read changes for room {room_id}: {e}")
+            return None
+
+        if not result:
+            return None
+        current = int(result[0])
+        if cursor > current:
+            return None
+        if cursor == current:
+            return [], cursor, False
+        # The oldest retained entry must follow the cursor directly
+        if not result[1] or _seq_of(result[1]) > cursor + 1:
+            return None
+
+        entries = result[2]
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        next_cursor = _seq_of(entries[-1][0]) if entries else current
+        return entries, next_cursor, has_more
+
+    @classmethod
+    def inspect(cls, room_id: Union[str, UUID], after: Optional[int] = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        A room's stream for staff tooling: counter, retained range and the
+        newest `limit` entries (or the first `limit` after `after`).
+        """
+        seq_key, stream_key = cls._keys(room_id)
+        client = cls._get_redis_client()
+        current = client.get(seq_key)
+        if after is not None:
+            raw = client.xrange(stream_key, min=f'{after + 1}-0', count=limit)
+        else:
+            raw = list(reversed(client.xrevrange(stream_key, count=limit)))
+        oldest = client.xrange(stream_key, count=1)
+        newest = client.xrevrange(stream_key, count=1)
+
+        entries = []
+        for entry in raw:
+            seq, kind, data, event = _decode(entry)
+            entries.append({'seq': seq, 'kind': kind, 'data': data, 'event': event})
+        return {
+            'current': int(current) if current is not None else None,
+            'length': client.xlen(stream_key),
+            'oldest': _seq_of(oldest[0][0]) if oldest else None,
+            'newest': _seq_of(newest[0][0]) if newest else None,
+            'ttl': client.ttl(stream_key),
+            'entries': entries,
+        }
+
+    @classmethod
+    def _compact(cls, room_id, entries, cursor: int, has_more: bool) -> Dict[str, Any]:
+        from chats.utils.performance.cache import MessageCache
+
+        messages: Dict[str, Dict[str, Any]] = {}
+        deleted = []
+        highlights: Dict[str, bool] = {}
+        reactions: Dict[str, Dict[str, int]] = {}
+        pins_changed = False
+        bans: Dict[str, bool] = {}
+
+        for entry in entries:
+            _, kind, data, event = _decode(entry)
+
+            if kind == cls.MESSAGE:
+                # Published messages are stored once, as the event's message_data
+                data = data or event['message_data']
+                messages[data['id']] = data
+            elif kind == cls.DELETE:
+                messages.pop(data['message_id'], None)
+                deleted.append(data['message_id'])
+            elif kind == cls.HIGHLIGHT:
+                highlights[data['message_id']] = data['is_highlight']
+                if data['message_id'] in messages:
+                    messages[data['message_id']]['is_highlight'] = data['is_highlight']
+            elif kind == cls.REACTION:
+                emojis = reactions.setdefault(data['message_id'], {})
+                emojis[data['emoji']] = emojis.get(data['emoji'], 0) + data['delta']
+            elif kind in (cls.PIN, cls.UNPIN):
+                pins_changed = True
+            elif kind == cls.BAN:
+                bans[data['username']] = data['is_banned']
+
+        changes = {
+            'cursor': cursor,
+            'has_more': has_more,
+            # Media URLs are stored unsigned; sign them as the message cache does
+            'messages': MessageCache._enrich_many(list(messages.values())),
+            'deleted': deleted,
+            'highlights': highlights,
+            'reactions': {
+                message_id: {emoji: delta for emoji, delta in emojis.items() if delta}
+                for message_id, emojis in reactions.items()
+                if any(emojis.values())
+            },
+            'bans': bans,
+        }
+        if pins_changed:
+            changes['pinned_messages'] = MessageCache.get_pinned_messages(room_id)
+        return changes
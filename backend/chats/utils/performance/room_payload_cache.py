@@ -0,0 +1,283 @@
+"""
+Pre-rendered JSON for the chat room detail endpoint.
+
+ChatRoomDetailView used to run ChatRoomSerializer on every page load and
+reconnect: the host's UserSerializer (two subscription COUNTs, a signed CDN
+avatar URL), ChatThemeSerializer over the theme's style fields, and a
+host-joined EXISTS query. Room metadata rarely changes, so the rendered
+JSON is cached instead:
+
+    room:{room_id}:payload          HASH: body (room JSON without theme and
+                                    message_count), theme_pk, host_joined, host_id
+    room_theme:{theme_pk}:payload   theme JSON (shared by every room using it)
+    room_payload:generation         bumped by every invalidation
+
+The response is assembled from these bytes without deserializing them.
+message_count changes with every message and is not cached; it is spliced
+in from message_counts_for_rooms().
+
+Fills are compare-and-set on the generation (as in RoomCache), so a reader
+that rendered the old row cannot cache it after a concurrent change.
+
+Invalidated by chats/signals.py on ChatRoom / ChatTheme save and delete,
+host User changes, subscriptions (the host's subscriber counts are
+embedded) and the host joining or leaving (host_joined).
+
+Usage:
+    payload = RoomPayloadCache.get(chat_room)
+    if payload.host_joined: ...
+    return payload_response(request, payload.body)
+"""
+
+import hashlib
+import logging
+from typing import NamedTuple, Optional, Tuple
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import quote_etag
+
+logger = logging.getLogger(__name__)
+
+# KEYS: payload, generation. ARGV: theme key prefix and suffix.
+# Returns {generation} on a miss, else {generation, body, host_joined, theme JSON}.
+_LOOKUP_LUA = """
+local generation = redis.call('GET', KEYS[2]) or '0'
+local payload = redis.call('HMGET', KEYS[1], 'body', 'host_joined', 'theme_pk')
+if not payload[1] or not payload[2] then
+    return {generation}
+end
+local theme = 'null'
+if payload[3] and payload[3] ~= '' then
+    theme = redis.call('GET', ARGV[1] .. payload[3] .. ARGV[2])
+    if not theme then
+        return {generation}
+    end
+end
+return {generation, payload[1], payload[2], theme}
+"""
+
+# KEYS: generation, payload, theme. ARGV: expected generation, ttl, body,
+# theme pk, host_joined, host id, theme JSON
+_FILL_LUA = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[2], 'body', ARGV[3], 'theme_pk', ARGV[4], 'host_joined', ARGV[5], 'host_id', ARGV[6])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if ARGV[4] ~= '' then
+    redis.call('SET', KEYS[3], ARGV[7], 'EX', ARGV[2])
+end
+return 1
+"""
+
+# KEYS: generation, payload. ARGV: user id.
+# Only a participation of the host can change host_joined.
+_PARTICIPATION_LUA = """
+redis.call('INCR', KEYS[1])
+local payload = redis.call('HMGET', KEYS[2], 'host_joined', 'host_id')
+if payload[1] == '0' or payload[2] == ARGV[1] then
+    redis.call('DEL', KEYS[2])
+    return 1
+end
+return 0
+"""
+
+
+class RoomPayload(NamedTuple):
+    """Rendered detail JSON for one room."""
+    body: bytes
+    host_joined: bool
+
+
+def _render(data) -> bytes:
+    from rest_framework.renderers import JSONRenderer
+    return JSONRenderer().render(data)
+
+
+def _assemble(room_json: bytes, theme_json: bytes, message_count: int) -> bytes:
+    """Splice theme and message_count into the cached room object."""
+    return b''.join((
+        room_json[:-1],
+        b',"theme":', theme_json,
+        b',"message_count":', str(message_count).encode(),
+        b'}',
+    ))
+
+
+def payload_response(request, body: bytes) -> HttpResponse:
+    """
+    JSON response for pre-rendered bytes, with an ETag (304 when the
+    client's If-None-Match still matches).
+    """
+    etag = quote_etag(hashlib.md5(body).hexdigest())
+    if any(tag.strip() in (etag, '*') for tag in request.headers.get('If-None-Match', '').split(',')):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Cacheable, but revalidated on every use (the count changes with each message)
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+class RoomPayloadCache:
+    """Redis cache of rendered ChatRoomSerializer output."""
+
+    PAYLOAD_KEY = "room:{room_id}:payload"
+    THEME_KEY = "room_theme:{theme_pk}:payload"
+    GENERATION_KEY = "room_payload:generation"
+
+    # Well under SIGNED_URL_VALIDITY_SECONDS, so the host's signed avatar
+    # URL is still valid for as long as the payload is served
+    TTL_SECONDS = 10 * 60
+
+    _scripts = {}
+
+    @classmethod
+    def _get_redis_client(cls):
+        """Get raw Redis client from django-redis"""
+        return cache.client.get_client()
+
+    @classmethod
+    def _script(cls, client, name, source):
+        script = cls._scripts.get(name)
+        if script is None:
+            script = cls._scripts[name] = client.register_script(source)
+        return script
+
+    @classmethod
+    def get(cls, chat_room) -> RoomPayload:
+        """
+        Detail JSON for a room (access_code omitted) and whether its host
+        has joined.
+
+        Args:
+            chat_room: ChatRoom with host and theme loaded (e.g. from
+                RoomCache.to_model())
+        """
+        from chats.utils.performance.message_counts import message_counts_for_rooms
+
+        message_counts = message_counts_for_rooms([chat_room])
+        message_count = message_counts[str(chat_room.id)]
+
+        cached, generation = cls._read_redis(chat_room.id)
+        if cached is not None:
+            room_json, host_joined, theme_json = cached
+            return RoomPayload(_assemble(room_json, theme_json, message_count), host_joined)
+
+        room_json, theme_json, host_joined = cls._render_room(chat_room, message_counts)
+        if generation is not None:
+            cls._fill_redis(chat_room, generation, room_json, theme_json, host_joined)
+        return RoomPayload(_assemble(room_json, theme_json, message_count), host_joined)
+
+    @classmethod
+    def _render_room(cls, chat_room, message_counts) -> Tuple[bytes, bytes, bool]:
+        from chats.models import ChatParticipation
+        from chats.serializers import ChatRoomSerializer
+
+        data = ChatRoomSerializer(chat_room, context={'message_counts': message_counts}).data
+        for field in ('access_code', 'theme', 'message_count'):
+            data.pop(field, None)
+        theme_json = cls._render_theme(chat_room.theme) if chat_room.theme_id else b'null'
+
+        host_joined = ChatParticipation.objects.filter(
+            chat_room=chat_room,
+            user_id=chat_room.host_id,
+            is_anonymous_identity=False,
+        ).exists()
+        return _render(data), theme_json, host_joined
+
+    @classmethod
+    def _render_theme(cls, theme) -> bytes:
+        from chats.serializers import ChatThemeSerializer
+        return _render(ChatThemeSerializer(theme).data)
+
+    @classmethod
+    def _read_redis(cls, room_id) -> Tuple[Optional[Tuple[bytes, bool, bytes]], Optional[str]]:
+        """((room JSON, host_joined, theme JSON) or None, generation); generation None if Redis is unavailable."""
+        try:
+            client = cls._get_redis_client()
+            result = cls._script(client, 'lookup', _LOOKUP_LUA)(
+                keys=[cls.PAYLOAD_KEY.format(room_id=room_id), cls.GENERATION_KEY],
+                args=cls.THEME_KEY.split('{theme_pk}'),
+                client=client,
+            )
+        except Exception as e:
+            logger.warning(f"[ROOM_PAYLOAD] Redis lookup failed for room {room_id}: {e}")
+            return None, None
+
+        generation = result[0].decode() if isinstance(result[0], bytes) else str(result[0])
+        if len(result) < 4:
+            return None, generation
+        room_json, host_joined, theme_json = (
+            value if isinstance(value, bytes) else str(value).encode() for value in result[1:]
+        )
+        return (room_json, host_joined == b'1', theme_json), generation
+
+    @classmethod
+    def _fill_redis(cls, chat_room, generation: str, room_json: bytes, theme_json: bytes, host_joined: bool):
+        theme_pk = chat_room.theme_id or ''
+        try:
+            client = cls._get_redis_client()
+            cls._script(client, 'fill', _FILL_LUA)(
+                keys=[
+                    cls.GENERATION_KEY,
+                    cls.PAYLOAD_KEY.format(room_id=chat_room.id),
+                    cls.THEME_KEY.format(theme_pk=theme_pk),
+                ],
+                args=[
+                    generation, cls.TTL_SECONDS, room_json, theme_pk,
+                    int(host_joined), str(chat_room.host_id), theme_json,
+                ],
+                client=client,
+            )
+        except Exception as e:
+            logger.warning(f"[ROOM_PAYLOAD] Redis fill failed for room {chat_room.id}: {e}")
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _invalidate(cls, keys):
+        try:
+            pipe = cls._get_redis_client().pipeline()
+            pipe.incr(cls.GENERATION_KEY)
+            if keys:
+                pipe.delete(*keys)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[ROOM_PAYLOAD] Invalidation failed: {e}")
+
+    @classmethod
+    def invalidate_rooms(cls, room_ids):
+        cls._invalidate([cls.PAYLOAD_KEY.format(room_id=room_id) for room_id in room_ids])
+
+    @classmethod
+    def invalidate_room(cls, room_id):
+        cls.invalidate_rooms([room_id])
+
+    @classmethod
+    def invalidate_hosts(cls, *user_ids):
+        """Drop payloads of every room hosted by these users (host fields are embedded)."""
+        from chats.models import ChatRoom
+
+        cls.invalidate_rooms(ChatRoom.objects.filter(host_id__in=user_ids).values_list('id', flat=True))
+
+    @classmethod
+    def invalidate_theme(cls, theme_pk):
+        cls._invalidate([cls.THEME_KEY.format(theme_pk=theme_pk)])
+
+    @classmethod
+    def participation_changed(cls, room_id, user_id):
+        """A registered user joined or left: drop the payload if host_joined may have changed."""
+        try:
+            client = cls._get_redis_client()
+            cls._script(client, 'participation', _PARTICIPATION_LUA)(
+                keys=[cls.GENERATION_KEY, cls.PAYLOAD_KEY.format(room_id=room_id)],
+                args=[str(user_id)],
+                client=client,
+            )
+        except Exception as e:
+            logger.warning(f"[ROOM_PAYLOAD] Invalidation failed for room {room_id}: {e}")
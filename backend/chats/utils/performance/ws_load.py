@@ -0,0 +1,345 @@
+"""
+End-to-end WebSocket load test for ChatConsumer.
+
+tests_redis_cache_load.py exercises the cache layer directly; this drives
+the real ASGI application in-process (channels.testing.WebsocketCommunicator,
+the configured channel layer, Postgres and Redis) through a scripted mix of
+rooms:
+
+1. Connect storm: every client of every room connects at once.
+2. Traffic: senders post `messages` chat messages each; every client in the
+   room (senders included) must receive every one of them.
+3. Reconnect: `reconnects` clients per room drop after the first message,
+   come back and send the `hello` handshake for the backfill.
+
+Reported per run: p50/p95/p99/max of connect, send-to-receive and
+hello-to-backfill latencies, messages and deliveries per second, DB queries
+(every connection opened during the run) and Redis commands (server-wide
+delta of total_commands_processed).
+
+Every socket of the run lives in this one process, so with the core
+channel layer all of their group_send copies share the process's single
+"specific." queue and its `capacity`; messages beyond it are dropped and
+reported as `lost`, exactly as on one production worker. Pass `capacity`
+to measure the consumer path without that ceiling.
+
+Scenarios name common mixes; run them with `manage.py benchmark_websockets`
+and compare the JSON results across commits.
+
+Usage:
+    result = run_load_test(SCENARIOS['mixed'])
+    result = run_load_test(RoomMix(rooms=2, listeners=3, senders=2, messages=3, reconnects=1))
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import subprocess
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+
+logger = logging.getLogger(__name__)
+
+# Room codes and usernames of load-test data (deleted afterwards)
+CODE_PREFIX = 'wsbench-'
+# Seconds without a frame before a client's missing messages count as lost
+# (e.g. dropped by a channel layer over capacity)
+RECEIVE_TIMEOUT = 10
+
+
+class RoomMix(NamedTuple):
+    """Shape of one load-test run."""
+    rooms: int
+    listeners: int     # clients per room that only receive
+    senders: int       # clients per room that send `messages` each
+    messages: int
+    reconnects: int    # clients per room that drop and come back with `hello`
+
+
+SCENARIOS = {
+    'smoke': RoomMix(rooms=2, listeners=3, senders=2, messages=3, reconnects=1),
+    'mixed': RoomMix(rooms=20, listeners=15, senders=3, messages=10, reconnects=2),
+    'busy': RoomMix(rooms=5, listeners=40, senders=10, messages=20, reconnects=5),
+    'fanout': RoomMix(rooms=1, listeners=1000, senders=1, messages=20, reconnects=0),
+}
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank p50/p95/p99/max in ms, None for an empty sample."""
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None, 'count': 0}
+    ordered = sorted(values)
+
+    def rank(p):
+        return round(ordered[min(len(ordered) - 1, max(0, int(len(ordered) * p / 100 + 0.5) - 1))], 2)
+
+    return {'p50': rank(50), 'p95': rank(95), 'p99': rank(99), 'max': round(ordered[-1], 2), 'count': len(ordered)}
+
+
+class QueryCounter:
+    """Count SQL statements on every connection opened while active."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def _attach(self, sender, connection, **kwargs):
+        # Fires again each time a connection object reconnects
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __enter__(self):
+        # Consumers run DB work in executor threads that open their own connections
+        connection_created.connect(self._attach, weak=False)
+        for conn in connections.all(initialized_only=True):
+            self._attach(None, conn)
+        return self
+
+    def __exit__(self, *exc):
+        connection_created.disconnect(self._attach)
+        for conn in connections.all(initialized_only=True):
+            if self in conn.execute_wrappers:
+                conn.execute_wrappers.remove(self)
+
+
+def _redis_commands() -> Optional[int]:
+    try:
+        return cache.client.get_client().info('stats')['total_commands_processed']
+    except Exception as e:
+        logger.warning(f"[WS_LOAD] Could not read Redis stats: {e}")
+        return None
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+class _Client(NamedTuple):
+    room: Any
+    username: str
+    token: str
+
+
+def _setup(mix: RoomMix):
+    """Rooms, participations and session tokens -> (host, {room: [clients]})."""
+    from accounts.models import User
+    from chats.models import ChatParticipation, ChatRoom
+    from chats.utils.security.auth import ChatSessionValidator
+    from chats.utils.username.availability import mark_taken
+
+    run_id = uuid.uuid4().hex[:8]
+    host = User.objects.create_user(
+        email=f'{run_id}@wsbench.invalid', password=None, reserved_username=f'WsBench{run_id}',
+    )
+    per_room = mix.listeners + mix.senders + mix.reconnects
+    clients = {}
+    for r in range(mix.rooms):
+        room = ChatRoom.objects.create(
+            name=f'Load test {r}', code=f'{CODE_PREFIX}{run_id}-{r}', host=host,
+            access_mode=ChatRoom.ACCESS_PUBLIC,
+        )
+        usernames = [f'Bench{r}x{c}' for c in range(per_room)]
+        ChatParticipation.objects.bulk_create([
+            ChatParticipation(chat_room=room, username=username, session_key=f'{run_id}{username}')
+            for username in usernames
+        ])
+        # bulk_create sends no post_save, so index the names here
+        transaction.on_commit(partial(mark_taken, *usernames))
+        clients[room] = [
+            _Client(room, username, ChatSessionValidator.create_session_token(
+                chat_code=room.code, username=username, session_key=f'{run_id}{username}',
+            ))
+            for username in usernames
+        ]
+    return host, clients
+
+
+def _teardown(host, rooms):
+    from chats.utils.performance.cache import MessageCache
+
+    for room in rooms:
+        MessageCache.clear_room_cache(room.id)
+        room.delete()
+    host.delete()
+
+
+async def _connect(application, client: _Client):
+    from channels.testing import WebsocketCommunicator
+
+    communicator = WebsocketCommunicator(
+        application,
+        f'/ws/chat/{client.room.code}/?session_token={client.token}',
+        # AllowedHostsOriginValidator rejects sockets without an Origin
+        headers=[(b'origin', b'http://localhost'), (b'host', b'localhost')],
+    )
+    start = time.perf_counter()
+    connected, _ = await communicator.connect(timeout=RECEIVE_TIMEOUT)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if not connected:
+        raise RuntimeError(f'{client.username} could not connect to {client.room.code}')
+    return communicator, elapsed_ms
+
+
+async def _receive_messages(communicator, expected: int, received: Dict[str, float],
+                            first: Optional[asyncio.Future] = None):
+    """Collect chat message frames (content -> receive time) until `expected` or idle."""
+    while len(received) < expected:
+        try:
+            frame = json.loads(await communicator.receive_from(timeout=RECEIVE_TIMEOUT))
+        except asyncio.TimeoutError:
+            return
+        content = frame.get('content')
+        if not frame.get('id') or not content or not content.startswith('bench '):
+            continue  # other frame types (gift_queue, sync replies, ...)
+        received.setdefault(content, time.perf_counter())
+        if first is not None and not first.done():
+            first.set_result(frame['id'])
+
+
+async def _run(application, mix: RoomMix, clients) -> Dict[str, Any]:
+    all_clients = [client for room_clients in clients.values() for client in room_clients]
+    expected = mix.senders * mix.messages
+
+    # 1. Connect storm
+    storm_start = time.perf_counter()
+    connected = await asyncio.gather(*(_connect(application, client) for client in all_clients))
+    storm_seconds = time.perf_counter() - storm_start
+    communicators = {client: communicator for client, (communicator, _) in zip(all_clients, connected)}
+    connect_ms = [elapsed for _, elapsed in connected]
+
+    # 2. Traffic
+    sent: Dict[str, float] = {}
+    received: Dict[_Client, Dict[str, float]] = {client: {} for client in all_clients}
+    first_seen: Dict[_Client, asyncio.Future] = {}
+    receivers = []
+    for room_clients in clients.values():
+        for index, client in enumerate(room_clients):
+            reconnecting = index >= mix.listeners + mix.senders
+            if reconnecting:
+                first_seen[client] = asyncio.get_running_loop().create_future()
+            receivers.append(asyncio.ensure_future(_receive_messages(
+                communicators[client], 1 if reconnecting else expected, received[client], first_seen.get(client),
+            )))
+
+    async def send_all(client: _Client):
+        communicator = communicators[client]
+        for n in range(mix.messages):
+            content = f'bench {client.room.code} {client.username} {n}'
+            sent[content] = time.perf_counter()
+            await communicator.send_to(text_data=json.dumps({'message': content}))
+
+    traffic_start = time.perf_counter()
+    senders = [
+        client for room_clients in clients.values()
+        for client in room_clients[mix.listeners:mix.listeners + mix.senders]
+    ]
+    await asyncio.gather(*(send_all(client) for client in senders))
+    await asyncio.gather(*receivers)
+    traffic_seconds = time.perf_counter() - traffic_start
+
+    latencies = [
+        (received_at - sent[content]) * 1000
+        for client_received in received.values()
+        for content, received_at in client_received.items()
+    ]
+
+    # 3. Reconnect with hello backfill
+    backfill_ms = []
+    for client, last_seen in first_seen.items():
+        await communicators[client].disconnect()
+        if not last_seen.done():
+            continue
+        communicator, elapsed = await _connect(application, client)
+        communicators[client] = communicator
+        connect_ms.append(elapsed)
+        start = time.perf_counter()
+        await communicator.send_to(text_data=json.dumps({'type': 'hello', 'last_seen_id': last_seen.result()}))
+        while True:
+            frame = json.loads(await communicator.receive_from(timeout=RECEIVE_TIMEOUT))
+            if frame.get('type') in ('backfill', 'backfill_overflow'):
+                break
+        backfill_ms.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(communicator.disconnect() for communicator in communicators.values()))
+
+    deliveries = len(latencies)
+    # Reconnecting clients only wait for their first message
+    expected_deliveries = mix.rooms * (expected * (mix.listeners + mix.senders) + mix.reconnects)
+    return {
+        'connections': len(all_clients),
+        'connect_storm_seconds': round(storm_seconds, 3),
+        'connect_ms': percentiles(connect_ms),
+        'send_to_receive_ms': percentiles(latencies),
+        'backfill_ms': percentiles(backfill_ms),
+        'messages_sent': len(sent),
+        'deliveries': deliveries,
+        'lost': expected_deliveries - deliveries,
+        'traffic_seconds': round(traffic_seconds, 3),
+        'messages_per_second': round(len(sent) / traffic_seconds, 1) if traffic_seconds else None,
+        'deliveries_per_second': round(deliveries / traffic_seconds, 1) if traffic_seconds else None,
+    }
+
+
+def _channel_layers(capacity: Optional[int]) -> Dict[str, Any]:
+    layers = copy.deepcopy(settings.CHANNEL_LAYERS)
+    if capacity is not None and 'capacity' in layers['default'].get('CONFIG', {}):
+        layers['default']['CONFIG']['capacity'] = capacity
+    return layers
+
+
+def run_load_test(mix: RoomMix, scenario: Optional[str] = None, application=None,
+                  capacity: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run one mix against the in-process ASGI app and clean up its data.
+
+    Args:
+        mix: Rooms and clients to simulate
+        scenario: Name recorded in the result
+        application: ASGI app (default chatpop.asgi.application)
+        capacity: Channel layer capacity for the run (core layer only,
+            default: the configured one)
+
+    Returns:
+        JSON-safe result dict (see module docstring).
+    """
+    if application is None:
+        from chatpop.asgi import application
+
+    host, clients = _setup(mix)
+    try:
+        redis_before = _redis_commands()
+        with override_settings(CHANNEL_LAYERS=_channel_layers(capacity)), QueryCounter() as queries:
+            result = async_to_sync(_run)(application, mix, clients)
+        redis_after = _redis_commands()
+    finally:
+        _teardown(host, list(clients))
+
+    return {
+        'scenario': scenario,
+        'mix': mix._asdict(),
+        'commit': _commit(),
+        'channel_layer_capacity': _channel_layers(capacity)['default'].get('CONFIG', {}).get('capacity'),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        **result,
+        'db_queries': queries.count,
+        'redis_commands': redis_after - redis_before if None not in (redis_before, redis_after) else None,
+    }
@@ -0,0 +1,245 @@
+"""
+Redis index of taken usernames (User.reserved_username and
+ChatParticipation.username, lowercased).
+
+Once built by rebuild_index(), the index is authoritative both ways: a
+member is taken and a non-member is free, so neither answer needs SQL.
+A complete index carries COMPLETE_MEMBER; until it is built (or after
+Redis lost the key) a name missing from the index is confirmed against
+the DB and added if found, so the index fills itself in.
+
+Kept current on commit by chats/signals.py for save and delete (including
+cascades). Writes that send no signals call mark_taken / sync_usernames
+themselves once committed (e.g. the bulk_create in
+chats/utils/performance/ws_load.py); writes that do neither (raw SQL,
+fixtures, restores) need a rebuild.
+
+A failed add drops COMPLETE_MEMBER, so lookups confirm misses against the
+DB again until the next rebuild.
+
+Invariant: a name is only ever added after it is committed to the DB, and
+removed only after a DB recheck finds no holder. Writes committed while a
+rebuild runs go into both the live and the rebuild set. Races between a
+delete's recheck and a rebuild can at worst leave a free name indexed,
+never a taken one out.
+
+Rebuild from the DB with:
+
+    ./venv/bin/python manage.py rebuild_username_index
+
+Redis keys:
+    username:taken           SET of lowercase usernames (+ COMPLETE_MEMBER)
+    username:taken:rebuild   SET being built by rebuild_index()
+
+Usage:
+    is_username_taken('CoolCat42')   # index only once complete
+    mark_taken('CoolCat42')
+    recheck_usernames(['CoolCat42'])  # drop names no longer held
+    sync_usernames(['CoolCat42'])     # add held names, drop the rest
+"""
+
+import logging
+from typing import Iterable, Set
+
+from django.core.cache import cache
+from django.db.models.functions import Lower
+
+logger = logging.getLogger(__name__)
+
+TAKEN_KEY = 'username:taken'
+REBUILD_KEY = f'{TAKEN_KEY}:rebuild'
+
+# Member of a complete index (not a valid username)
+COMPLETE_MEMBER = ''
+
+REBUILD_BATCH_SIZE = 5000
+
+# An abandoned rebuild set expires after this long
+REBUILD_TTL_SECONDS = 60 * 60
+
+# Apply SADD/SREM to the live set and, while a rebuild runs, the rebuild set.
+# KEYS: live, rebuild. ARGV: command, names...
+_WRITE_LUA = """
+redis.call(ARGV[1], KEYS[1], unpack(ARGV, 2))
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call(ARGV[1], KEYS[2], unpack(ARGV, 2))
+end
+"""
+
+_write_script = None
+
+
+def _redis():
+    return cache.client.get_client()
+
+
+def _write(command: str, names: Iterable[str]):
+    global _write_script
+    client = _redis()
+    if _write_script is None:
+        _write_script = client.register_script(_WRITE_LUA)
+    names = list(names)
+    for i in range(0, len(names), REBUILD_BATCH_SIZE):
+        _write_script(keys=[TAKEN_KEY, REBUILD_KEY], args=[command, *names[i:i + REBUILD_BATCH_SIZE]], client=client)
+
+
+def _held_in_db(usernames: Iterable[str]) -> Set[str]:
+    """Lowercase names among `usernames` that a User or ChatParticipation holds."""
+    from accounts.models import User
+    from chats.models import ChatParticipation
+
+    lowered = {name.lower() for name in usernames if name}
+    if not lowered:
+        return set()
+    if len(lowered) == 1:
+        name = next(iter(lowered))
+        held = (
+            User.objects.filter(reserved_username__iexact=name).exists()
+            or ChatParticipation.objects.filter(username__iexact=name).exists()
+        )
+        return {name} if held else set()
+
+    reserved_users = (
+        User.objects.annotate(name=Lower('reserved_username'))
+        .filter(name__in=lowered).order_by().values_list('name', flat=True)
+    )
+    chat_usernames = (
+        ChatParticipation.objects.annotate(name=Lower('username'))
+        .filter(name__in=lowered).order_by().values_list('name', flat=True)
+    )
+    return set(reserved_users.union(chat_usernames))
+
+
+def _mark_incomplete():
+    """
+    Drop COMPLETE_MEMBER from the live and rebuild sets, so names missing
+    from the index are confirmed against the DB until the next rebuild.
+    """
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        pipe.srem(TAKEN_KEY, COMPLETE_MEMBER)
+        pipe.srem(REBUILD_KEY, COMPLETE_MEMBER)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"[USERNAME_INDEX] Failed to mark index incomplete, rebuild it: {e}")
+
+
+def mark_taken(*usernames: str):
+    """Add committed usernames to the index."""
+    names = [name.lower() for name in usernames if name]
+    if not names:
+        return
+    try:
+        _write('SADD', names)
+    except Exception as e:
+        # A complete index without these names would report them free
+        logger.warning(f"[USERNAME_INDEX] Failed to add {names}: {e}")
+        _mark_incomplete()
+
+
+def recheck_usernames(usernames: Iterable[str]):
+    """Remove names from the index that no User or ChatParticipation holds any more."""
+    names = {name.lower() for name in usernames if name}
+    if not names:
+        return
+    free = names - _held_in_db(names)
+    if not free:
+        return
+    try:
+        _write('SREM', free)
+    except Exception as e:
+        logger.warning(f"[USERNAME_INDEX] Failed to remove {free}: {e}")
+
+
+def sync_usernames(usernames: Iterable[str]):
+    """
+    Index the names a User or ChatParticipation holds and drop the others.
+
+    For committed writes that change usernames without signals
+    (QuerySet.update, bulk_update): pass both the old and the new names.
+    """
+    names = {name.lower() for name in usernames if name}
+    if not names:
+        return
+    held = _held_in_db(names)
+    mark_taken(*held)
+    if names - held:
+        try:
+            _write('SREM', names - held)
+        except Exception as e:
+            logger.warning(f"[USERNAME_INDEX] Failed to remove {names - held}: {e}")
+
+
+def is_username_taken(username: str) -> bool:
+    """
+    True if a registered user reserved `username` or any chat uses it
+    (case-insensitive). Redis reservations are not considered.
+    """
+    username_lower = username.lower()
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        pipe.sismember(TAKEN_KEY, username_lower)
+        pipe.sismember(TAKEN_KEY, COMPLETE_MEMBER)
+        taken, complete = pipe.execute()
+        if taken:
+            return True
+        if complete:
+            return False
+    except Exception as e:
+        logger.warning(f"[USERNAME_INDEX] Lookup failed, using DB: {e}")
+
+    if _held_in_db([username_lower]):
+        mark_taken(username_lower)
+        return True
+    return False
+
+
+def rebuild_index() -> int:
+    """
+    Rebuild the index from the DB into a temporary key and swap it in.
+
+    The rebuild set exists before the DB is read, so names committed
+    meanwhile (and written to both sets) are not lost in the swap.
+
+    Returns:
+        int: Number of distinct usernames indexed
+    """
+    from accounts.models import User
+    from chats.models import ChatParticipation
+
+    client = _redis()
+    pipe = client.pipeline()
+    pipe.delete(REBUILD_KEY)
+    pipe.sadd(REBUILD_KEY, COMPLETE_MEMBER)
+    pipe.expire(REBUILD_KEY, REBUILD_TTL_SECONDS)
+    pipe.execute()
+
+    sources = (
+        User.objects.exclude(reserved_username__isnull=True).exclude(reserved_username='')
+        .annotate(name=Lower('reserved_username')).order_by().values_list('name', flat=True),
+        ChatParticipation.objects.exclude(username='')
+        .annotate(name=Lower('username')).order_by().values_list('name', flat=True).distinct(),
+    )
+    for queryset in sources:
+        batch = []
+        for name in queryset.iterator(chunk_size=REBUILD_BATCH_SIZE):
+            batch.append(name)
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                client.sadd(REBUILD_KEY, *batch)
+                batch = []
+        if batch:
+            client.sadd(REBUILD_KEY, *batch)
+
+    pipe = client.pipeline()
+    pipe.persist(REBUILD_KEY)
+    pipe.rename(REBUILD_KEY, TAKEN_KEY)
+    pipe.scard(TAKEN_KEY)
+    count = pipe.execute()[-1] - 1
+    logger.info(f"[USERNAME_INDEX] Rebuilt: {count} usernames")
+    return count
+
+
+def index_size() -> int:
+    """Indexed usernames (excluding COMPLETE_MEMBER)."""
+    client = _redis()
+    return client.scard(TAKEN_KEY) - client.sismember(TAKEN_KEY, COMPLETE_MEMBER)
@@ -8,6 +8,7 @@ from accounts.models import User
 from chats.models import ChatParticipation
 from .words import ADJECTIVES, NOUNS
 from .validators import validate_username, is_username_globally_available
+from .pool import pop_username, refill_pool_inline
 from django.conf import settings
 from django.core.cache import cache
 from constance import config
@@ -23,6 +24,10 @@ def generate_username(identity_key, chat_code=None, max_attempts=None):
     - Redis tracking of generated usernames per identity
     - API bypass prevention (tracks which usernames were generated for this identity)
 
+    Names come from the pre-validated Redis pool (see pool.py) in one call;
+    the per-attempt validate + availability loop below only runs when the
+    pool is empty and another request is already refilling it.
+
     Args:
         identity_key: Identity for rate limiting (session_key or IP address)
         chat_code: The chat room code (optional - used for chat-specific suggestion caching)
@@ -79,6 +84,30 @@ def generate_username(identity_key, chat_code=None, max_attempts=None):
     chat_cache_key = f"chat:{chat_code}:recent_suggestions" if use_chat_cache else None
     chat_cache_ttl = 1800  # 30 minutes
 
+    # FAST PATH: Pre-validated pool (SPOP + reservation in one Redis call).
+    # Pooled names were checked against the DB and Redis reservations at
+    # refill time and are handed out once, so no recent-suggestion check.
+    username = pop_username(ident, cache_ttl)
+    if username is None and refill_pool_inline():
+        username = pop_username(ident, cache_ttl)
+    if username is not None:
+        generated_usernames.add(username)
+        cache.set(generated_key, generated_usernames, cache_ttl)
+
+        if generated_per_chat_key:
+            generated_per_chat = cache.get(generated_per_chat_key, set())
+            generated_per_chat.add(username)
+            cache.set(generated_per_chat_key, generated_per_chat, cache_ttl)
+
+        if use_chat_cache:
+            recent_suggestions = cache.get(chat_cache_key, set())
+            recent_suggestions.add(username.lower())
+            if len(recent_suggestions) > 1000:
+                recent_suggestions = set(list(recent_suggestions)[-800:])
+            cache.set(chat_cache_key, recent_suggestions, chat_cache_ttl)
+
+        return (username, remaining_attempts)
+
     # Try to generate a username
     internal_max_attempts = 100  # Internal retry limit (doesn't count toward user limit)
     for attempt in range(internal_max_attempts):
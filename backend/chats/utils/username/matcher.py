@@ -0,0 +1,73 @@
+"""
+Aho-Corasick multi-pattern substring matcher.
+
+Finds every pattern occurring in a text in one pass over the text,
+independent of the number of patterns. Used by profanity.py to match
+usernames against the banned-word list and the allowlist.
+
+Usage:
+    matcher = AhoCorasick(["ass", "asset", "set"])
+    matcher.find("myassets")  # {"ass", "asset", "set"}
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+
+class AhoCorasick:
+    """Pure-Python Aho-Corasick automaton (goto / fail / output tables)."""
+
+    def __init__(self, patterns: Iterable[str]):
+        # State 0 is the root
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[FrozenSet[str]] = [frozenset()]
+        self.patterns: FrozenSet[str] = frozenset(p for p in patterns if p)
+
+        outputs: List[Set[str]] = [set()]
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                state = next_state
+            outputs[state].add(pattern)
+
+        # Breadth-first: a state's fail target is always shallower, so its
+        # output set is complete before being merged in
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                outputs[next_state] |= outputs[self._fail[next_state]]
+
+        self._output = [frozenset(out) for out in outputs]
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def find(self, text: str) -> Set[str]:
+        """All patterns that occur in text as substrings."""
+        goto, fail, output = self._goto, self._fail, self._output
+        found: Set[str] = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
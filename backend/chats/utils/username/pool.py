@@ -0,0 +1,260 @@
+"""
+Pool of pre-validated, currently free usernames for instant suggestions.
+
+generate_username() used to try up to 100 random ADJECTIVE+NOUN+number
+combinations per click, running profanity validation and two `iexact`
+exists() queries for each. The pool moves that work off the request path:
+
+- Refill: generate a batch of candidates, validate them, drop the ones
+  taken in the DB (one UNION'd `IN` query over User.reserved_username and
+  ChatParticipation.username) or held in Redis (one MGET), and SADD the
+  rest into a Redis SET.
+- Pop: one Lua call SPOPs a name and reserves it for the caller
+  (`username:reserved:<lower>`, SET NX EX - the same key and value
+  is_username_globally_available() reads). Names claimed since the refill
+  are in the taken index (`username:taken`, see availability.py) and are
+  skipped, so a pooled name is never handed out after someone took it.
+
+Refills run in `manage.py refill_username_pool` (keeps the pool above the
+low-water mark). Without a worker, the first request that finds the pool
+empty refills it inline under a lock.
+
+Redis keys:
+    username:pool              SET of usernames (expires after POOL_TTL_SECONDS)
+    username:pool:stats        HASH of counters (hits, misses, collisions,
+                               low_water_pops, refills, names_added, names_rejected)
+    username:pool:refill_lock  inline refill lock
+
+Settings:
+    USERNAME_POOL_TARGET_SIZE: Size a refill fills the pool up to
+    USERNAME_POOL_LOW_WATER: Pool size below which the worker refills
+
+Usage:
+    username = pop_username(identity_key, ttl=300)
+    refill_pool()
+    pool_stats()
+"""
+
+import logging
+import random
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models.functions import Lower
+
+from .availability import TAKEN_KEY
+from .validators import validate_username
+from .words import ADJECTIVES, NOUNS
+
+logger = logging.getLogger(__name__)
+
+POOL_KEY = 'username:pool'
+STATS_KEY = 'username:pool:stats'
+REFILL_LOCK_KEY = 'username:pool:refill_lock'
+RESERVATION_KEY_PREFIX = 'username:reserved:'
+
+DEFAULT_TARGET_SIZE = 2000
+DEFAULT_LOW_WATER = 500
+
+# Pooled names are re-checked against the DB at least this often: the whole
+# set expires and the next refill starts from scratch (between refills, pops
+# check the taken index)
+POOL_TTL_SECONDS = 15 * 60
+
+REFILL_LOCK_SECONDS = 30
+
+# Candidates generated per missing name (~25% fail validation, mostly on
+# length; a few are taken)
+REFILL_OVERSAMPLE = 1.5
+REFILL_MAX_ROUNDS = 5
+
+# Popped names that are taken or whose reservation is already held are
+# skipped, up to this many
+POP_MAX_TRIES = 5
+
+# SPOP until a name that is not taken and whose reservation can be taken,
+# then report the pool size.
+# KEYS: pool, stats, taken index. ARGV: reservation key prefix, owner, ttl, max tries.
+_POP_LUA = """
+for i = 1, tonumber(ARGV[4]) do
+    local name = redis.call('SPOP', KEYS[1])
+    if not name then
+        redis.call('HINCRBY', KEYS[2], 'misses', 1)
+        return {'', 0}
+    end
+    local lower = string.lower(name)
+    if redis.call('SISMEMBER', KEYS[3], lower) == 0
+        and redis.call('SET', ARGV[1] .. lower, ARGV[2], 'NX', 'EX', ARGV[3]) then
+        redis.call('HINCRBY', KEYS[2], 'hits', 1)
+        return {name, redis.call('SCARD', KEYS[1])}
+    end
+    redis.call('HINCRBY', KEYS[2], 'collisions', 1)
+end
+return {'', redis.call('SCARD', KEYS[1])}
+"""
+
+_pop_script = None
+
+# Own generator so patching random.choice/randint in the generator module
+# (tests) does not drain into refills
+_rng = random.Random()
+
+
+def _redis():
+    return cache.client.get_client()
+
+
+def target_size() -> int:
+    return getattr(settings, 'USERNAME_POOL_TARGET_SIZE', DEFAULT_TARGET_SIZE)
+
+
+def low_water() -> int:
+    return getattr(settings, 'USERNAME_POOL_LOW_WATER', DEFAULT_LOW_WATER)
+
+
+def pop_username(identity_key, ttl: int) -> Optional[str]:
+    """
+    Take a username from the pool and reserve it for identity_key.
+
+    One Redis round trip. Returns None if the pool is empty.
+    """
+    global _pop_script
+    client = _redis()
+    if _pop_script is None:
+        _pop_script = client.register_script(_POP_LUA)
+
+    try:
+        name, size = _pop_script(
+            keys=[POOL_KEY, STATS_KEY, TAKEN_KEY],
+            args=[
+                cache.make_key(RESERVATION_KEY_PREFIX),
+                cache.client.encode(identity_key),
+                int(ttl),
+                POP_MAX_TRIES,
+            ],
+            client=client,
+        )
+    except Exception as e:
+        logger.warning(f"[USERNAME_POOL] Pop failed: {e}")
+        return None
+
+    if size < low_water():
+        client.hincrby(STATS_KEY, 'low_water_pops', 1)
+
+    if not name:
+        return None
+    return name.decode() if isinstance(name, bytes) else name
+
+
+def _generate_candidates(count: int) -> Dict[str, str]:
+    """{lowercase: username} for `count` random names that pass validate_username()."""
+    candidates = {}
+    for _ in range(count):
+        username = f"{_rng.choice(ADJECTIVES)}{_rng.choice(NOUNS)}{_rng.randint(1, 999)}"
+        try:
+            validate_username(username)
+        except ValidationError:
+            continue
+        candidates[username.lower()] = username
+    return candidates
+
+
+def _drop_taken(candidates: Dict[str, str]) -> Dict[str, str]:
+    """Remove candidates that are taken in the DB or reserved in Redis."""
+    from accounts.models import User
+    from chats.models import ChatParticipation
+
+    lowered = list(candidates)
+    reserved_users = (
+        User.objects.annotate(name=Lower('reserved_username'))
+        .filter(name__in=lowered).order_by().values_list('name', flat=True)
+    )
+    chat_usernames = (
+        ChatParticipation.objects.annotate(name=Lower('username'))
+        .filter(name__in=lowered).order_by().values_list('name', flat=True)
+    )
+    taken = set(reserved_users.union(chat_usernames))
+
+    reservations = cache.get_many([f"{RESERVATION_KEY_PREFIX}{name}" for name in lowered])
+    taken.update(key[len(RESERVATION_KEY_PREFIX):] for key in reservations)
+
+    return {name: username for name, username in candidates.items() if name not in taken}
+
+
+def refill_pool(target: Optional[int] = None) -> int:
+    """
+    Top the pool up to `target` names (default USERNAME_POOL_TARGET_SIZE).
+
+    Returns:
+        int: Number of names added
+    """
+    target = target or target_size()
+    client = _redis()
+    added = 0
+    rejected = 0
+
+    for _ in range(REFILL_MAX_ROUNDS):
+        missing = target - client.scard(POOL_KEY)
+        if missing <= 0:
+            break
+        count = int(missing * REFILL_OVERSAMPLE) + 1
+        candidates = _generate_candidates(count)
+        free = list(_drop_taken(candidates).values())
+        rejected += count - len(free)
+        free = free[:missing]
+        if free:
+            added += client.sadd(POOL_KEY, *free)
+
+    pipe = client.pipeline()
+    pipe.expire(POOL_KEY, POOL_TTL_SECONDS)
+    pipe.hincrby(STATS_KEY, 'refills', 1)
+    pipe.hincrby(STATS_KEY, 'names_added', added)
+    pipe.hincrby(STATS_KEY, 'names_rejected', rejected)
+    pipe.execute()
+
+    logger.info(f"[USERNAME_POOL] Refilled: +{added} names ({rejected} rejected)")
+    return added
+
+
+def refill_pool_inline() -> bool:
+    """
+    Refill from a request that found the pool empty.
+
+    Only one caller refills at a time; others return False immediately and
+    fall back to generating a name themselves.
+    """
+    if not cache.add(REFILL_LOCK_KEY, 1, REFILL_LOCK_SECONDS):
+        return False
+    try:
+        return refill_pool() > 0
+    except Exception as e:
+        logger.warning(f"[USERNAME_POOL] Inline refill failed: {e}")
+        return False
+    finally:
+        cache.delete(REFILL_LOCK_KEY)
+
+
+def pool_size() -> int:
+    return _redis().scard(POOL_KEY)
+
+
+def pool_stats() -> Dict[str, int]:
+    """Pool size, thresholds and counters (for monitoring)."""
+    client = _redis()
+    counters = {k.decode(): int(v) for k, v in client.hgetall(STATS_KEY).items()}
+    stats = {
+        name: counters.get(name, 0)
+        for name in ('hits', 'misses', 'collisions', 'low_water_pops', 'refills', 'names_added', 'names_rejected')
+    }
+    stats.update({
+        'size': client.scard(POOL_KEY),
+        'target_size': target_size(),
+        'low_water': low_water(),
+    })
+    return stats
+
+
+def reset_pool_stats():
+    _redis().delete(STATS_KEY)
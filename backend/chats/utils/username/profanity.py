@@ -31,7 +31,9 @@ import json
 import os
 import re
 from dataclasses import dataclass
-from typing import Optional, Set
+from typing import Dict, FrozenSet, Optional, Set
+
+from .matcher import AhoCorasick
 
 # Import your banned words
 try:
@@ -257,6 +259,19 @@ class UsernameValidator:
         "q": "g",  # visual similarity
     }
 
+    # Numbers that can map to multiple letters (normalize_text_variants)
+    AMBIGUOUS_LEET = {
+        "0": ["o", "0"],  # keep original too
+        "1": ["i", "l", "1"],  # 1 can be i, l, or stay as 1
+        "3": ["e", "3"],
+        "4": ["a", "4"],
+        "5": ["s", "5"],
+        "6": ["g", "b", "6"],
+        "7": ["t", "7"],
+        "8": ["b", "8"],
+        "9": ["g", "q", "9"],
+    }
+
     def __init__(
         self, banned_words: Set[str] = None, allowlist_tokens: Set[str] = None, allowlist_substrings: Set[str] = None
     ):
@@ -277,6 +292,18 @@ class UsernameValidator:
         # Precompute normalized allowlist tokens for performance
         self.normalized_allowlist = {self.normalize_text(token).lower(): token for token in self.allowlist_tokens}
 
+        # Compile both lists into automata so matching is one pass over the
+        # username regardless of list size. For each allowlist token, the
+        # banned words it contains are precomputed: those are the matches
+        # it protects when it occurs in a username.
+        self._banned_matcher = AhoCorasick(word for word in self.normalized_banned if len(word) >= 3)
+        self._protected_by: Dict[str, FrozenSet[str]] = {}
+        for normalized_allowed in self.normalized_allowlist:
+            contained = self._banned_matcher.find(normalized_allowed)
+            if contained:
+                self._protected_by[normalized_allowed] = frozenset(contained)
+        self._allowlist_matcher = AhoCorasick(self._protected_by)
+
     def validate_format(self, username: str) -> Optional[str]:
         """Validate username format rules. Returns error message if invalid, None if valid."""
         if not username:
@@ -311,17 +338,14 @@ class UsernameValidator:
         text = text.replace("_", "")
 
         # Process multi-character leet substitutions first (longer patterns)
-        multi_char_leet = {k: v for k, v in self.LEET_MAP.items() if len(k) > 1}
-        for leet_char, normal_char in sorted(multi_char_leet.items(), key=lambda x: len(x[0]), reverse=True):
-            text = text.replace(leet_char, normal_char)
+        for leet_chars, normal_chars in _MULTI_CHAR_LEET:
+            text = text.replace(leet_chars, normal_chars)
 
         # Then process single character substitutions
-        single_char_leet = {k: v for k, v in self.LEET_MAP.items() if len(k) == 1}
-        for leet_char, normal_char in single_char_leet.items():
-            text = text.replace(leet_char, normal_char)
+        text = text.translate(_SINGLE_CHAR_LEET_TABLE)
 
         # Handle repeated characters (like "assss" -> "ass")
-        text = re.sub(r"(.)\1{2,}", r"\1\1", text)
+        text = _REPEATED_CHARS_RE.sub(r"\1\1", text)
 
         return text
 
@@ -337,18 +361,7 @@ class UsernameValidator:
         text = text.replace("_", "")
 
         # Handle ambiguous number mappings - generate all combinations
-        # Numbers that can map to multiple letters
-        ambiguous_mappings = {
-            "0": ["o", "0"],  # keep original too
-            "1": ["i", "l", "1"],  # 1 can be i, l, or stay as 1
-            "3": ["e", "3"],
-            "4": ["a", "4"],
-            "5": ["s", "5"],
-            "6": ["g", "b", "6"],
-            "7": ["t", "7"],
-            "8": ["b", "8"],
-            "9": ["g", "q", "9"],
-        }
+        ambiguous_mappings = self.AMBIGUOUS_LEET
 
         # Start with the base text
         current_variants = {text}
@@ -374,20 +387,17 @@ class UsernameValidator:
 
         # Apply single-char leet mappings to all variants
         final_variants = set()
-        single_char_leet = {k: v for k, v in self.LEET_MAP.items() if len(k) == 1 and k not in ambiguous_mappings}
 
         for variant in current_variants:
             # Apply multi-char substitutions first
-            multi_char_leet = {k: v for k, v in self.LEET_MAP.items() if len(k) > 1}
-            for leet_char, normal_char in sorted(multi_char_leet.items(), key=lambda x: len(x[0]), reverse=True):
-                variant = variant.replace(leet_char, normal_char)
+            for leet_chars, normal_chars in _MULTI_CHAR_LEET:
+                variant = variant.replace(leet_chars, normal_chars)
 
             # Apply single char (non-ambiguous) substitutions
-            for leet_char, normal_char in single_char_leet.items():
-                variant = variant.replace(leet_char, normal_char)
+            variant = variant.translate(_UNAMBIGUOUS_LEET_TABLE)
 
             # Handle repeated characters
-            variant = re.sub(r"(.)\1{2,}", r"\1\1", variant)
+            variant = _REPEATED_CHARS_RE.sub(r"\1\1", variant)
 
             final_variants.add(variant)
 
@@ -456,10 +466,8 @@ class UsernameValidator:
         """
         Find banned words in the normalized text.
         Uses allowlists to prevent false positives on legitimate words.
-        Simplified to avoid performance issues.
+        Matching is a single pass per automaton (see AhoCorasick).
         """
-        found_banned = set()
-
         # Step 1: Normalize the input text (single normalization, no variants for performance)
         normalized_text = self.normalize_text(text).lower()
 
@@ -469,24 +477,14 @@ class UsernameValidator:
 
         # Step 3: Check for direct matches against banned words
         if normalized_text in self.normalized_banned:
-            found_banned.add(normalized_text)
-            return found_banned
-
-        # Step 4: Check for banned word substrings
-        for banned_word in self.normalized_banned:
-            if len(banned_word) >= 3 and banned_word in normalized_text:
-                # Found a banned substring, but check allowlist protection
-                # Check if any allowlisted word would explain this match
-                is_protected = False
-                for normalized_allowed in self.normalized_allowlist.keys():
-                    # If the normalized allowed token contains the banned word AND
-                    # the normalized allowed token is present in our text, it's protected
-                    if banned_word in normalized_allowed and normalized_allowed in normalized_text:
-                        is_protected = True
-                        break
-
-                if not is_protected:
-                    found_banned.add(banned_word)
+            return {normalized_text}
+
+        # Step 4: Check for banned word substrings (len >= 3), unless an
+        # allowlisted token present in the text contains the match
+        found_banned = self._banned_matcher.find(normalized_text)
+        if found_banned:
+            for normalized_allowed in self._allowlist_matcher.find(normalized_text):
+                found_banned -= self._protected_by[normalized_allowed]
 
         return found_banned
 
@@ -517,6 +515,35 @@ class UsernameValidator:
         )
 
 
+def _compile_single_char_leet(leet_map: dict) -> dict:
+    """
+    Translation table equivalent to applying each single-character
+    replacement of leet_map in order with str.replace (so chained
+    replacements like "2" -> "z" -> "s" compose).
+    """
+    single_char = [(k, v) for k, v in leet_map.items() if len(k) == 1]
+    table = {}
+    for char, _ in single_char:
+        result = char
+        for leet_char, normal_char in single_char:
+            result = result.replace(leet_char, normal_char)
+        table[ord(char)] = result
+    return table
+
+
+# Normalization tables, compiled once from UsernameValidator.LEET_MAP
+_MULTI_CHAR_LEET = sorted(
+    ((k, v) for k, v in UsernameValidator.LEET_MAP.items() if len(k) > 1),
+    key=lambda item: len(item[0]),
+    reverse=True,
+)
+_SINGLE_CHAR_LEET_TABLE = _compile_single_char_leet(UsernameValidator.LEET_MAP)
+_UNAMBIGUOUS_LEET_TABLE = _compile_single_char_leet(
+    {k: v for k, v in UsernameValidator.LEET_MAP.items() if k not in UsernameValidator.AMBIGUOUS_LEET}
+)
+_REPEATED_CHARS_RE = re.compile(r"(.)\1{2,}")
+
+
 # Global validator instance
 _validator = UsernameValidator()
 
@@ -96,18 +96,14 @@ def is_username_globally_available(username, fingerprint=None):
         bool: True if available, False if taken
     """
     # Avoid circular imports
-    from accounts.models import User
-    from chats.models import ChatParticipation
     from django.core.cache import cache
+    from .availability import is_username_taken
 
     username_lower = username.lower()
 
-    # Check if reserved by any user
-    if User.objects.filter(reserved_username__iexact=username_lower).exists():
-        return False
-
-    # Check if used in any chat (uses indexed query for performance)
-    if ChatParticipation.objects.filter(username__iexact=username_lower).exists():
+    # Check if reserved by any user or used in any chat (Redis index; the DB
+    # is only queried for names the index doesn't know to be taken)
+    if is_username_taken(username_lower):
         return False
 
     # Check if temporarily reserved in Redis (prevents race conditions)
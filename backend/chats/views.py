@@ -6,6 +6,7 @@ from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.shortcuts import get_object_or_404
 from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 from constance import config
@@ -19,8 +20,12 @@ from .serializers import (
 )
 from .utils.security.auth import ChatSessionValidator
 from .utils.turnstile import require_turnstile
+from .utils.performance.avatar_directory import AvatarDirectory
 from .utils.performance.cache import MessageCache
+from .utils.performance.message_counts import record_message_count
 from .utils.performance.monitoring import monitor
+from .utils.performance.room_changes import RoomChangeLog
+from .utils.performance.room_payload_cache import RoomPayloadCache, payload_response
 from .utils.pin_tiers import (
     get_valid_pin_tiers, get_tiers_for_frontend, get_next_tier_above,
     get_tier_duration_minutes, get_new_pin_duration_minutes, validate_pin_amount, is_valid_tier
@@ -54,28 +59,24 @@ def get_chat_room_by_url(code, username=None):
         username: The host's reserved_username (case-insensitive). Defaults to 'discover'.
 
     Returns:
-        ChatRoom instance
+        ChatRoom instance built from the room cache (up to
+        ROOM_CACHE_LOCAL_TTL_SECONDS old). Write paths save it only with
+        update_fields, or reload the row with select_for_update().
 
     Raises:
         Http404: If chat room not found
     """
     from django.http import Http404
+    from .utils.performance.room_cache import RoomCache
 
-    # Default to 'discover' for backwards compatibility with old routes
-    if not username:
-        username = 'discover'
+    # Unified lookup: all rooms by username + code ('discover' when omitted),
+    # served from the room cache (see RoomCache)
+    record = RoomCache.resolve(code, username)
 
-    # Unified lookup: all rooms by username + code
-    chat_room = ChatRoom.objects.filter(
-        host__reserved_username__iexact=username,
-        code=code,
-        is_active=True
-    ).select_related('host', 'theme').first()
-
-    if not chat_room:
+    if record is None:
         raise Http404("Chat room not found")
 
-    return chat_room
+    return record.to_model()
 
 
 class ChatRoomCreateView(generics.CreateAPIView):
@@ -120,15 +121,18 @@ class NearbyDiscoverableChatsView(APIView):
     - distance <= chat's discovery_radius_miles (chat wants to be found at this distance)
     - distance <= user's selected radius (user is searching this far)
 
+    Filtering, ordering and pagination all run in PostgreSQL behind a
+    bounding-box prefilter on the (latitude, longitude) index, so cost
+    scales with nearby rooms rather than all located rooms.
+
     Returns paginated results ordered by distance (closest first).
     """
     permission_classes = [permissions.AllowAny]
 
     def post(self, request):
-        from django.db.models import F, FloatField
-        from django.db.models.functions import Cast, Radians, Sin, Cos, ACos
+        from django.db.models import Exists, F, OuterRef
         from .serializers import NearbyDiscoverableChatSerializer
-        import math
+        from .utils.geo import bounding_box_filter, haversine_miles
 
         # Validate required parameters
         latitude = request.data.get('latitude')
@@ -164,55 +168,39 @@ class NearbyDiscoverableChatsView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Constants for Haversine formula
-        EARTH_RADIUS_MILES = 3959
-
-        # Convert user's coordinates to radians
-        user_lat_rad = math.radians(latitude)
-        user_lon_rad = math.radians(longitude)
-
-        # Get all location-discoverable chats
-        # Filter to only active chats with location set
+        # Candidate rooms: active, located, inside the bounding box of the
+        # user's radius (served by the partial lat/lon index), and with the
+        # host joined (same check as ChatRoomDetailView).
+        host_joined = ChatParticipation.objects.filter(
+            chat_room=OuterRef('pk'),
+            user=OuterRef('host'),
+        )
         queryset = ChatRoom.objects.filter(
+            Exists(host_joined),
             is_active=True,
             latitude__isnull=False,
             longitude__isnull=False,
-            discovery_radius_miles__isnull=False
-        ).select_related('host')
-
-        # Check if host has joined (same as ChatRoomDetailView)
-        queryset = queryset.filter(
-            participations__user=F('host')
-        ).distinct()
-
-        # Calculate distance using Haversine formula in Python
-        # (PostgreSQL annotation would be more efficient for large datasets,
-        # but this is clearer and works for moderate numbers of chats)
-        results = []
-        for chat in queryset:
-            chat_lat_rad = math.radians(float(chat.latitude))
-            chat_lon_rad = math.radians(float(chat.longitude))
-
-            # Haversine formula
-            dlat = chat_lat_rad - user_lat_rad
-            dlon = chat_lon_rad - user_lon_rad
-            a = math.sin(dlat / 2) ** 2 + math.cos(user_lat_rad) * math.cos(chat_lat_rad) * math.sin(dlon / 2) ** 2
-            c = 2 * math.asin(math.sqrt(a))
-            distance_miles = EARTH_RADIUS_MILES * c
-
+            discovery_radius_miles__isnull=False,
+            **bounding_box_filter(latitude, longitude, radius),
+        ).annotate(
+            distance_miles=haversine_miles(latitude, longitude),
+        ).filter(
             # Two-way check:
             # 1. User must be within chat's discovery radius
             # 2. Chat must be within user's selected radius
-            if distance_miles <= chat.discovery_radius_miles and distance_miles <= radius:
-                chat.distance_miles = round(distance_miles, 1)
-                results.append(chat)
-
-        # Sort by distance (closest first)
-        results.sort(key=lambda x: x.distance_miles)
+            distance_miles__lte=radius,
+        ).filter(
+            distance_miles__lte=F('discovery_radius_miles'),
+        )
 
-        # Apply pagination
-        total_count = len(results)
-        paginated_results = results[offset:offset + limit]
+        # Sort by distance (closest first) and paginate in the database so
+        # only the requested page is loaded
+        total_count = queryset.count()
+        paginated_results = list(
+            queryset.select_related('host').order_by('distance_miles', 'id')[offset:offset + limit]
+        )
+        for chat in paginated_results:
+            chat.distance_miles = round(chat.distance_miles, 1)
 
         # Batch fetch message activity for all paginated rooms
         from media_analysis.utils.message_activity import get_message_activity_for_rooms
@@ -243,32 +231,19 @@ class ChatRoomDetailView(APIView):
 
     def get(self, request, code, username=None):
         chat_room = get_chat_room_by_url(code, username)
+        # Pre-rendered JSON (access_code omitted) and the host-joined flag
+        payload = RoomPayloadCache.get(chat_room)
 
         # AI-generated rooms (discover) are always accessible - skip host join check
-        # For manual rooms, check if host has joined first
-        if chat_room.source != ChatRoom.SOURCE_AI:
-            # Check if host has joined
-            # Only allow non-host users to see the chat if host has joined
-            host_has_joined = ChatParticipation.objects.filter(
-                chat_room=chat_room,
-                user=chat_room.host,
-                is_anonymous_identity=False,
-            ).exists()
+        # For manual rooms, only allow non-host users to see the chat if host has joined
+        if chat_room.source != ChatRoom.SOURCE_AI and not payload.host_joined:
+            is_host = request.user.is_authenticated and request.user.id == chat_room.host_id
+            if not is_host:
+                # Return 404 to hide the chat from non-host users
+                from django.http import Http404
+                raise Http404("Chat room not found")
 
-            # If host hasn't joined, only allow the host to see the chat
-            if not host_has_joined:
-                is_host = request.user.is_authenticated and request.user == chat_room.host
-                if not is_host:
-                    # Return 404 to hide the chat from non-host users
-                    from django.http import Http404
-                    raise Http404("Chat room not found")
-
-        # Don't expose access_code in response
-        serializer = ChatRoomSerializer(chat_room)
-        data = serializer.data
-        data.pop('access_code', None)
-
-        return Response(data)
+        return payload_response(request, payload.body)
 
 
 class ChatRoomUpdateView(APIView):
@@ -282,9 +257,13 @@ class ChatRoomUpdateView(APIView):
         if request.user != chat_room.host:
             raise PermissionDenied("Only the host can update chat settings")
 
-        serializer = ChatRoomUpdateSerializer(chat_room, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        # Save against the locked row, not the cached snapshot: a full save of
+        # the snapshot would write back stale columns (broadcast_message, theme)
+        with transaction.atomic():
+            chat_room = ChatRoom.objects.select_for_update().get(pk=chat_room.pk)
+            serializer = ChatRoomUpdateSerializer(chat_room, data=request.data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
 
         return Response(ChatRoomSerializer(chat_room).data)
 
@@ -702,7 +681,7 @@ class ChatRoomJoinView(APIView):
         - Registered user using different username: direct storage URL
         - Anonymous user: direct storage URL
 
-        If avatar_seed is provided, it is used as the DiceBear seed. For
+        If avatar_seed is provided, it is used as the avatar seed. For
         reserved-username users, the seed is honored ONLY when User.avatar_url
         is empty — the reserved avatar is stable once set and must not be
         overwritten by subsequent joins.
@@ -787,6 +766,12 @@ class MessageListView(APIView):
         # Check if Redis caching is enabled (Constance dynamic setting)
         cache_enabled = config.REDIS_CACHE_ENABLED
 
+        # Change-log position of the latest window, read before loading it so
+        # a later sync (RoomSyncView / WS 'sync') replays anything written meanwhile
+        cursor = None
+        if not before_timestamp and not filter_mode:
+            cursor = RoomChangeLog.current_cursor(chat_room.id)
+
         # Try Redis cache first (if enabled and no pagination)
         messages = []
         source = 'postgresql'  # Default source
@@ -1047,6 +1032,7 @@ class MessageListView(APIView):
             'source': source,  # Shows where data came from (redis/postgresql/postgresql_fallback)
             'cache_enabled': cache_enabled,
             'count': len(messages),
+            'cursor': cursor,
             'history_limits': {
                 'max_days': config.MESSAGE_HISTORY_MAX_DAYS,
                 'max_count': config.MESSAGE_HISTORY_MAX_COUNT
@@ -1139,22 +1125,10 @@ class MessageListView(APIView):
                     user_reactions[msg_id] = set()
                 user_reactions[msg_id].add(record['emoji'])
 
-        # Batch fetch avatar URLs (ONE query - solves N+1 problem)
-        # ChatParticipation.avatar_url is always populated at join time
+        # Batch fetch avatar URLs from the room's avatar directory (one Redis
+        # HMGET, at most one query for usernames it does not hold yet)
         unique_usernames = list(set(msg.username for msg in messages))
-        participations = ChatParticipation.objects.filter(
-            chat_room=chat_room,
-            username__in=unique_usernames
-        )
-
-        # Build avatar_map: username (lowercase) -> avatar_url
-        from chatpop.utils.media import get_fallback_dicebear_url
-
-        avatar_map = {}
-        for p in participations:
-            if p.avatar_url:
-                avatar_map[p.username.lower()] = p.avatar_url
-            # else: not in map, will fallback to DiceBear (orphaned data)
+        avatar_entries = AvatarDirectory.lookup(chat_room.id, unique_usernames)
 
         # Batch fetch banned usernames (ONE query)
         from django.utils import timezone as tz
@@ -1180,8 +1154,8 @@ class MessageListView(APIView):
         serialized = []
         for msg in messages:
             username_is_reserved = MessageCache._compute_username_is_reserved(msg)
-            # Lookup avatar from map, fallback to DiceBear if not found
-            avatar_url = avatar_map.get(msg.username.lower()) or get_fallback_dicebear_url(msg.username)
+            # Lookup avatar from the directory, fallback to DiceBear if not found
+            avatar_url = AvatarDirectory.avatar_url(chat_room.id, msg.username, avatar_entries)
 
             # Convert relative voice_url to absolute URL if present
             voice_url = msg.voice_url
@@ -1314,6 +1288,50 @@ class MessageListView(APIView):
             print(f"DEBUG: NO MESSAGES WERE CACHED! cached_count=0")
 
 
+class RoomSyncView(APIView):
+    """
+    Changes since a cursor, for clients catching up after a reconnect.
+
+    Query params:
+        cursor: Highest change sequence the client has applied (from the
+                message list's `cursor`, a previous sync, or the `seq` of
+                any live frame)
+
+    Returns the compacted changes from RoomChangeLog.changes_since() with
+    `resync: false`, or `{resync: true}` when the log no longer reaches back
+    to the cursor and the client must reload the message list.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, code, username=None):
+        chat_room = get_chat_room_by_url(code, username)
+
+        try:
+            cursor = int(request.query_params['cursor'])
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'cursor must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        changes = RoomChangeLog.changes_since(chat_room.id, cursor)
+        if changes is None:
+            return Response({'resync': True})
+
+        # Hide new messages from users this user muted (host broadcasts always shown)
+        if request.user and request.user.is_authenticated:
+            from .utils.performance.cache import UserBlockCache
+
+            blocked_usernames = UserBlockCache.get_blocked_usernames(request.user.id)
+            if blocked_usernames:
+                changes['messages'] = [
+                    m for m in changes['messages']
+                    if m.get('username') not in blocked_usernames or m.get('is_from_host')
+                ]
+
+        return Response({'resync': False, **changes})
+
+
 class MessageCreateView(generics.CreateAPIView):
     """Send a message to a chat room"""
     serializer_class = MessageCreateSerializer
@@ -1579,25 +1597,21 @@ class MessagePinView(APIView):
         is_top_pin = top_pinned and top_pinned.get('id') == str(message.id)
 
         # Broadcast pin update via WebSocket
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         from rest_framework.renderers import JSONRenderer
         import json as json_module
 
-        channel_layer = get_channel_layer()
-        room_group_name = f'chat_{chat_room.code}'
-
         # Convert serializer data to JSON-safe format (UUIDs become strings)
         serialized_data = MessageSerializer(message).data
         json_safe_data = json_module.loads(JSONRenderer().render(serialized_data))
 
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 'type': 'message_pinned',
                 'message': json_safe_data,
                 'is_top_pin': is_top_pin,
-            }
+            },
+            RoomChangeLog.PIN, {'message_id': str(message.id)},
         )
 
         return Response({
@@ -1717,25 +1731,21 @@ class AddToPinView(APIView):
         MessageCache.add_pinned_message(message)
 
         # Broadcast pin update via WebSocket
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         from rest_framework.renderers import JSONRenderer
         import json as json_module
 
-        channel_layer = get_channel_layer()
-        room_group_name = f'chat_{chat_room.code}'
-
         # Convert serializer data to JSON-safe format (UUIDs become strings)
         serialized_data = MessageSerializer(message).data
         json_safe_data = json_module.loads(JSONRenderer().render(serialized_data))
 
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 'type': 'message_pinned',
                 'message': json_safe_data,
                 'is_top_pin': True,  # After add-to-pin, message is still top pin
-            }
+            },
+            RoomChangeLog.PIN, {'message_id': str(message.id)},
         )
 
         # Calculate new time remaining
@@ -1757,8 +1767,6 @@ class MessageHighlightView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request, code, message_id, username=None):
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         from rest_framework.renderers import JSONRenderer
         import json as json_module
 
@@ -1801,19 +1809,17 @@ class MessageHighlightView(APIView):
             MessageCache.remove_from_highlight_index(chat_room.id, str(message.id))
 
         # Broadcast via WebSocket
-        channel_layer = get_channel_layer()
-        room_group_name = f'chat_{chat_room.code}'
-
         serialized_data = MessageSerializer(message).data
         json_safe_data = json_module.loads(JSONRenderer().render(serialized_data))
 
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 'type': 'message_highlight',
                 'message': json_safe_data,
                 'is_highlight': message.is_highlight,
-            }
+            },
+            RoomChangeLog.HIGHLIGHT, {'message_id': str(message.id), 'is_highlight': message.is_highlight},
         )
 
         return Response({
@@ -1827,8 +1833,6 @@ class BroadcastStickyView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request, code, message_id, username=None):
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         from rest_framework.renderers import JSONRenderer
         import json as json_module
 
@@ -1854,9 +1858,8 @@ class BroadcastStickyView(APIView):
             chat_room.broadcast_message = None
             chat_room.save(update_fields=['broadcast_message'])
 
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f'chat_{code}',
+            RoomChangeLog.publish(
+                chat_room.id, chat_room.code,
                 {'type': 'broadcast_sticky_update', 'message': None}
             )
             return Response({'success': True, 'action': 'unbroadcast'})
@@ -1868,9 +1871,8 @@ class BroadcastStickyView(APIView):
             serialized = MessageSerializer(message).data
             json_safe = json_module.loads(JSONRenderer().render(serialized))
 
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f'chat_{code}',
+            RoomChangeLog.publish(
+                chat_room.id, chat_room.code,
                 {'type': 'broadcast_sticky_update', 'message': json_safe}
             )
             return Response({'success': True, 'action': 'broadcast', 'message_id': str(message.id)})
@@ -2405,6 +2407,7 @@ class SuggestUsernameView(APIView):
     @require_turnstile
     def post(self, request, code, username=None):
         from .utils.username.generator import generate_username
+        from .utils.username.availability import is_username_taken
         import logging
         logger = logging.getLogger(__name__)
 
@@ -2469,16 +2472,10 @@ class SuggestUsernameView(APIView):
             for uname in generated_usernames:
                 username_lower = uname.lower()
 
-                # Check if reserved by a registered user
-                is_reserved = User.objects.filter(reserved_username__iexact=username_lower).exists()
-                logger.info(f"[USERNAME_PER_CHAT_LIMIT] {uname}: reserved_by_user={is_reserved}")
-                if is_reserved:
-                    continue
-
-                # Check if used in any chat
-                in_chat = ChatParticipation.objects.filter(username__iexact=username_lower).exists()
-                logger.info(f"[USERNAME_PER_CHAT_LIMIT] {uname}: in_chat={in_chat}")
-                if in_chat:
+                # Check if reserved by a registered user or used in any chat
+                is_taken = is_username_taken(username_lower)
+                logger.info(f"[USERNAME_PER_CHAT_LIMIT] {uname}: taken={is_taken}")
+                if is_taken:
                     continue
 
                 # Available! Add to list
@@ -2561,16 +2558,10 @@ class SuggestUsernameView(APIView):
                 for uname in generated_usernames:
                     username_lower = uname.lower()
 
-                    # Check if reserved by a registered user
-                    is_reserved = User.objects.filter(reserved_username__iexact=username_lower).exists()
-                    logger.info(f"[USERNAME_ROTATION] {uname}: reserved_by_user={is_reserved}")
-                    if is_reserved:
-                        continue
-
-                    # Check if used in any chat
-                    in_chat = ChatParticipation.objects.filter(username__iexact=username_lower).exists()
-                    logger.info(f"[USERNAME_ROTATION] {uname}: in_chat={in_chat}")
-                    if in_chat:
+                    # Check if reserved by a registered user or used in any chat
+                    is_taken = is_username_taken(username_lower)
+                    logger.info(f"[USERNAME_ROTATION] {uname}: taken={is_taken}")
+                    if is_taken:
                         continue
 
                     # Available! Add to list
@@ -2634,9 +2625,6 @@ class MessageReactionToggleView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request, code, message_id, username=None):
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-
         chat_room = get_chat_room_by_url(code, username)
         message = get_object_or_404(Message, id=message_id, chat_room=chat_room, is_deleted=False)
 
@@ -2714,10 +2702,8 @@ class MessageReactionToggleView(APIView):
                 reaction_data['user'] = str(reaction_data['user'])
 
         # Broadcast reaction update via WebSocket
-        channel_layer = get_channel_layer()
-        room_group_name = f'chat_{code}'
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 'type': 'message_reaction',
                 'reaction_data': {
@@ -2728,7 +2714,9 @@ class MessageReactionToggleView(APIView):
                     'username': username,
                     'reaction': reaction_data
                 }
-            }
+            },
+            RoomChangeLog.REACTION,
+            {'message_id': str(message_id), 'emoji': emoji, 'delta': 1 if action == 'added' else -1},
         )
 
         return Response({
@@ -2889,6 +2877,9 @@ class VoiceUploadView(APIView):
     Upload a voice message.
     Available to all chat participants if voice_enabled=True on the chat room.
     Saves to local storage or S3 based on configuration.
+
+    With `Prefer: respond-async`, WebM uploads are transcoded by a media job
+    worker and the response is 202 with the job id (see media_analysis.utils.jobs).
     """
     permission_classes = [permissions.AllowAny]
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
@@ -2896,6 +2887,9 @@ class VoiceUploadView(APIView):
     def post(self, request, code, username=None):
         from .utils.security.auth import ChatSessionValidator
         from rest_framework.exceptions import PermissionDenied
+        from media_analysis.utils.jobs import (
+            accepted_job_data, chat_upload_group, enqueue_job, prefers_async
+        )
 
         # Get chat room
         chat_room = get_chat_room_by_url(code, username)
@@ -2951,14 +2945,24 @@ class VoiceUploadView(APIView):
             # Track the actual content type for file extension
             actual_content_type = voice_file.content_type
 
+            # Async mode: stage the WebM upload and transcode it in a media
+            # job worker instead of holding this request open for ffmpeg
+            if voice_file.content_type == 'audio/webm' and prefers_async(request):
+                staged_path, _ = save_voice_message(voice_file, content_type=actual_content_type)
+                job = enqueue_job(
+                    'voice.transcode',
+                    {'storage_path': staged_path},
+                    notify_group=chat_upload_group(chat_room.id, session_data['username'])
+                )
+                logger.info(f"[VoiceUpload] Queued transcode job {job.id} for {staged_path}")
+                return Response(accepted_job_data(job), status=status.HTTP_202_ACCEPTED)
+
             # iOS Safari workaround: Transcode WebM to M4A for compatibility
             # iOS Safari MediaRecorder produces WebM/Opus that iOS cannot play
             if voice_file.content_type == 'audio/webm':
                 logger.info(f"[VoiceUpload] ✅ TRANSCODING WebM to M4A for iOS compatibility...")
                 voice_file = transcode_webm_to_m4a(voice_file)
-                transcoded_size = len(voice_file.read())
-                logger.info(f"[VoiceUpload] ✅ TRANSCODING COMPLETE, new file size: {transcoded_size} bytes")
-                voice_file.seek(0)  # Reset file pointer after read
+                logger.info(f"[VoiceUpload] ✅ TRANSCODING COMPLETE, new file size: {voice_file.size} bytes")
                 actual_content_type = 'audio/mp4'  # Transcoded file is M4A/AAC
             else:
                 logger.info(f"[VoiceUpload] ⏭️ Skipping transcoding (content_type is {voice_file.content_type}, not audio/webm)")
@@ -2990,6 +2994,10 @@ class VoiceStreamView(APIView):
     """
     Stream/download a voice message through Django proxy.
     Provides access control - only chat participants can access voice messages.
+
+    Also serves photo and video files. Range requests read only the
+    requested bytes; with MEDIA_SENDFILE_MODE set, the fronting server
+    sends the file (X-Accel-Redirect / X-Sendfile).
     """
     permission_classes = [permissions.AllowAny]
 
@@ -3005,12 +3013,10 @@ class VoiceStreamView(APIView):
         return response
 
     def get(self, request, storage_path):
-        from django.http import HttpResponse, Http404, JsonResponse
-        from chatpop.utils.media import MediaStorage
+        from django.http import Http404, JsonResponse
+        from chatpop.utils.media.streaming import serve_media_file
         from .utils.security.auth import ChatSessionValidator
         from rest_framework.exceptions import PermissionDenied
-        import os
-        import re
         import logging
 
         logger = logging.getLogger(__name__)
@@ -3057,6 +3063,23 @@ class VoiceStreamView(APIView):
                     'error': 'Invalid session token'
                 }, status=401)
 
+        # Locally rendered avatars are written to storage on first fetch.
+        # Only assigned avatars are stored (anyone can put a seed in the URL);
+        # others are rendered for this response and not saved.
+        from chatpop.utils.media.storage import GENERATED_AVATAR_DIR
+        is_generated_avatar = storage_path.startswith(GENERATED_AVATAR_DIR + '/')
+        if is_generated_avatar:
+            from chatpop.utils.media.avatar import ensure_generated_avatar, render_generated_avatar
+            from django.http import HttpResponse
+            if not ensure_generated_avatar(storage_path):
+                svg = render_generated_avatar(storage_path)
+                if svg is None:
+                    return JsonResponse({'error': 'Avatar not found'}, status=404)
+                response = HttpResponse(svg, content_type='image/svg+xml')
+                response['Cache-Control'] = 'public, max-age=86400'
+                response['Access-Control-Allow-Origin'] = '*'
+                return response
+
         # Fast path: when S3 storage is configured (with or without CloudFront),
         # auth has already been validated above — now redirect to a signed
         # storage URL so bytes flow browser → CDN/S3, not through Daphne.
@@ -3075,119 +3098,31 @@ class VoiceStreamView(APIView):
                 )
 
         try:
-            # Check if file exists in storage
-            if not MediaStorage.file_exists(storage_path):
-                logger.error(f"🎵 [VoiceStream] File not found: {storage_path}")
-                raise Http404("Voice message not found")
-
-            # Get file from storage
-            file_obj = MediaStorage.get_file(storage_path)
-            if not file_obj:
-                logger.error(f"🎵 [VoiceStream] Failed to get file object: {storage_path}")
-                raise Http404("Voice message not found")
-
-            # Determine content type from file extension
-            content_type = 'application/octet-stream'  # default
-            ext = storage_path.lower().split('.')[-1] if '.' in storage_path else ''
-
-            # Audio types
-            if ext in ('m4a', 'mp4') and 'voice' in storage_path:
-                content_type = 'audio/mp4'
-            elif ext == 'webm' and 'voice' in storage_path:
-                content_type = 'audio/webm'
-            elif ext in ('mp3', 'mpeg'):
-                content_type = 'audio/mpeg'
-            elif ext == 'ogg':
-                content_type = 'audio/ogg'
-            elif ext == 'wav':
-                content_type = 'audio/wav'
-            # Image types
-            elif ext in ('jpg', 'jpeg'):
-                content_type = 'image/jpeg'
-            elif ext == 'png':
-                content_type = 'image/png'
-            elif ext == 'webp':
-                content_type = 'image/webp'
-            elif ext == 'gif':
-                content_type = 'image/gif'
-            elif ext in ('heic', 'heif'):
-                content_type = 'image/heic'
-            elif ext == 'svg':
-                content_type = 'image/svg+xml'
-            # Video types
-            elif ext == 'mp4':
-                content_type = 'video/mp4'
-            elif ext == 'webm':
-                content_type = 'video/webm'
-            elif ext == 'mov':
-                content_type = 'video/quicktime'
-            elif ext == 'm4v':
-                content_type = 'video/x-m4v'
-
-            # Get file size
-            file_obj.seek(0, os.SEEK_END)
-            file_size = file_obj.tell()
-            file_obj.seek(0)
-            logger.info(f"🎵 [VoiceStream] File size: {file_size} bytes, Content-Type: {content_type}")
-
-            # Parse Range header for iOS Safari compatibility
-            range_header = request.META.get('HTTP_RANGE', '')
-
-            if range_header:
-                logger.info(f"🎵 [VoiceStream] Processing Range Request: {range_header}")
-                # Parse range header (format: "bytes=start-end")
-                range_match = re.match(r'bytes=(\d+)-(\d*)', range_header)
-                if range_match:
-                    start = int(range_match.group(1))
-                    end = int(range_match.group(2)) if range_match.group(2) else file_size - 1
-                    logger.info(f"🎵 [VoiceStream] Range: bytes {start}-{end}/{file_size}")
-
-                    # Validate range
-                    if start >= file_size or end >= file_size or start > end:
-                        logger.error(f"🎵 [VoiceStream] Invalid range: {start}-{end} for file size {file_size}")
-                        response = HttpResponse(status=416)  # Range Not Satisfiable
-                        response['Content-Range'] = f'bytes */{file_size}'
-                        return response
-
-                    # Read the requested range
-                    file_obj.seek(start)
-                    chunk_size = end - start + 1
-                    content = file_obj.read(chunk_size)
-                    logger.info(f"🎵 [VoiceStream] Returning 206 Partial Content: {chunk_size} bytes")
-
-                    # Return HTTP 206 Partial Content
-                    response = HttpResponse(content, content_type=content_type, status=206)
-                    response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
-                    response['Content-Length'] = str(chunk_size)
-                else:
-                    logger.warning(f"🎵 [VoiceStream] Invalid range format: {range_header}, returning full file")
-                    # Invalid range format, return full file
-                    content = file_obj.read()
-                    response = HttpResponse(content, content_type=content_type)
-                    response['Content-Length'] = str(file_size)
-            else:
-                logger.info(f"🎵 [VoiceStream] No Range header, returning full file ({file_size} bytes)")
-                # No range header, return full file
-                content = file_obj.read()
-                response = HttpResponse(content, content_type=content_type)
-                response['Content-Length'] = str(file_size)
+            # Opens the file once and streams only the requested range(s);
+            # handles suffix/multi-range, If-Range and If-None-Match
+            response = serve_media_file(request, storage_path)
+            logger.info(
+                f"🎵 [VoiceStream] {response.status_code} {response.get('Content-Range', '')} "
+                f"({response.get('Content-Length', 'sendfile')} bytes, {response.get('Content-Type')})"
+            )
 
             # Common headers for all responses
             response['Content-Disposition'] = f'inline; filename="{storage_path.split("/")[-1]}"'
             # Public files (avatars) can be cached publicly, other files are private
-            if is_public_file:
+            if is_generated_avatar:
+                # Path is derived from the renderer inputs: content never changes
+                response['Cache-Control'] = 'public, max-age=31536000, immutable'
+            elif is_public_file:
                 response['Cache-Control'] = 'public, max-age=86400'  # Cache avatars for 24 hours
             else:
                 response['Cache-Control'] = 'private, max-age=3600'  # Cache for 1 hour
-            response['Accept-Ranges'] = 'bytes'
 
             # Add CORS headers for audio element playback
             response['Access-Control-Allow-Origin'] = '*'
             response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
-            response['Access-Control-Allow-Headers'] = 'X-Chat-Session-Token, Content-Type, Range'
-            response['Access-Control-Expose-Headers'] = 'Content-Range, Accept-Ranges, Content-Length'
+            response['Access-Control-Allow-Headers'] = 'X-Chat-Session-Token, Content-Type, Range, If-Range'
+            response['Access-Control-Expose-Headers'] = 'Content-Range, Accept-Ranges, Content-Length, ETag'
 
-            logger.info(f"🎵 [VoiceStream] Success! Returning {response.status_code} response")
             return response
 
         except PermissionDenied:
@@ -3218,36 +3153,37 @@ class UserAvatarView(APIView):
     This endpoint allows registered users to change their avatar without
     invalidating cached messages. The URL stays constant, but the underlying
     avatar file can change.
+
+    Users without an avatar (assigned at registration; see backfill_avatars
+    for older accounts) are redirected to the locally rendered avatar for
+    their username. GET never writes to the user.
     """
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, user_id):
         from django.http import HttpResponseRedirect, Http404
         from accounts.models import User
-        from chatpop.utils.media import get_fallback_dicebear_url
+        from chatpop.utils.media import generated_avatar_url, get_fallback_dicebear_url
+        from chatpop.utils.media.storage import MediaStorage, MEDIA_PROXY_PREFIX
 
         try:
             user = User.objects.get(id=user_id)
         except User.DoesNotExist:
             raise Http404("User not found")
 
+        avatar_url = user.avatar_url
+        if not avatar_url and user.reserved_username:
+            avatar_url = generated_avatar_url(user.reserved_username)
+
         # If user has stored avatar, redirect to it.
         # When S3 storage is configured (cloud + CDN), short-circuit the
         # intermediate /api/chats/media/<...> proxy hop by signing a CDN URL
-        # directly. Otherwise, fall through to the stored proxy URL.
-        if user.avatar_url:
-            target = user.avatar_url
-            from django.conf import settings
-            from django.core.files.storage import default_storage
-            proxy_prefix = "/api/chats/media/"
-            if target.startswith(proxy_prefix) and getattr(settings, "AWS_STORAGE_BUCKET_NAME", ""):
-                storage_path = target[len(proxy_prefix):]
-                try:
-                    target = default_storage.url(storage_path)
-                except Exception:
-                    # If signing fails for any reason, fall back to the
-                    # original proxy URL so the avatar still loads.
-                    pass
+        # directly. Otherwise (or if signing isn't possible, e.g. a generated
+        # avatar not rendered yet), fall through to the stored proxy URL.
+        if avatar_url:
+            target = avatar_url
+            if target.startswith(MEDIA_PROXY_PREFIX):
+                target = MediaStorage.sign_storage_path(target[len(MEDIA_PROXY_PREFIX):]) or target
             return HttpResponseRedirect(target)
 
         # Fallback to DiceBear URL if no stored avatar
@@ -3264,6 +3200,8 @@ class PhotoUploadView(APIView):
     Upload a photo message.
     Available to all chat participants if photo_enabled=True on the chat room.
     Compresses images to max 1920px, 80% quality JPEG.
+    Large JPEGs are decoded at reduced scale (never at full resolution)
+    and images over the pixel ceiling are rejected.
     """
     permission_classes = [permissions.AllowAny]
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
@@ -3272,9 +3210,8 @@ class PhotoUploadView(APIView):
         from .utils.security.auth import ChatSessionValidator
         from rest_framework.exceptions import PermissionDenied
         from chatpop.utils.media import save_photo_message, get_photo_message_url, PHOTO_CONTENT_TYPE_TO_EXT
-        from PIL import Image
+        from chatpop.utils.media.image import ImageTooLarge, decode_resized, open_image, track_resource_usage
         from io import BytesIO
-        from django.core.files.base import ContentFile
         import logging
         logger = logging.getLogger(__name__)
 
@@ -3325,55 +3262,34 @@ class PhotoUploadView(APIView):
         try:
             logger.info(f"[PhotoUpload] Received file: {photo_file.content_type}, {photo_file.size} bytes")
 
-            # Open image with Pillow
-            img = Image.open(photo_file)
-
-            # Apply EXIF orientation (fixes sideways mobile photos)
-            from PIL import ImageOps
-            try:
-                transposed = ImageOps.exif_transpose(img)
-                if transposed is not None:
-                    img = transposed
-            except Exception as exif_error:
-                logger.warning(f"[PhotoUpload] EXIF transpose failed (ignoring): {exif_error}")
-
-            # Convert RGBA to RGB (remove alpha channel for JPEG)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-
-            # Get original dimensions
-            original_width, original_height = img.size
-
-            # Resize if larger than configured max dimension
             max_dimension = config.PHOTO_MAX_DIMENSION
-            if original_width > max_dimension or original_height > max_dimension:
-                if original_width > original_height:
-                    new_width = max_dimension
-                    new_height = int(original_height * (max_dimension / original_width))
-                else:
-                    new_height = max_dimension
-                    new_width = int(original_width * (max_dimension / original_height))
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                logger.info(f"[PhotoUpload] Resized from {original_width}x{original_height} to {new_width}x{new_height}")
-
-            # Get final dimensions
-            final_width, final_height = img.size
-
-            # Save as JPEG with 80% quality
-            output = BytesIO()
-            img.save(output, format='JPEG', quality=80, optimize=True)
-            output.seek(0)
+            with track_resource_usage() as usage:
+                # Header-only open enforces the pixel ceiling; JPEGs are then
+                # decoded at reduced DCT scale, shrunk, and EXIF-rotated
+                img = open_image(photo_file)
+                original_width, original_height = img.size
+                img = decode_resized(img, max_dimension=max_dimension)
+
+                # Get final dimensions
+                final_width, final_height = img.size
+
+                # Save as JPEG with 80% quality
+                output = BytesIO()
+                img.save(output, format='JPEG', quality=80, optimize=True)
+                output.seek(0)
+
+            logger.info(
+                f"[PhotoUpload] {original_width}x{original_height} -> {final_width}x{final_height} "
+                f"cpu={usage.cpu_ms:.0f}ms peak_rss={usage.peak_rss_mb:.0f}MB "
+                f"(+{usage.peak_rss_growth_mb:.0f}MB)"
+            )
 
             compressed_size = len(output.getvalue())
             logger.info(f"[PhotoUpload] Compressed to {compressed_size} bytes")
 
             # Save to storage
             storage_path, storage_type = save_photo_message(
-                ContentFile(output.read()),
+                output,
                 content_type='image/jpeg'
             )
 
@@ -3387,6 +3303,10 @@ class PhotoUploadView(APIView):
                 'storage_type': storage_type
             }, status=status.HTTP_201_CREATED)
 
+        except ImageTooLarge as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -3400,6 +3320,11 @@ class VideoUploadView(APIView):
     Upload a video message.
     Available to all chat participants if video_enabled=True on the chat room.
     Validates duration (max 30 seconds) and generates thumbnail.
+
+    With `Prefer: respond-async`, the video is stored immediately and the
+    duration check and thumbnail run in a media job worker (202 + job id).
+    The video URL is only handed out in the job result, once the duration
+    check has passed.
     """
     permission_classes = [permissions.AllowAny]
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
@@ -3409,14 +3334,16 @@ class VideoUploadView(APIView):
         from rest_framework.exceptions import PermissionDenied
         from chatpop.utils.media import (
             save_video_message, save_video_thumbnail,
-            get_video_message_url, VIDEO_CONTENT_TYPE_TO_EXT
+            get_video_message_url, VIDEO_CONTENT_TYPE_TO_EXT,
+            probe_video, extract_thumbnail, MAX_VIDEO_DURATION_SECONDS
+        )
+        from media_analysis.utils.jobs import (
+            accepted_job_data, chat_upload_group, enqueue_job, prefers_async
         )
         from django.core.files.base import ContentFile
-        import subprocess
         import tempfile
         import os
         import logging
-        import json
         logger = logging.getLogger(__name__)
 
         # Get chat room
@@ -3465,65 +3392,50 @@ class VideoUploadView(APIView):
         try:
             logger.info(f"[VideoUpload] Received file: {video_file.content_type}, {video_file.size} bytes")
 
-            # Save to temp file for ffprobe/ffmpeg processing
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp:
-                for chunk in video_file.chunks():
-                    tmp.write(chunk)
-                tmp_path = tmp.name
+            # Async mode: store the video now; duration check and thumbnail
+            # run in a media job worker instead of this request
+            if prefers_async(request):
+                storage_path, storage_type = save_video_message(
+                    video_file,
+                    content_type=video_file.content_type
+                )
+                job = enqueue_job(
+                    'video.process',
+                    {'storage_path': storage_path, 'storage_type': storage_type},
+                    notify_group=chat_upload_group(chat_room.id, session_data['username'])
+                )
+                logger.info(f"[VideoUpload] Queued processing job {job.id} for {storage_path}")
+                # No video_url yet: it comes with the job result if the
+                # duration check passes (too-long videos are deleted)
+                return Response(accepted_job_data(job), status=status.HTTP_202_ACCEPTED)
+
+            # ffprobe/ffmpeg need a path. Large uploads are already on disk
+            # (TemporaryFileUploadHandler); only in-memory ones are copied.
+            owns_tmp = not hasattr(video_file, 'temporary_file_path')
+            if owns_tmp:
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp:
+                    for chunk in video_file.chunks():
+                        tmp.write(chunk)
+                    tmp_path = tmp.name
+            else:
+                tmp_path = video_file.temporary_file_path()
 
             try:
-                # Get video duration using ffprobe
-                probe_cmd = [
-                    'ffprobe', '-v', 'quiet', '-print_format', 'json',
-                    '-show_format', '-show_streams', tmp_path
-                ]
-                probe_result = subprocess.run(probe_cmd, capture_output=True, text=True)
-                probe_data = json.loads(probe_result.stdout)
-                duration = float(probe_data.get('format', {}).get('duration', 0))
-
-                # Extract video dimensions from the video stream
-                video_width = None
-                video_height = None
-                for stream in probe_data.get('streams', []):
-                    if stream.get('codec_type') == 'video':
-                        video_width = int(stream['width']) if 'width' in stream else None
-                        video_height = int(stream['height']) if 'height' in stream else None
-                        # Check for rotation (phone videos record landscape with rotation metadata)
-                        rotation = 0
-                        # Check tags first (older ffprobe)
-                        rotation_tag = stream.get('tags', {}).get('rotate', '0')
-                        rotation = int(rotation_tag)
-                        # Check side_data_list (newer ffprobe)
-                        if rotation == 0:
-                            for sd in stream.get('side_data_list', []):
-                                if 'rotation' in sd:
-                                    rotation = int(sd['rotation'])
-                                    break
-                        # Swap dimensions for 90/270 degree rotations
-                        if video_width and video_height and abs(rotation) in (90, 270):
-                            video_width, video_height = video_height, video_width
-                        break
+                # Get video duration and display dimensions using ffprobe
+                duration, video_width, video_height = probe_video(tmp_path)
 
                 logger.info(f"[VideoUpload] Video duration: {duration} seconds, dimensions: {video_width}x{video_height}")
 
                 # Validate duration (max 30 seconds)
-                if duration > 30:
+                if duration > MAX_VIDEO_DURATION_SECONDS:
                     return Response({
-                        'error': 'Video too long (max 30 seconds)'
+                        'error': f'Video too long (max {MAX_VIDEO_DURATION_SECONDS} seconds)'
                     }, status=status.HTTP_400_BAD_REQUEST)
 
-                # Generate thumbnail from first frame
-                thumb_path = tmp_path + '_thumb.jpg'
-                thumb_cmd = [
-                    'ffmpeg', '-y', '-i', tmp_path,
-                    '-vframes', '1', '-f', 'image2',
-                    '-vf', 'scale=480:-1',  # Scale to 480px width
-                    thumb_path
-                ]
-                subprocess.run(thumb_cmd, capture_output=True)
+                # Generate thumbnail from first frame (480px wide)
+                thumbnail = extract_thumbnail(tmp_path)
 
-                # Save video to storage
-                video_file.seek(0)
+                # Stream video to storage (save_file seeks to the start)
                 storage_path, storage_type = save_video_message(
                     video_file,
                     content_type=video_file.content_type
@@ -3532,20 +3444,18 @@ class VideoUploadView(APIView):
 
                 # Save thumbnail to storage
                 thumbnail_url = None
-                if os.path.exists(thumb_path):
-                    with open(thumb_path, 'rb') as thumb_file:
-                        # Extract video filename from storage path
-                        video_filename = os.path.basename(storage_path)
-                        thumb_storage_path, _ = save_video_thumbnail(
-                            ContentFile(thumb_file.read()),
-                            video_filename
-                        )
-                        thumbnail_url = get_video_message_url(thumb_storage_path)
-                    os.unlink(thumb_path)
+                if thumbnail is not None:
+                    # Extract video filename from storage path
+                    video_filename = os.path.basename(storage_path)
+                    thumb_storage_path, _ = save_video_thumbnail(
+                        ContentFile(thumbnail),
+                        video_filename
+                    )
+                    thumbnail_url = get_video_message_url(thumb_storage_path)
 
             finally:
-                # Clean up temp file
-                if os.path.exists(tmp_path):
+                # Clean up temp file (the upload handler removes its own)
+                if owns_tmp and os.path.exists(tmp_path):
                     os.unlink(tmp_path)
 
             return Response({
@@ -3726,16 +3636,14 @@ class BlockUserView(APIView):
                     msg.save(update_fields=['is_pinned', 'pinned_at', 'sticky_until'])
                     MessageCache.update_message(msg)
                     MessageCache.remove_pinned_message(chat_room.id, str(msg.id))
+                    RoomChangeLog.append(chat_room.id, RoomChangeLog.UNPIN, {'message_id': str(msg.id)})
                     logger.info(f"[BLOCK] Auto-unpinned message {msg.id} by banned user")
 
                 # Broadcast updated pinned list so all clients reflect the change
                 if pinned_msgs.exists() or True:  # Always send to clear stale client state
-                    from channels.layers import get_channel_layer
-                    from asgiref.sync import async_to_sync
                     remaining_pins = MessageCache.get_pinned_messages(chat_room.id)
-                    channel_layer = get_channel_layer()
-                    async_to_sync(channel_layer.group_send)(
-                        f'chat_{chat_room.code}',
+                    RoomChangeLog.publish(
+                        chat_room.id, chat_room.code,
                         {
                             'type': 'message_unpinned',
                             'message_id': '',  # Multiple unpinned; clients use pinned_messages list
@@ -3758,6 +3666,10 @@ class BlockUserView(APIView):
                         msg.save(update_fields=['is_highlight'])
                         MessageCache.update_message(msg)
                         MessageCache.remove_from_highlight_index(chat_room.id, str(msg.id))
+                        RoomChangeLog.append(chat_room.id, RoomChangeLog.HIGHLIGHT, {
+                            'message_id': str(msg.id),
+                            'is_highlight': False,
+                        })
                     logger.info(f"[BLOCK] Unhighlighted messages by banned user")
             except Exception as e:
                 logger.warning(f"[BLOCK] Failed to unhighlight on ban: {e}")
@@ -3769,11 +3681,8 @@ class BlockUserView(APIView):
                     if bm and bm.username.lower() in [u.lower() for u in banned_usernames]:
                         chat_room.broadcast_message = None
                         chat_room.save(update_fields=['broadcast_message'])
-                        from channels.layers import get_channel_layer
-                        from asgiref.sync import async_to_sync
-                        channel_layer_bc = get_channel_layer()
-                        async_to_sync(channel_layer_bc.group_send)(
-                            f'chat_{chat_room.code}',
+                        RoomChangeLog.publish(
+                            chat_room.id, chat_room.code,
                             {'type': 'broadcast_sticky_update', 'message': None}
                         )
                         logger.info(f"[BLOCK] Cleared broadcast sticky from banned user")
@@ -3819,12 +3728,6 @@ class BlockUserView(APIView):
             # The user will be evicted via WebSocket event below
 
             # Send WebSocket event to evict the blocked user
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-
-            channel_layer = get_channel_layer()
-            room_group_name = f'chat_{chat_room.code}'
-
             # Determine all usernames to kick (account-level ban cascades to linked identities)
             usernames_to_kick = [participation.username]
             if block_created.blocked_user_id:
@@ -3838,8 +3741,8 @@ class BlockUserView(APIView):
 
             # Send eviction events to each banned identity
             for kick_username in usernames_to_kick:
-                async_to_sync(channel_layer.group_send)(
-                    room_group_name,
+                RoomChangeLog.publish(
+                    chat_room.id, chat_room.code,
                     {
                         'type': 'user_kicked',
                         'username': kick_username,
@@ -3848,13 +3751,14 @@ class BlockUserView(APIView):
                 )
 
             # Notify all clients that this user is now banned (for badge updates)
-            async_to_sync(channel_layer.group_send)(
-                room_group_name,
+            RoomChangeLog.publish(
+                chat_room.id, chat_room.code,
                 {
                     'type': 'user_ban_status',
                     'username': participation.username,
                     'is_banned': True,
-                }
+                },
+                RoomChangeLog.BAN, {'username': participation.username, 'is_banned': True},
             )
 
             return Response({
@@ -3917,18 +3821,14 @@ class UnblockUserView(APIView):
             participation.save()
 
         # Notify all clients that this user is unbanned (for badge updates)
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-
-        channel_layer = get_channel_layer()
-        room_group_name = f'chat_{chat_room.code}'
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 'type': 'user_ban_status',
                 'username': participation.username,
                 'is_banned': False,
-            }
+            },
+            RoomChangeLog.BAN, {'username': participation.username, 'is_banned': False},
         )
 
         return Response({
@@ -4003,13 +3903,8 @@ class MutedUsersInChatView(APIView):
 def _dispatch_spotlight_event(chat_room, action, target_username):
     """Broadcast a spotlight add/remove event to all WS clients in the room."""
     try:
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        channel_layer = get_channel_layer()
-        if channel_layer is None:
-            return
-        async_to_sync(channel_layer.group_send)(
-            f'chat_{chat_room.code}',
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 'type': 'spotlight_update',
                 'action': action,
@@ -4244,8 +4139,6 @@ class MessageDeleteView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request, code, message_id, username=None):
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         import logging
         logger = logging.getLogger(__name__)
 
@@ -4283,15 +4176,37 @@ class MessageDeleteView(APIView):
                 'already_deleted': True
             })
 
-        # Soft delete: Set is_deleted flag to True
+        # Soft delete: Set is_deleted flag to True. Claim the row with a conditional
+        # UPDATE so that concurrent deletes of the same message decrement the count once.
+        claimed = Message.objects.filter(pk=message.pk, is_deleted=False).update(
+            is_deleted=True, updated_at=timezone.now()
+        )
+        if not claimed:
+            return Response({
+                'success': True,
+                'message': 'Message was already deleted',
+                'already_deleted': True
+            })
         message.is_deleted = True
-        message.save()
         logger.info(f"[MESSAGE_DELETE] Message {message_id} marked as deleted in database")
 
         # Remove from Redis cache
         MessageCache.remove_message(chat_room.id, str(message_id))
         logger.info(f"[MESSAGE_DELETE] Message {message_id} removed from cache")
 
+        # Take the message back out of the rolling discovery activity counters
+        try:
+            from media_analysis.utils.message_activity import record_message_activity
+            record_message_activity(chat_room.id, message.created_at, delta=-1)
+        except Exception as e:
+            logger.warning(f"[MESSAGE_DELETE] Activity counter update failed: {e}")
+
+        # Take it out of the room's maintained message count
+        try:
+            record_message_count(chat_room.id, -1)
+        except Exception as e:
+            logger.warning(f"[MESSAGE_DELETE] Message count update failed: {e}")
+
         # If deleted message was highlighted, clear the highlight
         if message.is_highlight:
             message.is_highlight = False
@@ -4307,15 +4222,14 @@ class MessageDeleteView(APIView):
         # messages list so all clients show the correct next pin if the deleted
         # message was pinned.
         remaining_pins = MessageCache.get_pinned_messages(chat_room.id)
-        channel_layer = get_channel_layer()
-        room_group_name = f'chat_{code}'
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 'type': 'message_deleted',
                 'message_id': str(message_id),
                 'pinned_messages': remaining_pins,
-            }
+            },
+            RoomChangeLog.DELETE, {'message_id': str(message_id)},
         )
         logger.info(f"[MESSAGE_DELETE] Deletion event broadcast via WebSocket")
 
@@ -4331,9 +4245,6 @@ class MessageUnpinView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request, code, message_id, username=None):
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-
         chat_room = get_chat_room_by_url(code, username)
         message = get_object_or_404(Message, id=message_id, chat_room=chat_room)
 
@@ -4375,14 +4286,14 @@ class MessageUnpinView(APIView):
         # messages list so all clients can immediately show the correct next pin
         # without relying on local state (which may not have all pins loaded).
         remaining_pins = MessageCache.get_pinned_messages(chat_room.id)
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'chat_{code}',
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 'type': 'message_unpinned',
                 'message_id': str(message_id),
                 'pinned_messages': remaining_pins,
-            }
+            },
+            RoomChangeLog.UNPIN, {'message_id': str(message_id)},
         )
 
         return Response({
@@ -5176,6 +5087,26 @@ class AdminMessageListView(APIView):
         })
 
 
+class AdminRoomEventsView(APIView):
+    """
+    Inspect a chat room's event log (RoomChangeLog) for admin debugging.
+    Returns the newest entries, or the entries after ?after=<seq>.
+    """
+    permission_classes = [IsStaffUser]
+
+    def get(self, request, room_id):
+        chat_room = get_object_or_404(ChatRoom, id=room_id)
+
+        try:
+            after = request.query_params.get('after')
+            after = int(after) if after is not None else None
+            limit = min(int(request.query_params.get('limit', 50)), RoomChangeLog.SYNC_LIMIT)
+        except ValueError:
+            raise ValidationError({"after": ["after and limit must be integers"]})
+
+        return Response(RoomChangeLog.inspect(chat_room.id, after=after, limit=limit))
+
+
 class AdminMessageDeleteView(APIView):
     """
     Delete a message as admin/staff.
@@ -5184,8 +5115,6 @@ class AdminMessageDeleteView(APIView):
     permission_classes = [IsStaffUser]
 
     def post(self, request, room_id, message_id):
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         import logging
         logger = logging.getLogger(__name__)
 
@@ -5202,24 +5131,45 @@ class AdminMessageDeleteView(APIView):
                 'already_deleted': True
             })
 
-        # Soft delete
+        # Soft delete. Claim the row with a conditional UPDATE so that
+        # concurrent deletes of the same message decrement the count once.
+        claimed = Message.objects.filter(pk=message.pk, is_deleted=False).update(
+            is_deleted=True, updated_at=timezone.now()
+        )
+        if not claimed:
+            return Response({
+                'success': True,
+                'message': 'Message was already deleted',
+                'already_deleted': True
+            })
         message.is_deleted = True
-        message.save()
         logger.info(f"[ADMIN_DELETE] Message {message_id} marked as deleted")
 
         # Remove from Redis cache
         MessageCache.remove_message(chat_room.id, str(message_id))
         logger.info(f"[ADMIN_DELETE] Message {message_id} removed from cache")
 
+        # Take the message back out of the rolling discovery activity counters
+        try:
+            from media_analysis.utils.message_activity import record_message_activity
+            record_message_activity(chat_room.id, message.created_at, delta=-1)
+        except Exception as e:
+            logger.warning(f"[ADMIN_DELETE] Activity counter update failed: {e}")
+
+        # Take it out of the room's maintained message count
+        try:
+            record_message_count(chat_room.id, -1)
+        except Exception as e:
+            logger.warning(f"[ADMIN_DELETE] Message count update failed: {e}")
+
         # Broadcast deletion via WebSocket
-        channel_layer = get_channel_layer()
-        room_group_name = f'chat_{chat_room.code}'
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 'type': 'message_deleted',
                 'message_id': str(message_id)
-            }
+            },
+            RoomChangeLog.DELETE, {'message_id': str(message_id)},
         )
 
         return Response({
@@ -5261,6 +5211,7 @@ class AdminMessageUnpinView(APIView):
 
         # Update cache
         MessageCache.update_message(message)
+        RoomChangeLog.append(chat_room.id, RoomChangeLog.UNPIN, {'message_id': str(message_id)})
         logger.info(f"[ADMIN_UNPIN] Message {message_id} unpinned and cache updated")
 
         return Response({
@@ -5508,15 +5459,14 @@ class AdminChatBanCreateView(APIView):
             except Exception as e:
                 logger.warning(f"[ADMIN_CHAT_BAN] Failed to bump JWT epoch: {e}")
 
-            # Kick user via WebSocket
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-
-            channel_layer = get_channel_layer()
-            room_group_name = f'chat_{chat_room.code}'
+            RoomChangeLog.append(chat_room.id, RoomChangeLog.BAN, {
+                'username': participation.username,
+                'is_banned': True,
+            })
 
-            async_to_sync(channel_layer.group_send)(
-                room_group_name,
+            # Kick user via WebSocket
+            RoomChangeLog.publish(
+                chat_room.id, chat_room.code,
                 {
                     'type': 'user_kicked',
                     'username': participation.username,
@@ -5568,8 +5518,6 @@ class SendGiftView(APIView):
     def post(self, request, code, username=None):
         from .utils.performance.cache import GiftCatalogCache, UnacknowledgedGiftCache
         from .models import Gift, GiftCatalogItem, Transaction
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
         from rest_framework.renderers import JSONRenderer
 
         chat_room = get_chat_room_by_url(code, username)
@@ -5690,22 +5638,19 @@ class SendGiftView(APIView):
         json_bytes = JSONRenderer().render(message_data)
         json_safe_data = json.loads(json_bytes)
 
-        # WebSocket broadcast
-        channel_layer = get_channel_layer()
-        room_group_name = f'chat_{chat_room.code}'
-
         # Broadcast gift chat message to all
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 'type': 'gift_sent',
                 'message_data': json_safe_data,
-            }
+            },
+            RoomChangeLog.MESSAGE,
         )
 
         # Send gift notification to recipient only
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
+        RoomChangeLog.publish(
+            chat_room.id, chat_room.code,
             {
                 'type': 'gift_received',
                 'recipient_username': recipient_username,
@@ -5735,8 +5680,6 @@ class AcknowledgeGiftView(APIView):
     def post(self, request, code, username=None):
         from .utils.performance.cache import UnacknowledgedGiftCache, MessageCache
         from .models import Gift
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
 
         chat_room = get_chat_room_by_url(code, username)
 
@@ -5809,9 +5752,6 @@ class AcknowledgeGiftView(APIView):
 
         # Update Redis message cache + broadcast WebSocket for thanked messages
         if thanked_message_ids:
-            channel_layer = get_channel_layer()
-            room_group_name = f"chat_{chat_room.code}"
-
             for msg_id in thanked_message_ids:
                 try:
                     msg = Message.objects.get(id=msg_id)
@@ -5820,8 +5760,8 @@ class AcknowledgeGiftView(APIView):
                     pass
 
             # Single broadcast with all thanked message IDs
-            async_to_sync(channel_layer.group_send)(
-                room_group_name,
+            RoomChangeLog.publish(
+                chat_room.id, chat_room.code,
                 {
                     'type': 'gift_acknowledged',
                     'message_ids': thanked_message_ids,
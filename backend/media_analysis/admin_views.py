@@ -12,10 +12,11 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Q
-from media_analysis.models import LocationSuggestionsCache, LocationAnalysis
+from django.db.models import ExpressionWrapper, FloatField, Max, Min, Q, Sum
+from media_analysis.models import LocationSuggestionsCache, LocationAnalysis, LocationAnalysisRollup
 from media_analysis.utils.location.geohash_utils import get_cache_key, get_geohash_bounds, encode_location
 from media_analysis.utils.location.cache import get_or_fetch_location_suggestions
+from media_analysis.utils.location.rollups import LOCATION_ROLLUP_PRECISIONS, MAX_ROLLUP_PRECISION
 from constance import config
 
 logger = logging.getLogger(__name__)
@@ -375,17 +376,21 @@ def location_analytics_timeslice(request):
         created_at__lt=end_time
     ).select_related('user').order_by('-created_at')
 
-    total_count = analyses.count()
+    # Fetch one row past the cap: most slices fit, so the COUNT and the
+    # sampling pass only run for slices that actually overflow
+    head = list(analyses[:MAX_POINTS_PER_SLICE + 1])
     sampled = False
     sample_method = None
 
     # Apply grid-based sampling if too many points
-    if total_count > MAX_POINTS_PER_SLICE:
+    if len(head) > MAX_POINTS_PER_SLICE:
+        total_count = analyses.count()
         sampled = True
         sample_method = 'grid'
         points = _sample_by_grid(analyses, MAX_POINTS_PER_SLICE)
     else:
-        points = _format_analysis_points(analyses)
+        total_count = len(head)
+        points = _format_analysis_points(head)
 
     return JsonResponse({
         'success': True,
@@ -577,14 +582,17 @@ def location_analytics_time_range(request):
     """
     Get the available time range for location analytics data.
 
-    Returns the earliest and latest timestamps in the LocationAnalysis table,
-    useful for initializing the playback controls.
+    Returns the earliest and latest timestamps of location analytics data
+    (read from the rollup table), useful for initializing the playback controls.
     """
-    from django.db.models import Min, Max
-
-    stats = LocationAnalysis.objects.aggregate(
-        earliest=Min('created_at'),
-        latest=Max('created_at'),
+    # Every point lands in exactly one row per precision, so the coarsest
+    # rollup level gives exact totals without scanning LocationAnalysis
+    stats = LocationAnalysisRollup.objects.filter(
+        precision=min(LOCATION_ROLLUP_PRECISIONS),
+    ).aggregate(
+        earliest=Min('oldest_at'),
+        latest=Max('newest_at'),
+        total_count=Sum('count'),
     )
 
     if not stats['earliest'] or not stats['latest']:
@@ -596,14 +604,12 @@ def location_analytics_time_range(request):
             'total_count': 0,
         })
 
-    total_count = LocationAnalysis.objects.count()
-
     return JsonResponse({
         'success': True,
         'has_data': True,
         'earliest': stats['earliest'].isoformat(),
         'latest': stats['latest'].isoformat(),
-        'total_count': total_count,
+        'total_count': stats['total_count'],
     })
 
 
@@ -639,6 +645,42 @@ def _zoom_to_precision(zoom):
         return 9  # Max precision for very high zoom
 
 
+def _rollup_clusters(precision, start_time, end_time, bounds=None):
+    """
+    Aggregate LocationAnalysisRollup rows into one cluster per geohash cell.
+
+    Sums the hourly rows for each cell in the time range and derives the
+    centroid from the coordinate sums. When viewport bounds are given,
+    clusters are kept if their centroid falls inside the viewport.
+
+    Returns a values() queryset with geohash_prefix, total, avg_lat,
+    avg_lng, newest, oldest and city.
+    """
+    clusters = LocationAnalysisRollup.objects.filter(
+        precision=precision,
+        hour_bucket__gte=start_time,
+        hour_bucket__lte=end_time,
+    ).values('geohash_prefix').annotate(
+        total=Sum('count'),
+        avg_lat=ExpressionWrapper(Sum('latitude_sum') / Sum('count'), output_field=FloatField()),
+        avg_lng=ExpressionWrapper(Sum('longitude_sum') / Sum('count'), output_field=FloatField()),
+        newest=Max('newest_at'),
+        oldest=Min('oldest_at'),
+        city=Max('city_name'),
+    )
+
+    if bounds:
+        north, south, east, west = bounds
+        clusters = clusters.filter(
+            avg_lat__gte=south,
+            avg_lat__lte=north,
+            avg_lng__gte=west,
+            avg_lng__lte=east,
+        )
+
+    return clusters
+
+
 @staff_member_required
 def location_analytics_lod(request):
     """
@@ -647,6 +689,9 @@ def location_analytics_lod(request):
     Returns location analysis points clustered by geohash precision based on zoom level.
     At low zoom (zoomed out), returns coarse clusters. At high zoom, returns individual points.
 
+    Clusters and totals are read from the hourly LocationAnalysisRollup table, so
+    the time range is widened to the start of the first hour it touches.
+
     Query Parameters:
         zoom: Map zoom level (0-18, required)
         north: Bounding box north latitude (optional, for viewport filtering)
@@ -679,9 +724,6 @@ def location_analytics_lod(request):
             }
         }
     """
-    from django.db.models import Count, Max, Min, Avg
-    from django.db.models.functions import Substr
-
     # Parse zoom level (required)
     zoom_str = request.GET.get('zoom')
     if not zoom_str:
@@ -721,34 +763,35 @@ def location_analytics_lod(request):
     except ValueError:
         hours = 1.0
 
-    # Calculate time range
+    # Calculate time range. Rollups are hourly, so the window starts at the
+    # top of the hour containing `now - hours`.
     end_time = timezone.now()
-    start_time = end_time - timedelta(hours=hours)
+    start_time = (end_time - timedelta(hours=hours)).replace(minute=0, second=0, microsecond=0)
 
     # Determine geohash precision based on zoom
     precision = _zoom_to_precision(zoom)
+    bounds = (north, south, east, west) if has_bounds else None
 
-    # Build base query
-    queryset = LocationAnalysis.objects.filter(
-        created_at__gte=start_time,
-        created_at__lte=end_time,
+    # Clusters (and totals) come from the rollup table, never the raw table
+    rollup_clusters = _rollup_clusters(
+        min(precision, MAX_ROLLUP_PRECISION), start_time, end_time, bounds
     )
-
-    # Apply viewport bounds if provided
-    if has_bounds:
-        queryset = queryset.filter(
-            latitude__gte=south,
-            latitude__lte=north,
-            longitude__gte=west,
-            longitude__lte=east,
-        )
-
-    # Get total count before clustering
-    total_points = queryset.count()
+    total_points = rollup_clusters.aggregate(points=Sum('total'))['points'] or 0
 
     # At high zoom levels (precision >= 7), return individual points instead of clusters
     if precision >= 7:
         # Return individual points (limit to MAX_LOD_CLUSTERS)
+        queryset = LocationAnalysis.objects.filter(
+            created_at__gte=start_time,
+            created_at__lte=end_time,
+        )
+        if bounds:
+            queryset = queryset.filter(
+                latitude__gte=south,
+                latitude__lte=north,
+                longitude__gte=west,
+                longitude__lte=east,
+            )
         points = queryset.order_by('-created_at')[:MAX_LOD_CLUSTERS]
         clusters = []
         for point in points:
@@ -763,33 +806,17 @@ def location_analytics_lod(request):
                 'is_cluster': False,
             })
     else:
-        # Cluster by truncated geohash
-        clustered = queryset.annotate(
-            geohash_cell=Substr('geohash', 1, precision)
-        ).values('geohash_cell').annotate(
-            count=Count('id'),
-            newest_timestamp=Max('created_at'),
-            oldest_timestamp=Min('created_at'),
-            avg_lat=Avg('latitude'),
-            avg_lng=Avg('longitude'),
-        ).order_by('-newest_timestamp')[:MAX_LOD_CLUSTERS]
-
         clusters = []
-        for cluster in clustered:
-            # Get a sample city name for this cluster
-            sample = queryset.filter(
-                geohash__startswith=cluster['geohash_cell']
-            ).exclude(city_name='').first()
-
+        for cluster in rollup_clusters.order_by('-newest')[:MAX_LOD_CLUSTERS]:
             clusters.append({
-                'geohash': cluster['geohash_cell'],
+                'geohash': cluster['geohash_prefix'],
                 'latitude': cluster['avg_lat'],
                 'longitude': cluster['avg_lng'],
-                'count': cluster['count'],
-                'newest_timestamp': cluster['newest_timestamp'].isoformat(),
-                'oldest_timestamp': cluster['oldest_timestamp'].isoformat(),
-                'city_name': sample.city_name if sample else '',
-                'is_cluster': cluster['count'] > 1,
+                'count': cluster['total'],
+                'newest_timestamp': cluster['newest'].isoformat(),
+                'oldest_timestamp': cluster['oldest'].isoformat(),
+                'city_name': cluster['city'] or '',
+                'is_cluster': cluster['total'] > 1,
             })
 
     return JsonResponse({
@@ -1085,3 +1112,38 @@ def api_health_check(request):
 
     results = [r.to_dict() for r in run_probes(selector)]
     return JsonResponse({'results': results})
+
+
+# ---------------------------------------------------------------------------
+# Slow traces
+# ---------------------------------------------------------------------------
+
+@staff_member_required
+def slow_traces_dashboard(request):
+    """Recent traces slower than TRACE_SLOW_MS, from every process, with their span trees."""
+    from django.conf import settings
+    from media_analysis.utils.tracing import get_slow_traces
+
+    try:
+        limit = min(200, max(1, int(request.GET.get('limit', 50))))
+    except (ValueError, TypeError):
+        limit = 50
+
+    traces = get_slow_traces(limit=limit)
+    trace_id = request.GET.get('trace_id', '').strip()
+    if trace_id:
+        traces = [trace for trace in traces if trace['trace_id'] == trace_id]
+
+    for trace in traces:
+        for span in trace['spans']:
+            span['indent_px'] = span['depth'] * 20
+
+    context = {
+        'title': 'Slow Traces',
+        'traces': traces,
+        'trace_id': trace_id,
+        'limit': limit,
+        'slow_ms': settings.TRACE_SLOW_MS,
+        'tracing_enabled': settings.TRACING_ENABLED,
+    }
+    return render(request, 'admin/slow_traces.html', context)
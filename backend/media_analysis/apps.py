@@ -8,5 +8,10 @@ class MediaAnalysisConfig(AppConfig):
     verbose_name = 'Media Analysis'
 
     def ready(self):
-        """Import signals when app is ready."""
-        pass  # Add signal imports here if needed
+        """Import signals and count SQL per trace span when app is ready."""
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .utils.tracing import instrument_connection
+
+        connection_created.connect(instrument_connection)
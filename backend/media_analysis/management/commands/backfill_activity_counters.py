@@ -0,0 +1,75 @@
+"""
+Management command to rebuild the rolling activity counters from PostgreSQL.
+
+Discovery ranking reads per-room message counts and active-user estimates
+from Redis hour buckets that are maintained on write. Messages written
+before the counters existed (or while Redis was down, or via bulk_create)
+are not reflected until this command replays the last 24 hours.
+
+Usage:
+    ./venv/bin/python manage.py backfill_activity_counters [--chat CHAT_CODE]
+
+Examples:
+    # Rebuild counters for every active chat
+    ./venv/bin/python manage.py backfill_activity_counters
+
+    # Rebuild a single chat
+    ./venv/bin/python manage.py backfill_activity_counters --chat ABC123
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chats.models import ChatRoom, Message
+from media_analysis.utils.message_activity import (
+    ACTIVITY_WINDOW_HOURS,
+    record_message_activity,
+    reset_message_activity,
+)
+from media_analysis.utils.room_activity import record_active_user, reset_active_users
+
+
+class Command(BaseCommand):
+    help = 'Rebuild rolling message/active-user counters from the last 24 hours of messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chat',
+            type=str,
+            help='Specific chat code to rebuild (optional, rebuilds all active chats if omitted)',
+        )
+
+    def handle(self, *args, **options):
+        chat_code = options.get('chat')
+
+        rooms = ChatRoom.objects.filter(is_active=True)
+        if chat_code:
+            rooms = rooms.filter(code=chat_code)
+            if not rooms.exists():
+                self.stdout.write(self.style.ERROR(f'Chat not found: {chat_code}'))
+                return
+
+        cutoff = timezone.now() - timedelta(hours=ACTIVITY_WINDOW_HOURS)
+        total = rooms.count()
+        self.stdout.write(f'Rebuilding activity counters for {total} chats...\n')
+
+        for i, room in enumerate(rooms.iterator(), 1):
+            reset_message_activity(str(room.id))
+            reset_active_users(str(room.id))
+
+            messages = Message.objects.filter(
+                chat_room=room,
+                created_at__gte=cutoff,
+                is_deleted=False,
+            ).values_list('username', 'created_at')
+
+            count = 0
+            for username, created_at in messages.iterator():
+                record_message_activity(str(room.id), created_at)
+                record_active_user(str(room.id), username, created_at)
+                count += 1
+
+            self.stdout.write(f'[{i}/{total}] {room.code}: {count} messages')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Rebuilt activity counters for {total} chats'))
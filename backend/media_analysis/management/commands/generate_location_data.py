@@ -30,6 +30,7 @@ from django.utils import timezone
 
 from media_analysis.models import LocationAnalysis
 from media_analysis.utils.location import encode_location
+from media_analysis.utils.location.rollups import rebuild_location_rollups, record_location_rollups
 
 # Continental US bounding box
 US_BOUNDS = {
@@ -181,9 +182,12 @@ class Command(BaseCommand):
             f"Found {count} test data records. Deleting..."
         ))
 
-        deleted, _ = LocationAnalysis.objects.filter(
-            fingerprint__startswith=TEST_DATA_PREFIX
-        ).delete()
+        test_data = LocationAnalysis.objects.filter(fingerprint__startswith=TEST_DATA_PREFIX)
+        oldest = test_data.order_by('created_at').values_list('created_at', flat=True).first()
+        deleted, _ = test_data.delete()
+
+        # Rollups only count up; recompute the affected hours from what's left
+        rebuild_location_rollups(since=oldest)
 
         self.stdout.write(self.style.SUCCESS(
             f"Deleted {deleted} test data records."
@@ -240,8 +244,9 @@ class Command(BaseCommand):
             )
             records.append(record)
 
-        # Bulk create for efficiency
+        # Bulk create for efficiency (bypasses post_save, so roll up explicitly)
         created = LocationAnalysis.objects.bulk_create(records)
+        record_location_rollups(created)
         return created
 
     def _generate_location(self, city_bias: float) -> Tuple[float, float, str]:
@@ -0,0 +1,96 @@
+"""
+Management command to run a media processing job worker.
+
+Claims queued MediaJob rows (FOR UPDATE SKIP LOCKED, so several workers
+can run side by side), runs their handlers (voice transcoding, video
+probing/thumbnails, photo analysis) and records the results. Running jobs
+left behind by a crashed worker are requeued periodically.
+
+Usage:
+    ./venv/bin/python manage.py process_media_jobs [--once] [--kind KIND ...]
+
+Options:
+    --once: Drain the queue and exit instead of polling forever
+    --kind: Only run jobs of this kind (repeatable)
+    --poll-interval: Seconds to sleep when the queue is empty (default: 1.0)
+    --worker-id: Name recorded on claimed jobs (default: hostname:pid)
+
+Examples:
+    # Dedicated video worker
+    ./venv/bin/python manage.py process_media_jobs --kind video.process
+
+    # Drain everything once (cron, local development)
+    ./venv/bin/python manage.py process_media_jobs --once
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from media_analysis.utils.jobs import (
+    JOB_HANDLERS,
+    STALE_JOB_SECONDS,
+    claim_next_job,
+    default_worker_id,
+    requeue_stale_jobs,
+    run_job,
+)
+
+
+class Command(BaseCommand):
+    help = 'Run a worker that processes queued media jobs (voice, video, photo analysis)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue and exit instead of polling forever',
+        )
+        parser.add_argument(
+            '--kind',
+            action='append',
+            choices=sorted(JOB_HANDLERS),
+            dest='kinds',
+            help='Only run jobs of this kind (repeatable)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when the queue is empty (default: 1.0)',
+        )
+        parser.add_argument(
+            '--worker-id',
+            default=None,
+            help='Name recorded on claimed jobs (default: hostname:pid)',
+        )
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or default_worker_id()
+        kinds = options['kinds']
+        processed = 0
+        last_requeue = 0.0
+
+        self.stdout.write(f'Media job worker {worker_id} started (kinds: {", ".join(kinds or ["all"])})')
+
+        try:
+            while True:
+                if time.monotonic() - last_requeue > STALE_JOB_SECONDS / 2:
+                    requeue_stale_jobs()
+                    last_requeue = time.monotonic()
+
+                job = claim_next_job(worker_id=worker_id, kinds=kinds)
+                if job is None:
+                    if options['once']:
+                        break
+                    close_old_connections()
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                run_job(job)
+                processed += 1
+                self.stdout.write(f'  {job.kind} {job.id}: {job.status}')
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Processed {processed} media jobs'))
@@ -0,0 +1,41 @@
+"""
+Management command to rebuild the location analytics rollup table.
+
+The admin LOD map reads LocationAnalysisRollup instead of aggregating
+LocationAnalysis. Rollups are maintained on insert; run this to backfill
+history after deploying, or to repair drift after deletes or bulk imports
+that bypassed the incremental path.
+
+Usage:
+    ./venv/bin/python manage.py rebuild_location_rollups [--hours N]
+
+Options:
+    --hours: Only rebuild the last N hours (default: rebuild everything)
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from media_analysis.utils.location.rollups import rebuild_location_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild geohash/hour rollups used by the location analytics map'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=None,
+            help='Only rebuild the last N hours (default: rebuild everything)',
+        )
+
+    def handle(self, *args, **options):
+        hours = options['hours']
+        since = timezone.now() - timedelta(hours=hours) if hours else None
+
+        written = rebuild_location_rollups(since=since)
+
+        scope = f'last {hours} hours' if hours else 'all history'
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {written} rollup rows ({scope})'))
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.14 on 2026-10-18 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_analysis', '0016_expand_geohash_field_for_settings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationAnalysisRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precision', models.PositiveSmallIntegerField(help_text='Geohash precision of this rollup level')),
+                ('geohash_prefix', models.CharField(help_text='Geohash truncated to `precision` characters', max_length=12)),
+                ('hour_bucket', models.DateTimeField(help_text='Start of the hour this row aggregates')),
+                ('count', models.PositiveIntegerField(default=0, help_text='Number of LocationAnalysis records in this cell and hour')),
+                ('latitude_sum', models.FloatField(default=0.0)),
+                ('longitude_sum', models.FloatField(default=0.0)),
+                ('newest_at', models.DateTimeField()),
+                ('oldest_at', models.DateTimeField()),
+                ('city_name', models.CharField(blank=True, default='', help_text='Sample city name for the cell (first non-empty seen)', max_length=255)),
+            ],
+            options={
+                'verbose_name': 'Location Analysis Rollup',
+                'verbose_name_plural': 'Location Analysis Rollups',
+                'db_table': 'location_analysis_rollup',
+                'indexes': [models.Index(fields=['precision', 'hour_bucket'], name='location_an_precisi_4206a3_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='locationanalysisrollup',
+            constraint=models.UniqueConstraint(fields=('precision', 'geohash_prefix', 'hour_bucket'), name='unique_location_rollup_cell_hour'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.14 on 2026-10-18 21:26
+
+from django.db import migrations, models
+
+
+def backfill_phash_bands(apps, schema_editor):
+    from media_analysis.utils.fingerprinting.near_duplicate import (
+        phash_bands, phash_to_int, to_signed_bigint,
+    )
+
+    PhotoAnalysis = apps.get_model('media_analysis', 'PhotoAnalysis')
+    batch = []
+    for analysis in PhotoAnalysis.objects.only('id', 'image_phash').iterator():
+        value = phash_to_int(analysis.image_phash)
+        if value is None:
+            continue
+        analysis.phash_value = to_signed_bigint(value)
+        (analysis.phash_band_0, analysis.phash_band_1,
+         analysis.phash_band_2, analysis.phash_band_3) = phash_bands(value)
+        batch.append(analysis)
+    PhotoAnalysis.objects.bulk_update(
+        batch,
+        ['phash_value', 'phash_band_0', 'phash_band_1', 'phash_band_2', 'phash_band_3'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_analysis', '0017_location_analysis_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photoanalysis',
+            name='phash_band_0',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='photoanalysis',
+            name='phash_band_1',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='photoanalysis',
+            name='phash_band_2',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='photoanalysis',
+            name='phash_band_3',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='photoanalysis',
+            name='phash_value',
+            field=models.BigIntegerField(blank=True, help_text='pHash as a signed 64-bit integer', null=True),
+        ),
+        migrations.RunPython(backfill_phash_bands, migrations.RunPython.noop),
+    ]
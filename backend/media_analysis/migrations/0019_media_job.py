@@ -0,0 +1,42 @@
+# Generated by Django 5.0.14 on 2026-10-18 21:29
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_analysis', '0018_photo_analysis_phash_bands'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(help_text='Job type (selects the handler)', max_length=50)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('payload', models.JSONField(default=dict, help_text='Handler input (storage paths, uploader identity, ...)')),
+                ('result', models.JSONField(blank=True, help_text='Handler output once succeeded (URLs, analysis id, ...)', null=True)),
+                ('error', models.TextField(blank=True, default='', help_text='Last error message')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3)),
+                ('notify_group', models.CharField(blank=True, default='', max_length=100)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Media Job',
+                'verbose_name_plural': 'Media Jobs',
+                'db_table': 'media_job',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['run_after', 'created_at'], name='media_job_queued_idx'), models.Index(fields=['status', 'locked_at'], name='media_job_status_095980_idx')],
+            },
+        ),
+    ]
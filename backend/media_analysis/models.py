@@ -349,6 +349,20 @@ class PhotoAnalysis(models.Model):
         help_text="Perceptual hash (pHash) for detecting similar images"
     )
 
+    # pHash as a signed 64-bit integer plus four 16-bit bands
+    # - Derived from image_phash in save()
+    # - Bands are indexed for near-duplicate lookup by multi-index hashing
+    #   (see utils/fingerprinting/near_duplicate.py)
+    phash_value = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="pHash as a signed 64-bit integer"
+    )
+    phash_band_0 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_band_1 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_band_2 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_band_3 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+
     # File Hash (MD5) - exact file match detection
     # - Only matches identical files byte-for-byte
     # - Example: "098f6bcd4621d373cade4e832627b4f6"
@@ -554,6 +568,20 @@ class PhotoAnalysis(models.Model):
     def __str__(self):
         return f"PhotoAnalysis {self.id} - {self.ai_vision_model}"
 
+    def save(self, *args, **kwargs):
+        """Keep the integer/band form of image_phash in sync."""
+        from .utils.fingerprinting.near_duplicate import phash_bands, phash_to_int, to_signed_bigint
+
+        value = phash_to_int(self.image_phash)
+        if value is None:
+            self.phash_value = None
+            bands = (None,) * 4
+        else:
+            self.phash_value = to_signed_bigint(value)
+            bands = phash_bands(value)
+        self.phash_band_0, self.phash_band_1, self.phash_band_2, self.phash_band_3 = bands
+        super().save(*args, **kwargs)
+
     def is_expired(self):
         """Check if the analysis has expired."""
         if self.expires_at is None:
@@ -774,3 +802,169 @@ class LocationAnalysis(models.Model):
     def __str__(self):
         location = self.city_name or f"({self.latitude}, {self.longitude})"
         return f"Location Analysis: {location}"
+
+
+class LocationAnalysisRollup(models.Model):
+    """
+    Pre-aggregated LocationAnalysis counts for the admin analytics map.
+
+    One row per (geohash precision, geohash prefix, hour). Every new
+    LocationAnalysis increments one row per precision in
+    LOCATION_ROLLUP_PRECISIONS, so the LOD map reads a few hundred rollup
+    rows instead of GROUP BY-ing the raw table on every pan or zoom.
+
+    Maintained by media_analysis.utils.location.rollups; rebuild with:
+        ./venv/bin/python manage.py rebuild_location_rollups
+    """
+
+    precision = models.PositiveSmallIntegerField(
+        help_text="Geohash precision of this rollup level"
+    )
+
+    geohash_prefix = models.CharField(
+        max_length=12,
+        help_text="Geohash truncated to `precision` characters"
+    )
+
+    hour_bucket = models.DateTimeField(
+        help_text="Start of the hour this row aggregates"
+    )
+
+    count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of LocationAnalysis records in this cell and hour"
+    )
+
+    # Sums (not averages) so rows can be merged across hours and increments
+    latitude_sum = models.FloatField(default=0.0)
+    longitude_sum = models.FloatField(default=0.0)
+
+    newest_at = models.DateTimeField()
+    oldest_at = models.DateTimeField()
+
+    city_name = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text="Sample city name for the cell (first non-empty seen)"
+    )
+
+    class Meta:
+        db_table = 'location_analysis_rollup'
+        verbose_name = 'Location Analysis Rollup'
+        verbose_name_plural = 'Location Analysis Rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['precision', 'geohash_prefix', 'hour_bucket'],
+                name='unique_location_rollup_cell_hour'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['precision', 'hour_bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.geohash_prefix} @ {self.hour_bucket:%Y-%m-%d %H:00} ({self.count})"
+
+
+class MediaJob(models.Model):
+    """
+    Durable queue entry for media processing that runs outside the request.
+
+    Uploads that ask for asynchronous processing (Prefer: respond-async)
+    store their input and enqueue a job instead of running ffmpeg/ffprobe
+    or the Vision API inside a web worker. Workers claim jobs with
+    SELECT ... FOR UPDATE SKIP LOCKED, so any number of them can drain the
+    table without double-processing.
+
+    Run a worker with:
+        ./venv/bin/python manage.py process_media_jobs
+    """
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+
+    # Handler name from media_analysis.utils.jobs.JOB_HANDLERS
+    # (e.g., 'voice.transcode', 'video.process', 'photo.analyze')
+    kind = models.CharField(
+        max_length=50,
+        help_text="Job type (selects the handler)"
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED
+    )
+
+    payload = models.JSONField(
+        default=dict,
+        help_text="Handler input (storage paths, uploader identity, ...)"
+    )
+
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Handler output once succeeded (URLs, analysis id, ...)"
+    )
+
+    error = models.TextField(
+        blank=True,
+        default='',
+        help_text="Last error message"
+    )
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+
+    # Channel layer group notified when the job finishes (blank = nobody)
+    notify_group = models.CharField(
+        max_length=100,
+        blank=True,
+        default=''
+    )
+
+    # Earliest time a worker may pick the job up (pushed back on retry)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'media_job'
+        verbose_name = 'Media Job'
+        verbose_name_plural = 'Media Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['run_after', 'created_at'],
+                name='media_job_queued_idx',
+                condition=models.Q(status='queued'),
+            ),
+            models.Index(fields=['status', 'locked_at']),
+        ]
+
+    def __str__(self):
+        return f"MediaJob {self.id} - {self.kind} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
@@ -0,0 +1,47 @@
+"""
+Signal handlers for media_analysis.
+
+Keeps derived read models in step with writes so readers never have to
+aggregate raw tables:
+- Rolling activity counters used for discovery ranking (Message)
+- Geohash/hour rollups for the location analytics map (LocationAnalysis)
+"""
+import logging
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from chats.models import Message
+from .models import LocationAnalysis
+from .utils.location.rollups import record_location_rollups
+from .utils.message_activity import record_message_activity
+from .utils.room_activity import record_active_user
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Message, dispatch_uid='media_analysis_record_message_activity')
+def record_message_activity_on_create(sender, instance, created, **kwargs):
+    """Count a newly created message towards its room's activity."""
+    if not created or instance.is_deleted:
+        return
+
+    try:
+        record_message_activity(instance.chat_room_id, instance.created_at)
+        record_active_user(instance.chat_room_id, instance.username, instance.created_at)
+    except Exception as e:
+        # Counters are best-effort; never fail the message write over them
+        logger.warning(f"Activity counter update failed for message {instance.id}: {e}")
+
+
+@receiver(post_save, sender=LocationAnalysis, dispatch_uid='media_analysis_record_location_rollups')
+def record_location_rollups_on_create(sender, instance, created, **kwargs):
+    """Count a new location lookup towards the analytics map rollups."""
+    if not created:
+        return
+
+    try:
+        record_location_rollups([instance])
+    except Exception as e:
+        # Rollups can be rebuilt with rebuild_location_rollups; never fail the lookup
+        logger.warning(f"Location rollup update failed for analysis {instance.id}: {e}")
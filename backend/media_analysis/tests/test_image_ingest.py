@@ -0,0 +1,232 @@
+"""
+Tests for the single-decode photo ingestion pipeline.
+
+Tests ImageIngest, which reads and decodes an upload once and derives the
+hashes, dimensions, orientation and resized JPEG from that one buffer, and
+the photo upload view rejecting uploads it cannot decode.
+
+Benchmark against the legacy multi-decode path (tagged `slow`):
+
+    ./venv/bin/python -m pytest media_analysis/tests/test_image_ingest.py -m slow
+"""
+import base64
+import io
+import random
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, tag
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from media_analysis.utils.fingerprinting.file_hash import calculate_sha256, get_file_size
+from media_analysis.utils.fingerprinting.image_hash import calculate_phash
+from media_analysis.utils.image_processing import (
+    EXIF_ORIENTATION_TAG,
+    ImageIngest,
+    VISION_MAX_DIMENSION,
+    resize_image_if_needed,
+)
+from media_analysis.utils.vision.openai_vision import OpenAIVisionProvider
+
+
+def _make_image_bytes(width, height, format='JPEG', mode='RGB', orientation=None, seed=0):
+    """Build a noisy image (so pHash and JPEG size are realistic)."""
+    rng = random.Random(seed)
+    small = Image.new(mode, (32, 24))
+    small.putdata([
+        tuple(rng.randrange(256) for _ in range(len(mode)))
+        for _ in range(32 * 24)
+    ])
+    img = small.resize((width, height), Image.BILINEAR)
+
+    output = io.BytesIO()
+    save_kwargs = {'quality': 95} if format == 'JPEG' else {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION_TAG] = orientation
+        save_kwargs['exif'] = exif.tobytes()
+    img.save(output, format=format, **save_kwargs)
+    return output.getvalue()
+
+
+class ImageIngestTests(TestCase):
+    """Test suite for ImageIngest."""
+
+    def test_hashes_match_legacy_helpers(self):
+        """Hashes must match existing PhotoAnalysis rows for deduplication."""
+        data = _make_image_bytes(1200, 900)
+
+        ingest = ImageIngest(io.BytesIO(data))
+
+        self.assertEqual(ingest.file_hash, calculate_sha256(data))
+        self.assertEqual(ingest.phash, calculate_phash(data))
+        self.assertEqual(ingest.file_size, get_file_size(data))
+
+    def test_rgba_png_phash_matches_legacy(self):
+        data = _make_image_bytes(800, 600, format='PNG', mode='RGBA')
+
+        ingest = ImageIngest(data)
+
+        self.assertEqual(ingest.phash, calculate_phash(data))
+        self.assertEqual(ingest.format, 'PNG')
+
+    def test_dimensions_and_orientation(self):
+        data = _make_image_bytes(400, 300, orientation=6)
+
+        ingest = ImageIngest(data)
+
+        self.assertEqual(ingest.size, (400, 300))
+        self.assertEqual(ingest.orientation, 6)
+
+    def test_jpeg_respects_both_limits(self):
+        ingest = ImageIngest(_make_image_bytes(4000, 3000))
+
+        jpeg = ingest.to_jpeg(max_megapixels=2.0, max_dimension=VISION_MAX_DIMENSION)
+
+        img = Image.open(io.BytesIO(jpeg))
+        self.assertEqual(img.format, 'JPEG')
+        self.assertEqual(img.size, (768, 576))
+
+    def test_jpeg_megapixel_limit_only(self):
+        ingest = ImageIngest(_make_image_bytes(4000, 3000))
+
+        jpeg = ingest.to_jpeg(max_megapixels=2.0)
+
+        width, height = Image.open(io.BytesIO(jpeg)).size
+        self.assertLessEqual(width * height, 2_000_000)
+        self.assertGreater(width * height, 1_900_000)
+
+    def test_jpeg_applies_exif_orientation(self):
+        """Orientation 6 (rotate 90° CW) produces an upright portrait JPEG."""
+        ingest = ImageIngest(_make_image_bytes(400, 300, orientation=6))
+
+        jpeg = ingest.to_jpeg(max_dimension=VISION_MAX_DIMENSION)
+
+        self.assertEqual(Image.open(io.BytesIO(jpeg)).size, (300, 400))
+
+    def test_jpeg_flattens_transparency(self):
+        ingest = ImageIngest(_make_image_bytes(200, 200, format='PNG', mode='RGBA'))
+
+        img = Image.open(io.BytesIO(ingest.to_jpeg()))
+
+        self.assertEqual(img.mode, 'RGB')
+
+    def test_jpeg_is_encoded_once(self):
+        ingest = ImageIngest(_make_image_bytes(1200, 900))
+
+        first = ingest.to_jpeg(max_megapixels=2.0, max_dimension=VISION_MAX_DIMENSION)
+        second = ingest.to_jpeg(max_megapixels=2.0, max_dimension=VISION_MAX_DIMENSION)
+
+        self.assertIs(first, second)
+
+    def test_invalid_image_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            ImageIngest(b'not an image')
+
+    def test_vision_provider_sends_presized_jpeg_as_is(self):
+        """The vision provider must not re-encode ingest output."""
+        jpeg = ImageIngest(_make_image_bytes(2000, 1500)).to_jpeg(
+            max_dimension=VISION_MAX_DIMENSION
+        )
+        provider = OpenAIVisionProvider(api_key='test-key')
+
+        with patch('media_analysis.utils.vision.openai_vision.Image.Image.save') as mock_save:
+            encoded = provider._encode_image_to_base64(io.BytesIO(jpeg))
+
+        self.assertEqual(base64.b64decode(encoded), jpeg)
+        mock_save.assert_not_called()
+
+
+class PhotoUploadDecodeTests(TestCase):
+    """Uploads that cannot be decoded are rejected with a validation error."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _upload(self, data, name, content_type):
+        return self.client.post(
+            '/api/media-analysis/photo/upload/',
+            {'image': SimpleUploadedFile(name, data, content_type=content_type)},
+            format='multipart',
+        )
+
+    def test_truncated_image_returns_400(self):
+        data = _make_image_bytes(400, 300)
+
+        response = self._upload(data[:len(data) // 2], 'truncated.jpg', 'image/jpeg')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data)
+
+    def test_non_image_returns_400(self):
+        response = self._upload(b'%PDF-1.4 not an image', 'photo.jpg', 'image/jpeg')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data)
+
+
+@tag('slow')
+class ImageIngestBenchmarkTests(TestCase):
+    """CPU time and peak Python-heap memory: ImageIngest vs the legacy upload path."""
+
+    FIXTURES = [
+        ('JPEG', 'RGB', 4032, 3024),
+        ('JPEG', 'RGB', 6000, 4000),
+        ('PNG', 'RGB', 3000, 2000),
+        ('PNG', 'RGBA', 2048, 2048),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fixtures = [
+            _make_image_bytes(width, height, format=format, mode=mode, seed=i)
+            for i, (format, mode, width, height) in enumerate(cls.FIXTURES)
+        ]
+
+    def _legacy_path(self, data):
+        """Upload path before ImageIngest: five reads, three decodes."""
+        upload = io.BytesIO(data)
+        calculate_sha256(upload)
+        upload.seek(0)
+        calculate_phash(upload)
+        upload.seek(0)
+        get_file_size(upload)
+        upload.seek(0)
+        resized, _ = resize_image_if_needed(upload, 2.0)
+        provider = OpenAIVisionProvider(api_key='test-key')
+        provider._encode_image_to_base64(resized)
+        upload.seek(0)
+        upload.read()  # MediaStorage.save_file
+
+    def _ingest_path(self, data):
+        ingest = ImageIngest(io.BytesIO(data))
+        ingest.file_hash, ingest.phash, ingest.file_size
+        jpeg = ingest.to_jpeg(max_megapixels=2.0, max_dimension=VISION_MAX_DIMENSION)
+        provider = OpenAIVisionProvider(api_key='test-key')
+        provider._encode_image_to_base64(io.BytesIO(jpeg))
+
+    def _measure(self, path):
+        tracemalloc.start()
+        start = time.process_time()
+        for data in self.fixtures:
+            path(data)
+        elapsed = time.process_time() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, peak
+
+    def test_ingest_is_cheaper_than_legacy_path(self):
+        legacy_cpu, legacy_peak = self._measure(self._legacy_path)
+        ingest_cpu, ingest_peak = self._measure(self._ingest_path)
+
+        print(
+            f'\n[ingest benchmark] fixtures={len(self.fixtures)} '
+            f'legacy={legacy_cpu * 1000:.0f}ms/{legacy_peak / 2**20:.1f}MB '
+            f'ingest={ingest_cpu * 1000:.0f}ms/{ingest_peak / 2**20:.1f}MB'
+        )
+        self.assertLess(ingest_cpu, legacy_cpu)
+        self.assertLessEqual(ingest_peak, legacy_peak)
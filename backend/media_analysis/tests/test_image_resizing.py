@@ -284,3 +284,19 @@ class ImageResizingTests(TestCase):
         width, height = img.size
         aspect_ratio = width / height
         self.assertAlmostEqual(aspect_ratio, 10.0, places=1)
+
+    def test_resize_large_palette_png(self):
+        """Test resizing a palette PNG far above the limit (reduce() has no 'P' mode)."""
+        img = Image.new('RGB', (8000, 6000), (30, 144, 255)).quantize(colors=16)
+        self.assertEqual(img.mode, 'P')
+        image_file = io.BytesIO()
+        img.save(image_file, format='PNG')
+        image_file.seek(0)
+
+        result, was_resized = resize_image_if_needed(image_file, max_megapixels=2.0)
+
+        self.assertTrue(was_resized)
+        result.seek(0)
+        resized = Image.open(result)
+        self.assertEqual(resized.format, 'PNG')
+        self.assertLessEqual(resized.width * resized.height, 2_000_000)
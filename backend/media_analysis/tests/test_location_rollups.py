@@ -0,0 +1,184 @@
+"""
+Tests for location analytics rollups.
+
+Tests the incremental geohash/hour rollup table including:
+- Increments on LocationAnalysis create and bulk record
+- Rebuild from the raw table matches incremental maintenance, including
+  points stored with a short geohash
+- LOD endpoint serves clusters without touching the raw table
+- Time range endpoint totals
+"""
+
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User
+from media_analysis.models import LocationAnalysis, LocationAnalysisRollup
+from media_analysis.utils.location import encode_location
+from media_analysis.utils.location.rollups import (
+    LOCATION_ROLLUP_PRECISIONS,
+    rebuild_location_rollups,
+)
+
+import allure
+
+CHICAGO = (41.8781, -87.6298)
+NEW_YORK = (40.7128, -74.0060)
+
+
+def _make_analysis(lat, lng, city_name=''):
+    return LocationAnalysis.objects.create(
+        latitude=lat,
+        longitude=lng,
+        geohash=encode_location(lat, lng, precision=7),
+        city_name=city_name,
+    )
+
+
+def _snapshot():
+    return sorted(
+        LocationAnalysisRollup.objects.values_list(
+            'precision', 'geohash_prefix', 'hour_bucket', 'count'
+        )
+    )
+
+
+@allure.feature('Location Analytics')
+@allure.story('Rollup Maintenance')
+class LocationRollupMaintenanceTests(TestCase):
+    """Test that rollups track LocationAnalysis inserts."""
+
+    @allure.title("Create increments one row per precision")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_create_increments_each_precision(self):
+        _make_analysis(*CHICAGO, city_name='Chicago')
+        _make_analysis(*CHICAGO)
+
+        rows = LocationAnalysisRollup.objects.order_by('precision')
+        self.assertEqual([r.precision for r in rows], list(LOCATION_ROLLUP_PRECISIONS))
+        for row in rows:
+            self.assertEqual(row.count, 2)
+            self.assertEqual(row.city_name, 'Chicago')
+            self.assertAlmostEqual(row.latitude_sum / row.count, CHICAGO[0])
+
+    @allure.title("Distant points land in different cells")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_distinct_cells(self):
+        _make_analysis(*CHICAGO)
+        _make_analysis(*NEW_YORK)
+
+        self.assertEqual(
+            LocationAnalysisRollup.objects.filter(precision=2).count(), 2
+        )
+
+    @allure.title("Rebuild matches incremental maintenance")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_rebuild_matches_incremental(self):
+        for _ in range(3):
+            _make_analysis(*CHICAGO, city_name='Chicago')
+        _make_analysis(*NEW_YORK, city_name='New York')
+
+        incremental = _snapshot()
+        LocationAnalysisRollup.objects.all().delete()
+
+        rebuild_location_rollups()
+
+        self.assertEqual(_snapshot(), incremental)
+
+    @allure.title("Rebuild re-encodes short geohashes like the incremental path")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_rebuild_matches_incremental_for_short_geohash(self):
+        LocationAnalysis.objects.create(
+            latitude=CHICAGO[0],
+            longitude=CHICAGO[1],
+            geohash=encode_location(*CHICAGO, precision=3),
+        )
+        _make_analysis(*NEW_YORK)
+
+        incremental = _snapshot()
+        self.assertEqual(len(incremental), 2 * len(LOCATION_ROLLUP_PRECISIONS))
+        LocationAnalysisRollup.objects.all().delete()
+
+        rebuild_location_rollups()
+
+        self.assertEqual(_snapshot(), incremental)
+
+    @allure.title("Rebuild repairs drift after deletes")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_rebuild_after_delete(self):
+        _make_analysis(*CHICAGO)
+        stale = _make_analysis(*CHICAGO)
+        stale.delete()
+
+        rebuild_location_rollups(since=timezone.now() - timedelta(hours=1))
+
+        for row in LocationAnalysisRollup.objects.all():
+            self.assertEqual(row.count, 1)
+
+
+@allure.feature('Location Analytics')
+@allure.story('Admin Endpoints')
+class LocationRollupEndpointTests(TestCase):
+    """Test that the admin map endpoints read from rollups."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            email='rollup_staff@example.com',
+            password='testpass123',
+            is_staff=True,
+        )
+        self.client.force_login(self.staff)
+
+        for _ in range(3):
+            _make_analysis(*CHICAGO, city_name='Chicago')
+        _make_analysis(*NEW_YORK, city_name='New York')
+
+    @allure.title("LOD clusters come from rollups only")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_lod_reads_rollups(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/monitor/location-cache/analytics/lod/', {'zoom': 4})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total_points'], 4)
+        counts = sorted(c['count'] for c in data['clusters'])
+        self.assertEqual(counts, [1, 3])
+        chicago = next(c for c in data['clusters'] if c['count'] == 3)
+        self.assertEqual(chicago['city_name'], 'Chicago')
+        self.assertAlmostEqual(chicago['latitude'], CHICAGO[0])
+        self.assertFalse(any('"location_analysis"' in q['sql'] for q in queries.captured_queries))
+
+    @allure.title("LOD viewport filters clusters by centroid")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_lod_viewport(self):
+        response = self.client.get('/admin/monitor/location-cache/analytics/lod/', {
+            'zoom': 6, 'north': 43, 'south': 41, 'east': -86, 'west': -89,
+        })
+
+        data = response.json()
+        self.assertEqual(data['total_points'], 3)
+        self.assertEqual(len(data['clusters']), 1)
+
+    @allure.title("High zoom still returns individual points")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_lod_high_zoom_points(self):
+        response = self.client.get('/admin/monitor/location-cache/analytics/lod/', {'zoom': 15})
+
+        data = response.json()
+        self.assertEqual(len(data['clusters']), 4)
+        self.assertFalse(any(c['is_cluster'] for c in data['clusters']))
+        self.assertEqual(data['total_points'], 4)
+
+    @allure.title("Time range totals come from rollups")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_time_range(self):
+        response = self.client.get('/admin/monitor/location-cache/analytics/time-range/')
+
+        data = response.json()
+        self.assertTrue(data['has_data'])
+        self.assertEqual(data['total_count'], 4)
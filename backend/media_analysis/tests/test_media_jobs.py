@@ -0,0 +1,296 @@
+"""
+Tests for the media job queue.
+
+Tests claiming, retries and failure handling, the job status endpoint,
+completion notifications, and the `Prefer: respond-async` upload paths.
+"""
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from chatpop.utils.media import MediaStorage, save_video_message
+from chats.tests import factories
+from chats.utils.security.auth import ChatSessionValidator
+from chatpop.utils.media.video import VideoInfo
+from media_analysis.models import MediaJob, PhotoAnalysis
+from media_analysis.utils import jobs
+from media_analysis.utils.jobs import (
+    JobRejected,
+    chat_upload_group,
+    claim_next_job,
+    enqueue_job,
+    requeue_stale_jobs,
+    run_job,
+    run_pending_jobs,
+)
+
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+def succeeding_handler(payload):
+    return {'echo': payload['value']}
+
+
+def failing_handler(payload):
+    raise RuntimeError('transient failure')
+
+
+def rejecting_handler(payload):
+    raise JobRejected('bad input')
+
+
+TEST_HANDLERS = {
+    **jobs.JOB_HANDLERS,
+    'test.ok': f'{__name__}.succeeding_handler',
+    'test.fail': f'{__name__}.failing_handler',
+    'test.reject': f'{__name__}.rejecting_handler',
+}
+
+
+@patch.dict(jobs.JOB_HANDLERS, TEST_HANDLERS)
+class MediaJobQueueTests(TestCase):
+    """Test enqueue/claim/run state transitions."""
+
+    def test_unknown_kind_rejected(self):
+        with self.assertRaises(ValueError):
+            enqueue_job('nope', {})
+
+    def test_successful_job_records_result(self):
+        job = enqueue_job('test.ok', {'value': 42})
+
+        self.assertEqual(run_pending_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.result, {'echo': 42})
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_claimed_job_not_claimed_again(self):
+        enqueue_job('test.ok', {'value': 1})
+
+        first = claim_next_job(worker_id='a')
+
+        self.assertEqual(first.status, MediaJob.STATUS_RUNNING)
+        self.assertEqual(first.locked_by, 'a')
+        self.assertIsNone(claim_next_job(worker_id='b'))
+
+    def test_claim_filters_by_kind(self):
+        enqueue_job('test.ok', {'value': 1})
+
+        self.assertIsNone(claim_next_job(kinds=['video.process']))
+        self.assertIsNotNone(claim_next_job(kinds=['test.ok']))
+
+    def test_failure_retries_with_backoff(self):
+        job = enqueue_job('test.fail', {})
+
+        run_job(claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaJob.STATUS_QUEUED)
+        self.assertEqual(job.error, 'transient failure')
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=jobs.RETRY_BASE_SECONDS - 1))
+        # Not runnable until the backoff expires
+        self.assertIsNone(claim_next_job())
+
+    def test_failure_after_max_attempts(self):
+        job = enqueue_job('test.fail', {}, max_attempts=2)
+
+        for _ in range(2):
+            MediaJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            run_job(claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_rejected_job_fails_without_retry(self):
+        job = enqueue_job('test.reject', {})
+
+        run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.error, 'bad input')
+
+    def test_requeue_stale_jobs(self):
+        job = enqueue_job('test.ok', {'value': 1})
+        claim_next_job(worker_id='crashed')
+        MediaJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaJob.STATUS_QUEUED)
+        self.assertEqual(job.locked_by, '')
+
+    def test_stale_job_out_of_attempts_fails_instead_of_requeueing(self):
+        job = enqueue_job('test.ok', {'value': 1}, max_attempts=1)
+        claim_next_job(worker_id='crashed')
+        MediaJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale_jobs(), 0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaJob.STATUS_FAILED)
+        self.assertIn('crashed', job.error)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(claim_next_job())
+
+    @override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+    def test_finished_job_notifies_group(self):
+        channel_layer = get_channel_layer()
+        group = chat_upload_group(1, 'alice')
+        channel_name = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(group, channel_name)
+        job = enqueue_job('test.ok', {'value': 7}, notify_group=group)
+
+        run_pending_jobs()
+
+        message = async_to_sync(channel_layer.receive)(channel_name)
+        self.assertEqual(message['type'], 'media_job_update')
+        self.assertEqual(message['job']['id'], str(job.id))
+        self.assertEqual(message['job']['result'], {'echo': 7})
+
+
+class MediaJobStatusEndpointTests(TestCase):
+    """Test GET /api/media-analysis/jobs/{id}/."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_returns_job(self):
+        job = enqueue_job('video.process', {'storage_path': 'video_messages/x.mp4'})
+
+        response = self.client.get(f'/api/media-analysis/jobs/{job.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], str(job.id))
+        self.assertEqual(response.data['status'], MediaJob.STATUS_QUEUED)
+        self.assertNotIn('payload', response.data)
+
+    def test_unknown_job_404(self):
+        response = self.client.get('/api/media-analysis/jobs/not-a-uuid/')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class MediaJobUploadTests(TestCase):
+    """Test uploads with `Prefer: respond-async` and their job handlers."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            AWS_ACCESS_KEY_ID='',
+            AWS_SECRET_ACCESS_KEY='',
+            AWS_STORAGE_BUCKET_NAME='',
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _jpeg(self):
+        output = io.BytesIO()
+        Image.new('RGB', (320, 240), (200, 120, 40)).save(output, format='JPEG')
+        return output.getvalue()
+
+    @patch('media_analysis.views.get_vision_provider')
+    def test_async_photo_upload_returns_202_and_job_completes(self, mock_get_vision_provider):
+        provider = Mock()
+        provider.is_available.return_value = True
+        mock_get_vision_provider.return_value = provider
+
+        response = self.client.post(
+            '/api/media-analysis/photo/upload/',
+            {'image': SimpleUploadedFile('photo.jpg', self._jpeg(), content_type='image/jpeg')},
+            format='multipart',
+            HTTP_PREFER='respond-async',
+        )
+
+        self.assertEqual(response.status_code, 202)
+        job = MediaJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.kind, 'photo.analyze')
+        self.assertTrue(MediaStorage.file_exists(job.payload['storage_path']))
+        self.assertFalse(PhotoAnalysis.objects.exists())
+
+        def fake_pipeline(vision_provider, resized_jpeg, **kwargs):
+            analysis = PhotoAnalysis.objects.create(
+                image_phash=kwargs['image_phash'],
+                file_hash=kwargs['file_hash'],
+                file_size=kwargs['file_size'],
+                image_path=kwargs['storage'][0],
+                suggestions={'suggestions': [{'name': 'Coffee Chat', 'key': 'coffee-chat'}], 'count': 1},
+            )
+            return analysis, None
+
+        with patch('media_analysis.views.run_photo_analysis', side_effect=fake_pipeline):
+            run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaJob.STATUS_SUCCEEDED)
+        analysis = PhotoAnalysis.objects.get(pk=job.result['analysis_id'])
+        self.assertEqual(analysis.image_path, job.payload['storage_path'])
+        self.assertEqual(job.result['suggestions'][0]['key'], 'coffee-chat')
+
+    def test_async_video_upload_withholds_url_until_the_job_succeeds(self):
+        room = factories.make_room()
+        room.video_enabled = True
+        room.save()
+        token = ChatSessionValidator.create_session_token(room.code, 'alice')
+
+        response = self.client.post(
+            f'/api/chats/{room.host.reserved_username}/{room.code}/video/upload/',
+            {
+                'video': SimpleUploadedFile('clip.mp4', b'fake video', content_type='video/mp4'),
+                'session_token': token,
+            },
+            format='multipart',
+            HTTP_PREFER='respond-async',
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertNotIn('video_url', response.data)
+        job = MediaJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.kind, 'video.process')
+
+    @patch('chats.utils.media_jobs.extract_thumbnail', return_value=b'thumb')
+    @patch('chats.utils.media_jobs.probe_video', return_value=VideoInfo(12.345, 720, 1280))
+    def test_video_job_returns_metadata(self, mock_probe, mock_thumb):
+        storage_path, _ = save_video_message(io.BytesIO(b'fake video'), filename='clip.mp4')
+        job = enqueue_job('video.process', {'storage_path': storage_path})
+
+        run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.result['duration'], 12.35)
+        self.assertEqual((job.result['width'], job.result['height']), (720, 1280))
+        self.assertIsNotNone(job.result['thumbnail_url'])
+
+    @patch('chats.utils.media_jobs.probe_video', return_value=VideoInfo(45.0, 720, 1280))
+    def test_video_job_rejects_long_video(self, mock_probe):
+        storage_path, _ = save_video_message(io.BytesIO(b'fake video'), filename='long.mp4')
+        job = enqueue_job('video.process', {'storage_path': storage_path})
+
+        run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertFalse(MediaStorage.file_exists(storage_path))
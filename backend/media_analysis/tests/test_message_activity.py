@@ -3,7 +3,7 @@ Tests for message activity utility.
 
 Tests the message-based activity tracking including:
 - Message counting for 24h and 10min windows
-- Redis caching with proper TTL
+- Rolling Redis counters maintained on write
 - Edge cases (empty rooms, deleted messages)
 - Security (isolation between rooms)
 - Performance (batch queries, deduplication)
@@ -13,7 +13,9 @@ import time
 from datetime import timedelta
 from unittest.mock import patch, MagicMock
 
+from django.db import connection
 from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.core.cache import cache
 
@@ -24,12 +26,13 @@ import allure
 
 from media_analysis.utils.message_activity import (
     get_message_activity_for_rooms,
-    invalidate_message_activity_cache,
+    record_message_activity,
     MessageActivity,
     MESSAGE_ACTIVITY_CACHE_PREFIX,
-    _get_cache_ttl_seconds,
-    _get_activity_window_minutes,
-    _query_message_activity,
+)
+from media_analysis.utils.room_activity import (
+    get_active_users_for_rooms,
+    record_active_user,
 )
 
 
@@ -250,9 +253,9 @@ class MessageActivityCountingTests(TransactionTestCase):
 
 
 @allure.feature('Message Activity')
-@allure.story('Redis Caching')
-class MessageActivityCachingTests(TransactionTestCase):
-    """Test Redis caching for message activity."""
+@allure.story('Rolling Counters')
+class MessageActivityCounterTests(TransactionTestCase):
+    """Test the write-maintained Redis counters behind message activity."""
 
     def setUp(self):
         """Set up test data."""
@@ -274,119 +277,180 @@ class MessageActivityCachingTests(TransactionTestCase):
         """Clean up after tests."""
         cache.clear()
 
-    @allure.title("Results are cached in Redis")
+    @allure.title("Message creation updates the hour bucket")
     @allure.severity(allure.severity_level.CRITICAL)
-    def test_results_cached(self):
-        """Test that query results are cached in Redis."""
-        now = timezone.now()
+    def test_create_updates_bucket(self):
+        """Test that creating a message increments its room's hour bucket."""
         room_id = str(self.room.id)
-        cache_key = f"{MESSAGE_ACTIVITY_CACHE_PREFIX}:{room_id}"
 
-        Message.objects.create(
+        message = Message.objects.create(
             chat_room=self.room,
             username='TestUser',
             user=self.user,
-            content='Cacheable message',
-            created_at=now - timedelta(minutes=1)
+            content='Counted message',
         )
 
-        # First call should query DB and cache result
-        result1 = get_message_activity_for_rooms([room_id])
+        timestamp = int(message.created_at.timestamp())
+        hour = timestamp // 3600
+        bucket_key = f"{MESSAGE_ACTIVITY_CACHE_PREFIX}:{room_id}:{hour}"
+        redis_client = cache.client.get_client()
 
-        # Verify cache was set
-        cached = cache.get(cache_key)
-        self.assertIsNotNone(cached)
-        self.assertEqual(cached['messages_24h'], 1)
-        self.assertEqual(cached['messages_10min'], 1)
+        self.assertEqual(int(redis_client.hget(bucket_key, 'total')), 1)
+        self.assertEqual(int(redis_client.hget(bucket_key, str((timestamp // 60) % 60))), 1)
+        self.assertGreater(redis_client.ttl(bucket_key), 24 * 3600)
 
-    @allure.title("Cache hit avoids database query")
+    @allure.title("Reads never query the database")
     @allure.severity(allure.severity_level.CRITICAL)
-    def test_cache_hit_avoids_db_query(self):
-        """Test that cached results avoid database queries."""
+    def test_read_avoids_db_query(self):
+        """Test that activity is served from counters without a COUNT query."""
         room_id = str(self.room.id)
-        cache_key = f"{MESSAGE_ACTIVITY_CACHE_PREFIX}:{room_id}"
 
-        # Manually set cache
-        cache.set(cache_key, {
-            'messages_24h': 42,
-            'messages_10min': 7
-        }, timeout=_get_cache_ttl_seconds())
+        for i in range(4):
+            Message.objects.create(
+                chat_room=self.room,
+                username='TestUser',
+                user=self.user,
+                content=f'Message {i}',
+            )
 
-        # Mock the DB query function to verify it's not called
         with patch('media_analysis.utils.message_activity._query_message_activity') as mock_query:
-            result = get_message_activity_for_rooms([room_id])
+            with CaptureQueriesContext(connection) as queries:
+                result = get_message_activity_for_rooms([room_id])
 
-            # DB query should not be called
             mock_query.assert_not_called()
 
-            # Result should come from cache
-            self.assertEqual(result[room_id].messages_24h, 42)
-            self.assertEqual(result[room_id].messages_10min, 7)
+        # Only the Constance window lookup may touch the database
+        self.assertFalse(any('chats_message' in q['sql'] for q in queries.captured_queries))
+
+        self.assertEqual(result[room_id].messages_24h, 4)
+        self.assertEqual(result[room_id].messages_10min, 4)
 
-    @allure.title("Cache invalidation clears room cache")
+    @allure.title("Soft-delete decrements counters")
     @allure.severity(allure.severity_level.NORMAL)
-    def test_cache_invalidation(self):
-        """Test that cache invalidation removes the cached entry."""
+    def test_soft_delete_decrements(self):
+        """Test that removing a message from the counters lowers both counts."""
         room_id = str(self.room.id)
-        cache_key = f"{MESSAGE_ACTIVITY_CACHE_PREFIX}:{room_id}"
 
-        # Set cache manually
-        cache.set(cache_key, {
-            'messages_24h': 100,
-            'messages_10min': 50
-        }, timeout=_get_cache_ttl_seconds())
+        messages = [
+            Message.objects.create(
+                chat_room=self.room,
+                username='TestUser',
+                user=self.user,
+                content=f'Message {i}',
+            )
+            for i in range(3)
+        ]
+
+        record_message_activity(room_id, messages[0].created_at, delta=-1)
 
-        # Verify cache is set
-        self.assertIsNotNone(cache.get(cache_key))
+        result = get_message_activity_for_rooms([room_id])
+        self.assertEqual(result[room_id].messages_24h, 2)
+        self.assertEqual(result[room_id].messages_10min, 2)
 
-        # Invalidate cache
-        invalidate_message_activity_cache(room_id)
+    @allure.title("Counts never go negative")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_counts_clamped_at_zero(self):
+        """Test that deleting a message the counters never saw reports zero."""
+        room_id = str(self.room.id)
 
-        # Cache should be cleared
-        self.assertIsNone(cache.get(cache_key))
+        record_message_activity(room_id, timezone.now(), delta=-1)
 
-    @allure.title("Partial cache hit queries only missing rooms")
+        result = get_message_activity_for_rooms([room_id])
+        self.assertEqual(result[room_id], MessageActivity(0, 0))
+
+    @allure.title("Messages outside the activity window only count toward 24h")
     @allure.severity(allure.severity_level.NORMAL)
-    def test_partial_cache_hit(self):
-        """Test that only cache-missed rooms are queried from DB."""
-        now = timezone.now()
+    def test_window_excludes_older_buckets(self):
+        """Test that counters recorded an hour ago only count toward 24h."""
+        room_id = str(self.room.id)
 
-        # Create second room
-        room2 = ChatRoom.objects.create(
-            name='Cache Test Room 2',
-            host=self.user,
-            access_mode='public'
-        )
+        record_message_activity(room_id, timezone.now() - timedelta(hours=1))
+        record_message_activity(room_id, timezone.now() - timedelta(hours=30))
 
-        room1_id = str(self.room.id)
-        room2_id = str(room2.id)
+        result = get_message_activity_for_rooms([room_id])
+        self.assertEqual(result[room_id].messages_24h, 1)
+        self.assertEqual(result[room_id].messages_10min, 0)
 
-        # Pre-cache room1
-        cache_key1 = f"{MESSAGE_ACTIVITY_CACHE_PREFIX}:{room1_id}"
-        cache.set(cache_key1, {
-            'messages_24h': 10,
-            'messages_10min': 2
-        }, timeout=_get_cache_ttl_seconds())
+    @allure.title("Falls back to database when Redis is unavailable")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_redis_failure_falls_back_to_db(self):
+        """Test that a Redis outage degrades to the COUNT query."""
+        room_id = str(self.room.id)
 
-        # Add message to room2 (not cached)
         Message.objects.create(
-            chat_room=room2,
+            chat_room=self.room,
             username='TestUser',
             user=self.user,
             content='Test message',
-            created_at=now - timedelta(minutes=1)
         )
 
-        # Query both rooms
-        result = get_message_activity_for_rooms([room1_id, room2_id])
+        with patch(
+            'media_analysis.utils.message_activity._get_redis_client',
+            side_effect=ConnectionError('redis down'),
+        ):
+            result = get_message_activity_for_rooms([room_id])
+
+        self.assertEqual(result[room_id].messages_24h, 1)
+        self.assertEqual(result[room_id].messages_10min, 1)
+
+
+@allure.feature('Message Activity')
+@allure.story('Active Users')
+class ActiveUsersCounterTests(TransactionTestCase):
+    """Test the HyperLogLog-backed active user counts."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+
+        self.user = User.objects.create_user(
+            email='hll_test@example.com',
+            password='testpass123',
+            reserved_username='HllTester'
+        )
+
+        self.room = ChatRoom.objects.create(
+            name='HLL Test Room',
+            host=self.user,
+            access_mode='public'
+        )
+
+    def tearDown(self):
+        """Clean up after tests."""
+        cache.clear()
 
-        # Room1 should have cached values
-        self.assertEqual(result[room1_id].messages_24h, 10)
-        self.assertEqual(result[room1_id].messages_10min, 2)
+    @allure.title("Distinct senders are counted once")
+    @allure.severity(allure.severity_level.CRITICAL)
+    def test_distinct_senders(self):
+        """Test that repeat senders are only counted once."""
+        room_id = str(self.room.id)
 
-        # Room2 should have fresh DB values
-        self.assertEqual(result[room2_id].messages_24h, 1)
-        self.assertEqual(result[room2_id].messages_10min, 1)
+        for username in ['alice', 'bob', 'alice', 'carol', 'bob']:
+            Message.objects.create(
+                chat_room=self.room,
+                username=username,
+                content='hi',
+            )
+
+        with self.assertNumQueries(0):
+            result = get_active_users_for_rooms([room_id])
+
+        self.assertEqual(result, {room_id: 3})
+
+    @allure.title("Senders are merged across hour buckets")
+    @allure.severity(allure.severity_level.NORMAL)
+    def test_union_across_hours(self):
+        """Test that the same sender in different hours is counted once."""
+        room_id = str(self.room.id)
+        now = timezone.now()
+
+        record_active_user(room_id, 'alice', now)
+        record_active_user(room_id, 'alice', now - timedelta(hours=5))
+        record_active_user(room_id, 'bob', now - timedelta(hours=5))
+        record_active_user(room_id, 'dave', now - timedelta(hours=30))
+
+        result = get_active_users_for_rooms([room_id])
+        self.assertEqual(result[room_id], 2)
 
 
 @allure.feature('Message Activity')
@@ -528,11 +592,3 @@ class MessageActivityDataTypeTests(TestCase):
         self.assertEqual(activity.messages_10min, activity[1])
 
         cache.clear()
-
-    @allure.title("Cache TTL is half the activity window")
-    @allure.severity(allure.severity_level.NORMAL)
-    def test_cache_ttl_is_correct(self):
-        """Test that the cache TTL is calculated as half the activity window."""
-        window_minutes = _get_activity_window_minutes()
-        expected_ttl = int((window_minutes / 2) * 60)
-        self.assertEqual(_get_cache_ttl_seconds(), expected_ttl)
@@ -0,0 +1,184 @@
+"""
+Tests for near-duplicate photo lookup on perceptual hashes.
+
+Tests the multi-index hashing lookup (4 x 16-bit pHash bands) and the
+upload view's reuse of a near-duplicate's analysis.
+"""
+import io
+import random
+from unittest.mock import Mock, patch
+
+from constance.test import override_config
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from PIL import Image
+from rest_framework.test import APIClient
+
+from media_analysis.models import PhotoAnalysis
+from media_analysis.utils.fingerprinting.image_hash import calculate_phash, compare_phash
+from media_analysis.utils.fingerprinting.near_duplicate import (
+    _band_neighbors,
+    find_near_duplicate,
+    find_near_duplicates,
+    from_signed_bigint,
+    phash_bands,
+    phash_to_int,
+)
+from media_analysis.utils.vision.base import AnalysisResult, ChatSuggestion
+
+
+def _flip_bits(phash, *bits):
+    value = int(phash, 16)
+    for bit in bits:
+        value ^= 1 << bit
+    return f'{value:016x}'
+
+
+def _make_analysis(phash, **kwargs):
+    return PhotoAnalysis.objects.create(
+        image_phash=phash,
+        file_hash=kwargs.pop('file_hash', f'hash-{phash}'),
+        file_size=1024,
+        image_path='media_analysis/test.jpg',
+        suggestions={'suggestions': [{'name': 'Coffee Chat', 'key': 'coffee-chat'}], 'count': 1},
+        **kwargs,
+    )
+
+
+class PhashBandTests(TestCase):
+    """Test integer/band conversion of pHashes."""
+
+    def test_bands_round_trip(self):
+        value = phash_to_int('d879f4f8e3b0c1a2')
+
+        self.assertEqual(phash_bands(value), (0xd879, 0xf4f8, 0xe3b0, 0xc1a2))
+
+    def test_high_bit_hash_stored_as_signed_bigint(self):
+        analysis = _make_analysis('ffffffffffffffff')
+
+        self.assertEqual(analysis.phash_value, -1)
+        self.assertEqual(from_signed_bigint(analysis.phash_value), 2**64 - 1)
+        self.assertEqual(analysis.phash_band_3, 0xffff)
+
+    def test_non_64_bit_hash_has_no_bands(self):
+        analysis = _make_analysis('abc')
+
+        self.assertIsNone(analysis.phash_value)
+        self.assertIsNone(analysis.phash_band_0)
+
+    def test_band_neighbor_counts(self):
+        self.assertEqual(len(_band_neighbors(0x1234, 0)), 1)
+        self.assertEqual(len(_band_neighbors(0x1234, 1)), 17)
+        self.assertEqual(len(set(_band_neighbors(0x1234, 2))), 137)
+
+
+class NearDuplicateLookupTests(TestCase):
+    """Test find_near_duplicates against brute-force Hamming distance."""
+
+    BASE = 'd879f4f8e3b0c1a2'
+
+    def test_exact_match(self):
+        analysis = _make_analysis(self.BASE)
+
+        self.assertEqual(find_near_duplicate(self.BASE, max_distance=0), analysis)
+
+    def test_bits_spread_across_every_band(self):
+        """Distance 5 with one flipped bit in each band still matches via radius-1 probes."""
+        analysis = _make_analysis(self.BASE)
+        query = _flip_bits(self.BASE, 1, 17, 33, 49, 50)
+
+        matches = find_near_duplicates(query, max_distance=5)
+
+        self.assertEqual(matches, [(5, analysis)])
+
+    def test_distance_above_threshold_excluded(self):
+        _make_analysis(self.BASE)
+        query = _flip_bits(self.BASE, 0, 1, 2, 3, 4, 5)
+
+        self.assertIsNone(find_near_duplicate(query, max_distance=5))
+
+    def test_closest_match_wins(self):
+        _make_analysis(_flip_bits(self.BASE, 0, 20, 40))
+        closest = _make_analysis(_flip_bits(self.BASE, 63))
+
+        self.assertEqual(find_near_duplicate(self.BASE, max_distance=5), closest)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        hashes = [self.BASE] + [
+            _flip_bits(self.BASE, *rng.sample(range(64), rng.randint(1, 12)))
+            for _ in range(60)
+        ]
+        for phash in hashes:
+            _make_analysis(phash)
+
+        for max_distance in (3, 5, 9):
+            expected = sorted(
+                phash for phash in hashes if compare_phash(phash, self.BASE) <= max_distance
+            )
+            found = sorted(a.image_phash for _, a in find_near_duplicates(self.BASE, max_distance))
+            self.assertEqual(found, expected)
+
+
+class NearDuplicateUploadTests(TestCase):
+    """Test that uploads of near-duplicate images skip the Vision API."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        rng = random.Random(3)
+        small = Image.new('RGB', (16, 12))
+        small.putdata([tuple(rng.randrange(256) for _ in range(3)) for _ in range(16 * 12)])
+        self.image = small.resize((640, 480), Image.BILINEAR)
+
+    def _jpeg(self, quality):
+        output = io.BytesIO()
+        self.image.save(output, format='JPEG', quality=quality)
+        return output.getvalue()
+
+    def _upload(self, data):
+        return self.client.post(
+            '/api/media-analysis/photo/upload/',
+            {'image': SimpleUploadedFile('photo.jpg', data, content_type='image/jpeg')},
+            format='multipart'
+        )
+
+    def _mock_provider(self, mock_get_vision_provider):
+        provider = Mock()
+        provider.is_available.return_value = True
+        provider.get_model_name.return_value = 'gpt-4o'
+        provider.analyze_image.return_value = AnalysisResult(
+            suggestions=[ChatSuggestion(name='Coffee Chat', key='coffee-chat', description='Coffee')],
+            raw_response={},
+            token_usage={'total_tokens': 100},
+            model='gpt-4o',
+        )
+        mock_get_vision_provider.return_value = provider
+        return provider
+
+    @patch('media_analysis.views.get_vision_provider')
+    def test_reencoded_copy_reuses_analysis(self, mock_get_vision_provider):
+        provider = self._mock_provider(mock_get_vision_provider)
+        original = _make_analysis(calculate_phash(self._jpeg(95)))
+        reencoded = self._jpeg(40)
+        self.assertLessEqual(compare_phash(calculate_phash(reencoded), original.image_phash), 5)
+
+        response = self._upload(reencoded)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['cached'])
+        self.assertEqual(response.data['analysis']['id'], str(original.id))
+        provider.analyze_image.assert_not_called()
+
+    @override_config(PHOTO_ANALYSIS_NEAR_DUPLICATE_ENABLED=False)
+    @patch('media_analysis.views.MediaStorage.save_file')
+    @patch('media_analysis.views.get_vision_provider')
+    def test_disabled_flag_calls_vision_api(self, mock_get_vision_provider, mock_save_file):
+        provider = self._mock_provider(mock_get_vision_provider)
+        mock_save_file.return_value = ('media_analysis/test.jpg', 'local')
+        _make_analysis(calculate_phash(self._jpeg(95)))
+
+        self._upload(self._jpeg(40))
+
+        # Later pipeline steps (embeddings) need OpenAI; only the vision call matters here
+        provider.analyze_image.assert_called_once()
@@ -4,13 +4,18 @@ Tests for media storage functionality (local and S3 - mocked).
 Tests MediaStorage utility class used for saving/retrieving images
 from both local filesystem and S3, with all S3 operations fully mocked.
 """
+import hashlib
 import io
+import os
+import shutil
+import tempfile
+import tracemalloc
 from unittest.mock import Mock, patch, MagicMock
 from django.test import TestCase, override_settings
 from django.core.files.storage import Storage
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 
-from chatpop.utils.media.storage import MediaStorage
+from chatpop.utils.media.storage import UPLOAD_CHUNK_SIZE, MediaStorage, StreamingSource
 
 
 class MediaStorageTests(TestCase):
@@ -82,10 +87,11 @@ class MediaStorageTests(TestCase):
         self.assertEqual(storage_type, 'local')
         mock_storage.save.assert_called_once()
 
-        # Verify file content was read and passed correctly
+        # Verify file content is passed as a stream, not read into memory
         call_args = mock_storage.save.call_args
         self.assertEqual(call_args[0][0], 'media_analysis/test.png')
-        self.assertIsInstance(call_args[0][1], ContentFile)
+        self.assertIsInstance(call_args[0][1], File)
+        self.assertNotIsInstance(call_args[0][1], ContentFile)
 
     @patch('chatpop.utils.media.storage.default_storage')
     @override_settings(
@@ -302,3 +308,72 @@ class MediaStorageTests(TestCase):
         # Verify path structure
         self.assertEqual(storage_path, 'media_analysis/subfolder/test.png')
         self.assertIn('media_analysis/subfolder', storage_path)
+
+
+class StreamingSaveTests(TestCase):
+    """Test that MediaStorage streams uploads instead of buffering them."""
+
+    # 64 MB synthetic upload
+    FILE_SIZE = 64 * 1024 * 1024
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            AWS_STORAGE_BUCKET_NAME=''
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _chunks(self, total, chunk_size=256 * 1024):
+        block = bytes(range(256)) * (chunk_size // 256)
+        remaining = total
+        while remaining > 0:
+            yield block[:remaining]
+            remaining -= len(block)
+
+    def test_save_stream_from_iterable(self):
+        expected = hashlib.sha256(b''.join(self._chunks(3_000_000))).hexdigest()
+
+        saved = MediaStorage.save_stream(self._chunks(3_000_000), 'videos', 'clip.mp4')
+
+        self.assertEqual(saved.storage_path, 'videos/clip.mp4')
+        self.assertEqual(saved.storage_type, 'local')
+        self.assertEqual(saved.size, 3_000_000)
+        self.assertEqual(saved.sha256, expected)
+        self.assertEqual(os.path.getsize(os.path.join(self.media_root, 'videos', 'clip.mp4')), 3_000_000)
+
+    def test_save_file_returns_actual_name_when_taken(self):
+        first, _ = MediaStorage.save_file(io.BytesIO(b'a'), 'photos', 'same.jpg')
+        second, _ = MediaStorage.save_file(io.BytesIO(b'b'), 'photos', 'same.jpg')
+
+        self.assertNotEqual(first, second)
+        with MediaStorage.get_file(second) as stored:
+            self.assertEqual(stored.read(), b'b')
+
+    def test_streaming_source_handles_uneven_chunks(self):
+        stream = StreamingSource(iter([b'abc', b'', b'defgh', b'i']))
+
+        self.assertEqual(stream.read(4), b'abcd')
+        self.assertEqual(stream.read(), b'efghi')
+        self.assertEqual(stream.read(4), b'')
+        self.assertEqual(stream.bytes_read, 9)
+
+    def test_peak_memory_bounded_by_chunk_size(self):
+        """A 64 MB upload is streamed with peak allocation of a few chunks."""
+        source_path = os.path.join(self.media_root, 'source.bin')
+        with open(source_path, 'wb') as source:
+            for chunk in self._chunks(self.FILE_SIZE):
+                source.write(chunk)
+
+        with open(source_path, 'rb') as source:
+            tracemalloc.start()
+            saved = MediaStorage.save_stream(source, 'videos', 'large.mp4')
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        self.assertEqual(saved.size, self.FILE_SIZE)
+        self.assertLess(peak, 4 * UPLOAD_CHUNK_SIZE)
@@ -0,0 +1,240 @@
+"""
+Tests for request-scoped span tracing (media_analysis/utils/tracing.py).
+
+Covers nesting and per-span SQL / Redis counters, perf_track spans, the
+shared slow-trace buffer and its admin page, the trace middleware, ChatConsumer
+frames, media job traces and OTLP JSON export.
+"""
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from accounts.models import User
+from media_analysis.models import MediaJob
+from media_analysis.utils import jobs
+from media_analysis.utils.performance import PerformanceTracker, perf_track
+from media_analysis.utils.tracing import (
+    SLOW_TRACES_KEY, TRACE_ID_HEADER, current_trace_id, get_slow_traces, parse_trace_id, span, start_trace,
+)
+
+
+def traced_job_handler(payload):
+    with span('work', step=payload['step']):
+        User.objects.count()
+    return {}
+
+
+class TracingTestCase(TestCase):
+    def setUp(self):
+        cache.client.get_client().delete(SLOW_TRACES_KEY)
+
+    def tearDown(self):
+        cache.client.get_client().delete(SLOW_TRACES_KEY)
+
+
+class SpanTests(TracingTestCase):
+    def test_nested_spans_count_sql_and_redis_including_children(self):
+        with start_trace('outer', kind='internal') as trace:
+            User.objects.count()
+            with span('child', rows=3) as child:
+                User.objects.count()
+                User.objects.count()
+                cache.client.get_client().ping()
+
+        root = trace.root
+        self.assertEqual(child.parent, root)
+        self.assertEqual(child.attributes, {'rows': 3})
+        self.assertEqual((child.sql_queries, child.redis_commands), (2, 1))
+        self.assertEqual((root.sql_queries, root.redis_commands), (3, 1))
+        self.assertGreaterEqual(root.duration_ms, child.duration_ms)
+
+    def test_redis_pipeline_counts_every_command(self):
+        with start_trace('pipeline', kind='internal') as trace:
+            pipe = cache.client.get_client().pipeline()
+            pipe.set('tracing:test', 1)
+            pipe.delete('tracing:test')
+            pipe.execute()
+
+        self.assertGreaterEqual(trace.root.redis_commands, 2)
+
+    def test_span_outside_trace_is_a_no_op(self):
+        with span('orphan') as orphan:
+            self.assertIsNone(orphan)
+            self.assertIsNone(current_trace_id())
+
+    def test_nested_start_trace_becomes_a_child_span(self):
+        with start_trace('outer', kind='internal') as outer:
+            with start_trace('inner') as inner:
+                self.assertIs(inner, outer)
+
+        self.assertEqual([s.name for s in outer.spans], ['outer', 'inner'])
+        self.assertEqual(outer.spans[1].parent, outer.root)
+
+    def test_exceptions_are_recorded_and_propagated(self):
+        with self.assertRaises(ValueError):
+            with start_trace('failing', kind='internal') as trace:
+                with span('step'):
+                    raise ValueError('boom')
+
+        self.assertEqual(trace.root.error, 'ValueError')
+        self.assertEqual(trace.spans[1].error, 'ValueError')
+
+    def test_perf_track_and_tracker_open_spans(self):
+        tracker = PerformanceTracker()
+        with start_trace('upload', kind='internal') as trace:
+            with tracker.track('Image ingest and hashing'):
+                with perf_track('Vision analysis', metadata='10 seeds'):
+                    pass
+
+        self.assertEqual([s.name for s in trace.spans], ['upload', 'Image ingest and hashing', 'Vision analysis'])
+        self.assertEqual(trace.spans[2].attributes, {'metadata': '10 seeds'})
+        self.assertEqual(trace.spans[2].parent, trace.spans[1])
+
+    @override_settings(TRACING_ENABLED=False)
+    def test_disabled_tracing_yields_none(self):
+        with start_trace('off') as trace:
+            self.assertIsNone(trace)
+
+    def test_parse_trace_id(self):
+        trace_id = '4bf92f3577b34da6a3ce929d0e0e4736'
+        self.assertEqual(parse_trace_id(f'00-{trace_id}-00f067aa0ba902b7-01'), trace_id)
+        self.assertEqual(parse_trace_id(trace_id.upper()), trace_id)
+        self.assertIsNone(parse_trace_id('not-a-trace'))
+        self.assertIsNone(parse_trace_id(None))
+
+
+class SlowTraceBufferTests(TracingTestCase):
+    @override_settings(TRACE_SLOW_MS=0)
+    def test_slow_traces_are_shared_and_newest_first(self):
+        for name in ('first', 'second'):
+            with start_trace(name, kind='internal'):
+                with span('step'):
+                    User.objects.count()
+
+        traces = get_slow_traces()
+        self.assertEqual([t['name'] for t in traces], ['second', 'first'])
+        self.assertEqual(traces[0]['sql_queries'], 1)
+        self.assertEqual([s['name'] for s in traces[0]['spans']], ['second', 'step'])
+        self.assertEqual(traces[0]['spans'][1]['depth'], 1)
+
+    @override_settings(TRACE_SLOW_MS=0, TRACE_BUFFER_SIZE=3)
+    def test_buffer_is_capped(self):
+        for n in range(5):
+            with start_trace(f'trace {n}', kind='internal'):
+                pass
+
+        self.assertEqual([t['name'] for t in get_slow_traces()], ['trace 4', 'trace 3', 'trace 2'])
+
+    @override_settings(TRACE_SLOW_MS=60_000)
+    def test_fast_traces_are_not_kept(self):
+        with start_trace('fast', kind='internal'):
+            pass
+
+        self.assertEqual(get_slow_traces(), [])
+
+    @override_settings(TRACE_SLOW_MS=0)
+    def test_admin_page_lists_slow_traces(self):
+        with start_trace('GET /slow/', kind='server'):
+            with span('render'):
+                pass
+        staff = User.objects.create_user(email='staff@example.com', password='pw', is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get('/admin/monitor/traces/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'GET /slow/')
+        self.assertContains(response, 'render')
+
+    def test_admin_page_requires_staff(self):
+        response = self.client.get('/admin/monitor/traces/')
+        self.assertEqual(response.status_code, 302)
+
+
+class TraceMiddlewareTests(TracingTestCase):
+    def test_response_carries_a_trace_id(self):
+        response = self.client.get('/api/chats/')
+        self.assertIsNotNone(parse_trace_id(response[TRACE_ID_HEADER]))
+
+    @override_settings(TRACE_SLOW_MS=0)
+    def test_incoming_traceparent_is_continued(self):
+        trace_id = '4bf92f3577b34da6a3ce929d0e0e4736'
+        response = self.client.get(
+            '/api/chats/', HTTP_TRACEPARENT=f'00-{trace_id}-00f067aa0ba902b7-01',
+        )
+
+        self.assertEqual(response[TRACE_ID_HEADER], trace_id)
+        recorded = get_slow_traces()[0]
+        self.assertEqual(recorded['trace_id'], trace_id)
+        self.assertEqual(recorded['name'], 'GET /api/chats/')
+        self.assertEqual(recorded['spans'][0]['attributes']['http.status_code'], response.status_code)
+
+
+class JobTraceTests(TracingTestCase):
+    @override_settings(TRACE_SLOW_MS=0)
+    def test_jobs_run_in_their_own_trace(self):
+        with patch.dict(jobs.JOB_HANDLERS, {'test.traced': f'{__name__}.traced_job_handler'}):
+            job = jobs.enqueue_job('test.traced', {'step': 'one'})
+            jobs.run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, MediaJob.STATUS_SUCCEEDED)
+        recorded = get_slow_traces()[0]
+        self.assertEqual(recorded['name'], 'job test.traced')
+        self.assertEqual(recorded['kind'], 'internal')
+        self.assertEqual(recorded['spans'][1]['attributes'], {'step': 'one'})
+        self.assertEqual(recorded['spans'][1]['sql_queries'], 1)
+
+
+class ConsumerTraceTests(TransactionTestCase):
+    def setUp(self):
+        cache.client.get_client().delete(SLOW_TRACES_KEY)
+
+    def tearDown(self):
+        cache.client.get_client().delete(SLOW_TRACES_KEY)
+
+    @override_settings(TRACE_SLOW_MS=0)
+    def test_chat_messages_are_traced_per_frame(self):
+        from chats.utils.performance.ws_load import RoomMix, run_load_test
+
+        run_load_test(RoomMix(rooms=1, listeners=0, senders=1, messages=1, reconnects=0))
+
+        message_traces = [t for t in get_slow_traces() if t['name'] == 'ws message']
+        self.assertEqual(len(message_traces), 1)
+        trace = message_traces[0]
+        self.assertEqual(trace['kind'], 'consumer')
+        spans = {s['name']: s for s in trace['spans']}
+        self.assertEqual(set(spans), {'ws message', 'save_message', 'serialize', 'broadcast'})
+        self.assertGreater(spans['save_message']['sql_queries'], 0)
+        self.assertGreater(spans['broadcast']['redis_commands'], 0)
+
+
+class OtlpExportTests(TracingTestCase):
+    def test_every_trace_is_appended_as_otlp_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'traces.jsonl')
+            with override_settings(TRACE_EXPORT_PATH=path):
+                with start_trace('consume', kind='consumer', chat_code='ABC123') as trace:
+                    with span('save_message'):
+                        User.objects.count()
+                with start_trace('second', kind='internal'):
+                    pass
+
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+
+        self.assertEqual(len(lines), 2)
+        spans = lines[0]['resourceSpans'][0]['scopeSpans'][0]['spans']
+        root, child = spans
+        self.assertEqual(root['traceId'], trace.trace_id)
+        self.assertEqual(root['kind'], 5)
+        self.assertNotIn('parentSpanId', root)
+        self.assertEqual(child['parentSpanId'], root['spanId'])
+        self.assertEqual(child['kind'], 1)
+        self.assertLessEqual(int(root['startTimeUnixNano']), int(child['startTimeUnixNano']))
+        self.assertIn({'key': 'db.queries', 'value': {'intValue': '1'}}, child['attributes'])
+        self.assertIn({'key': 'chat_code', 'value': {'stringValue': 'ABC123'}}, root['attributes'])
@@ -3,7 +3,7 @@ URL Configuration for Media Analysis API.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PhotoAnalysisViewSet, MusicAnalysisViewSet, LocationAnalysisViewSet, ActivityPollingView
+from .views import PhotoAnalysisViewSet, MusicAnalysisViewSet, LocationAnalysisViewSet, ActivityPollingView, MediaJobViewSet
 
 # Create DRF router
 router = DefaultRouter()
@@ -11,6 +11,7 @@ router.register(r'photo', PhotoAnalysisViewSet, basename='photo-analysis')
 router.register(r'music', MusicAnalysisViewSet, basename='music-analysis')
 router.register(r'location', LocationAnalysisViewSet, basename='location-analysis')
 router.register(r'activity', ActivityPollingView, basename='activity-polling')
+router.register(r'jobs', MediaJobViewSet, basename='media-job')
 
 app_name = 'media_analysis'
 
@@ -36,3 +37,6 @@ urlpatterns = [
 # POST   /api/media-analysis/location/suggest/       - Get location-based suggestions
 # GET    /api/media-analysis/location/recent/        - Recent analyses for user
 # GET    /api/media-analysis/location/{id}/          - Get specific analysis
+#
+# Media Jobs:
+# GET    /api/media-analysis/jobs/{id}/              - Async upload job status
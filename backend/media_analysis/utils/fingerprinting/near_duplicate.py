@@ -0,0 +1,148 @@
+"""
+Near-duplicate lookup over perceptual hashes (multi-index hashing).
+
+Each 64-bit pHash is stored on PhotoAnalysis as a signed BIGINT plus four
+indexed 16-bit bands. By the pigeonhole principle, two hashes within
+Hamming distance k share at least one band within distance k // 4, so a
+lookup only has to probe each band index for the handful of values near
+the query band, then verify the exact distance on those candidates.
+
+    k = 0..3   -> 1 value per band (exact band match)
+    k = 4..7   -> 17 values per band
+    k = 8..11  -> 137 values per band
+
+Usage:
+    match = find_near_duplicate(image_phash, max_distance=5)
+"""
+import logging
+from itertools import combinations
+from typing import List, Optional, Tuple
+
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+PHASH_BITS = 64
+PHASH_BANDS = 4
+PHASH_BAND_BITS = PHASH_BITS // PHASH_BANDS
+PHASH_BAND_MASK = (1 << PHASH_BAND_BITS) - 1
+
+# Probing more than 3 bits per band (2,517 values) stops being an index lookup
+MAX_NEAR_DUPLICATE_DISTANCE = 4 * PHASH_BANDS - 1
+
+
+def phash_to_int(phash: str) -> Optional[int]:
+    """
+    Convert a 64-bit pHash hex string to an unsigned integer.
+
+    Args:
+        phash: 16-character hex string from calculate_phash()
+
+    Returns:
+        Unsigned 64-bit integer, or None if the hash is not 64 bits
+    """
+    if not phash or len(phash) != PHASH_BITS // 4:
+        return None
+    try:
+        return int(phash, 16)
+    except ValueError:
+        return None
+
+
+def phash_bands(value: int) -> Tuple[int, ...]:
+    """Split an unsigned 64-bit hash into four 16-bit bands (high to low)."""
+    return tuple(
+        (value >> (PHASH_BAND_BITS * (PHASH_BANDS - 1 - i))) & PHASH_BAND_MASK
+        for i in range(PHASH_BANDS)
+    )
+
+
+def to_signed_bigint(value: int) -> int:
+    """Reinterpret an unsigned 64-bit integer as a signed BIGINT."""
+    return value - (1 << PHASH_BITS) if value >= (1 << (PHASH_BITS - 1)) else value
+
+
+def from_signed_bigint(value: int) -> int:
+    """Reinterpret a signed BIGINT as an unsigned 64-bit integer."""
+    return value & ((1 << PHASH_BITS) - 1)
+
+
+def _band_neighbors(band: int, radius: int) -> List[int]:
+    """All 16-bit values within Hamming distance `radius` of `band`."""
+    neighbors = [band]
+    for distance in range(1, radius + 1):
+        for bits in combinations(range(PHASH_BAND_BITS), distance):
+            flipped = band
+            for bit in bits:
+                flipped ^= 1 << bit
+            neighbors.append(flipped)
+    return neighbors
+
+
+def find_near_duplicates(phash: str, max_distance: int, queryset=None) -> List[Tuple[int, object]]:
+    """
+    Find photo analyses whose pHash is within `max_distance` of `phash`.
+
+    Args:
+        phash: 64-bit pHash hex string of the query image
+        max_distance: Maximum Hamming distance (clamped to 0..15)
+        queryset: Optional PhotoAnalysis queryset to search (default: all)
+
+    Returns:
+        List of (distance, PhotoAnalysis) sorted by distance, then newest first
+    """
+    from media_analysis.models import PhotoAnalysis
+
+    value = phash_to_int(phash)
+    if value is None:
+        return []
+
+    if max_distance > MAX_NEAR_DUPLICATE_DISTANCE:
+        logger.warning(
+            f"Near-duplicate distance {max_distance} exceeds {MAX_NEAR_DUPLICATE_DISTANCE}, clamping"
+        )
+    max_distance = max(0, min(max_distance, MAX_NEAR_DUPLICATE_DISTANCE))
+    radius = max_distance // PHASH_BANDS
+
+    band_filter = Q()
+    for index, band in enumerate(phash_bands(value)):
+        neighbors = _band_neighbors(band, radius)
+        if len(neighbors) == 1:
+            band_filter |= Q(**{f'phash_band_{index}': band})
+        else:
+            band_filter |= Q(**{f'phash_band_{index}__in': neighbors})
+
+    if queryset is None:
+        queryset = PhotoAnalysis.objects.all()
+
+    candidates = queryset.filter(band_filter).order_by('-created_at')
+
+    matches = []
+    for analysis in candidates:
+        distance = (from_signed_bigint(analysis.phash_value) ^ value).bit_count()
+        if distance <= max_distance:
+            matches.append((distance, analysis))
+
+    # Stable sort keeps newest-first order among equal distances
+    matches.sort(key=lambda match: match[0])
+    return matches
+
+
+def find_near_duplicate(phash: str, max_distance: int, queryset=None):
+    """
+    Return the closest photo analysis within `max_distance`, or None.
+
+    Args:
+        phash: 64-bit pHash hex string of the query image
+        max_distance: Maximum Hamming distance
+        queryset: Optional PhotoAnalysis queryset to search (default: all)
+
+    Returns:
+        PhotoAnalysis instance or None
+    """
+    matches = find_near_duplicates(phash, max_distance, queryset=queryset)
+    if not matches:
+        return None
+    distance, analysis = matches[0]
+    logger.info(f"Near-duplicate match: phash={phash} ~ {analysis.image_phash} (distance={distance})")
+    return analysis
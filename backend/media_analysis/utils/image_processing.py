@@ -1,14 +1,145 @@
 """
 Image processing utilities for photo analysis.
 """
+import hashlib
 import io
-import math
 import logging
-from typing import BinaryIO, Tuple
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+
+import imagehash
 from PIL import Image
 
+from chatpop.utils.media.image import (
+    EXIF_ORIENTATION_TAG,
+    ImageTooLarge,
+    ORIENTATION_TRANSPOSE,
+    decode_resized,
+    fit_size,
+    flatten_to_rgb,
+    open_image,
+    shrink,
+)
+
 logger = logging.getLogger(__name__)
 
+# Longest side sent to the vision API (keeps text in photos readable)
+VISION_MAX_DIMENSION = 768
+
+
+class ImageIngest:
+    """
+    Single-read, single-decode view of an uploaded image.
+
+    The upload is read into memory once and decoded once; the SHA-256,
+    perceptual hash, dimensions and EXIF orientation all come from that
+    buffer, and each JPEG derivative is encoded at most once. The same
+    derivative bytes are handed to the vision provider and to storage.
+
+    Hashes match calculate_sha256() and calculate_phash() on the original
+    bytes, so deduplication against existing PhotoAnalysis rows still works.
+
+    Example:
+        >>> ingest = ImageIngest(request_file)
+        >>> ingest.file_hash, ingest.phash, ingest.size
+        ('e3b0c4...', 'd879f4f8e3b0c1a2', (4032, 3024))
+        >>> jpeg = ingest.to_jpeg(max_megapixels=2.0, max_dimension=768)
+    """
+
+    def __init__(self, image_file: Union[BinaryIO, bytes]):
+        """
+        Read and decode the image.
+
+        Args:
+            image_file: File object or bytes containing image data
+
+        Raises:
+            ImageTooLarge: If the image exceeds the decode pixel ceiling
+            ValueError: If the image cannot be decoded
+        """
+        if isinstance(image_file, (bytes, bytearray)):
+            data = bytes(image_file)
+        else:
+            if hasattr(image_file, 'seek'):
+                image_file.seek(0)
+            data = image_file.read()
+
+        self.data = data
+        self.file_size = len(data)
+        self.file_hash = hashlib.sha256(data).hexdigest()
+
+        try:
+            # Pixel ceiling is checked before anything is decoded
+            image = open_image(data)
+            self.format = image.format
+            self.orientation = image.getexif().get(EXIF_ORIENTATION_TAG, 1)
+            image.load()
+        except ImageTooLarge:
+            raise
+        except Exception as e:
+            raise ValueError(f"Failed to decode image: {str(e)}")
+
+        self.image = image
+        self._phash: Optional[str] = None
+        self._jpegs: Dict[Tuple[Optional[float], Optional[int]], bytes] = {}
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """Stored (width, height), before EXIF orientation is applied."""
+        return self.image.size
+
+    @property
+    def megapixels(self) -> float:
+        width, height = self.image.size
+        return (width * height) / 1_000_000
+
+    @property
+    def phash(self) -> str:
+        """Perceptual hash of the decoded image (same value as calculate_phash)."""
+        if self._phash is None:
+            image = self.image
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            self._phash = str(imagehash.phash(image))
+        return self._phash
+
+    def to_jpeg(
+        self,
+        max_megapixels: Optional[float] = None,
+        max_dimension: Optional[int] = None
+    ) -> bytes:
+        """
+        Encode an upright JPEG bounded by megapixels and/or longest side.
+
+        Both limits are folded into one scale factor so the image is resampled
+        once. The result is cached per (max_megapixels, max_dimension).
+
+        Args:
+            max_megapixels: Maximum pixel count in millions (None = unbounded)
+            max_dimension: Maximum width/height in pixels (None = unbounded)
+
+        Returns:
+            JPEG bytes (quality 85, transparency flattened onto white)
+        """
+        key = (max_megapixels, max_dimension)
+        if key in self._jpegs:
+            return self._jpegs[key]
+
+        width, height = self.image.size
+        target = fit_size((width, height), max_dimension, max_megapixels)
+
+        img = shrink(flatten_to_rgb(self.image), target)
+        if target != (width, height):
+            logger.info(f"Ingest resize: {width}x{height} ({self.megapixels:.2f}MP) → {target[0]}x{target[1]}")
+
+        transpose = ORIENTATION_TRANSPOSE.get(self.orientation)
+        if transpose is not None:
+            img = img.transpose(transpose)
+
+        output = io.BytesIO()
+        img.save(output, format='JPEG', quality=85, optimize=True)
+        self._jpegs[key] = output.getvalue()
+        return self._jpegs[key]
+
 
 def resize_image_if_needed(
     image_file: BinaryIO,
@@ -43,9 +174,8 @@ def resize_image_if_needed(
         if hasattr(image_file, 'seek'):
             image_file.seek(0)
 
-        # Read and open image
         image_data = image_file.read()
-        img = Image.open(io.BytesIO(image_data))
+        img = open_image(image_data)
 
         # Calculate current megapixels
         width, height = img.size
@@ -59,35 +189,20 @@ def resize_image_if_needed(
             logger.info(f"No resize needed - image is within limit")
             return io.BytesIO(image_data), False
 
-        # Calculate scale factor to reach target megapixels
-        scale = math.sqrt(max_megapixels / current_megapixels)
-        new_width = int(width * scale)
-        new_height = int(height * scale)
-
-        logger.info(f"Resizing from {width}x{height} to {new_width}x{new_height} (scale: {scale:.3f})")
-
-        # Resize image using high-quality LANCZOS resampling
-        resized_img = img.resize((new_width, new_height), Image.LANCZOS)
-
         # Determine output format (preserve original format if possible)
         output_format = img.format or 'JPEG'
         if output_format not in ['JPEG', 'PNG', 'WEBP']:
             output_format = 'JPEG'  # Default to JPEG for unsupported formats
 
-        # Save resized image to BytesIO
-        output = io.BytesIO()
+        # Draft decode + reduce + LANCZOS; transparency is kept for PNG/WEBP
+        resized_img = decode_resized(
+            img,
+            max_megapixels=max_megapixels,
+            flatten=output_format == 'JPEG'
+        )
 
-        # Handle different formats appropriately
+        output = io.BytesIO()
         if output_format == 'JPEG':
-            # Convert RGBA to RGB for JPEG (no transparency support)
-            if resized_img.mode in ('RGBA', 'LA', 'P'):
-                # Create white background
-                background = Image.new('RGB', resized_img.size, (255, 255, 255))
-                if resized_img.mode == 'P':
-                    resized_img = resized_img.convert('RGBA')
-                background.paste(resized_img, mask=resized_img.split()[-1] if resized_img.mode == 'RGBA' else None)
-                resized_img = background
-
             resized_img.save(output, format='JPEG', quality=85, optimize=True)
         else:
             resized_img.save(output, format=output_format, optimize=True)
@@ -0,0 +1,291 @@
+"""
+Durable media processing job queue (Postgres, FOR UPDATE SKIP LOCKED).
+
+Uploads that send `Prefer: respond-async` store their input, enqueue a
+MediaJob and return 202 with the job id. Workers started with
+`manage.py process_media_jobs` claim queued jobs, run the handler named
+by `job.kind`, and record the result. Clients either poll
+GET /api/media-analysis/jobs/{id}/ or, for chat uploads, receive a
+`media_job` event on their chat WebSocket when the job finishes.
+
+Handlers take the job payload dict and return a JSON-serializable result
+dict. An exception marks the attempt failed; the job is retried with
+exponential backoff until max_attempts, then marked failed. Handlers raise
+JobRejected for input that can never succeed (fails without retrying).
+
+Usage:
+    job = enqueue_job('video.process', {'storage_path': path}, notify_group=group)
+    run_pending_jobs()   # in-process worker (tests, management command)
+"""
+
+import hashlib
+import logging
+import os
+import socket
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .tracing import start_trace
+
+logger = logging.getLogger(__name__)
+
+# kind -> dotted path of handler(payload) -> result
+JOB_HANDLERS = {
+    'voice.transcode': 'chats.utils.media_jobs.transcode_voice_job',
+    'video.process': 'chats.utils.media_jobs.process_video_job',
+    'photo.analyze': 'media_analysis.views.run_photo_analysis_job',
+}
+
+# Retry backoff: RETRY_BASE_SECONDS * 2^(attempt - 1)
+RETRY_BASE_SECONDS = 5
+
+# Running jobs not finished within this window are assumed to belong to a
+# crashed worker and are put back on the queue
+STALE_JOB_SECONDS = 10 * 60
+
+
+class JobRejected(Exception):
+    """Raised by a handler when its input is invalid; the job fails without retrying."""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def prefers_async(request) -> bool:
+    """True if the client asked for a 202 + job instead of waiting (RFC 7240)."""
+    return 'respond-async' in request.headers.get('Prefer', '').lower()
+
+
+def chat_upload_group(chat_room_id, username: str) -> str:
+    """
+    Channel layer group for one participant's upload notifications.
+
+    Joined by ChatConsumer on authenticated connect. Usernames are hashed
+    because group names only allow ASCII alphanumerics, '-', '_' and '.'.
+    """
+    digest = hashlib.sha1(f"{chat_room_id}:{username}".encode()).hexdigest()[:24]
+    return f"media_jobs_{digest}"
+
+
+def enqueue_job(kind: str, payload: Dict[str, Any], notify_group: str = '',
+                max_attempts: int = 3):
+    """
+    Add a job to the queue.
+
+    Args:
+        kind: Handler name (key of JOB_HANDLERS)
+        payload: JSON-serializable handler input
+        notify_group: Channel layer group to notify on completion
+        max_attempts: Attempts before the job is marked failed
+
+    Returns:
+        The created MediaJob
+    """
+    from media_analysis.models import MediaJob
+
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown media job kind: {kind}")
+
+    job = MediaJob.objects.create(
+        kind=kind,
+        payload=payload,
+        notify_group=notify_group,
+        max_attempts=max_attempts,
+    )
+    logger.info(f"[MediaJob] Enqueued {job.kind} {job.id}")
+    return job
+
+
+def claim_next_job(worker_id: Optional[str] = None, kinds: Optional[Iterable[str]] = None):
+    """
+    Atomically claim the oldest runnable job.
+
+    Uses FOR UPDATE SKIP LOCKED so concurrent workers never block on or
+    claim the same row.
+
+    Args:
+        worker_id: Identifier recorded in locked_by
+        kinds: Restrict to these job kinds (default: all)
+
+    Returns:
+        The claimed MediaJob (status=running), or None if the queue is empty
+    """
+    from media_analysis.models import MediaJob
+
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = MediaJob.objects.select_for_update(skip_locked=True).filter(
+            status=MediaJob.STATUS_QUEUED,
+            run_after__lte=now,
+        )
+        if kinds:
+            queryset = queryset.filter(kind__in=list(kinds))
+        job = queryset.order_by('run_after', 'created_at').first()
+        if job is None:
+            return None
+
+        job.status = MediaJob.STATUS_RUNNING
+        job.attempts += 1
+        job.locked_by = worker_id or default_worker_id()
+        job.locked_at = now
+        job.save(update_fields=['status', 'attempts', 'locked_by', 'locked_at', 'updated_at'])
+    return job
+
+
+def run_job(job) -> None:
+    """
+    Run a claimed job's handler and record the outcome.
+
+    Args:
+        job: MediaJob returned by claim_next_job()
+    """
+    from media_analysis.models import MediaJob
+
+    try:
+        handler = import_string(JOB_HANDLERS[job.kind])
+        with start_trace(f'job {job.kind}', kind='internal', job_id=str(job.id), attempt=job.attempts):
+            result = handler(job.payload)
+    except Exception as e:
+        job.error = str(e)
+        job.locked_by = ''
+        job.locked_at = None
+        if job.attempts < job.max_attempts and not isinstance(e, JobRejected):
+            job.status = MediaJob.STATUS_QUEUED
+            job.run_after = timezone.now() + timedelta(
+                seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+            )
+            logger.warning(
+                f"[MediaJob] {job.kind} {job.id} attempt {job.attempts}/{job.max_attempts} failed, retrying: {e}"
+            )
+        else:
+            job.status = MediaJob.STATUS_FAILED
+            job.finished_at = timezone.now()
+            logger.error(f"[MediaJob] {job.kind} {job.id} failed: {e}", exc_info=True)
+        job.save()
+        if job.status == MediaJob.STATUS_FAILED:
+            notify_job(job)
+        return
+
+    job.status = MediaJob.STATUS_SUCCEEDED
+    job.result = result or {}
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save()
+    logger.info(f"[MediaJob] {job.kind} {job.id} succeeded")
+    notify_job(job)
+
+
+def run_pending_jobs(worker_id: Optional[str] = None, kinds: Optional[Iterable[str]] = None,
+                     limit: Optional[int] = None) -> int:
+    """
+    Drain runnable jobs in-process.
+
+    Args:
+        worker_id: Identifier recorded in locked_by
+        kinds: Restrict to these job kinds (default: all)
+        limit: Stop after this many jobs (default: until the queue is empty)
+
+    Returns:
+        Number of jobs run
+    """
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job(worker_id=worker_id, kinds=kinds)
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def requeue_stale_jobs(stale_seconds: int = STALE_JOB_SECONDS) -> int:
+    """
+    Put running jobs whose worker disappeared back on the queue.
+
+    Jobs that already used all their attempts are marked failed instead, so
+    a job that keeps crashing its worker is not retried forever.
+
+    Returns:
+        Number of jobs requeued
+    """
+    from django.db.models import F
+    from media_analysis.models import MediaJob
+
+    now = timezone.now()
+    stale = MediaJob.objects.filter(
+        status=MediaJob.STATUS_RUNNING,
+        locked_at__lt=now - timedelta(seconds=stale_seconds),
+    )
+
+    exhausted = list(stale.filter(attempts__gte=F('max_attempts')))
+    for job in exhausted:
+        job.status = MediaJob.STATUS_FAILED
+        job.error = f"Worker {job.locked_by or 'unknown'} stopped responding on attempt {job.attempts}/{job.max_attempts}"
+        job.locked_by = ''
+        job.locked_at = None
+        job.finished_at = now
+        job.save()
+        logger.error(f"[MediaJob] {job.kind} {job.id} failed: {job.error}")
+        notify_job(job)
+
+    count = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=MediaJob.STATUS_QUEUED,
+        locked_by='',
+        locked_at=None,
+        run_after=now,
+        updated_at=now,
+    )
+    if count:
+        logger.warning(f"[MediaJob] Requeued {count} stale jobs")
+    return count
+
+
+def serialize_job(job) -> Dict[str, Any]:
+    """Public representation used by the status endpoint and notifications."""
+    return {
+        'id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'result': job.result,
+        'error': job.error or None,
+        'attempts': job.attempts,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def accepted_job_data(job) -> Dict[str, Any]:
+    """Body of a 202 Accepted upload response."""
+    from django.urls import reverse
+
+    return {
+        'job_id': str(job.id),
+        'status': job.status,
+        'status_url': reverse('media_analysis:media-job-detail', kwargs={'pk': job.id}),
+    }
+
+
+def notify_job(job) -> None:
+    """Send a `media_job` event to the job's notify group (best-effort)."""
+    if not job.notify_group:
+        return
+
+    try:
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(
+            job.notify_group,
+            {
+                'type': 'media_job_update',
+                'job': serialize_job(job),
+            }
+        )
+    except Exception as e:
+        logger.warning(f"[MediaJob] Notification for {job.id} failed: {e}")
@@ -0,0 +1,183 @@
+"""
+Incremental geohash/hour rollups for location analytics.
+
+Every LocationAnalysis contributes one count to a LocationAnalysisRollup
+row per precision in LOCATION_ROLLUP_PRECISIONS. Increments are applied
+with a single INSERT ... ON CONFLICT DO UPDATE per batch, so concurrent
+writers never lose counts and the admin map never has to aggregate the
+raw table.
+
+Usage:
+    record_location_rollups([analysis])          # after create
+    record_location_rollups(bulk_created_list)   # after bulk_create
+    rebuild_location_rollups(since=...)          # repair / backfill
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import connection, transaction
+
+from .geohash_utils import encode_location
+
+logger = logging.getLogger(__name__)
+
+# Precisions used for clustering by the LOD map (zoom < 13). Higher
+# precisions are served as individual points from the raw table.
+LOCATION_ROLLUP_PRECISIONS = (2, 3, 4, 5, 6)
+MAX_ROLLUP_PRECISION = max(LOCATION_ROLLUP_PRECISIONS)
+
+REBUILD_CHUNK_SIZE = 2000
+
+_UPSERT_SQL = """
+    INSERT INTO location_analysis_rollup
+        (precision, geohash_prefix, hour_bucket, count,
+         latitude_sum, longitude_sum, newest_at, oldest_at, city_name)
+    VALUES {values}
+    ON CONFLICT (precision, geohash_prefix, hour_bucket) DO UPDATE SET
+        count = location_analysis_rollup.count + EXCLUDED.count,
+        latitude_sum = location_analysis_rollup.latitude_sum + EXCLUDED.latitude_sum,
+        longitude_sum = location_analysis_rollup.longitude_sum + EXCLUDED.longitude_sum,
+        newest_at = GREATEST(location_analysis_rollup.newest_at, EXCLUDED.newest_at),
+        oldest_at = LEAST(location_analysis_rollup.oldest_at, EXCLUDED.oldest_at),
+        city_name = CASE
+            WHEN location_analysis_rollup.city_name = '' THEN EXCLUDED.city_name
+            ELSE location_analysis_rollup.city_name
+        END
+"""
+
+
+def _full_geohash(analysis) -> str:
+    """Stored geohash if precise enough for every rollup level, else re-encode."""
+    if analysis.geohash and len(analysis.geohash) >= MAX_ROLLUP_PRECISION:
+        return analysis.geohash
+    return encode_location(analysis.latitude, analysis.longitude, precision=MAX_ROLLUP_PRECISION)
+
+
+def _hour(analysis) -> datetime:
+    return analysis.created_at.replace(minute=0, second=0, microsecond=0)
+
+
+def _add_to_groups(groups: Dict[Tuple[int, str, datetime], list], analysis) -> None:
+    """
+    Count one analysis towards its (precision, prefix, hour) groups.
+
+    Shared by the incremental and rebuild paths so both bucket points the
+    same way (see _full_geohash).
+    """
+    geohash = _full_geohash(analysis)
+    hour = _hour(analysis)
+    for precision in LOCATION_ROLLUP_PRECISIONS:
+        key = (precision, geohash[:precision], hour)
+        row = groups.get(key)
+        if row is None:
+            groups[key] = [
+                1, analysis.latitude, analysis.longitude,
+                analysis.created_at, analysis.created_at, analysis.city_name or '',
+            ]
+        else:
+            row[0] += 1
+            row[1] += analysis.latitude
+            row[2] += analysis.longitude
+            row[3] = max(row[3], analysis.created_at)
+            row[4] = min(row[4], analysis.created_at)
+            row[5] = row[5] or analysis.city_name or ''
+
+
+def record_location_rollups(analyses: Iterable) -> None:
+    """
+    Add LocationAnalysis records to the rollup table.
+
+    Records are grouped in Python by (precision, prefix, hour) first, so a
+    bulk insert of N points costs one statement with at most
+    N x len(LOCATION_ROLLUP_PRECISIONS) value rows.
+
+    Args:
+        analyses: Saved LocationAnalysis instances (created_at populated)
+    """
+    groups: Dict[Tuple[int, str, datetime], list] = {}
+
+    for analysis in analyses:
+        _add_to_groups(groups, analysis)
+
+    if not groups:
+        return
+
+    params = []
+    for (precision, prefix, hour), row in groups.items():
+        params.extend([precision, prefix, hour, *row])
+    values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s)'] * len(groups))
+
+    with connection.cursor() as cursor:
+        cursor.execute(_UPSERT_SQL.format(values=values), params)
+
+
+def _create_rollups(groups: Dict[Tuple[int, str, datetime], list]) -> int:
+    """Insert rollup rows for `groups` (from _add_to_groups)."""
+    from media_analysis.models import LocationAnalysisRollup
+
+    rows = [
+        LocationAnalysisRollup(
+            precision=precision,
+            geohash_prefix=prefix,
+            hour_bucket=hour,
+            count=count,
+            latitude_sum=latitude_sum,
+            longitude_sum=longitude_sum,
+            newest_at=newest,
+            oldest_at=oldest,
+            city_name=city_name,
+        )
+        for (precision, prefix, hour), (count, latitude_sum, longitude_sum, newest, oldest, city_name)
+        in groups.items()
+    ]
+    LocationAnalysisRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rebuild_location_rollups(since: Optional[datetime] = None) -> int:
+    """
+    Recompute rollups from the raw LocationAnalysis table.
+
+    Deletes rollup rows from the hour containing `since` onward (or all
+    rows) and re-aggregates them, streaming the raw rows in created_at
+    order and writing each hour's groups once the hour is complete. Points
+    are bucketed exactly as by `record_location_rollups` (short stored
+    geohashes are re-encoded from lat/lng). Used to backfill history and
+    to repair drift after bulk imports that bypassed it.
+
+    Args:
+        since: Only rebuild hours at or after this time (default: everything)
+
+    Returns:
+        Number of rollup rows written
+    """
+    from media_analysis.models import LocationAnalysis, LocationAnalysisRollup
+
+    raw = LocationAnalysis.objects.all()
+    existing = LocationAnalysisRollup.objects.all()
+    if since is not None:
+        since = since.replace(minute=0, second=0, microsecond=0)
+        raw = raw.filter(created_at__gte=since)
+        existing = existing.filter(hour_bucket__gte=since)
+
+    raw = raw.only('latitude', 'longitude', 'geohash', 'city_name', 'created_at').order_by('created_at')
+
+    written = 0
+    with transaction.atomic():
+        existing.delete()
+
+        groups: Dict[Tuple[int, str, datetime], list] = {}
+        current_hour = None
+        for analysis in raw.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            hour = _hour(analysis)
+            if hour != current_hour:
+                written += _create_rollups(groups)
+                groups = {}
+                current_hour = hour
+            _add_to_groups(groups, analysis)
+        written += _create_rollups(groups)
+
+    logger.info(f"Rebuilt {written} location rollup rows (since={since})")
+    return written
@@ -1,17 +1,31 @@
 """
 Message activity utility for ranking suggestions by chat activity.
 
-Queries message counts for the last 24 hours and within the configurable
-activity window, with Redis caching to reduce database load.
+Maintains rolling per-room message counters on write instead of running
+COUNT queries on read. Each room gets one Redis hash per hour bucket:
+
+    room_msg_activity:{room_id}:{epoch_hour}
+        total   -> messages sent during that hour
+        0..59   -> messages sent during that minute of the hour
+
+The "last 24h" count sums the `total` field of the 24 most recent hour
+buckets; the active-window count sums the minute fields covering the
+configurable activity window. Buckets expire on their own 25 hours after
+the hour closes, so there is nothing to invalidate or prune.
+
+Counters are incremented by the Message post_save signal (see
+media_analysis/signals.py) and decremented on soft-delete. Rooms whose
+history predates the counters can be seeded with:
+    ./venv/bin/python manage.py backfill_activity_counters
 
 The activity window is configurable via Constance setting:
     CHAT_ACTIVITY_WINDOW_MINUTES (default: 10.0)
-
-Cache TTL is automatically set to half the activity window.
 """
 
 import logging
-from datetime import timedelta
+import math
+import time
+from datetime import datetime, timedelta
 from typing import Dict, List, NamedTuple
 
 from django.core.cache import cache
@@ -20,8 +34,15 @@ from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
-# Cache configuration
+# Counter key configuration
 MESSAGE_ACTIVITY_CACHE_PREFIX = "room_msg_activity"
+MESSAGE_ACTIVITY_BUCKET_KEY = MESSAGE_ACTIVITY_CACHE_PREFIX + ":{room_id}:{hour}"
+MESSAGE_ACTIVITY_TOTAL_FIELD = "total"
+
+# 24 hour buckets (current hour + 23 previous) make up the "last 24h" window
+ACTIVITY_WINDOW_HOURS = 24
+# Keep each bucket one hour past the point it leaves the 24h window
+BUCKET_RETENTION_SECONDS = (ACTIVITY_WINDOW_HOURS + 1) * 3600
 
 
 def _get_activity_window_minutes() -> float:
@@ -30,11 +51,13 @@ def _get_activity_window_minutes() -> float:
     return float(config.CHAT_ACTIVITY_WINDOW_MINUTES)
 
 
-def _get_cache_ttl_seconds() -> int:
-    """Calculate cache TTL as half the activity window (in seconds)."""
-    window_minutes = _get_activity_window_minutes()
-    ttl_seconds = (window_minutes / 2) * 60
-    return max(1, int(ttl_seconds))  # Minimum 1 second
+def _get_redis_client():
+    """Get raw Redis client from django-redis"""
+    return cache.client.get_client()
+
+
+def _bucket_key(room_id: str, hour: int) -> str:
+    return MESSAGE_ACTIVITY_BUCKET_KEY.format(room_id=room_id, hour=hour)
 
 
 class MessageActivity(NamedTuple):
@@ -47,8 +70,9 @@ def get_message_activity_for_rooms(room_ids: List[str]) -> Dict[str, MessageActi
     """
     Get message counts (24h and active window) for each room.
 
-    Uses Redis caching with TTL = activity_window / 2 to reduce database load.
-    Batch fetches from cache, then queries DB for cache misses.
+    Reads the rolling hour buckets for every room in a single Redis
+    pipeline (24 HMGETs per room), so cost is O(rooms) with no SQL.
+    Falls back to a COUNT query only if Redis is unavailable.
 
     The activity window is configurable via CHAT_ACTIVITY_WINDOW_MINUTES.
 
@@ -74,59 +98,105 @@ def get_message_activity_for_rooms(room_ids: List[str]) -> Dict[str, MessageActi
     # Deduplicate room IDs
     unique_room_ids = list(set(room_ids))
 
-    # Build cache keys
-    cache_keys = {
-        room_id: f"{MESSAGE_ACTIVITY_CACHE_PREFIX}:{room_id}"
-        for room_id in unique_room_ids
-    }
+    now_minute = int(time.time()) // 60
+    now_hour = now_minute // 60
 
-    # Batch fetch from cache
-    cached_values = cache.get_many(list(cache_keys.values()))
+    # Minute buckets covering the activity window, grouped by hour bucket
+    window_minutes = min(
+        max(1, math.ceil(_get_activity_window_minutes())),
+        ACTIVITY_WINDOW_HOURS * 60,
+    )
+    window_fields: Dict[int, List[str]] = {}
+    for minute in range(now_minute - window_minutes + 1, now_minute + 1):
+        window_fields.setdefault(minute // 60, []).append(str(minute % 60))
+
+    hours = list(range(now_hour - ACTIVITY_WINDOW_HOURS + 1, now_hour + 1))
+
+    try:
+        pipe = _get_redis_client().pipeline(transaction=False)
+        for room_id in unique_room_ids:
+            for hour in hours:
+                pipe.hmget(
+                    _bucket_key(room_id, hour),
+                    [MESSAGE_ACTIVITY_TOTAL_FIELD] + window_fields.get(hour, []),
+                )
+        replies = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Message activity counters unavailable, falling back to DB: {e}")
+        db_results = _query_message_activity(unique_room_ids)
+        return {
+            room_id: db_results.get(room_id, MessageActivity(0, 0))
+            for room_id in unique_room_ids
+        }
 
-    # Separate hits and misses
     results: Dict[str, MessageActivity] = {}
-    cache_misses: List[str] = []
-
-    for room_id in unique_room_ids:
-        cache_key = cache_keys[room_id]
-        if cache_key in cached_values:
-            cached = cached_values[cache_key]
-            results[room_id] = MessageActivity(
-                messages_24h=cached.get('messages_24h', 0),
-                messages_10min=cached.get('messages_10min', 0)
-            )
-        else:
-            cache_misses.append(room_id)
-
-    if cache_misses:
-        logger.debug(
-            f"Message activity cache: {len(results)} hits, {len(cache_misses)} misses"
+    per_room = len(hours)
+    for index, room_id in enumerate(unique_room_ids):
+        messages_24h = 0
+        messages_window = 0
+        for values in replies[index * per_room:(index + 1) * per_room]:
+            total, *minutes = (int(v) if v else 0 for v in values)
+            messages_24h += total
+            messages_window += sum(minutes)
+        # Deletes of messages sent before the counters existed can push a
+        # bucket below zero; never report negative activity.
+        results[room_id] = MessageActivity(
+            messages_24h=max(0, messages_24h),
+            messages_10min=max(0, messages_window),
         )
 
-        # Query DB for cache misses
-        db_results = _query_message_activity(cache_misses)
+    return results
 
-        # Store in cache and add to results
-        cache_to_set = {}
-        for room_id in cache_misses:
-            activity = db_results.get(room_id, MessageActivity(0, 0))
-            results[room_id] = activity
-            cache_to_set[cache_keys[room_id]] = {
-                'messages_24h': activity.messages_24h,
-                'messages_10min': activity.messages_10min
-            }
 
-        # Batch set cache
-        cache.set_many(cache_to_set, timeout=_get_cache_ttl_seconds())
+def record_message_activity(room_id: str, created_at: datetime, delta: int = 1) -> None:
+    """
+    Apply a message to the rolling counters for its room.
 
-    return results
+    Called with delta=1 when a message is created and delta=-1 when it is
+    soft-deleted. Messages older than the 24h window are ignored since no
+    reader will ever look at their bucket.
+
+    Args:
+        room_id: ChatRoom UUID
+        created_at: When the message was sent (bucket is derived from this)
+        delta: Amount to add to the counters
+    """
+    timestamp = int(created_at.timestamp())
+    if timestamp < time.time() - ACTIVITY_WINDOW_HOURS * 3600:
+        return
+
+    minute = timestamp // 60
+    hour = minute // 60
+    key = _bucket_key(str(room_id), hour)
+
+    pipe = _get_redis_client().pipeline(transaction=False)
+    pipe.hincrby(key, MESSAGE_ACTIVITY_TOTAL_FIELD, delta)
+    pipe.hincrby(key, str(minute % 60), delta)
+    pipe.expireat(key, (hour + 1) * 3600 + BUCKET_RETENTION_SECONDS)
+    pipe.execute()
+
+
+def reset_message_activity(room_id: str) -> None:
+    """
+    Drop every hour bucket for a room (used before a backfill).
+
+    Args:
+        room_id: ChatRoom UUID
+    """
+    now_hour = int(time.time()) // 3600
+    keys = [
+        _bucket_key(str(room_id), hour)
+        for hour in range(now_hour - ACTIVITY_WINDOW_HOURS, now_hour + 1)
+    ]
+    _get_redis_client().delete(*keys)
 
 
 def _query_message_activity(room_ids: List[str]) -> Dict[str, MessageActivity]:
     """
     Query database for message counts in last 24h and within activity window.
 
-    The activity window is configurable via CHAT_ACTIVITY_WINDOW_MINUTES.
+    Only used as a fallback when Redis is unreachable; the hot path reads
+    the rolling counters.
 
     Args:
         room_ids: List of ChatRoom UUIDs to query
@@ -171,18 +241,3 @@ def _query_message_activity(room_ids: List[str]) -> Dict[str, MessageActivity]:
     logger.debug(f"Queried message activity for {len(room_ids)} rooms: {len(results)} with activity")
 
     return results
-
-
-def invalidate_message_activity_cache(room_id: str) -> None:
-    """
-    Invalidate the message activity cache for a specific room.
-
-    Call this when a new message is sent to ensure fresh counts.
-    Optional optimization - cache will naturally expire after TTL.
-
-    Args:
-        room_id: ChatRoom UUID to invalidate
-    """
-    cache_key = f"{MESSAGE_ACTIVITY_CACHE_PREFIX}:{room_id}"
-    cache.delete(cache_key)
-    logger.debug(f"Invalidated message activity cache for room {room_id}")
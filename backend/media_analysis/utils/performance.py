@@ -5,6 +5,9 @@ Provides context managers for timing operations when MEDIA_ANALYSIS_PERFORMANCE_
 is enabled in Django settings. Designed to identify bottlenecks in API calls and
 database operations.
 
+Inside a trace (see tracing.py) every tracked operation is also recorded as a
+span with its SQL and Redis counts, whether or not logging is enabled.
+
 Usage:
     from media_analysis.utils.performance import perf_track, perf_summary
 
@@ -28,6 +31,8 @@ from typing import Dict, Optional
 
 from django.conf import settings
 
+from .tracing import span
+
 logger = logging.getLogger(__name__)
 
 
@@ -55,22 +60,23 @@ def perf_track(operation_name: str, metadata: Optional[str] = None):
         with perf_track("K-NN search", metadata=f"{len(results)} results"):
             results = PhotoAnalysis.objects.filter(...)
     """
-    if not is_performance_tracking_enabled():
-        yield
-        return
+    with span(operation_name, metadata=metadata):
+        if not is_performance_tracking_enabled():
+            yield
+            return
 
-    start_time = time.time()
-    try:
-        yield
-    finally:
-        elapsed = time.time() - start_time
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start_time
 
-        # Format log message
-        log_msg = f"[PERF] {operation_name}: {elapsed:.2f}s"
-        if metadata:
-            log_msg += f" ({metadata})"
+            # Format log message
+            log_msg = f"[PERF] {operation_name}: {elapsed:.2f}s"
+            if metadata:
+                log_msg += f" ({metadata})"
 
-        logger.info(log_msg)
+            logger.info(log_msg)
 
 
 class PerformanceTracker:
@@ -105,24 +111,25 @@ class PerformanceTracker:
             operation_name: Description of the operation
             metadata: Optional metadata to include in summary
         """
-        if not self.enabled:
-            yield
-            return
-
-        start_time = time.time()
-        try:
-            yield
-        finally:
-            elapsed = time.time() - start_time
-            self.timings[operation_name] = elapsed
-            if metadata:
-                self.metadata[operation_name] = metadata
-
-            # Log individual operation
-            log_msg = f"[PERF] {operation_name}: {elapsed:.2f}s"
-            if metadata:
-                log_msg += f" ({metadata})"
-            logger.info(log_msg)
+        with span(operation_name, metadata=metadata):
+            if not self.enabled:
+                yield
+                return
+
+            start_time = time.time()
+            try:
+                yield
+            finally:
+                elapsed = time.time() - start_time
+                self.timings[operation_name] = elapsed
+                if metadata:
+                    self.metadata[operation_name] = metadata
+
+                # Log individual operation
+                log_msg = f"[PERF] {operation_name}: {elapsed:.2f}s"
+                if metadata:
+                    log_msg += f" ({metadata})"
+                logger.info(log_msg)
 
     def log_summary(self, operation_label: str = "operation"):
         """
@@ -1,31 +1,51 @@
 """
 Room activity utility for ranking suggestions by active participants.
 
-Queries unique users who sent messages in the last 24 hours,
-with Redis caching to reduce database load.
+Counts unique users who sent messages in the last 24 hours using one
+HyperLogLog per room per hour, maintained on write:
+
+    room_active_users_24h:{room_id}:{epoch_hour}
+
+PFCOUNT over the 24 most recent hour keys returns the cardinality of
+their union (an implicit PFMERGE), with ~0.81% standard error. Keys
+expire 25 hours after their hour closes, so there is nothing to
+invalidate. Soft-deleting a message does not remove its sender from the
+estimate (HyperLogLogs are add-only).
 """
 
 import logging
-from datetime import timedelta
-from typing import Dict, List, Set
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
 
 from django.core.cache import cache
 from django.db.models import Count
 from django.utils import timezone
 
+from .message_activity import ACTIVITY_WINDOW_HOURS, BUCKET_RETENTION_SECONDS
+
 logger = logging.getLogger(__name__)
 
-# Cache configuration
+# HyperLogLog key configuration
 ACTIVE_USERS_CACHE_PREFIX = "room_active_users_24h"
-ACTIVE_USERS_CACHE_TTL = 300  # 5 minutes in seconds
+ACTIVE_USERS_HLL_KEY = ACTIVE_USERS_CACHE_PREFIX + ":{room_id}:{hour}"
+
+
+def _get_redis_client():
+    """Get raw Redis client from django-redis"""
+    return cache.client.get_client()
+
+
+def _hll_key(room_id: str, hour: int) -> str:
+    return ACTIVE_USERS_HLL_KEY.format(room_id=room_id, hour=hour)
 
 
 def get_active_users_for_rooms(room_ids: List[str]) -> Dict[str, int]:
     """
     Get count of unique users who sent messages in last 24 hours for each room.
 
-    Uses Redis caching with 5-minute TTL to reduce database load.
-    Batch fetches from cache, then queries DB for cache misses.
+    Issues one multi-key PFCOUNT per room in a single Redis pipeline.
+    Falls back to a COUNT(DISTINCT) query only if Redis is unavailable.
 
     Args:
         room_ids: List of ChatRoom UUIDs (as strings)
@@ -45,51 +65,66 @@ def get_active_users_for_rooms(room_ids: List[str]) -> Dict[str, int]:
     # Deduplicate room IDs
     unique_room_ids = list(set(room_ids))
 
-    # Build cache keys
-    cache_keys = {
-        room_id: f"{ACTIVE_USERS_CACHE_PREFIX}:{room_id}"
-        for room_id in unique_room_ids
-    }
+    now_hour = int(time.time()) // 3600
+    hours = range(now_hour - ACTIVITY_WINDOW_HOURS + 1, now_hour + 1)
 
-    # Batch fetch from cache
-    cached_values = cache.get_many(list(cache_keys.values()))
+    try:
+        pipe = _get_redis_client().pipeline(transaction=False)
+        for room_id in unique_room_ids:
+            pipe.pfcount(*[_hll_key(room_id, hour) for hour in hours])
+        counts = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Active user counters unavailable, falling back to DB: {e}")
+        db_results = _query_active_users(unique_room_ids)
+        return {room_id: db_results.get(room_id, 0) for room_id in unique_room_ids}
 
-    # Separate hits and misses
-    results: Dict[str, int] = {}
-    cache_misses: Set[str] = set()
+    return dict(zip(unique_room_ids, counts))
 
-    for room_id in unique_room_ids:
-        cache_key = cache_keys[room_id]
-        if cache_key in cached_values:
-            results[room_id] = cached_values[cache_key]
-        else:
-            cache_misses.add(room_id)
 
-    if cache_misses:
-        logger.debug(
-            f"Active users cache: {len(results)} hits, {len(cache_misses)} misses"
-        )
+def record_active_user(room_id: str, username: str, created_at: datetime) -> None:
+    """
+    Add a message sender to the hourly HyperLogLog for its room.
 
-        # Query DB for cache misses
-        db_results = _query_active_users(list(cache_misses))
+    Args:
+        room_id: ChatRoom UUID
+        username: Sender's username (case-sensitive, matching the legacy
+            COUNT(DISTINCT username) semantics)
+        created_at: When the message was sent (bucket is derived from this)
+    """
+    timestamp = int(created_at.timestamp())
+    if timestamp < time.time() - ACTIVITY_WINDOW_HOURS * 3600:
+        return
 
-        # Store in cache and add to results
-        cache_to_set = {}
-        for room_id in cache_misses:
-            count = db_results.get(room_id, 0)
-            results[room_id] = count
-            cache_to_set[cache_keys[room_id]] = count
+    hour = timestamp // 3600
+    key = _hll_key(str(room_id), hour)
 
-        # Batch set cache
-        cache.set_many(cache_to_set, timeout=ACTIVE_USERS_CACHE_TTL)
+    pipe = _get_redis_client().pipeline(transaction=False)
+    pipe.pfadd(key, username)
+    pipe.expireat(key, (hour + 1) * 3600 + BUCKET_RETENTION_SECONDS)
+    pipe.execute()
 
-    return results
+
+def reset_active_users(room_id: str) -> None:
+    """
+    Drop every hourly HyperLogLog for a room (used before a backfill).
+
+    Args:
+        room_id: ChatRoom UUID
+    """
+    now_hour = int(time.time()) // 3600
+    keys = [
+        _hll_key(str(room_id), hour)
+        for hour in range(now_hour - ACTIVITY_WINDOW_HOURS, now_hour + 1)
+    ]
+    _get_redis_client().delete(*keys)
 
 
 def _query_active_users(room_ids: List[str]) -> Dict[str, int]:
     """
     Query database for unique users who sent messages in last 24 hours.
 
+    Only used as a fallback when Redis is unreachable.
+
     Args:
         room_ids: List of ChatRoom UUIDs to query
 
@@ -125,18 +160,3 @@ def _query_active_users(room_ids: List[str]) -> Dict[str, int]:
     logger.debug(f"Queried active users for {len(room_ids)} rooms: {results}")
 
     return results
-
-
-def invalidate_room_activity_cache(room_id: str) -> None:
-    """
-    Invalidate the active users cache for a specific room.
-
-    Call this when a new message is sent to ensure fresh counts.
-    Optional optimization - cache will naturally expire after TTL.
-
-    Args:
-        room_id: ChatRoom UUID to invalidate
-    """
-    cache_key = f"{ACTIVE_USERS_CACHE_PREFIX}:{room_id}"
-    cache.delete(cache_key)
-    logger.debug(f"Invalidated active users cache for room {room_id}")
@@ -0,0 +1,375 @@
+"""
+Request-scoped span tracing.
+
+A trace is a tree of timed spans held in a contextvar, so nested work in
+the same request, asyncio task or sync_to_async thread (which copies the
+context) attaches to the right parent without passing anything around.
+Every span counts the SQL statements and Redis commands issued while it
+is open (children included).
+
+- TraceMiddleware opens a trace per HTTP request, honouring an incoming
+  `traceparent` / `X-Trace-Id` header, and returns `X-Trace-Id`.
+- ChatConsumer opens one per WebSocket frame; media jobs one per job.
+- `span()` (and perf_track / PerformanceTracker.track, which use it)
+  nests a span under the current one; outside a trace it does nothing.
+
+Finished traces slower than TRACE_SLOW_MS are pushed onto a capped Redis
+list shared by all processes (admin: /admin/monitor/traces/). With
+TRACE_EXPORT_PATH set, every trace is also appended to that file as one
+line of OTLP JSON (ExportTraceServiceRequest), for an OpenTelemetry
+collector's file receiver or offline analysis.
+
+SQL statements are counted by a database execute wrapper installed on
+each new connection (MediaAnalysisConfig.ready); Redis commands by the
+connection class of the django-redis pool (CACHES OPTIONS
+CONNECTION_POOL_CLASS). Channel layer traffic is not counted.
+
+Redis keys:
+    traces:slow     LIST of JSON traces, newest first, capped at TRACE_BUFFER_SIZE
+
+Usage:
+    with start_trace('job photo.analyze', kind='internal', job_id=job.id):
+        with span('vision', model=model_name):
+            ...
+
+    current_trace_id()          # for log lines / responses
+    get_slow_traces(limit=50)
+"""
+
+import json
+import logging
+import re
+import secrets
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SLOW_TRACES_KEY = 'traces:slow'
+TRACE_ID_HEADER = 'X-Trace-Id'
+
+# OTLP span kinds
+SPAN_KINDS = {'internal': 1, 'server': 2, 'consumer': 5}
+
+_TRACE_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+_TRACEPARENT_RE = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-[0-9a-f]{16}-[0-9a-f]{2}$')
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('trace_span', default=None)
+_export_lock = threading.Lock()
+
+
+def _get_redis_client():
+    """Get raw Redis client from django-redis"""
+    return cache.client.get_client()
+
+
+def _attribute(value: Any):
+    return value if isinstance(value, (str, bool, int, float)) else str(value)
+
+
+class Span:
+    """One timed operation in a trace."""
+
+    def __init__(self, trace: 'Trace', name: str, parent: Optional['Span'], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.name = name
+        self.parent = parent
+        self.attributes = {key: _attribute(value) for key, value in attributes.items() if value is not None}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.sql_queries = 0
+        self.redis_commands = 0
+        self.error: Optional[str] = None
+        trace.spans.append(self)
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = _attribute(value)
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        self.end_ns = self.start_ns + int(self.duration_ms * 1e6)
+
+    @property
+    def depth(self) -> int:
+        depth, parent = 0, self.parent
+        while parent is not None:
+            depth, parent = depth + 1, parent.parent
+        return depth
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent else None,
+            'name': self.name,
+            'depth': self.depth,
+            'start_offset_ms': round((self.start_ns - self.trace.root.start_ns) / 1e6, 2),
+            'duration_ms': round(self.duration_ms, 2) if self.duration_ms is not None else None,
+            'sql_queries': self.sql_queries,
+            'redis_commands': self.redis_commands,
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+class Trace:
+    """Spans of one request, WebSocket frame or job."""
+
+    def __init__(self, trace_id: str, kind: str):
+        self.trace_id = trace_id
+        self.kind = kind
+        self.spans: List[Span] = []
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'kind': self.kind,
+            'start': datetime.fromtimestamp(self.root.start_ns / 1e9, tz=timezone.utc).isoformat(),
+            'duration_ms': round(self.root.duration_ms, 2),
+            'sql_queries': self.root.sql_queries,
+            'redis_commands': self.root.redis_commands,
+            'error': self.root.error,
+            'spans': [span.to_dict() for span in self.spans],
+        }
+
+
+def tracing_enabled() -> bool:
+    return getattr(settings, 'TRACING_ENABLED', False)
+
+
+def parse_trace_id(value: Optional[str]) -> Optional[str]:
+    """Trace ID from a W3C `traceparent` or a bare 32-hex-digit ID, else None."""
+    value = (value or '').strip().lower()
+    match = _TRACEPARENT_RE.match(value)
+    if match:
+        return match.group(1)
+    return value if _TRACE_ID_RE.match(value) else None
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span_ = _current_span.get()
+    return span_.trace.trace_id if span_ else None
+
+
+@contextmanager
+def _open(span_: Span) -> Iterator[Span]:
+    token = _current_span.set(span_)
+    try:
+        yield span_
+    except BaseException as e:
+        span_.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        span_.finish()
+
+
+@contextmanager
+def start_trace(name: str, trace_id: Optional[str] = None, kind: str = 'server',
+                **attributes) -> Iterator[Optional[Trace]]:
+    """
+    Open a trace with a root span (a child span if a trace is already open).
+
+    Args:
+        name: Root span name, e.g. 'POST /api/media-analysis/photo/upload/'
+        trace_id: Incoming 32-hex-digit ID to continue (default: new one)
+        kind: 'server', 'consumer' or 'internal'
+        **attributes: Root span attributes (None values are dropped)
+
+    Yields:
+        The Trace, or None when TRACING_ENABLED is off.
+    """
+    if not tracing_enabled():
+        yield None
+        return
+
+    parent = _current_span.get()
+    if parent is not None:
+        with span(name, **attributes):
+            yield parent.trace
+        return
+
+    trace = Trace(trace_id or uuid.uuid4().hex, kind)
+    try:
+        with _open(Span(trace, name, None, attributes)):
+            yield trace
+    finally:
+        _finish_trace(trace)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Nested span under the current one; a no-op outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    with _open(Span(parent.trace, name, parent, attributes)) as span_:
+        yield span_
+
+
+# Counters
+
+def count_sql(execute, sql, params, many, context):
+    """Database execute wrapper: count the statement on every open span."""
+    span_ = _current_span.get()
+    while span_ is not None:
+        span_.sql_queries += 1
+        span_ = span_.parent
+    return execute(sql, params, many, context)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """connection_created receiver (fires again when a connection reconnects)."""
+    if count_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_sql)
+
+
+def _count_redis(commands: int):
+    span_ = _current_span.get()
+    while span_ is not None:
+        span_.redis_commands += commands
+        span_ = span_.parent
+
+
+class TracingConnection(redis.Connection):
+    """redis-py connection that counts commands on the open spans."""
+
+    def send_command(self, *args, **kwargs):
+        _count_redis(1)
+        return super().send_command(*args, **kwargs)
+
+    def pack_commands(self, commands):
+        # Pipelines and transactions
+        commands = list(commands)
+        _count_redis(len(commands))
+        return super().pack_commands(commands)
+
+
+class TracingConnectionPool(redis.ConnectionPool):
+    """ConnectionPool for django-redis whose connections are TracingConnections."""
+
+    def __init__(self, connection_class=TracingConnection, **kwargs):
+        super().__init__(connection_class=connection_class, **kwargs)
+
+
+# Sinks
+
+def _finish_trace(trace: Trace):
+    if trace.root.duration_ms >= settings.TRACE_SLOW_MS:
+        logger.info(
+            f"[TRACE] Slow {trace.root.name}: {trace.root.duration_ms:.1f}ms "
+            f"({trace.root.sql_queries} SQL, {trace.root.redis_commands} Redis) trace_id={trace.trace_id}"
+        )
+        record_slow_trace(trace)
+    if settings.TRACE_EXPORT_PATH:
+        export_otlp(trace, settings.TRACE_EXPORT_PATH)
+
+
+def record_slow_trace(trace: Trace):
+    """Push a trace onto the shared slow-trace list."""
+    try:
+        pipe = _get_redis_client().pipeline(transaction=False)
+        pipe.lpush(SLOW_TRACES_KEY, json.dumps(trace.to_dict()))
+        pipe.ltrim(SLOW_TRACES_KEY, 0, settings.TRACE_BUFFER_SIZE - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"[TRACE] Failed to record slow trace {trace.trace_id}: {e}")
+
+
+def get_slow_traces(limit: int = 50) -> List[Dict[str, Any]]:
+    """Newest slow traces from every process."""
+    try:
+        entries = _get_redis_client().lrange(SLOW_TRACES_KEY, 0, limit - 1)
+    except Exception as e:
+        logger.warning(f"[TRACE] Failed to read slow traces: {e}")
+        return []
+    return [json.loads(entry) for entry in entries]
+
+
+def _otlp_value(value) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items()]
+
+
+def to_otlp(trace: Trace) -> Dict[str, Any]:
+    """A trace as an OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for span_ in trace.spans:
+        attributes = {**span_.attributes, 'db.queries': span_.sql_queries, 'redis.commands': span_.redis_commands}
+        spans.append({
+            'traceId': trace.trace_id,
+            'spanId': span_.span_id,
+            **({'parentSpanId': span_.parent.span_id} if span_.parent else {}),
+            'name': span_.name,
+            'kind': SPAN_KINDS.get(trace.kind, 1) if span_.parent is None else SPAN_KINDS['internal'],
+            'startTimeUnixNano': str(span_.start_ns),
+            'endTimeUnixNano': str(span_.end_ns),
+            'attributes': _otlp_attributes(attributes),
+            # STATUS_CODE_ERROR = 2, STATUS_CODE_UNSET = 0
+            'status': {'code': 2, 'message': span_.error} if span_.error else {},
+        })
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': 'chatpop-backend'})},
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+        }],
+    }
+
+
+def export_otlp(trace: Trace, path: str):
+    """Append a trace to `path` as one line of OTLP JSON."""
+    line = json.dumps(to_otlp(trace), separators=(',', ':'))
+    try:
+        with _export_lock, open(path, 'a') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        logger.warning(f"[TRACE] Failed to export trace {trace.trace_id} to {path}: {e}")
+
+
+class TraceMiddleware:
+    """Open a trace per request and return its ID in the X-Trace-Id header."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace_id = parse_trace_id(request.headers.get('traceparent')) or parse_trace_id(
+            request.headers.get(TRACE_ID_HEADER)
+        )
+        with start_trace(f'{request.method} {request.path}', trace_id=trace_id, kind='server') as trace:
+            response = self.get_response(request)
+            if trace is not None:
+                trace.root.set_attribute('http.status_code', response.status_code)
+                response[TRACE_ID_HEADER] = trace.trace_id
+        return response
@@ -67,6 +67,12 @@ class OpenAIVisionProvider(VisionProvider):
             original_width, original_height = img.size
             original_megapixels = (original_width * original_height) / 1_000_000
 
+            # Already a right-sized JPEG (e.g. ImageIngest.to_jpeg output):
+            # send the bytes as-is instead of decoding and re-encoding
+            if img.format == 'JPEG' and img.mode in ('RGB', 'L') and max(original_width, original_height) <= max_size:
+                logger.info(f"Image is a pre-sized JPEG: {original_width}x{original_height}, base64 size: {len(image_data)} bytes")
+                return base64.b64encode(image_data).decode('utf-8')
+
             # Convert RGBA to RGB (JPEG doesn't support transparency)
             if img.mode in ('RGBA', 'LA', 'P'):
                 # Create white background
@@ -3,8 +3,10 @@ DRF Views for Photo Analysis API.
 """
 import io
 import logging
+from typing import Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import timedelta
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
@@ -13,7 +15,7 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import AllowAny
 from constance import config
 
-from .models import PhotoAnalysis, MusicAnalysis, Suggestion, LocationAnalysis, LocationSuggestionsCache
+from .models import PhotoAnalysis, MusicAnalysis, Suggestion, LocationAnalysis, LocationSuggestionsCache, MediaJob
 from .serializers import (
     PhotoAnalysisSerializer,
     PhotoAnalysisDetailSerializer,
@@ -29,13 +31,13 @@ from .utils.rate_limit import (
     increment_global_rate_limit,
 )
 from .utils.location import get_or_fetch_location_suggestions, encode_location
-from .utils.fingerprinting.image_hash import calculate_phash
-from .utils.fingerprinting.file_hash import calculate_sha256, get_file_size
+from .utils.fingerprinting.near_duplicate import find_near_duplicate
 from .utils.vision.openai_vision import get_vision_provider
-from .utils.image_processing import resize_image_if_needed
+from .utils.image_processing import ImageIngest, VISION_MAX_DIMENSION
+from .utils.jobs import accepted_job_data, enqueue_job, prefers_async, serialize_job
 from .utils.suggestion_blending import blend_suggestions
 from .utils.suggestion_matching import match_suggestions_to_existing, discover_related_suggestions
-from .utils.performance import PerformanceTracker
+from .utils.performance import PerformanceTracker, perf_track
 from .utils.room_activity import get_active_users_for_rooms
 from chatpop.utils.media import MediaStorage
 from chats.utils.turnstile import require_turnstile
@@ -146,15 +148,24 @@ class PhotoAnalysisViewSet(viewsets.ReadOnlyModelViewSet):
         tracker = PerformanceTracker()
 
         try:
-            # Calculate file hashes for deduplication (SHA-256 for collision resistance)
-            image_file.seek(0)
-            file_hash = calculate_sha256(image_file)
-
-            image_file.seek(0)
-            image_phash = calculate_phash(image_file)
+            # Read and decode the upload once; hashes, size and the resized
+            # JPEG below all come from this single buffer
+            with tracker.track("Image ingest and hashing"):
+                try:
+                    ingest = ImageIngest(image_file)
+                except ValueError as e:
+                    # Passed the serializer's checks but cannot be decoded
+                    # (e.g. truncated) or exceeds the pixel ceiling
+                    logger.warning(f"Photo upload validation failed: {e}")
+                    return Response(
+                        {'image': [str(e)]},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
 
-            image_file.seek(0)
-            file_size = get_file_size(image_file)
+                # Calculate file hashes for deduplication (SHA-256 for collision resistance)
+                file_hash = ingest.file_hash
+                image_phash = ingest.phash
+                file_size = ingest.file_size
 
             # Check for existing analysis (exact match)
             existing_analysis = PhotoAnalysis.objects.filter(
@@ -177,6 +188,16 @@ class PhotoAnalysisViewSet(viewsets.ReadOnlyModelViewSet):
                     # Both hashes match - safe to return cached analysis
                     logger.info(f"Returning cached analysis for file_hash={file_hash[:16]}... (phash validated)")
 
+            # Near-duplicate match: re-encoded/re-screenshotted copies of an
+            # image already analyzed reuse its suggestions
+            if existing_analysis is None and config.PHOTO_ANALYSIS_NEAR_DUPLICATE_ENABLED:
+                existing_analysis = find_near_duplicate(
+                    image_phash,
+                    max_distance=config.PHOTO_ANALYSIS_NEAR_DUPLICATE_THRESHOLD
+                )
+                if existing_analysis:
+                    logger.info(f"Returning cached analysis {existing_analysis.id} for near-duplicate phash={image_phash}")
+
             if existing_analysis:
                 # Blend suggestions for cached analysis (add room metadata)
                 blended = None  # Track if blending succeeded
@@ -220,17 +241,15 @@ class PhotoAnalysisViewSet(viewsets.ReadOnlyModelViewSet):
 
                 return Response(response_data, status=status.HTTP_200_OK)
 
-            # Resize image if needed to reduce token usage
-            # This happens AFTER cache check to avoid unnecessary processing
+            # Resize once to reduce token usage; the same JPEG is sent to the
+            # vision API and stored. This happens AFTER cache check to avoid
+            # unnecessary processing
             max_megapixels = config.PHOTO_ANALYSIS_MAX_MEGAPIXELS
-            image_file.seek(0)
-            resized_image, was_resized = resize_image_if_needed(
-                image_file,
-                max_megapixels
-            )
-
-            if was_resized:
-                logger.info(f"Resized image to {max_megapixels}MP to reduce token usage")
+            with tracker.track("Resize"):
+                resized_jpeg = ingest.to_jpeg(
+                    max_megapixels=max_megapixels,
+                    max_dimension=VISION_MAX_DIMENSION
+                )
 
             # Get vision provider
             vision_provider = get_vision_provider(
@@ -243,287 +262,31 @@ class PhotoAnalysisViewSet(viewsets.ReadOnlyModelViewSet):
                     status=status.HTTP_503_SERVICE_UNAVAILABLE
                 )
 
-            # Analyze image for chat name suggestions
-            logger.info(f"Analyzing image for suggestions with {vision_provider.get_model_name()}")
-            resized_image.seek(0)
-            analysis_result = vision_provider.analyze_image(
-                image_file=resized_image,
-                prompt=config.PHOTO_ANALYSIS_PROMPT,
-                max_suggestions=10,  # Request 10 seed suggestions
-                temperature=config.PHOTO_ANALYSIS_TEMPERATURE
-            )
-            logger.info("Vision analysis completed")
-
-            # TODO: Track API cost for circuit breaker (not implemented yet)
-            # estimated_cost = estimate_request_cost(
-            #     model=config.PHOTO_ANALYSIS_OPENAI_MODEL,
-            #     detail_mode=config.PHOTO_ANALYSIS_DETAIL_MODE,
-            #     megapixels=max_megapixels
-            # )
-            # increment_cost(estimated_cost)
-
-            # Store image file using unified MediaStorage API
-            import uuid
-            file_extension = image_file.name.split('.')[-1] if '.' in image_file.name else 'jpg'
-            filename = f"{uuid.uuid4()}.{file_extension}"
-
-            # Save file (MediaStorage automatically handles S3 vs local based on settings)
-            image_file.seek(0)
-            storage_path, storage_type = MediaStorage.save_file(
-                file_obj=image_file,
-                directory='media_analysis',
-                filename=filename
-            )
-
-            logger.info(f"Stored image ({storage_type}): {storage_path}")
-
-            # Calculate expiration time
-            ttl_hours = config.PHOTO_ANALYSIS_IMAGE_TTL_HOURS
-            expires_at = None
-            if ttl_hours > 0:
-                expires_at = timezone.now() + timedelta(hours=ttl_hours)
-
-            # Format seed suggestions (initial 10 AI suggestions from Vision API)
-            seed_suggestions_list = [
-                {
-                    'name': s.name,
-                    'key': s.key,
-                    'description': s.description,
-                    'is_proper_noun': s.is_proper_noun,
-                    'source': 'seed'
-                }
-                for s in analysis_result.suggestions
-            ]
-
-            seed_suggestions_data = {
-                'suggestions': seed_suggestions_list,
-                'count': len(seed_suggestions_list)
-            }
-
-            logger.info(f"Received {len(seed_suggestions_list)} seed suggestions from Vision API")
-
-            # =========================================================================
-            # SUGGESTION-TO-SUGGESTION MATCHING WORKFLOW
-            # Replaces photo-level similarity with granular suggestion-level matching
-            # =========================================================================
-
-            # STEP 1: Match seed suggestions to existing Suggestion records
-            # - Proper nouns: preserved without matching (unique entities)
-            # - Generic suggestions: K-NN search in Suggestion table (threshold: 0.15)
-            # - Match found: use existing suggestion, increment usage_count
-            # - No match: create new Suggestion record
-            # This eliminates cross-domain contamination (whiskey photos won't match beer photos)
-            logger.info("\n" + "="*80)
-            logger.info("STEP 1: Matching seed suggestions to existing Suggestion records")
-            logger.info("="*80)
-
-            matched_suggestions = match_suggestions_to_existing(seed_suggestions_list)
-
-            logger.info(f"\nMatching complete: {len(matched_suggestions)} suggestions processed")
-
-            # STEP 2: Sort by room activity (active users in last 24h)
-            # - Priority 1: AI-suggested proper nouns first (in AI order)
-            # - Priority 2: Other proper nouns sorted by active_users, then usage_count
-            # - Priority 3: Generics sorted by active_users, then usage_count
-            logger.info("\n" + "="*80)
-            logger.info("STEP 2: Sorting by room activity (active users in 24h)")
-            logger.info("="*80)
-
-            # Get room info for all suggestions (to map keys -> room IDs)
-            from chats.models import ChatRoom
-            suggestion_keys = [s.get('key') for s in matched_suggestions if s.get('key')]
-            rooms_by_code = {
-                room.code: room
-                for room in ChatRoom.objects.filter(
-                    code__in=suggestion_keys,
-                    is_active=True
-                )
-            }
-
-            # Get active user counts for rooms
-            room_ids = [str(room.id) for room in rooms_by_code.values()]
-            active_users_by_room_id = get_active_users_for_rooms(room_ids) if room_ids else {}
-
-            # Map suggestion key -> active_users count
-            active_users_by_key = {}
-            for code, room in rooms_by_code.items():
-                active_users_by_key[code] = active_users_by_room_id.get(str(room.id), 0)
-
-            # Attach active_users to each suggestion
-            for s in matched_suggestions:
-                s['active_users'] = active_users_by_key.get(s.get('key'), 0)
-                s['has_room'] = s.get('key') in rooms_by_code
-
-            # Split proper nouns and generics
-            proper_nouns = [s for s in matched_suggestions if s.get('is_proper_noun', False)]
-            non_proper_nouns = [s for s in matched_suggestions if not s.get('is_proper_noun', False)]
-
-            # Sort function: similarity_score DESC (higher = more relevant to this photo)
-            def sort_by_similarity(s):
-                return -s.get('similarity_score', 1.0)  # Default 1.0 for created suggestions
-
-            # Sort both groups by similarity score
-            proper_nouns_sorted = sorted(proper_nouns, key=sort_by_similarity)
-            non_proper_nouns_sorted = sorted(non_proper_nouns, key=sort_by_similarity)
-
-            logger.info(f"\nProper nouns (sorted by similarity): {len(proper_nouns_sorted)}")
-            for pn in proper_nouns_sorted:
-                logger.info(
-                    f"  ✓ '{pn['name']}' (similarity: {pn.get('similarity_score', 1.0):.1%}, "
-                    f"active: {pn.get('active_users', 0)}, has_room: {pn.get('has_room', False)})"
-                )
-
-            logger.info(f"\nNon-proper nouns (sorted by similarity): {len(non_proper_nouns_sorted)}")
-            for npn in non_proper_nouns_sorted[:5]:  # Show top 5
-                logger.info(
-                    f"  → '{npn['name']}' (similarity: {npn.get('similarity_score', 1.0):.1%}, "
-                    f"active: {npn.get('active_users', 0)}, has_room: {npn.get('has_room', False)})"
-                )
-
-            # Combine: proper nouns first (sorted by similarity), then generics (sorted by similarity)
-            final_suggestions_list = (proper_nouns_sorted + non_proper_nouns_sorted)[:5]
-
-            logger.info(
-                f"\nFinal selection: {len(final_suggestions_list)} suggestions "
-                f"({len([s for s in final_suggestions_list if s.get('is_proper_noun', False)])} proper nouns, "
-                f"{len([s for s in final_suggestions_list if not s.get('is_proper_noun', False)])} generics)"
-            )
-            logger.info("="*80 + "\n")
-
-            # STEP 3: Discover related suggestions via K-NN (if enabled)
-            # This finds existing suggestions semantically similar to the LLM's suggestions
-            discovery_count = config.SUGGESTION_DISCOVERY_EXTRA_COUNT
-            discovery_threshold = config.SUGGESTION_DISCOVERY_THRESHOLD
-
-            discovered_suggestions = []
-            if discovery_count > 0:
-                logger.info("\n" + "="*80)
-                logger.info("STEP 3: Discovering related suggestions via K-NN")
-                logger.info("="*80)
-
-                discovered_suggestions = discover_related_suggestions(
-                    matched_suggestions=final_suggestions_list,
-                    max_count=discovery_count,
-                    threshold=discovery_threshold
-                )
-
-                if discovered_suggestions:
-                    # Get active user counts for discovered suggestions
-                    discovered_keys = [s.get('key') for s in discovered_suggestions if s.get('key')]
-                    discovered_rooms = {
-                        room.code: room
-                        for room in ChatRoom.objects.filter(
-                            code__in=discovered_keys,
-                            is_active=True
-                        )
-                    }
-                    discovered_room_ids = [str(room.id) for room in discovered_rooms.values()]
-                    discovered_active_users = get_active_users_for_rooms(discovered_room_ids) if discovered_room_ids else {}
-
-                    # Attach active_users to discovered suggestions
-                    for s in discovered_suggestions:
-                        key = s.get('key')
-                        if key in discovered_rooms:
-                            room_id = str(discovered_rooms[key].id)
-                            s['active_users'] = discovered_active_users.get(room_id, 0)
-                            s['has_room'] = True
-                        else:
-                            s['active_users'] = 0
-                            s['has_room'] = False
-
-                    # Sort discovered suggestions by similarity score
-                    discovered_suggestions_sorted = sorted(
-                        discovered_suggestions,
-                        key=lambda s: -s.get('similarity_score', 0)  # Higher similarity = more relevant
-                    )
-
-                    logger.info(f"Discovered {len(discovered_suggestions_sorted)} suggestions:")
-                    for ds in discovered_suggestions_sorted:
-                        logger.info(
-                            f"  → '{ds['name']}' (similarity: {ds.get('similarity_score', 0):.1%}, "
-                            f"active: {ds.get('active_users', 0)}, proper_noun: {ds.get('is_proper_noun', False)}, "
-                            f"has_room: {ds.get('has_room', False)})"
-                        )
-
-                    # Combine all suggestions for final re-sort
-                    all_suggestions = final_suggestions_list + discovered_suggestions_sorted
-                else:
-                    logger.info("No related suggestions discovered")
-                    all_suggestions = final_suggestions_list
-
-                # STEP 4: Final re-sort to ensure proper ordering
-                # Order: Proper nouns by similarity → Generics by similarity
-                logger.info("\n" + "="*80)
-                logger.info("STEP 4: Final re-sort (Proper nouns → Generics, both by similarity)")
-                logger.info("="*80)
-
-                # Separate into categories
-                all_proper_nouns = [s for s in all_suggestions if s.get('is_proper_noun')]
-                generics = [s for s in all_suggestions if not s.get('is_proper_noun')]
-
-                # Sort both groups by similarity score (higher = more relevant)
-                proper_nouns_final = sorted(
-                    all_proper_nouns,
-                    key=lambda s: -s.get('similarity_score', 1.0)
-                )
-
-                generics_final = sorted(
-                    generics,
-                    key=lambda s: -s.get('similarity_score', 1.0)
-                )
-
-                # Final order: proper nouns first (by similarity), then generics (by similarity)
-                final_suggestions_list = proper_nouns_final + generics_final
-
-                logger.info(f"Final order ({len(final_suggestions_list)} total):")
-                for i, s in enumerate(final_suggestions_list, 1):
-                    category = "Proper noun" if s.get('is_proper_noun') else "Generic"
-                    logger.info(
-                        f"  #{i} '{s['name']}' [{category}] "
-                        f"(similarity: {s.get('similarity_score', 1.0):.1%}, active: {s.get('active_users', 0)}, has_room: {s.get('has_room', False)})"
-                    )
-
-                logger.info("="*80 + "\n")
-
-            # Format final suggestions for database storage
-            suggestions_data = {
-                'suggestions': final_suggestions_list,
-                'count': len(final_suggestions_list)
-            }
+            if prefers_async(request):
+                # Vision call, matching and embeddings run in a media job
+                # worker; the client polls the job or the analysis
+                storage_path, storage_type = store_analysis_image(resized_jpeg)
+                job = enqueue_job('photo.analyze', {
+                    'storage_path': storage_path,
+                    'storage_type': storage_type,
+                    'image_phash': image_phash,
+                    'file_hash': file_hash,
+                    'file_size': file_size,
+                    'user_id': request.user.pk if request.user.is_authenticated else None,
+                    'fingerprint': fingerprint,
+                    'ip_address': ip_address,
+                })
+                return Response(accepted_job_data(job), status=status.HTTP_202_ACCEPTED)
 
-            # Enrich final suggestions with room metadata (metadata-only layer)
-            # Adds has_room, room_id, room_code, room_url, active_users for existing rooms
-            blended = None
-            try:
-                logger.info("Enriching final suggestions with room metadata")
-                blended = blend_suggestions(
-                    refined_suggestions=final_suggestions_list,
-                    exclude_photo_id=None  # Will exclude after PhotoAnalysis is created
-                )
-                logger.info(f"Enriched {len(blended)} suggestions with room metadata")
-            except Exception as e:
-                # Metadata enrichment is non-fatal - log warning and continue
-                logger.warning(f"Metadata enrichment failed (non-fatal): {str(e)}", exc_info=True)
-                blended = None
-
-            # Create PhotoAnalysis record
-            media_analysis = PhotoAnalysis.objects.create(
+            media_analysis, blended = run_photo_analysis(
+                vision_provider,
+                resized_jpeg,
                 image_phash=image_phash,
                 file_hash=file_hash,
                 file_size=file_size,
-                image_path=storage_path,
-                storage_type=storage_type,
-                expires_at=expires_at,
-                seed_suggestions=seed_suggestions_data,  # Store original 10 AI suggestions for audit trail
-                suggestions=suggestions_data,  # Store final merged suggestions (popular + normalized)
-                raw_response=analysis_result.raw_response,
-                ai_vision_model=analysis_result.model,
-                token_usage=analysis_result.token_usage,
                 user=request.user if request.user.is_authenticated else None,
                 fingerprint=fingerprint,
-                ip_address=ip_address,
-                suggestions_embedding=None,  # Not using photo-level similarity
-                suggestions_embedding_generated_at=None
+                ip_address=ip_address
             )
 
             # Return analysis result
@@ -541,6 +304,7 @@ class PhotoAnalysisViewSet(viewsets.ReadOnlyModelViewSet):
             if blended is not None:
                 response_data['analysis']['suggestions'] = [s.to_dict() for s in blended]
 
+            tracker.log_summary("photo upload")
             return Response(response_data, status=status.HTTP_201_CREATED)
 
         except Exception as e:
@@ -618,6 +382,385 @@ class PhotoAnalysisViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(photos)
 
 
+def store_analysis_image(jpeg: bytes) -> Tuple[str, str]:
+    """
+    Store an analyzed photo using the unified MediaStorage API.
+
+    Returns:
+        Tuple of (storage_path, storage_type)
+    """
+    import uuid
+    filename = f"{uuid.uuid4()}.jpg"
+
+    # Save file (MediaStorage automatically handles S3 vs local based on settings)
+    storage_path, storage_type = MediaStorage.save_file(
+        file_obj=io.BytesIO(jpeg),
+        directory='media_analysis',
+        filename=filename
+    )
+
+    logger.info(f"Stored image ({storage_type}): {storage_path}")
+    return storage_path, storage_type
+
+
+def run_photo_analysis(
+    vision_provider,
+    resized_jpeg: bytes,
+    *,
+    image_phash: str,
+    file_hash: str,
+    file_size: int,
+    user=None,
+    fingerprint: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    storage: Optional[Tuple[str, str]] = None
+):
+    """
+    Analyze a new photo and save its PhotoAnalysis.
+
+    Runs the Vision API call, suggestion matching/discovery and room
+    metadata enrichment. Shared by the synchronous upload path and the
+    'photo.analyze' media job.
+
+    Args:
+        vision_provider: Available VisionProvider
+        resized_jpeg: JPEG from ImageIngest.to_jpeg()
+        image_phash, file_hash, file_size: Fingerprints of the original upload
+        user, fingerprint, ip_address: Uploader identity
+        storage: (storage_path, storage_type) if the JPEG is already stored
+
+    Returns:
+        Tuple of (PhotoAnalysis, blended suggestions or None)
+    """
+    # Analyze image for chat name suggestions
+    logger.info(f"Analyzing image for suggestions with {vision_provider.get_model_name()}")
+    with perf_track(f"Vision analysis ({vision_provider.get_model_name()})"):
+        analysis_result = vision_provider.analyze_image(
+            image_file=io.BytesIO(resized_jpeg),
+            prompt=config.PHOTO_ANALYSIS_PROMPT,
+            max_suggestions=10,  # Request 10 seed suggestions
+            temperature=config.PHOTO_ANALYSIS_TEMPERATURE
+        )
+    logger.info("Vision analysis completed")
+
+    # TODO: Track API cost for circuit breaker (not implemented yet)
+    # estimated_cost = estimate_request_cost(
+    #     model=config.PHOTO_ANALYSIS_OPENAI_MODEL,
+    #     detail_mode=config.PHOTO_ANALYSIS_DETAIL_MODE,
+    #     megapixels=max_megapixels
+    # )
+    # increment_cost(estimated_cost)
+
+    # Store image file (async uploads stored it before enqueueing)
+    if storage is None:
+        with perf_track("Image storage"):
+            storage = store_analysis_image(resized_jpeg)
+    storage_path, storage_type = storage
+
+    # Calculate expiration time
+    ttl_hours = config.PHOTO_ANALYSIS_IMAGE_TTL_HOURS
+    expires_at = None
+    if ttl_hours > 0:
+        expires_at = timezone.now() + timedelta(hours=ttl_hours)
+
+    # Format seed suggestions (initial 10 AI suggestions from Vision API)
+    seed_suggestions_list = [
+        {
+            'name': s.name,
+            'key': s.key,
+            'description': s.description,
+            'is_proper_noun': s.is_proper_noun,
+            'source': 'seed'
+        }
+        for s in analysis_result.suggestions
+    ]
+
+    seed_suggestions_data = {
+        'suggestions': seed_suggestions_list,
+        'count': len(seed_suggestions_list)
+    }
+
+    logger.info(f"Received {len(seed_suggestions_list)} seed suggestions from Vision API")
+
+    # =========================================================================
+    # SUGGESTION-TO-SUGGESTION MATCHING WORKFLOW
+    # Replaces photo-level similarity with granular suggestion-level matching
+    # =========================================================================
+
+    # STEP 1: Match seed suggestions to existing Suggestion records
+    # - Proper nouns: preserved without matching (unique entities)
+    # - Generic suggestions: K-NN search in Suggestion table (threshold: 0.15)
+    # - Match found: use existing suggestion, increment usage_count
+    # - No match: create new Suggestion record
+    # This eliminates cross-domain contamination (whiskey photos won't match beer photos)
+    logger.info("\n" + "="*80)
+    logger.info("STEP 1: Matching seed suggestions to existing Suggestion records")
+    logger.info("="*80)
+
+    with perf_track("Suggestion matching", metadata=f"{len(seed_suggestions_list)} seeds"):
+        matched_suggestions = match_suggestions_to_existing(seed_suggestions_list)
+
+    logger.info(f"\nMatching complete: {len(matched_suggestions)} suggestions processed")
+
+    # STEP 2: Sort by room activity (active users in last 24h)
+    # - Priority 1: AI-suggested proper nouns first (in AI order)
+    # - Priority 2: Other proper nouns sorted by active_users, then usage_count
+    # - Priority 3: Generics sorted by active_users, then usage_count
+    logger.info("\n" + "="*80)
+    logger.info("STEP 2: Sorting by room activity (active users in 24h)")
+    logger.info("="*80)
+
+    # Get room info for all suggestions (to map keys -> room IDs)
+    from chats.models import ChatRoom
+    suggestion_keys = [s.get('key') for s in matched_suggestions if s.get('key')]
+    rooms_by_code = {
+        room.code: room
+        for room in ChatRoom.objects.filter(
+            code__in=suggestion_keys,
+            is_active=True
+        )
+    }
+
+    # Get active user counts for rooms
+    room_ids = [str(room.id) for room in rooms_by_code.values()]
+    active_users_by_room_id = get_active_users_for_rooms(room_ids) if room_ids else {}
+
+    # Map suggestion key -> active_users count
+    active_users_by_key = {}
+    for code, room in rooms_by_code.items():
+        active_users_by_key[code] = active_users_by_room_id.get(str(room.id), 0)
+
+    # Attach active_users to each suggestion
+    for s in matched_suggestions:
+        s['active_users'] = active_users_by_key.get(s.get('key'), 0)
+        s['has_room'] = s.get('key') in rooms_by_code
+
+    # Split proper nouns and generics
+    proper_nouns = [s for s in matched_suggestions if s.get('is_proper_noun', False)]
+    non_proper_nouns = [s for s in matched_suggestions if not s.get('is_proper_noun', False)]
+
+    # Sort function: similarity_score DESC (higher = more relevant to this photo)
+    def sort_by_similarity(s):
+        return -s.get('similarity_score', 1.0)  # Default 1.0 for created suggestions
+
+    # Sort both groups by similarity score
+    proper_nouns_sorted = sorted(proper_nouns, key=sort_by_similarity)
+    non_proper_nouns_sorted = sorted(non_proper_nouns, key=sort_by_similarity)
+
+    logger.info(f"\nProper nouns (sorted by similarity): {len(proper_nouns_sorted)}")
+    for pn in proper_nouns_sorted:
+        logger.info(
+            f"  ✓ '{pn['name']}' (similarity: {pn.get('similarity_score', 1.0):.1%}, "
+            f"active: {pn.get('active_users', 0)}, has_room: {pn.get('has_room', False)})"
+        )
+
+    logger.info(f"\nNon-proper nouns (sorted by similarity): {len(non_proper_nouns_sorted)}")
+    for npn in non_proper_nouns_sorted[:5]:  # Show top 5
+        logger.info(
+            f"  → '{npn['name']}' (similarity: {npn.get('similarity_score', 1.0):.1%}, "
+            f"active: {npn.get('active_users', 0)}, has_room: {npn.get('has_room', False)})"
+        )
+
+    # Combine: proper nouns first (sorted by similarity), then generics (sorted by similarity)
+    final_suggestions_list = (proper_nouns_sorted + non_proper_nouns_sorted)[:5]
+
+    logger.info(
+        f"\nFinal selection: {len(final_suggestions_list)} suggestions "
+        f"({len([s for s in final_suggestions_list if s.get('is_proper_noun', False)])} proper nouns, "
+        f"{len([s for s in final_suggestions_list if not s.get('is_proper_noun', False)])} generics)"
+    )
+    logger.info("="*80 + "\n")
+
+    # STEP 3: Discover related suggestions via K-NN (if enabled)
+    # This finds existing suggestions semantically similar to the LLM's suggestions
+    discovery_count = config.SUGGESTION_DISCOVERY_EXTRA_COUNT
+    discovery_threshold = config.SUGGESTION_DISCOVERY_THRESHOLD
+
+    discovered_suggestions = []
+    if discovery_count > 0:
+        logger.info("\n" + "="*80)
+        logger.info("STEP 3: Discovering related suggestions via K-NN")
+        logger.info("="*80)
+
+        with perf_track("Suggestion discovery"):
+            discovered_suggestions = discover_related_suggestions(
+                matched_suggestions=final_suggestions_list,
+                max_count=discovery_count,
+                threshold=discovery_threshold
+            )
+
+        if discovered_suggestions:
+            # Get active user counts for discovered suggestions
+            discovered_keys = [s.get('key') for s in discovered_suggestions if s.get('key')]
+            discovered_rooms = {
+                room.code: room
+                for room in ChatRoom.objects.filter(
+                    code__in=discovered_keys,
+                    is_active=True
+                )
+            }
+            discovered_room_ids = [str(room.id) for room in discovered_rooms.values()]
+            discovered_active_users = get_active_users_for_rooms(discovered_room_ids) if discovered_room_ids else {}
+
+            # Attach active_users to discovered suggestions
+            for s in discovered_suggestions:
+                key = s.get('key')
+                if key in discovered_rooms:
+                    room_id = str(discovered_rooms[key].id)
+                    s['active_users'] = discovered_active_users.get(room_id, 0)
+                    s['has_room'] = True
+                else:
+                    s['active_users'] = 0
+                    s['has_room'] = False
+
+            # Sort discovered suggestions by similarity score
+            discovered_suggestions_sorted = sorted(
+                discovered_suggestions,
+                key=lambda s: -s.get('similarity_score', 0)  # Higher similarity = more relevant
+            )
+
+            logger.info(f"Discovered {len(discovered_suggestions_sorted)} suggestions:")
+            for ds in discovered_suggestions_sorted:
+                logger.info(
+                    f"  → '{ds['name']}' (similarity: {ds.get('similarity_score', 0):.1%}, "
+                    f"active: {ds.get('active_users', 0)}, proper_noun: {ds.get('is_proper_noun', False)}, "
+                    f"has_room: {ds.get('has_room', False)})"
+                )
+
+            # Combine all suggestions for final re-sort
+            all_suggestions = final_suggestions_list + discovered_suggestions_sorted
+        else:
+            logger.info("No related suggestions discovered")
+            all_suggestions = final_suggestions_list
+
+        # STEP 4: Final re-sort to ensure proper ordering
+        # Order: Proper nouns by similarity → Generics by similarity
+        logger.info("\n" + "="*80)
+        logger.info("STEP 4: Final re-sort (Proper nouns → Generics, both by similarity)")
+        logger.info("="*80)
+
+        # Separate into categories
+        all_proper_nouns = [s for s in all_suggestions if s.get('is_proper_noun')]
+        generics = [s for s in all_suggestions if not s.get('is_proper_noun')]
+
+        # Sort both groups by similarity score (higher = more relevant)
+        proper_nouns_final = sorted(
+            all_proper_nouns,
+            key=lambda s: -s.get('similarity_score', 1.0)
+        )
+
+        generics_final = sorted(
+            generics,
+            key=lambda s: -s.get('similarity_score', 1.0)
+        )
+
+        # Final order: proper nouns first (by similarity), then generics (by similarity)
+        final_suggestions_list = proper_nouns_final + generics_final
+
+        logger.info(f"Final order ({len(final_suggestions_list)} total):")
+        for i, s in enumerate(final_suggestions_list, 1):
+            category = "Proper noun" if s.get('is_proper_noun') else "Generic"
+            logger.info(
+                f"  #{i} '{s['name']}' [{category}] "
+                f"(similarity: {s.get('similarity_score', 1.0):.1%}, active: {s.get('active_users', 0)}, has_room: {s.get('has_room', False)})"
+            )
+
+        logger.info("="*80 + "\n")
+
+    # Format final suggestions for database storage
+    suggestions_data = {
+        'suggestions': final_suggestions_list,
+        'count': len(final_suggestions_list)
+    }
+
+    # Enrich final suggestions with room metadata (metadata-only layer)
+    # Adds has_room, room_id, room_code, room_url, active_users for existing rooms
+    blended = None
+    try:
+        logger.info("Enriching final suggestions with room metadata")
+        with perf_track("Room metadata blending"):
+            blended = blend_suggestions(
+                refined_suggestions=final_suggestions_list,
+                exclude_photo_id=None  # Will exclude after PhotoAnalysis is created
+            )
+        logger.info(f"Enriched {len(blended)} suggestions with room metadata")
+    except Exception as e:
+        # Metadata enrichment is non-fatal - log warning and continue
+        logger.warning(f"Metadata enrichment failed (non-fatal): {str(e)}", exc_info=True)
+        blended = None
+
+    # Create PhotoAnalysis record
+    media_analysis = PhotoAnalysis.objects.create(
+        image_phash=image_phash,
+        file_hash=file_hash,
+        file_size=file_size,
+        image_path=storage_path,
+        storage_type=storage_type,
+        expires_at=expires_at,
+        seed_suggestions=seed_suggestions_data,  # Store original 10 AI suggestions for audit trail
+        suggestions=suggestions_data,  # Store final merged suggestions (popular + normalized)
+        raw_response=analysis_result.raw_response,
+        ai_vision_model=analysis_result.model,
+        token_usage=analysis_result.token_usage,
+        user=user,
+        fingerprint=fingerprint,
+        ip_address=ip_address,
+        suggestions_embedding=None,  # Not using photo-level similarity
+        suggestions_embedding_generated_at=None
+    )
+
+    return media_analysis, blended
+
+
+def run_photo_analysis_job(payload: dict) -> dict:
+    """
+    Media job handler for uploads sent with `Prefer: respond-async`.
+
+    Payload holds the stored JPEG, the upload fingerprints and the uploader
+    identity captured by PhotoAnalysisViewSet.upload.
+
+    Returns:
+        {'analysis_id': ..., 'suggestions': [...]}
+    """
+    from django.contrib.auth import get_user_model
+    from .utils.jobs import JobRejected
+
+    stored = MediaStorage.get_file(payload['storage_path'])
+    if stored is None:
+        raise JobRejected(f"Stored photo not found: {payload['storage_path']}")
+    with stored:
+        resized_jpeg = stored.read()
+
+    vision_provider = get_vision_provider(model=config.PHOTO_ANALYSIS_OPENAI_MODEL)
+    if not vision_provider.is_available():
+        raise RuntimeError("OpenAI API not configured")
+
+    user = None
+    if payload.get('user_id'):
+        user = get_user_model().objects.filter(pk=payload['user_id']).first()
+
+    media_analysis, blended = run_photo_analysis(
+        vision_provider,
+        resized_jpeg,
+        image_phash=payload['image_phash'],
+        file_hash=payload['file_hash'],
+        file_size=payload['file_size'],
+        user=user,
+        fingerprint=payload.get('fingerprint'),
+        ip_address=payload.get('ip_address'),
+        storage=(payload['storage_path'], payload['storage_type'])
+    )
+
+    if blended is not None:
+        suggestions = [s.to_dict() for s in blended]
+    else:
+        suggestions = media_analysis.suggestions.get('suggestions', [])
+    return {
+        'analysis_id': str(media_analysis.id),
+        'suggestions': suggestions,
+    }
+
+
 def _get_or_create_suggestion(name: str, key: str, description: str = '', is_proper_noun: bool = True) -> Suggestion:
     """
     Get or create a Suggestion by key.
@@ -1480,3 +1623,27 @@ class ActivityPollingView(viewsets.ViewSet):
             "activity": activity,
         })
 
+
+class MediaJobViewSet(viewsets.ViewSet):
+    """
+    Status of asynchronous media processing jobs.
+
+    Uploads sent with `Prefer: respond-async` return 202 with a job id;
+    clients poll this endpoint (or listen for `media_job` WebSocket events)
+    until the job is `succeeded` or `failed`. Job ids are random UUIDs and
+    act as the capability to read the result.
+
+    GET /api/media-analysis/jobs/{id}/
+    """
+    permission_classes = [AllowAny]
+
+    def retrieve(self, request, pk=None):
+        """Get the status (and result once finished) of a media job."""
+        try:
+            job = MediaJob.objects.get(pk=pk)
+        except (MediaJob.DoesNotExist, ValueError, DjangoValidationError):
+            return Response(
+                {"error": "Job not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(serialize_job(job))